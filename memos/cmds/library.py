@@ -7,6 +7,7 @@ import threading
 import asyncio
 import logging
 import logging.config
+import json
 from pathlib import Path
 from datetime import datetime, timezone
 from enum import Enum
@@ -21,11 +22,15 @@ from tqdm import tqdm
 from tabulate import tabulate
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Local imports
 from memos.config import settings
 from memos.utils import get_image_metadata
+from memos.utils.directory_digest import directory_digests
+from memos.utils.file_type import detect_file_type
+from memos.utils.low_info import FRAME_INFO_KEY, LOW_INFO_TAG, read_frame_info
+from memos.utils.scan_manifest import ScanManifest, ScanPlan, manifest_path
 from memos.schemas import MetadataSource
 from memos.logging_config import LOGGING_CONFIG
 from memos.record import is_app_blacklisted, get_active_window_info
@@ -37,14 +42,15 @@ logger = logging.getLogger(__name__)
 
 lib_app = typer.Typer()
 
-file_detector = None
-
 IS_THUMBNAIL = "is_thumbnail"
 
 BASE_URL = settings.server_endpoint
 
 include_files = [".jpg", ".jpeg", ".png", ".webp"]
 
+# Workers running prepare_entity (stat, magika, EXIF) during a scan.
+DEFAULT_PREPARE_WORKERS = min(8, os.cpu_count() or 1)
+
 
 class FileStatus(Enum):
     UPDATED = "updated"
@@ -61,21 +67,10 @@ def format_timestamp(timestamp):
     )
 
 
-def init_file_detector():
-    """Initialize the global file detector if not already initialized"""
-    global file_detector
-    if file_detector is None:
-        from magika import Magika
-
-        file_detector = Magika()
-    return file_detector
-
-
-def get_file_type(file_path):
-    """Get file type using lazy-loaded detector"""
-    detector = init_file_detector()
-    file_result = detector.identify_path(file_path)
-    return file_result.output.ct_label, file_result.output.group
+def get_file_type(file_path, file_stat=None):
+    """Get file type, falling back to the lazy-loaded magika detector only
+    when the extension and magic bytes are not conclusive"""
+    return detect_file_type(file_path, file_stat)
 
 
 def display_libraries(libraries):
@@ -174,10 +169,24 @@ def is_temp_file(filename):
     )
 
 
-async def loop_files(library, folder, folder_path, force, plugins, batch_size):
+async def loop_files(
+    library,
+    folder,
+    folder_path,
+    force,
+    plugins,
+    batch_size,
+    full=False,
+    prepare_workers=DEFAULT_PREPARE_WORKERS,
+    use_processes=False,
+):
     """
     Process files in the folder
 
+    Only files that are new or changed since the last scan of the folder, or
+    in directories whose server-side entities differ from the files on disk,
+    are prepared and sent; force, full and plugin scans check every file.
+
     Args:
         library: Library object
         folder: Folder information
@@ -185,6 +194,9 @@ async def loop_files(library, folder, folder_path, force, plugins, batch_size):
         force: Whether to force update
         plugins: List of plugins
         batch_size: Batch size
+        full: Whether to ignore the scan manifest
+        prepare_workers: Number of workers preparing entities
+        use_processes: Whether to prepare in processes rather than threads
 
     Returns:
         Tuple[int, int, int]: (Number of files added, Number of files updated, Number of files deleted)
@@ -194,27 +206,48 @@ async def loop_files(library, folder, folder_path, force, plugins, batch_size):
     deleted_file_count = 0
     semaphore = asyncio.Semaphore(batch_size)
 
+    manifest = ScanManifest.load(
+        manifest_path(library.get("id"), folder["id"]), folder.get("created_at")
+    )
+    # Plugin runs have to reach every file, changed or not.
+    check_every_file = full or force or bool(plugins)
+
     async with httpx.AsyncClient(timeout=300) as client:
         # 1. Collect candidate files
-        candidate_files = await collect_candidate_files(folder_path)
-        scanned_files = set(candidate_files)
+        plan = await collect_candidate_files(folder_path, manifest, check_every_file)
+        scanned_files = set(plan.candidate_files)
+        changed_files = plan.changed_files
+        if not check_every_file:
+            # Unchanged files whose entities the server no longer has.
+            changed_files = changed_files + await files_in_differing_directories(
+                client, library.get("id"), folder, folder_path, plan, manifest
+            )
 
         # 2. Process file batches
+        failed_files = set()
         added_file_count, updated_file_count = await process_file_batches(
             client,
             library,
             folder,
-            candidate_files,
+            changed_files,
             force,
             plugins,
             semaphore,
+            failed_files,
+            prepare_workers,
+            use_processes,
         )
 
         # 3. Check for deleted files
         deleted_file_count = await check_deleted_files(
-            client, library.get("id"), folder, folder_path, scanned_files
+            client, library.get("id"), folder, folder_path, scanned_files, manifest
         )
 
+        # Files that failed are retried by the next scan.
+        for file_path in failed_files:
+            manifest.forget(file_path)
+        manifest.save()
+
         return added_file_count, updated_file_count, deleted_file_count
 
 
@@ -228,6 +261,18 @@ def scan(
     batch_size: int = typer.Option(
         1, "--batch-size", "-bs", help="Batch size for processing files"
     ),
+    full: bool = typer.Option(
+        False, "--full", help="Check every file, not only new or changed ones"
+    ),
+    prepare_workers: int = typer.Option(
+        DEFAULT_PREPARE_WORKERS,
+        "--prepare-workers",
+        "-pw",
+        help="Number of workers reading file type and metadata",
+    ),
+    processes: bool = typer.Option(
+        False, "--processes", help="Prepare files in worker processes instead of threads"
+    ),
 ):
     # Check if both path and folders are provided
     if path and folders:
@@ -277,7 +322,17 @@ def scan(
             continue
 
         added_file_count, updated_file_count, deleted_file_count = asyncio.run(
-            loop_files(library, folder, folder_path, force, plugins, batch_size)
+            loop_files(
+                library,
+                folder,
+                folder_path,
+                force,
+                plugins,
+                batch_size,
+                full,
+                prepare_workers,
+                processes,
+            )
         )
         total_files_added += added_file_count
         total_files_updated += updated_file_count
@@ -436,13 +491,16 @@ def reindex(
             for folder in library_folders:
                 print(f"Processing folder: {folder['id']}")
 
-                # List all entities in the folder
+                # List all entities in the folder, paging by id
                 limit = 200
-                offset = 0
+                after_id = None
                 while True:
+                    params = {"limit": limit, "order_by": "id:asc", "count": False}
+                    if after_id is not None:
+                        params["after_id"] = after_id
                     entities_response = client.get(
                         f"{BASE_URL}/api/libraries/{library_id}/folders/{folder['id']}/entities",
-                        params={"limit": limit, "offset": offset},
+                        params=params,
                     )
                     if entities_response.status_code != 200:
                         print(
@@ -477,7 +535,7 @@ def reindex(
                             pbar.update(len(batch_ids))
                             scanned_entities.update(batch_ids)
 
-                    offset += limit
+                    after_id = entities[-1]["id"]
 
     if folders:
         print(f"Reindexing completed for library {library_id} with folders: {folders}")
@@ -562,7 +620,7 @@ def sync(
     )
 
     file_stat = file_path.stat()
-    file_type, file_type_group = get_file_type(file_path)
+    file_type, file_type_group = get_file_type(file_path, file_stat)
 
     # 比较st_mtime和st_ctime，使用较早的时间作为file_created_at
     created_at_timestamp = file_stat.st_ctime
@@ -609,6 +667,9 @@ def sync(
                 typer.echo(f"Skipping thumbnail file: {file_path}")
                 return
 
+        if settings.low_info.enabled:
+            add_frame_info(new_entity, file_path)
+
     # If metadata_timestamp is set, use it for file_created_at
     if metadata_timestamp is not None:
         new_entity["file_created_at"] = format_timestamp(metadata_timestamp)
@@ -744,6 +805,8 @@ class LibraryFileHandler(FileSystemEventHandler):
     BG_RESTART_COOLDOWN = 300  # seconds
     ERROR_RETRY_BASE_WAIT = 30  # seconds
     ERROR_RETRY_MAX_WAIT = 300  # seconds
+    BG_MAX_QUEUED_JOBS = 20  # pause background submits while this many plugin jobs are queued
+    BG_QUEUE_POLL_INTERVAL = 5  # seconds
 
     def __init__(
         self,
@@ -1066,6 +1129,12 @@ class LibraryFileHandler(FileSystemEventHandler):
                                         )
                                         self.failed_retries.pop(filepath, None)
 
+                        # sync() only enqueues plugin jobs now, so wait for the
+                        # server to work the queue down before submitting more.
+                        # This keeps the idle/battery checks above meaningful.
+                        if not self.wait_for_plugin_queue():
+                            return
+
                     # Log cycle summary
                     if cycle_stats["processed_count"] > 0 or cycle_stats["failed_count"] > 0:
                         self.logger.info("Background processing cycle completed", extra={
@@ -1116,6 +1185,21 @@ class LibraryFileHandler(FileSystemEventHandler):
         # Start processing in a separate thread
         self.executor.submit(process_files)
 
+    def wait_for_plugin_queue(self) -> bool:
+        """Block while the library's plugin job queue is at least
+        BG_MAX_QUEUED_JOBS deep. Returns False (and stops background
+        processing) if the idle conditions end while waiting."""
+        while True:
+            if not self.is_processing_skipped or is_on_battery() or not self.is_within_process_interval() or self.state != "idle":
+                self.is_processing_skipped = False
+                return False
+
+            response = httpx.get(f"{BASE_URL}/api/libraries/{self.library_id}/plugin-jobs")
+            response.raise_for_status()
+            if response.json()["depth"] < self.BG_MAX_QUEUED_JOBS:
+                return True
+            time.sleep(self.BG_QUEUE_POLL_INTERVAL)
+
     def process_pending_files(self):
         current_time = time.time()
         files_to_process_with_plugins = []
@@ -1388,45 +1472,73 @@ def watch(
     observer.join()
 
 
-async def collect_candidate_files(folder_path: Path) -> List[str]:
+def is_candidate_file(filename: str) -> bool:
+    return Path(filename).suffix.lower() in include_files and not is_temp_file(
+        filename
+    )
+
+
+async def collect_candidate_files(
+    folder_path: Path, manifest: ScanManifest, full: bool = False
+) -> ScanPlan:
     """
     Collect candidate files to be processed
 
     Args:
         folder_path: Folder path
+        manifest: Scan manifest of the folder, updated in place
+        full: Whether to list every directory and treat every file as changed
 
     Returns:
-        List[str]: List of candidate file paths
+        ScanPlan: All candidate files and the new or changed ones among them
     """
-    candidate_files = []
-    for root, _, files in os.walk(folder_path):
-        with tqdm(total=len(files), desc=f"Scanning {root}", leave=True) as pbar:
-            for file in files:
-                file_path = Path(root) / file
-                absolute_file_path = file_path.resolve()
+    t0 = time.perf_counter()
+    plan = manifest.walk(folder_path, is_candidate_file, full=full)
+    elapsed = time.perf_counter() - t0
+    tqdm.write(
+        f"Scanned {folder_path} in {elapsed:.2f}s: {len(plan.candidate_files)} files, "
+        f"{len(plan.changed_files)} new or changed, "
+        f"{plan.dirs_skipped} unchanged directories skipped"
+    )
+    return plan
 
-                # Check if the file extension is in the include_files list and is not a temporary file
-                if file_path.suffix.lower() in include_files and not is_temp_file(file):
-                    candidate_files.append(str(absolute_file_path))
-                pbar.update(1)
 
-    return candidate_files
+def add_frame_info(new_entity: Dict[str, Any], file_path: Path):
+    """Score how much there is to read in an image, record the score as
+    metadata, and tag the entity low_info when plugins should skip it."""
+    info = read_frame_info(file_path)
+    if info is None:
+        return
+    low_info = info.is_low_info(settings.low_info)
+    new_entity.setdefault("metadata_entries", []).append(
+        {
+            "key": FRAME_INFO_KEY,
+            "value": json.dumps(info.as_metadata(low_info)),
+            "source": MetadataSource.SYSTEM_GENERATED.value,
+            "data_type": "json",
+        }
+    )
+    if low_info:
+        new_entity.setdefault("tags", []).append(LOW_INFO_TAG)
 
 
-async def prepare_entity(file_path: str, folder_id: int) -> Dict[str, Any]:
+def prepare_entity(file_path: str, folder_id: int) -> Optional[Dict[str, Any]]:
     """
     Prepare entity data
 
+    Blocking (stat, file type detection, image metadata); the scan pipeline
+    runs it in a worker pool. Returns None for thumbnails.
+
     Args:
         file_path: File path
         folder_id: Folder ID
 
     Returns:
-        Dict[str, Any]: Entity data
+        Optional[Dict[str, Any]]: Entity data
     """
     file_path = Path(file_path)
     file_stat = file_path.stat()
-    file_type, file_type_group = get_file_type(file_path)
+    file_type, file_type_group = get_file_type(file_path, file_stat)
 
     # 比较st_mtime和st_ctime，使用较早的时间作为file_created_at
     created_at_timestamp = file_stat.st_ctime
@@ -1474,6 +1586,9 @@ async def prepare_entity(file_path: str, folder_id: int) -> Dict[str, Any]:
                 typer.echo(f"Skipping thumbnail file: {file_path}")
                 return
 
+        if settings.low_info.enabled:
+            add_frame_info(new_entity, file_path)
+
     # If metadata_timestamp is set, use it for file_created_at
     if metadata_timestamp is not None:
         new_entity["file_created_at"] = format_timestamp(metadata_timestamp)
@@ -1509,6 +1624,134 @@ def format_error_message(
     return error_message
 
 
+class StageMeter:
+    """Throughput of one scan pipeline stage, for the progress bar."""
+
+    def __init__(self):
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def add(self, n: int = 1):
+        self.count += n
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+
+def create_prepare_executor(workers: int, use_processes: bool):
+    if use_processes:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan-prepare")
+
+
+async def prepare_entities(
+    candidate_files: list,
+    folder_id: int,
+    executor,
+    prepared: asyncio.Queue,
+    max_in_flight: int,
+    meter: StageMeter,
+):
+    """
+    Prepare stage: run prepare_entity in the executor and put
+    (file_path, new_entity, error) on the prepared queue, then None.
+
+    At most max_in_flight files are being prepared or waiting in the queue,
+    so a slow upsert stage holds back preparation instead of buffering the
+    whole folder in memory.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_in_flight)
+    running = set()
+
+    async def prepare_one(file_path):
+        try:
+            new_entity = await loop.run_in_executor(
+                executor, prepare_entity, file_path, folder_id
+            )
+            error = None
+        except Exception as e:
+            new_entity, error = None, e
+        meter.add()
+        await prepared.put((file_path, new_entity, error))
+        slots.release()
+
+    for file_path in candidate_files:
+        await slots.acquire()
+        task = asyncio.create_task(prepare_one(file_path))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.gather(*running)
+    await prepared.put(None)
+
+
+async def next_prepared_batch(prepared: asyncio.Queue, batching: int) -> Tuple[list, bool]:
+    """Wait for one prepared file, then take whatever else is ready, up to
+    batching files. Returns (batch, done)."""
+    batch = []
+    item = await prepared.get()
+    while item is not None:
+        batch.append(item)
+        if len(batch) >= batching or prepared.empty():
+            return batch, False
+        item = prepared.get_nowait()
+    return batch, True
+
+
+def build_upsert_task(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    library_id: int,
+    plugins: list,
+    target_plugins: list,
+    force: bool,
+    new_entity: dict,
+    existing_entity: Optional[dict],
+):
+    """Return the add/update coroutine for a prepared entity, or None when
+    the existing entity is already up to date."""
+    if not existing_entity:
+        return add_entity(client, semaphore, library_id, plugins, new_entity)
+
+    if force:
+        # Directly update without merging if force is true
+        return update_entity(
+            client, semaphore, plugins, new_entity, existing_entity, force
+        )
+
+    # Merge existing metadata with new metadata
+    new_metadata_keys = {
+        entry["key"] for entry in new_entity.get("metadata_entries", [])
+    }
+    for existing_entry in existing_entity.get("metadata_entries", []):
+        if existing_entry["key"] not in new_metadata_keys:
+            new_entity.setdefault("metadata_entries", []).append(existing_entry)
+
+    # Merge existing tags with new tags
+    existing_tags = {tag["name"] for tag in existing_entity.get("tags", [])}
+    new_tags = set(new_entity.get("tags", []))
+    new_entity["tags"] = list(new_tags.union(existing_tags))
+
+    # Check if the entity needs to be processed by any plugins
+    processed_plugins = {
+        plugin_status.get("plugin_id")
+        for plugin_status in existing_entity.get("plugin_status", [])
+    }
+    has_unprocessed_plugins = any(
+        plugin_id not in processed_plugins for plugin_id in target_plugins
+    )
+
+    # Only update if there are actual changes or the entity needs to be processed by any plugins
+    if has_unprocessed_plugins or has_entity_changes(new_entity, existing_entity):
+        return update_entity(
+            client, semaphore, plugins, new_entity, existing_entity, force
+        )
+    return None
+
+
 async def process_file_batches(
     client: httpx.AsyncClient,
     library: dict,
@@ -1517,10 +1760,17 @@ async def process_file_batches(
     force: bool,
     plugins: list,
     semaphore: asyncio.Semaphore,
+    failed_files: Optional[Set[str]] = None,
+    prepare_workers: int = DEFAULT_PREPARE_WORKERS,
+    use_processes: bool = False,
 ) -> Tuple[int, int]:
     """
     Process file batches
 
+    Runs as a pipeline: files are prepared in a worker pool while earlier
+    ones are looked up and upserted, with bounded hand-offs between the
+    stages so the slowest one sets the pace.
+
     Args:
         client: httpx async client
         library: Library object
@@ -1529,6 +1779,9 @@ async def process_file_batches(
         force: Whether to force update
         plugins: List of plugins
         semaphore: Concurrency control semaphore
+        failed_files: If given, collects the files that could not be added or updated
+        prepare_workers: Number of workers preparing entities
+        use_processes: Whether to prepare in processes rather than threads
 
     Returns:
         Tuple[int, int]: (Number of files added, Number of files updated)
@@ -1536,6 +1789,8 @@ async def process_file_batches(
     added_file_count = 0
     updated_file_count = 0
     batching = 50
+    # Prepared entities waiting for lookup, and upserts waiting to finish.
+    max_in_flight = max(batching, prepare_workers * 2)
 
     library_id = library.get("id")
     library_plugins = [plugin.get("id") for plugin in library.get("plugins", [])]
@@ -1545,214 +1800,258 @@ async def process_file_batches(
         else [plugin for plugin in library_plugins if plugin in plugins]
     )
 
-    with tqdm(total=len(candidate_files), desc="Processing files", leave=True) as pbar:
-        for i in range(0, len(candidate_files), batching):
-            batch = candidate_files[i : i + batching]
+    prepare_meter, lookup_meter, upsert_meter = StageMeter(), StageMeter(), StageMeter()
+    prepared: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+    upserts = set()
 
-            # Get existing entities in the batch
-            get_response = await client.post(
-                f"{BASE_URL}/api/libraries/{library_id}/entities/by-filepaths",
-                json=batch,
-            )
+    def mark_failed(files):
+        if failed_files is not None:
+            failed_files.update(files)
 
-            if get_response.status_code != 200:
-                print(
-                    f"Failed to get entities: {get_response.status_code} - {get_response.text}"
-                )
-                pbar.update(len(batch))
-                continue
+    def report_progress(pbar):
+        pbar.update(1)
+        pbar.set_postfix(
+            {
+                "Added": added_file_count,
+                "Updated": updated_file_count,
+                "prepare/s": f"{prepare_meter.rate:.1f}",
+                "lookup/s": f"{lookup_meter.rate:.1f}",
+                "upsert/s": f"{upsert_meter.rate:.1f}",
+            },
+            refresh=True,
+        )
 
-            existing_entities = get_response.json()
-            existing_entities_dict = {
-                entity["filepath"]: entity for entity in existing_entities
-            }
+    def record_upsert(pbar, result):
+        nonlocal added_file_count, updated_file_count
+        file_path, file_status, succeeded, response = result
+        upsert_meter.add()
+        if succeeded:
+            if file_status == FileStatus.ADDED:
+                added_file_count += 1
+                tqdm.write(f"Added file to library: {file_path}")
+            else:
+                updated_file_count += 1
+                tqdm.write(f"Updated file in library: {file_path}")
+        else:
+            tqdm.write(format_error_message(file_status, response))
+            mark_failed([file_path])
+        report_progress(pbar)
+
+    async def drain_upserts(pbar, limit):
+        nonlocal upserts
+        while len(upserts) > limit:
+            done, upserts = await asyncio.wait(
+                upserts, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                record_upsert(pbar, task.result())
 
-            # Process each file
-            tasks = []
-            for file_path in batch:
-                new_entity = await prepare_entity(file_path, folder["id"])
+    executor = create_prepare_executor(prepare_workers, use_processes)
+    with tqdm(total=len(candidate_files), desc="Processing files", leave=True) as pbar:
+        producer = asyncio.create_task(
+            prepare_entities(
+                candidate_files,
+                folder["id"],
+                executor,
+                prepared,
+                max_in_flight,
+                prepare_meter,
+            )
+        )
+        try:
+            done = False
+            while not done:
+                batch, done = await next_prepared_batch(prepared, batching)
+
+                ready = []
+                for file_path, new_entity, error in batch:
+                    if error is not None:
+                        tqdm.write(f"Failed to prepare file {file_path}: {error}")
+                        mark_failed([file_path])
+                        report_progress(pbar)
+                    elif new_entity is None or new_entity.get("is_thumbnail", False):
+                        # prepare_entity has already reported the thumbnail.
+                        report_progress(pbar)
+                    else:
+                        ready.append(new_entity)
+                if not ready:
+                    continue
 
-                if new_entity.get("is_thumbnail", False):
-                    typer.echo(f"Skipping thumbnail file: {file_path}")
+                # Get existing entities in the batch
+                get_response = await client.post(
+                    f"{BASE_URL}/api/libraries/{library_id}/entities/by-filepaths",
+                    json=[new_entity["filepath"] for new_entity in ready],
+                )
+                lookup_meter.add(len(ready))
+
+                if get_response.status_code != 200:
+                    print(
+                        f"Failed to get entities: {get_response.status_code} - {get_response.text}"
+                    )
+                    mark_failed(new_entity["filepath"] for new_entity in ready)
+                    pbar.update(len(ready))
                     continue
 
-                existing_entity = existing_entities_dict.get(str(file_path))
-                if existing_entity:
-                    if force:
-                        # Directly update without merging if force is true
-                        tasks.append(
-                            update_entity(
-                                client, semaphore, plugins, new_entity, existing_entity, force
-                            )
-                        )
-                    else:
-                        # Merge existing metadata with new metadata
-                        new_metadata_keys = {
-                            entry["key"]
-                            for entry in new_entity.get("metadata_entries", [])
-                        }
-                        for existing_entry in existing_entity.get(
-                            "metadata_entries", []
-                        ):
-                            if existing_entry["key"] not in new_metadata_keys:
-                                new_entity.setdefault("metadata_entries", []).append(
-                                    existing_entry
-                                )
+                existing_entities_dict = {
+                    entity["filepath"]: entity for entity in get_response.json()
+                }
 
-                        # Merge existing tags with new tags
-                        existing_tags = {
-                            tag["name"] for tag in existing_entity.get("tags", [])
-                        }
-                        new_tags = set(new_entity.get("tags", []))
-                        merged_tags = new_tags.union(existing_tags)
-                        new_entity["tags"] = list(merged_tags)
-
-                        # Check if the entity needs to be processed by any plugins
-                        processed_plugins = {
-                            plugin_status.get("plugin_id")
-                            for plugin_status in existing_entity.get(
-                                "plugin_status", []
-                            )
-                        }
-                        has_unprocessed_plugins = any(
-                            plugin_id not in processed_plugins
-                            for plugin_id in target_plugins
+                for new_entity in ready:
+                    existing_entity = existing_entities_dict.get(new_entity["filepath"])
+                    upsert = build_upsert_task(
+                        client,
+                        semaphore,
+                        library_id,
+                        plugins,
+                        target_plugins,
+                        force,
+                        new_entity,
+                        existing_entity,
+                    )
+                    if upsert is None:
+                        pbar.write(
+                            f"Skipping file: {new_entity['filepath']} #{existing_entity.get('id')}"
                         )
+                        report_progress(pbar)
+                    else:
+                        upserts.add(asyncio.create_task(upsert))
 
-                        # Only update if there are actual changes or the entity needs to be processed by any plugins
-                        if has_unprocessed_plugins or has_entity_changes(
-                            new_entity, existing_entity
-                        ):
-                            tasks.append(
-                                update_entity(
-                                    client,
-                                    semaphore,
-                                    plugins,
-                                    new_entity,
-                                    existing_entity,
-                                    force
-                                )
-                            )
-                        else:
-                            pbar.write(
-                                f"Skipping file: {file_path} #{existing_entity.get('id')}"
-                            )
-                            pbar.update(1)
-                            continue
-                else:
-                    tasks.append(
-                        add_entity(client, semaphore, library_id, plugins, new_entity)
-                    )
+                await drain_upserts(pbar, max_in_flight)
 
-            # Process task results
-            if tasks:
-                for future in asyncio.as_completed(tasks):
-                    file_path, file_status, succeeded, response = await future
-                    if succeeded:
-                        if file_status == FileStatus.ADDED:
-                            added_file_count += 1
-                            tqdm.write(f"Added file to library: {file_path}")
-                        else:
-                            updated_file_count += 1
-                            tqdm.write(f"Updated file in library: {file_path}")
-                    else:
-                        error_message = format_error_message(file_status, response)
-                        tqdm.write(error_message)
-
-                    # Update progress bar for each file processed
-                    pbar.update(1)
-                    pbar.set_postfix(
-                        {"Added": added_file_count, "Updated": updated_file_count},
-                        refresh=True,
-                    )
+            await drain_upserts(pbar, 0)
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
 
+    tqdm.write(
+        f"Throughput: prepare {prepare_meter.rate:.1f}/s, "
+        f"lookup {lookup_meter.rate:.1f}/s, upsert {upsert_meter.rate:.1f}/s"
+    )
     return added_file_count, updated_file_count
 
 
+async def fetch_directory_digests(
+    client: httpx.AsyncClient, library_id: int, folder: dict, folder_path: Path
+) -> Dict[str, str] | None:
+    """Digests of the server's entity filepaths per directory under
+    folder_path, or None when the server could not be asked."""
+    response = await client.get(
+        f"{BASE_URL}/api/libraries/{library_id}/folders/{folder['id']}/entities/directory-digests",
+        params={"path_prefix": str(folder_path)},
+    )
+    if response.status_code != 200:
+        print(
+            f"Failed to get directory digests: {response.status_code} - {response.text}"
+        )
+        return None
+    return response.json()["digests"]
+
+
+async def files_in_differing_directories(
+    client: httpx.AsyncClient,
+    library_id: int,
+    folder: dict,
+    folder_path: Path,
+    plan: ScanPlan,
+    manifest: ScanManifest,
+) -> List[str]:
+    """
+    Unchanged candidate files in directories whose server-side digest is not
+    the one recorded by the last scan, e.g. after their entities were
+    deleted on the server. They are checked again; files the server still
+    has are skipped as unchanged.
+    """
+    server_digests = await fetch_directory_digests(client, library_id, folder, folder_path)
+    if server_digests is None:
+        return []
+    changed = set(plan.changed_files)
+    return [
+        filepath
+        for filepath in plan.candidate_files
+        if filepath not in changed
+        and server_digests.get(os.path.dirname(filepath))
+        != manifest.server_digests.get(os.path.dirname(filepath))
+    ]
+
+
 async def check_deleted_files(
     client: httpx.AsyncClient,
     library_id: int,
     folder: dict,
     folder_path: Path,
     scanned_files: Set[str],
+    manifest: ScanManifest | None = None,
 ) -> int:
     """
     Check and handle deleted files
 
+    The server returns a digest of its entity filepaths per directory under
+    folder_path. Only directories whose digest differs from the scanned
+    files' get their file list sent, and the server deletes the missing
+    entities of each such directory in one transaction.
+
     Args:
         client: httpx async client
         library_id: Library ID
         folder: Folder information
         folder_path: Folder path
         scanned_files: Set of scanned files
+        manifest: Scan manifest to record the server's digests in
 
     Returns:
         int: Number of deleted files
     """
-    deleted_count = 0
-    limit = 100
-    offset = 0
-    total_entities = 0
+    url = f"{BASE_URL}/api/libraries/{library_id}/folders/{folder['id']}/entities"
+    server_digests = await fetch_directory_digests(client, library_id, folder, folder_path)
+    if server_digests is None:
+        return 0
+
+    scanned_by_directory = defaultdict(list)
+    for file_path in scanned_files:
+        scanned_by_directory[os.path.dirname(file_path)].append(file_path)
+    scanned_digests = directory_digests(scanned_files)
+    changed = sorted(
+        directory
+        for directory, digest in server_digests.items()
+        if scanned_digests.get(directory) != digest
+    )
 
-    with tqdm(
-        total=total_entities, desc="Checking for deleted files", leave=True
-    ) as pbar:
-        while True:
-            # Add path_prefix parameter to only get entities under the folder_path
-            existing_files_response = await client.get(
-                f"{BASE_URL}/api/libraries/{library_id}/folders/{folder['id']}/entities",
-                params={
-                    "limit": limit,
-                    "offset": offset,
-                    "path_prefix": str(folder_path),
-                },
-                timeout=300,
+    deleted_count = 0
+    unsettled = set()
+    for directory in changed:
+        response = await client.post(
+            f"{url}/remove-missing",
+            json={
+                "path_prefix": directory,
+                "present_filepaths": sorted(scanned_by_directory.get(directory, [])),
+                "recursive": False,
+            },
+            timeout=300,
+        )
+        if response.status_code != 200:
+            print(
+                f"Failed to remove deleted files in {directory}: "
+                f"{response.status_code} - {response.text}"
             )
+            unsettled.add(directory)
+            continue
 
-            if existing_files_response.status_code != 200:
-                pbar.write(
-                    f"Failed to retrieve existing files: {existing_files_response.status_code} - {existing_files_response.text}"
-                )
-                break
-
-            existing_files = existing_files_response.json()
-            if not existing_files:
-                break
-
-            # Update total count (if this is the first request)
-            if offset == 0:
-                total_entities = int(
-                    existing_files_response.headers.get("X-Total-Count", total_entities)
-                )
-                pbar.total = total_entities
-                pbar.refresh()
-
-            for existing_file in existing_files:
-                if (
-                    # path_prefix may include files not in the folder_path,
-                    # for example when folder_path is 20241101 but there is another folder 20241101-copy
-                    # so check the existing_file is relative_to folder_path is required,
-                    # do not remove this.
-                    Path(existing_file["filepath"]).is_relative_to(folder_path)
-                    and existing_file["filepath"] not in scanned_files
-                ):
-                    # File has been deleted
-                    delete_response = await client.delete(
-                        f"{BASE_URL}/api/libraries/{library_id}/entities/{existing_file['id']}"
-                    )
-                    if 200 <= delete_response.status_code < 300:
-                        pbar.write(
-                            f"Deleted file from library: {existing_file['filepath']}"
-                        )
-                        deleted_count += 1
-                    else:
-                        pbar.write(
-                            f"Failed to delete file: {delete_response.status_code} - {delete_response.text}"
-                        )
-                pbar.update(1)
-
-            offset += limit
-
+        deleted_filepaths = response.json()["deleted_filepaths"]
+        for filepath in deleted_filepaths:
+            print(f"Deleted file from library: {filepath}")
+        if deleted_filepaths:
+            unsettled.add(directory)
+        deleted_count += len(deleted_filepaths)
+
+    if manifest is not None:
+        # Directories whose entities just changed are checked again next time.
+        manifest.server_digests = {
+            directory: digest
+            for directory, digest in server_digests.items()
+            if directory not in unsettled
+        }
     return deleted_count
 
 
@@ -1,7 +1,7 @@
 import os
 import shutil
 from pathlib import Path
-from typing import Tuple, Type, List
+from typing import Tuple, Type, List, Dict
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
@@ -20,6 +20,14 @@ class VLMSettings(BaseModel):
     endpoint: str = "http://localhost:11434"
     token: SecretStr = SecretStr("")
     concurrency: int = 8
+    # Adjust the requests in flight to the backend (AIMD) between
+    # min_concurrency and max_concurrency, starting at concurrency: grow while
+    # requests succeed, shrink on 5xx, timeouts and network errors. Never
+    # above the vlm + structured_vlm plugin_queue concurrency. Off: fixed at
+    # concurrency.
+    adaptive_concurrency: bool = True
+    min_concurrency: int = 1
+    max_concurrency: int = 16
     # some vlm models do not support webp
     force_jpeg: bool = True
     # prompt for vlm to extract caption
@@ -31,6 +39,12 @@ class VLMSettings(BaseModel):
     # budget and truncate the JSON output.
     max_tokens: int = 4096
     disable_thinking: bool = True
+    # structured_vlm only: send up to this many consecutive frames of a screen
+    # in one multi-image request (1 = one frame per request). A frame waits
+    # up to structured_batch_wait seconds for its neighbours. The plugin
+    # queue must run at least this many structured_vlm jobs at once.
+    structured_batch_size: int = 1
+    structured_batch_wait: float = 2.0
     # whether to enable the VLM plugin
     enabled: bool = True
 
@@ -42,11 +56,38 @@ class OCRSettings(BaseModel):
     concurrency: int = 8
     use_local: bool = True
     force_jpeg: bool = False
+    # how frames reach a remote OCR server (use_local=False): "raw" posts the
+    # JPEG bytes, "base64" the {"image_base64": ...} JSON older servers expect;
+    # "raw" switches to base64 if the server also rejects a probe image
+    remote_transport: str = "raw"
+    # retries of a request the server turned away with 429 / 503
+    remote_max_retries: int = 3
     # Apple Vision language preference (macOS only, used when use_local=True).
     # First language has the highest decoding weight. Default mixes Chinese and
     # English so isolated Latin letters are not misread as digits in Chinese
     # contexts (O→0, I→1, S→5, etc).
     languages: List[str] = ["zh-Hans", "en-US"]
+    # RapidOCR backend when use_local is True: "thread" shares one engine
+    # across `concurrency` threads, "process" runs one engine (and model) per
+    # worker process. Apple Vision on macOS is unaffected.
+    local_backend: str = "thread"
+    # worker processes, 0 = min(concurrency, cpu cores / intra_op_threads)
+    process_workers: int = 0
+    # onnxruntime intra-op threads per worker process
+    intra_op_threads: int = 1
+    # frames gathered into one local RapidOCR batch (1 disables batching),
+    # waiting at most batch_window seconds for the batch to fill; capped at
+    # the OCR plugin's plugin_queue concurrency, which bounds jobs in flight
+    batch_size: int = 8
+    batch_window: float = 0.05
+    # text-line crops per recognition batch
+    rec_batch_size: int = 32
+    # OCR only the tiles that changed since the last frame of the same screen
+    # and carry the other text lines over (local RapidOCR only)
+    delta: bool = False
+    delta_tile: int = 64
+    # changed fraction of the frame above which it is OCR'd in full
+    delta_max_changed: float = 0.5
     # whether to enable the OCR plugin
     enabled: bool = True
 
@@ -110,6 +151,76 @@ class HealthSettings(BaseModel):
     alert_cooldown_seconds: int = 3600       # min gap between repeat alerts for the same problem
 
 
+class PluginQueueSettings(BaseModel):
+    concurrency: int = 4                      # in-flight jobs per plugin
+    plugin_concurrency: Dict[str, int] = {}   # per-plugin override, keyed by plugin name
+    max_attempts: int = 5                     # give up on a job after this many tries
+    lease_seconds: int = 600                  # a job still running shortly before this is failed
+    retry_base_delay: float = 30.0            # first retry delay, doubled per attempt
+    retry_max_delay: float = 3600.0           # cap for the retry delay
+    poll_interval: float = 2.0                # idle wait between queue scans
+    request_timeout: float = 300.0            # webhook call timeout
+    breaker_failure_threshold: int = 5        # consecutive failures that pause a plugin; 0 disables
+    breaker_open_seconds: float = 30.0        # pause before the first health probe
+    breaker_max_open_seconds: float = 600.0   # cap for the pause, doubled per failed probe or trial
+    probe_timeout: float = 10.0               # health probe timeout
+
+    def concurrency_for(self, plugin_name: str) -> int:
+        """Jobs of the plugin dispatched at once."""
+        return max(1, self.plugin_concurrency.get(plugin_name, self.concurrency))
+
+
+class IndexQueueSettings(BaseModel):
+    debounce_seconds: float = 2.0    # index an entity once it has been quiet this long
+    max_delay_seconds: float = 30.0  # ...or once it has been dirty this long
+    batch_size: int = 50             # entities per index batch
+
+
+class RecordSettings(BaseModel):
+    capture_workers: int = 4            # screens grabbed and hashed in parallel
+    encode_workers: int = 2             # WebP encode + metadata/worklog writers
+    queue_size: int = 8                 # captured frames waiting for an encode worker
+    timings_log_interval: int = 60      # ticks between pipeline timing log lines
+    max_interval: int = 30              # cap for the interval while the screen is static
+    interval_backoff: float = 1.5       # interval growth per tick without changes
+
+
+class LowInfoSettings(BaseModel):
+    enabled: bool = True                # score images at ingest, tag low-info frames
+    min_edge_density: float = 0.0015    # fewer sharp edges than this: blank
+    media_edge_density: float = 0.01    # fewer sharp edges than this...
+    media_entropy: float = 4.5          # ...over more varied gray levels: video/wallpaper
+    # plugins not run on frames tagged low_info
+    skip_plugins: List[str] = ["builtin_ocr", "builtin_vlm", "builtin_structured_vlm"]
+
+
+class ResultReuseSettings(BaseModel):
+    enabled: bool = True                # copy plugin results from near-duplicate frames
+    max_distance: int = 2               # perceptual-hash bits that may differ (at most 3)
+    # plugin name -> metadata source its results are written under
+    plugin_sources: Dict[str, str] = {
+        "builtin_ocr": "ocr",
+        "builtin_vlm": "vlm",
+        "builtin_structured_vlm": "structured_vlm",
+    }
+
+    @field_validator("max_distance")
+    @classmethod
+    def check_max_distance(cls, v):
+        # The band index only finds every match within 3 bits.
+        if not 0 <= v <= 3:
+            raise ValueError("max_distance must be between 0 and 3")
+        return v
+
+
+class SQLiteSettings(BaseModel):
+    read_pool_size: int = 8             # read-only connections for search and listing
+    prewarm_connections: int = 4        # main-pool connections opened at server start-up
+    write_batch_size: int = 32          # queued writes group-committed per transaction
+    mmap_size: int = 268435456          # bytes of the database file memory-mapped (256 MiB)
+    cache_size: int = -65536            # page cache per connection; negative = KiB (64 MiB)
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         yaml_file=str(Path.home() / ".memos" / "config.yaml"),
@@ -139,13 +250,25 @@ class Settings(BaseSettings):
 
     default_plugins: List[str] = ["builtin_ocr"]
 
+    # Decoded and encoded frames shared by the built-in plugins and thumbnails
+    image_cache_mb: int = 256
+
     record_interval: int = 4
 
     # App blacklist for recording
     app_blacklist: List[str] = []
 
+    record: RecordSettings = RecordSettings()
+
+    low_info: LowInfoSettings = LowInfoSettings()
+
+    result_reuse: ResultReuseSettings = ResultReuseSettings()
+
     watch: WatchSettings = WatchSettings()
     health: HealthSettings = HealthSettings()
+    plugin_queue: PluginQueueSettings = PluginQueueSettings()
+    index_queue: IndexQueueSettings = IndexQueueSettings()
+    sqlite: SQLiteSettings = SQLiteSettings()
 
     @classmethod
     def settings_customise_sources(
@@ -329,6 +452,9 @@ def categorize_settings_by_restart():
         # Configuration affecting only the recording service
         "record_interval": ["record"],  # Changes to the recording interval
         "app_blacklist": ["record"],    # Changes to the app blacklist
+        "record": ["record"],           # Capture pipeline workers and queue
+        "low_info": ["serve", "watch"],  # Ingest scoring (watch/scan) and plugin skips (serve)
+        "result_reuse": ["serve"],      # Plugin result reuse for duplicate frames
         
         # Configuration affecting only the monitoring service
         "watch.rate_window_size": ["watch"],
@@ -344,6 +470,10 @@ def categorize_settings_by_restart():
         "ocr.enabled": ["serve"],       # Changes to OCR plugin enabled flag
         "embedding": ["serve"],
         "default_plugins": ["serve"],
+        "image_cache_mb": ["serve"],
+        "plugin_queue": ["serve"],
+        "index_queue": ["serve"],
+        "sqlite": ["serve"],
     }
 
 def apply_config_updates(current_config: dict, updates: dict):
@@ -1,8 +1,10 @@
 import logfire
-from typing import List, Tuple, Optional
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional, Set
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text, BigInteger, select
+from sqlalchemy import func, text, BigInteger, bindparam, select
 from .schemas import (
     Library,
     NewLibraryParam,
@@ -27,11 +29,16 @@ from .models import (
     EntityMetadataModel,
     EntityTagModel,
     EntityPluginStatusModel,
+    EntityPhashModel,
+    IndexPendingModel,
+    PluginJobModel,
 )
 import logging
 from sqlalchemy.sql import text
+from .utils.directory_digest import DirectoryDigests
 from sqlalchemy.orm import joinedload
-from sqlalchemy.sql import or_
+from sqlalchemy.sql import and_, or_
+from sqlalchemy.exc import IntegrityError
 
 logger = logging.getLogger(__name__)
 
@@ -180,6 +187,10 @@ def get_entity_by_id(entity_id: int, db: Session, include_relationships: bool =
     return Entity.model_validate(db_entity, from_attributes=True)
 
 
+# Non-null columns a keyset cursor can continue from.
+KEYSET_ORDER_COLUMNS = {"id", "file_created_at", "file_last_modified_at"}
+
+
 def get_entities_of_folder(
     library_id: int,
     folder_id: int,
@@ -189,7 +200,19 @@ def get_entities_of_folder(
     path_prefix: str | None = None,
     unprocessed_only: bool = False,
     order_by: str = "last_scan_at:desc",
-) -> Tuple[List[Entity], int]:
+    after_id: int | None = None,
+    after_ts: datetime | None = None,
+    with_count: bool = True,
+) -> Tuple[List[Entity], int | None]:
+    """List a page of a folder's entities.
+
+    Pages are addressed either by `offset` or, for full passes over large
+    folders, by a keyset cursor: the id (and, when ordering by a timestamp,
+    the timestamp) of the last entity of the previous page. A keyset page
+    costs the same wherever it is in the folder and does not skip rows when
+    earlier ones are deleted in between. With `with_count=False` the total
+    is not computed and None is returned in its place.
+    """
     # Define allowed columns for ordering
     ALLOWED_ORDER_COLUMNS = {
         "last_scan_at",
@@ -246,6 +269,12 @@ def get_entities_of_folder(
                     < len(library_plugin_ids),  # Not all plugins have processed
                 )
             )
+            # Entities already waiting in the plugin job queue are not
+            # "unprocessed" from the caller's point of view: re-submitting them
+            # would only re-enqueue the same jobs.
+            base_query = base_query.filter(
+                EntityModel.id.notin_(select(PluginJobModel.entity_id))
+            )
 
     # Determine the order by field and direction
     try:
@@ -265,16 +294,39 @@ def get_entities_of_folder(
             f"Invalid order direction: {order_direction}. Must be either 'asc' or 'desc'"
         )
 
-    order_column = getattr(EntityModel, order_field)
-    order_column = (
-        order_column.desc() if order_direction.lower() == "desc" else order_column.asc()
-    )
+    descending = order_direction.lower() == "desc"
+    column = getattr(EntityModel, order_field)
+    order_column = column.desc() if descending else column.asc()
+    # id breaks ties so that keyset pages over equal timestamps are stable.
+    order_columns = [order_column]
+    if order_field != "id":
+        order_columns.append(EntityModel.id.desc() if descending else EntityModel.id.asc())
+
+    # Get total count before the cursor narrows the query
+    total_count = base_query.count() if with_count else None
+
+    if after_id is not None:
+        if order_field not in KEYSET_ORDER_COLUMNS:
+            raise ValueError(
+                f"Keyset pagination requires ordering by one of: {', '.join(sorted(KEYSET_ORDER_COLUMNS))}"
+            )
+        past = (lambda a, b: a < b) if descending else (lambda a, b: a > b)
+        if order_field == "id":
+            base_query = base_query.filter(past(EntityModel.id, after_id))
+        else:
+            if after_ts is None:
+                raise ValueError(f"after_ts is required when ordering by {order_field}")
+            base_query = base_query.filter(
+                or_(
+                    past(column, after_ts),
+                    and_(column == after_ts, past(EntityModel.id, after_id)),
+                )
+            )
+        offset = 0
 
     # Order by the specified field and direction
-    id_query = base_query.order_by(order_column)
+    id_query = base_query.order_by(*order_columns)
 
-    # Get total count and paginated results
-    total_count = id_query.count()
     entity_ids = id_query.limit(limit).offset(offset).all()
     entity_ids = [id[0] for id in entity_ids]
 
@@ -287,13 +339,51 @@ def get_entities_of_folder(
             joinedload(EntityModel.plugin_status),
         )
         .filter(EntityModel.id.in_(entity_ids))
-        .order_by(order_column)  # Keep consistent with the ID query
+        .order_by(*order_columns)  # Keep consistent with the ID query
         .all()
     )
 
     return entities, total_count
 
 
+def get_existing_entity_ids(entity_ids: List[int], db: Session) -> List[int]:
+    """Return the subset of `entity_ids` that still exist, in input order."""
+    if not entity_ids:
+        return []
+    existing = {
+        row.id
+        for row in db.query(EntityModel.id).filter(EntityModel.id.in_(entity_ids))
+    }
+    return [entity_id for entity_id in entity_ids if entity_id in existing]
+
+
+def mark_index_pending(entity_ids: List[int], db: Session):
+    """Record that the entities need indexing. Called from the entity write
+    itself, so the mark commits (or rolls back) with it."""
+    now = datetime.now(timezone.utc)
+    for entity_id in entity_ids:
+        db.merge(IndexPendingModel(entity_id=entity_id, marked_at=now))
+    db.commit()
+
+
+def clear_index_pending(entity_ids: List[int], marked_before: datetime, db: Session):
+    """Drop the marks of indexed entities, keeping any made after
+    `marked_before` (their write came after the index pass read them)."""
+    if entity_ids:
+        db.query(IndexPendingModel).filter(
+            IndexPendingModel.entity_id.in_(entity_ids),
+            IndexPendingModel.marked_at <= marked_before,
+        ).delete(synchronize_session=False)
+    db.commit()
+
+
+def get_index_pending_ids(db: Session) -> List[int]:
+    return [
+        row.entity_id
+        for row in db.query(IndexPendingModel.entity_id).order_by(IndexPendingModel.marked_at)
+    ]
+
+
 def get_entity_by_filepath(filepath: str, db: Session, library_id: int = None) -> Entity | None:
     query = db.query(EntityModel).filter(EntityModel.filepath == filepath)
     if library_id is not None:
@@ -322,6 +412,8 @@ def remove_entity(entity_id: int, db: Session):
         db.execute(
             text("DELETE FROM entities_vec_v2 WHERE rowid = :id"), {"id": entity_id}
         )
+        db.query(EntityPhashModel).filter(EntityPhashModel.entity_id == entity_id).delete()
+        db.query(IndexPendingModel).filter(IndexPendingModel.entity_id == entity_id).delete()
 
         # Then delete the entity itself
         db.delete(entity)
@@ -330,14 +422,118 @@ def remove_entity(entity_id: int, db: Session):
         raise ValueError(f"Entity with id {entity_id} not found")
 
 
+# Entity ids per statement in bulk deletes; stays under SQLite's host
+# parameter limit and keeps each FTS scan (id is not indexed there) large.
+_BULK_DELETE_CHUNK = 500
+
+
+def remove_entities(entity_ids: List[int], db: Session) -> int:
+    """Delete entities together with their FTS/vector index rows, metadata,
+    tags, plugin status and queued plugin jobs, in one transaction.
+
+    The dependent rows are deleted explicitly rather than left to ON DELETE
+    CASCADE, which SQLite only honours with foreign_keys enabled. Returns
+    the number of entities deleted.
+    """
+    deleted = 0
+    for i in range(0, len(entity_ids), _BULK_DELETE_CHUNK):
+        chunk = list(entity_ids[i : i + _BULK_DELETE_CHUNK])
+        db.execute(
+            text("DELETE FROM entities_fts WHERE id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": chunk},
+        )
+        db.execute(
+            text("DELETE FROM entities_vec_v2 WHERE rowid IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": chunk},
+        )
+        for model in (
+            EntityMetadataModel,
+            EntityTagModel,
+            EntityPluginStatusModel,
+            EntityPhashModel,
+            IndexPendingModel,
+            PluginJobModel,
+        ):
+            db.query(model).filter(model.entity_id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+        deleted += db.query(EntityModel).filter(EntityModel.id.in_(chunk)).delete(
+            synchronize_session=False
+        )
+    db.commit()
+    return deleted
+
+
+def _folder_filepaths_under(
+    library_id: int, folder_id: int, path_prefix: str, db: Session
+):
+    """(id, filepath) of the folder's entities under `path_prefix`, in
+    filepath order."""
+    prefix = Path(path_prefix)
+    rows = (
+        db.query(EntityModel.id, EntityModel.filepath)
+        .filter(
+            EntityModel.library_id == library_id,
+            EntityModel.folder_id == folder_id,
+            EntityModel.filepath.like(f"{path_prefix}%"),
+        )
+        .order_by(EntityModel.filepath)
+        .yield_per(1000)
+    )
+    for entity_id, filepath in rows:
+        # The LIKE prefix also matches siblings such as 20241101-copy for
+        # 20241101, so check the path really is under path_prefix.
+        if Path(filepath).is_relative_to(prefix):
+            yield entity_id, filepath
+
+
+def get_directory_digests(
+    library_id: int, folder_id: int, path_prefix: str, db: Session
+) -> Dict[str, str]:
+    """Digest of the entity filepaths in each directory under `path_prefix`
+    (see memos.utils.directory_digest)."""
+    digests = DirectoryDigests()
+    for _, filepath in _folder_filepaths_under(library_id, folder_id, path_prefix, db):
+        digests.add(filepath)
+    return digests.result()
+
+
+def remove_missing_entities(
+    library_id: int,
+    folder_id: int,
+    path_prefix: str,
+    present_filepaths: Set[str],
+    db: Session,
+    recursive: bool = True,
+) -> List[str]:
+    """Delete the folder's entities under `path_prefix` whose filepath is not
+    in `present_filepaths` (the files a scan just found). Without `recursive`
+    only entities directly in the `path_prefix` directory are considered.
+    Returns the deleted filepaths."""
+    missing = [
+        (entity_id, filepath)
+        for entity_id, filepath in _folder_filepaths_under(
+            library_id, folder_id, path_prefix, db
+        )
+        if filepath not in present_filepaths
+        and (recursive or os.path.dirname(filepath) == path_prefix)
+    ]
+    remove_entities([entity_id for entity_id, _ in missing], db)
+    return [filepath for _, filepath in missing]
+
+
 def remove_library(library_id: int, db: Session):
     """Delete a library and everything under it.
 
     Order matters: entities reference folders and folders reference the library
-    (all NO ACTION), so children must go first. Each entity is removed via
-    remove_entity so its FTS/vector index rows and metadata are cleaned too;
-    entity_plugin_status and entity_tags rows drop via their ON DELETE CASCADE.
-    Then plugin bindings, folders, and finally the library row itself.
+    (all NO ACTION), so children must go first. Entities go through
+    remove_entities so their FTS/vector index rows, metadata, tags and plugin
+    state are cleaned too. Then plugin bindings, folders, and finally the
+    library row itself.
     """
     exists = db.query(LibraryModel.id).filter(LibraryModel.id == library_id).first()
     if exists is None:
@@ -349,8 +545,7 @@ def remove_library(library_id: int, db: Session):
         .filter(EntityModel.library_id == library_id)
         .all()
     ]
-    for entity_id in entity_ids:
-        remove_entity(entity_id, db)
+    remove_entities(entity_ids, db)
 
     # Bulk Core deletes for the shell. Deliberately NOT db.delete(library_obj):
     # that makes the ORM also try to clear the library<->plugins secondary
@@ -767,6 +962,81 @@ def record_plugin_processed(entity_id: int, plugin_id: int, db: Session):
     db.commit()
 
 
+def _phash_bands(phash: int) -> List[int]:
+    return [(phash >> (16 * band)) & 0xFFFF for band in range(4)]
+
+
+def upsert_entity_phash(entity_id: int, library_id: int, phash: int, db: Session):
+    """Store the unsigned 64-bit perceptual hash of an image entity."""
+    band0, band1, band2, band3 = _phash_bands(phash)
+    db.merge(
+        EntityPhashModel(
+            entity_id=entity_id,
+            library_id=library_id,
+            phash=phash - (1 << 64) if phash >= 1 << 63 else phash,
+            band0=band0,
+            band1=band1,
+            band2=band2,
+            band3=band3,
+        )
+    )
+    db.commit()
+
+
+def find_processed_near_duplicates(
+    library_id: int,
+    plugin_id: int,
+    phash: int,
+    max_distance: int,
+    exclude_entity_id: int,
+    db: Session,
+) -> List[Tuple[int, int]]:
+    """(entity_id, distance) of entities the plugin has processed whose
+    perceptual hash is within `max_distance` (at most 3) bits of `phash`,
+    nearest first."""
+    bands = _phash_bands(phash)
+    candidates = (
+        db.query(EntityPhashModel.entity_id, EntityPhashModel.phash)
+        .join(
+            EntityPluginStatusModel,
+            and_(
+                EntityPluginStatusModel.entity_id == EntityPhashModel.entity_id,
+                EntityPluginStatusModel.plugin_id == plugin_id,
+            ),
+        )
+        .filter(
+            EntityPhashModel.library_id == library_id,
+            EntityPhashModel.entity_id != exclude_entity_id,
+            or_(
+                EntityPhashModel.band0 == bands[0],
+                EntityPhashModel.band1 == bands[1],
+                EntityPhashModel.band2 == bands[2],
+                EntityPhashModel.band3 == bands[3],
+            ),
+        )
+        .all()
+    )
+    matches = []
+    for entity_id, stored in candidates:
+        distance = bin((stored & 0xFFFFFFFFFFFFFFFF) ^ phash).count("1")
+        if distance <= max_distance:
+            matches.append((entity_id, distance))
+    return sorted(matches, key=lambda match: (match[1], -match[0]))
+
+
+def get_entity_metadata_by_source(
+    entity_id: int, source: str, db: Session
+) -> List[EntityMetadataModel]:
+    return (
+        db.query(EntityMetadataModel)
+        .filter(
+            EntityMetadataModel.entity_id == entity_id,
+            EntityMetadataModel.source == source,
+        )
+        .all()
+    )
+
+
 def get_pending_plugins(entity_id: int, library_id: int, db: Session) -> List[int]:
     """Get list of plugin IDs that haven't processed this entity yet"""
     # Get all plugins associated with the library
@@ -790,6 +1060,163 @@ def get_pending_plugins(entity_id: int, library_id: int, db: Session) -> List[in
     return list(set(library_plugin_ids) - set(processed_plugin_ids))
 
 
+def enqueue_plugin_jobs(entity_id: int, plugin_ids: List[int], db: Session) -> int:
+    """Queue a run of each plugin for the entity and return how many jobs
+    were created.
+
+    Enqueueing is idempotent: a job that already exists for the same
+    (entity, plugin) is not duplicated, but if it is waiting out a retry
+    backoff it becomes due immediately.
+    """
+    if not plugin_ids:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    existing = (
+        db.query(PluginJobModel)
+        .filter(
+            PluginJobModel.entity_id == entity_id,
+            PluginJobModel.plugin_id.in_(plugin_ids),
+        )
+        .all()
+    )
+    existing_plugin_ids = set()
+    for job in existing:
+        existing_plugin_ids.add(job.plugin_id)
+        if job.lease_expires_at is None:
+            job.next_attempt_at = now
+
+    created = 0
+    for plugin_id in set(plugin_ids) - existing_plugin_ids:
+        db.add(
+            PluginJobModel(
+                entity_id=entity_id,
+                plugin_id=plugin_id,
+                attempts=0,
+                next_attempt_at=now,
+            )
+        )
+        created += 1
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent write enqueued the same job first; nothing left to do.
+        db.rollback()
+        return 0
+    return created
+
+
+def lease_plugin_jobs(
+    plugin_id: int, limit: int, lease_seconds: int, db: Session
+) -> List[PluginJobModel]:
+    """Claim up to `limit` due jobs of one plugin.
+
+    A job is due when its backoff has elapsed and it is not leased (or its
+    lease expired because the worker holding it went away). Claiming bumps
+    `attempts` and sets a fresh lease.
+    """
+    if limit <= 0:
+        return []
+
+    now = datetime.now(timezone.utc)
+    jobs = (
+        db.query(PluginJobModel)
+        .filter(
+            PluginJobModel.plugin_id == plugin_id,
+            PluginJobModel.next_attempt_at <= now,
+            or_(
+                PluginJobModel.lease_expires_at.is_(None),
+                PluginJobModel.lease_expires_at <= now,
+            ),
+        )
+        .order_by(PluginJobModel.next_attempt_at, PluginJobModel.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    for job in jobs:
+        job.attempts += 1
+        job.lease_expires_at = lease_expires_at
+    db.commit()
+    return jobs
+
+
+def complete_plugin_job(job_id: int, db: Session):
+    """Record the plugin as done for the job's entity and drop the job."""
+    job = db.get(PluginJobModel, job_id)
+    if job is None:
+        return
+    db.merge(EntityPluginStatusModel(entity_id=job.entity_id, plugin_id=job.plugin_id))
+    db.delete(job)
+    db.commit()
+
+
+def fail_plugin_job(
+    job_id: int,
+    error: str,
+    max_attempts: int,
+    base_delay: float,
+    max_delay: float,
+    db: Session,
+) -> bool:
+    """Schedule a retry with exponential backoff, or drop the job once it has
+    used up `max_attempts`. Returns True when a retry was scheduled.
+    """
+    job = db.get(PluginJobModel, job_id)
+    if job is None:
+        return False
+
+    if job.attempts >= max_attempts:
+        db.delete(job)
+        db.commit()
+        return False
+
+    delay = min(base_delay * (2 ** max(job.attempts - 1, 0)), max_delay)
+    job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    job.lease_expires_at = None
+    job.last_error = error[:1000] if error else error
+    db.commit()
+    return True
+
+
+def delete_plugin_job(job_id: int, db: Session):
+    job = db.get(PluginJobModel, job_id)
+    if job is not None:
+        db.delete(job)
+        db.commit()
+
+
+def release_plugin_job_leases(db: Session) -> int:
+    """Clear every lease. Called when the dispatcher starts: leases left
+    behind by a previous server process can never be completed."""
+    released = (
+        db.query(PluginJobModel)
+        .filter(PluginJobModel.lease_expires_at.isnot(None))
+        .update({PluginJobModel.lease_expires_at: None}, synchronize_session=False)
+    )
+    db.commit()
+    return released
+
+
+def get_plugin_queue_stats(library_id: int, db: Session) -> Tuple[int, int, Optional[datetime]]:
+    """Return (depth, in_flight, oldest_created_at) of the plugin job queue
+    for one library."""
+    now = datetime.now(timezone.utc)
+    depth, in_flight, oldest = (
+        db.query(
+            func.count(PluginJobModel.id),
+            func.count(PluginJobModel.id).filter(PluginJobModel.lease_expires_at > now),
+            func.min(PluginJobModel.created_at),
+        )
+        .join(EntityModel, EntityModel.id == PluginJobModel.entity_id)
+        .filter(EntityModel.library_id == library_id)
+        .one()
+    )
+    return depth, in_flight or 0, oldest
+
+
 def count_entities_in_window(library_id: int, window_hours: int, db: Session) -> int:
     """Count entities created in the rolling window for one library."""
     cutoff = datetime.now(timezone.utc) - timedelta(hours=window_hours)
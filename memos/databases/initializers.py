@@ -1,6 +1,10 @@
 """Database initializer classes for different database backends."""
 
+import logging
 import sys
+import threading
+import time
+from functools import partial
 from pathlib import Path
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.exc import OperationalError
@@ -10,6 +14,19 @@ import sqlite_vec
 from ..models import RawBase, PluginModel, LibraryModel, LibraryPluginModel
 from ..schemas import LibraryKind
 
+logger = logging.getLogger(__name__)
+
+# Cost of preparing new SQLite connections (extension loading + PRAGMAs),
+# summed over every engine in the process.
+connection_setup_stats = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+_connection_setup_lock = threading.Lock()
+
+# jieba_dict() configures the jieba instance inside libsimple, which is
+# process-wide: every connection loads the same shared library. Only the
+# first connection needs to point it at the dictionary files.
+_jieba_dict_loaded = False
+_jieba_dict_lock = threading.Lock()
+
 
 def setup_database(settings, **engine_kwargs):
     """Set up and initialize the database.
@@ -142,6 +159,10 @@ def create_db_initializer(settings, **engine_kwargs):
     
     if settings.is_sqlite:
         default_engine_kwargs["connect_args"] = {"timeout": 60}
+        # Same capacity, but every connection stays pooled: overflow
+        # connections are closed on return and recycling only guards against
+        # server-side timeouts, so both just repeat the extension setup.
+        default_engine_kwargs.update(pool_size=30, max_overflow=0, pool_recycle=-1)
     
     # Override defaults with any provided kwargs
     default_engine_kwargs.update(engine_kwargs)
@@ -161,6 +182,150 @@ def create_db_initializer(settings, **engine_kwargs):
     return engine, initializer
 
 
+def create_read_engine(settings, engine):
+    """Create the engine behind read-only endpoints (search, entity listing).
+
+    On SQLite this is a separate pool of `mode=ro` connections with
+    `query_only` set, so readers never hold or wait on a writer's connection.
+    Other backends, and in-memory SQLite, share the main engine.
+    """
+    database = engine.url.database
+    if not settings.is_sqlite or not database or database == ":memory:":
+        return engine
+
+    read_engine = create_engine(
+        f"sqlite:///file:{database}?mode=ro&uri=true",
+        pool_size=settings.sqlite.read_pool_size,
+        max_overflow=0,
+        pool_timeout=60,
+        pool_recycle=-1,
+        connect_args={"timeout": 60},
+    )
+    event.listen(
+        read_engine,
+        "connect",
+        partial(_connect_sqlite, settings=settings, read_only=True),
+    )
+    return read_engine
+
+
+def create_write_engine(settings, engine):
+    """Create the single-connection engine owned by the server's WriteQueue.
+
+    On SQLite the connection opens every transaction with BEGIN IMMEDIATE, so
+    the write lock is taken up front (and its wait can be timed) instead of on
+    the first write statement, and pysqlite's own transaction handling is
+    turned off so the queue's per-write SAVEPOINTs behave.
+    """
+    write_engine = create_engine(
+        settings.database_url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=60,
+        pool_recycle=-1 if settings.is_sqlite else 3600,
+        **({"connect_args": {"timeout": 60}} if settings.is_sqlite else {}),
+    )
+    if settings.is_sqlite:
+        event.listen(write_engine, "connect", partial(_connect_sqlite, settings=settings))
+        use_begin_immediate(write_engine)
+    return write_engine
+
+
+def use_begin_immediate(engine):
+    """Make a SQLite engine start every transaction with BEGIN IMMEDIATE and
+    leave transaction control to SQLAlchemy rather than pysqlite."""
+
+    def disable_driver_transactions(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None
+
+    event.listen(engine, "connect", disable_driver_transactions)
+    event.listen(engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN IMMEDIATE"))
+
+
+def load_sqlite_extensions(dbapi_conn):
+    """Load the simple tokenizer (with its jieba dictionary) and sqlite-vec."""
+    try:
+        dbapi_conn.enable_load_extension(True)
+    except AttributeError as e:
+        print("Error: Current SQLite3 build doesn't support loading extensions.")
+        print("\nRecommended solutions:")
+        print("1. Install Python using Conda (recommended for both Windows and macOS):")
+        print("   conda create -n yourenv python")
+        print("   conda activate yourenv")
+        print("\n2. Or on macOS, you can use Homebrew:")
+        print("   brew install python")
+        print(f"\nDetailed error: {str(e)}")
+        raise
+
+    # load simple tokenizer
+    current_dir = Path(__file__).parent.parent.resolve()
+    if sys.platform.startswith("linux"):
+        lib_path = current_dir / "simple_tokenizer" / "linux" / "libsimple"
+    elif sys.platform == "win32":
+        lib_path = current_dir / "simple_tokenizer" / "windows" / "simple"
+    elif sys.platform == "darwin":
+        lib_path = current_dir / "simple_tokenizer" / "macos" / "libsimple"
+    else:
+        raise OSError(f"Unsupported operating system: {sys.platform}")
+
+    dbapi_conn.load_extension(str(lib_path))
+    global _jieba_dict_loaded
+    with _jieba_dict_lock:
+        if not _jieba_dict_loaded:
+            dict_path = current_dir / "simple_tokenizer" / "dict"
+            dbapi_conn.execute(f"SELECT jieba_dict('{dict_path}')")
+            _jieba_dict_loaded = True
+
+    # load vector ext
+    sqlite_vec.load(dbapi_conn)
+
+
+def apply_sqlite_pragmas(dbapi_conn, settings, read_only: bool = False):
+    """Per-connection tuning. Readers only get the cache settings plus
+    query_only; journal mode and fsync policy are set by writers."""
+    dbapi_conn.execute(f"PRAGMA mmap_size={int(settings.sqlite.mmap_size)}")
+    dbapi_conn.execute(f"PRAGMA cache_size={int(settings.sqlite.cache_size)}")
+    dbapi_conn.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        dbapi_conn.execute("PRAGMA query_only=ON")
+    else:
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        # Safe under WAL: a power loss can drop the last commits, never
+        # corrupt the database.
+        dbapi_conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def _connect_sqlite(dbapi_conn, connection_record, settings, read_only: bool = False):
+    t0 = time.perf_counter()
+    load_sqlite_extensions(dbapi_conn)
+    apply_sqlite_pragmas(dbapi_conn, settings, read_only=read_only)
+    record_connection_setup(time.perf_counter() - t0)
+
+
+def record_connection_setup(seconds: float):
+    with _connection_setup_lock:
+        connection_setup_stats["count"] += 1
+        connection_setup_stats["total_seconds"] += seconds
+        connection_setup_stats["max_seconds"] = max(
+            connection_setup_stats["max_seconds"], seconds
+        )
+
+
+def prewarm_engine(engine, connections: int) -> float:
+    """Open `connections` pooled connections at once and return them to the
+    pool, so the first requests don't pay for connection setup. Returns the
+    seconds spent."""
+    t0 = time.perf_counter()
+    opened = []
+    try:
+        for _ in range(max(0, connections)):
+            opened.append(engine.connect())
+    finally:
+        for conn in opened:
+            conn.close()
+    return time.perf_counter() - t0
+
+
 class DatabaseInitializer:
     """Base class for database initialization."""
     def __init__(self, engine, settings):
@@ -219,39 +384,7 @@ class SQLiteInitializer(DatabaseInitializer):
 
     def _load_sqlite_extensions(self, dbapi_conn, connection_record):
         """Load SQLite extensions for full-text search and vector operations."""
-        try:
-            dbapi_conn.enable_load_extension(True)
-        except AttributeError as e:
-            print("Error: Current SQLite3 build doesn't support loading extensions.")
-            print("\nRecommended solutions:")
-            print("1. Install Python using Conda (recommended for both Windows and macOS):")
-            print("   conda create -n yourenv python")
-            print("   conda activate yourenv")
-            print("\n2. Or on macOS, you can use Homebrew:")
-            print("   brew install python")
-            print(f"\nDetailed error: {str(e)}")
-            raise
-
-        # load simple tokenizer
-        current_dir = Path(__file__).parent.parent.resolve()
-        if sys.platform.startswith("linux"):
-            lib_path = current_dir / "simple_tokenizer" / "linux" / "libsimple"
-        elif sys.platform == "win32":
-            lib_path = current_dir / "simple_tokenizer" / "windows" / "simple"
-        elif sys.platform == "darwin":
-            lib_path = current_dir / "simple_tokenizer" / "macos" / "libsimple"
-        else:
-            raise OSError(f"Unsupported operating system: {sys.platform}")
-
-        dbapi_conn.load_extension(str(lib_path))
-        dict_path = current_dir / "simple_tokenizer" / "dict"
-        dbapi_conn.execute(f"SELECT jieba_dict('{dict_path}')")
-
-        # load vector ext
-        sqlite_vec.load(dbapi_conn)
-
-        # Set WAL mode after loading extensions
-        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        _connect_sqlite(dbapi_conn, connection_record, self.settings)
 
     def init_specific_features(self):
         """Initialize SQLite-specific features like FTS and vector extensions."""
@@ -0,0 +1,221 @@
+"""Write-behind search indexing.
+
+Entity writes mark the entity dirty instead of rebuilding its FTS row and
+embedding inline. A background thread waits until an entity has been quiet
+for `debounce_seconds` (or dirty for `max_delay_seconds`, so a constantly
+touched entity still gets indexed), then flushes ready entities through the
+search provider in two steps: the entities are read and embedded in a
+session of the queue's own, and only the resulting index rows are written
+through the server's WriteQueue, so a flush holds the write lock for the
+inserts alone and never contends with entity writes. Marking an entity that is
+already pending only pushes back its debounce, so the create / scan PUT /
+plugin metadata writes of one ingest cycle collapse into a single index pass.
+
+The writes also leave a row in index_pending in their own transaction, and
+the queue deletes it once the entity is indexed. start() re-queues whatever
+is still marked, so entities acknowledged but not yet flushed when the
+server went down are indexed after the restart.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from memos import crud
+from memos.config import IndexQueueSettings
+
+logger = logging.getLogger(__name__)
+
+
+class IndexQueue:
+    def __init__(
+        self,
+        search_provider,
+        session_factory: Callable[[], Session],
+        config: IndexQueueSettings,
+        write_queue=None,
+    ):
+        self.search_provider = search_provider
+        self.session_factory = session_factory
+        self.config = config
+        self.write_queue = write_queue
+        # entity_id -> (first marked, last marked), time.monotonic() values
+        self._pending: Dict[int, Tuple[float, float]] = {}
+        self._cond = threading.Condition()
+        # Serializes the worker and on-demand flushes against the index tables.
+        self._index_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.flushed_total = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_lag_seconds: Optional[float] = None
+
+    def mark_dirty(self, entity_id: int):
+        now = time.monotonic()
+        with self._cond:
+            first, _ = self._pending.get(entity_id, (now, now))
+            self._pending[entity_id] = (first, now)
+            self._cond.notify()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def oldest_pending_age_seconds(self) -> Optional[float]:
+        """Freshness lag: how long the longest-waiting dirty entity has gone
+        without reaching the index."""
+        with self._cond:
+            if not self._pending:
+                return None
+            oldest = min(first for first, _ in self._pending.values())
+        return time.monotonic() - oldest
+
+    def recover(self) -> int:
+        """Queue the entities left marked in index_pending by an earlier run.
+        Returns how many were queued."""
+        with self.session_factory() as db:
+            entity_ids = crud.get_index_pending_ids(db)
+        for entity_id in entity_ids:
+            self.mark_dirty(entity_id)
+        if entity_ids:
+            logger.info("Re-queued %d entities left unindexed", len(entity_ids))
+        return len(entity_ids)
+
+    def start(self):
+        try:
+            self.recover()
+        except Exception as e:
+            logger.error("Could not read pending index marks: %s", e)
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="index-queue", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Don't leave dirty entities behind on shutdown.
+        self.flush()
+
+    def flush(self) -> int:
+        """Index everything pending right now, ignoring the debounce. Returns
+        the number of entities flushed."""
+        total = 0
+        while True:
+            with self._cond:
+                batch = self._take_ready(force=True)
+            if not batch:
+                return total
+            self._index(batch)
+            total += len(batch)
+
+    def _take_ready(self, force: bool = False) -> List[Tuple[int, float]]:
+        """Pop up to batch_size ready entities, oldest first. Caller holds
+        self._cond."""
+        now = time.monotonic()
+        ready = [
+            (entity_id, first)
+            for entity_id, (first, last) in self._pending.items()
+            if force
+            or now - last >= self.config.debounce_seconds
+            or now - first >= self.config.max_delay_seconds
+        ]
+        ready.sort(key=lambda item: item[1])
+        ready = ready[: self.config.batch_size]
+        for entity_id, _ in ready:
+            del self._pending[entity_id]
+        return ready
+
+    def _next_due_in(self) -> Optional[float]:
+        """Seconds until the next pending entity becomes ready. Caller holds
+        self._cond."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        due = min(
+            min(last + self.config.debounce_seconds, first + self.config.max_delay_seconds)
+            for first, last in self._pending.values()
+        )
+        return max(0.0, due - now)
+
+    def _write_index(self, prepared: list, done: List[int], taken_at: datetime, db: Session):
+        for index_batch in prepared:
+            self.search_provider.write_index_batch(index_batch, db)
+        crud.clear_index_pending(done, taken_at, db)
+
+    def _write(self, fn: Callable[[Session], Any]) -> Any:
+        """Run `fn(db)` through the write queue when there is one, otherwise
+        in a session of our own."""
+        if self.write_queue is not None:
+            return self.write_queue.submit(fn).result()
+        with self.session_factory() as db:
+            return fn(db)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                batch = self._take_ready()
+                if not batch:
+                    self._cond.wait(timeout=self._next_due_in())
+                    continue
+            self._index(batch)
+
+    def _index(self, batch: List[Tuple[int, float]]):
+        marked = [entity_id for entity_id, _ in batch]
+        # Marks made after this point belong to writes the pass may not see.
+        taken_at = datetime.now(timezone.utc)
+        with self._index_lock:
+            prepared = []
+            failed = set()
+            with self.session_factory() as db:
+                # Entities deleted since they were marked have nothing to index.
+                entity_ids = crud.get_existing_entity_ids(marked, db)
+                if entity_ids:
+                    try:
+                        # Forced: a write in the same second as the last
+                        # pass would look fresh to the timestamp check.
+                        prepared.append(
+                            self.search_provider.prepare_index_batch(
+                                entity_ids, db, force=True
+                            )
+                        )
+                    except Exception as e:
+                        # Fall back to one at a time so a single bad entity
+                        # does not keep the rest of the batch out of the index.
+                        logger.error("Batch indexing %d entities failed: %s", len(entity_ids), e)
+                        db.rollback()
+                        for entity_id in entity_ids:
+                            try:
+                                prepared.append(
+                                    self.search_provider.prepare_index_batch(
+                                        [entity_id], db, force=True
+                                    )
+                                )
+                            except Exception as e:
+                                logger.error("Error indexing entity %d: %s", entity_id, e)
+                                db.rollback()
+                                failed.add(entity_id)
+            # Failed entities keep their mark and are retried on the next start.
+            done = [entity_id for entity_id in marked if entity_id not in failed]
+            try:
+                self._write(partial(self._write_index, prepared, done, taken_at))
+            except Exception as e:
+                logger.error("Writing index rows of %d entities failed: %s", len(done), e)
+
+        now = time.monotonic()
+        self.flushed_total += len(batch)
+        self.last_flush_at = now
+        self.last_flush_lag_seconds = now - min(first for _, first in batch)
@@ -0,0 +1,48 @@
+"""add plugin_jobs
+
+Revision ID: 5c2d7e91a4b8
+Revises: 33a9131fe2ab
+Create Date: 2026-10-19 10:12:40.512337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2d7e91a4b8'
+down_revision: Union[str, None] = '33a9131fe2ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Durable queue of (entity, plugin) webhook runs. Replaces awaiting the
+    # plugin webhooks inside the entity write requests.
+    op.create_table(
+        'plugin_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('plugin_id', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.ForeignKeyConstraint(['entity_id'], ['entities.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['plugin_id'], ['plugins.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('entity_id', 'plugin_id', name='uq_plugin_job_entity_plugin'),
+        if_not_exists=True
+    )
+    op.create_index('idx_plugin_job_plugin_next', 'plugin_jobs', ['plugin_id', 'next_attempt_at'], if_not_exists=True)
+    op.create_index('idx_plugin_job_entity_id', 'plugin_jobs', ['entity_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_plugin_job_entity_id', table_name='plugin_jobs')
+    op.drop_index('idx_plugin_job_plugin_next', table_name='plugin_jobs')
+    op.drop_table('plugin_jobs')
@@ -0,0 +1,47 @@
+"""add entity_phashes
+
+Revision ID: 7b3e1f4c9d2a
+Revises: 5c2d7e91a4b8
+Create Date: 2026-10-19 12:04:18.220931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e1f4c9d2a'
+down_revision: Union[str, None] = '5c2d7e91a4b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Perceptual hashes of processed image entities, banded for near-duplicate
+    # lookup, so plugin results can be copied to repeated frames.
+    op.create_table(
+        'entity_phashes',
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('library_id', sa.Integer(), nullable=False),
+        sa.Column('phash', sa.BigInteger(), nullable=False),
+        sa.Column('band0', sa.Integer(), nullable=False),
+        sa.Column('band1', sa.Integer(), nullable=False),
+        sa.Column('band2', sa.Integer(), nullable=False),
+        sa.Column('band3', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['entity_id'], ['entities.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('entity_id'),
+        if_not_exists=True
+    )
+    for band in range(4):
+        op.create_index(
+            f'idx_entity_phash_band{band}', 'entity_phashes', ['library_id', f'band{band}'],
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    for band in range(4):
+        op.drop_index(f'idx_entity_phash_band{band}', table_name='entity_phashes')
+    op.drop_table('entity_phashes')
@@ -0,0 +1,35 @@
+"""add index_pending
+
+Revision ID: 9d4a6c2e8f13
+Revises: 7b3e1f4c9d2a
+Create Date: 2026-10-19 15:21:44.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4a6c2e8f13'
+down_revision: Union[str, None] = '7b3e1f4c9d2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Entities written with update_index whose index rows have not been
+    # rebuilt yet; the index queue re-reads them on start.
+    op.create_table(
+        'index_pending',
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('marked_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['entity_id'], ['entities.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('entity_id'),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('index_pending')
@@ -1,4 +1,5 @@
 from sqlalchemy import (
+    BigInteger,
     Integer,
     String,
     Text,
@@ -8,6 +9,7 @@ from sqlalchemy import (
     func,
     Index,
     TypeDecorator,
+    UniqueConstraint,
 )
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column, Session
@@ -141,6 +143,9 @@ class EntityModel(Base):
     plugin_status: Mapped[List["EntityPluginStatusModel"]] = relationship(
         "EntityPluginStatusModel", cascade="all, delete-orphan", lazy="select"
     )
+    plugin_jobs: Mapped[List["PluginJobModel"]] = relationship(
+        "PluginJobModel", cascade="all, delete-orphan", lazy="select"
+    )
 
     # 添加索引
     __table_args__ = (
@@ -163,6 +168,82 @@ class EntityModel(Base):
         return [tag.name for tag in self.tags]
 
 
+class EntityPhashModel(RawBase):
+    """Perceptual hash of an image entity, for reusing plugin results.
+
+    The 64-bit hash is also stored as four 16-bit bands. Two hashes within
+    Hamming distance 3 agree exactly on at least one band, so near-duplicate
+    lookup is four indexed equality probes plus a popcount over the few
+    candidates (a multi-index hash table).
+    """
+
+    __tablename__ = "entity_phashes"
+
+    entity_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("entities.id", ondelete="CASCADE"), primary_key=True
+    )
+    library_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Signed: the unsigned hash minus 2**64 when the top bit is set.
+    phash: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    band0: Mapped[int] = mapped_column(Integer, nullable=False)
+    band1: Mapped[int] = mapped_column(Integer, nullable=False)
+    band2: Mapped[int] = mapped_column(Integer, nullable=False)
+    band3: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("idx_entity_phash_band0", "library_id", "band0"),
+        Index("idx_entity_phash_band1", "library_id", "band1"),
+        Index("idx_entity_phash_band2", "library_id", "band2"),
+        Index("idx_entity_phash_band3", "library_id", "band3"),
+    )
+
+
+class IndexPendingModel(RawBase):
+    """An entity whose search index rows are stale.
+
+    Written in the same transaction as an entity write that asked for
+    indexing, and deleted once the index queue has rebuilt the entity's rows,
+    so index work acknowledged before a restart is picked up again on start.
+    """
+
+    __tablename__ = "index_pending"
+
+    entity_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("entities.id", ondelete="CASCADE"), primary_key=True
+    )
+    marked_at: Mapped[datetime] = mapped_column(UTCDateTime, nullable=False)
+
+
+class PluginJobModel(Base):
+    """A pending plugin run for an entity.
+
+    Rows are created when an entity is written and deleted once the plugin
+    webhook succeeds (or the job runs out of attempts). A worker owns a job
+    while `lease_expires_at` is in the future; an expired lease means the
+    worker died and the job may be dispatched again.
+    """
+
+    __tablename__ = "plugin_jobs"
+    entity_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("entities.id", ondelete="CASCADE"), nullable=False
+    )
+    plugin_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("plugins.id", ondelete="CASCADE"), nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(UTCDateTime, nullable=False)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        UTCDateTime, nullable=True
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("entity_id", "plugin_id", name="uq_plugin_job_entity_plugin"),
+        Index("idx_plugin_job_plugin_next", "plugin_id", "next_attempt_at"),
+        Index("idx_plugin_job_entity_id", "entity_id"),
+    )
+
+
 class TagModel(Base):
     __tablename__ = "tags"
     name: Mapped[str] = mapped_column(String, nullable=False)
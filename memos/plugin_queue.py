@@ -0,0 +1,513 @@
+"""Durable dispatch of plugin webhooks.
+
+Entity writes only enqueue (entity, plugin) rows in `plugin_jobs`; the
+PluginJobDispatcher running inside `serve` leases due jobs, calls the plugin
+webhooks with bounded per-plugin concurrency, and completes, retries (with
+exponential backoff) or drops them. Because the queue lives in the database,
+jobs survive a server restart: leases left behind by a dead process are
+released on start-up, or expire on their own. A job that is still running
+shortly before its lease expires is cancelled and failed, so an expired
+lease never hands a running job out a second time.
+
+Built-in plugins mounted on this server register an in-process handler for
+their webhook URL; their jobs call the handler directly with the entity and
+write metadata through crud instead of round-tripping over loopback HTTP.
+External plugins keep the webhook contract.
+
+With a ResultReuse, jobs of reuse-capable plugins on image entities first
+look for a near-duplicate frame the plugin already processed and copy its
+results instead of running the plugin (see memos.result_reuse).
+
+Each plugin has a CircuitBreaker. After `breaker_failure_threshold`
+consecutive failed jobs it opens: no jobs are leased for the plugin, so they
+wait in the queue without using up their attempts. Once the open period has
+passed the plugin's health route is probed (the webhook's `/`, or the probe a
+built-in registered for its backend); a healthy answer half-opens the
+breaker and a single trial job either closes it or opens it again for twice
+as long.
+
+The dispatcher never touches the database on the event loop: reads run on
+a thread of its own, and leases, completions and metadata go through the
+server's WriteQueue (or that same thread when there is none).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+
+from memos import crud
+from memos.config import PluginQueueSettings
+from memos.plugins import MetadataWriter
+from memos.schemas import Entity, EntityMetadataParam, Plugin
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a lease expires by which its job must have finished.
+LEASE_MARGIN = 30.0
+
+InProcessHandler = Callable[[Entity, MetadataWriter], Awaitable[dict]]
+HealthProbe = Callable[[], Awaitable[None]]
+
+# webhook_url -> handler, filled in by run_server for the enabled built-ins.
+_inprocess_handlers: Dict[str, InProcessHandler] = {}
+# webhook_url -> health probe of the backend an in-process handler calls.
+_inprocess_probes: Dict[str, HealthProbe] = {}
+
+
+def register_inprocess_handler(
+    webhook_url: str, handler: InProcessHandler, probe: Optional[HealthProbe] = None
+):
+    """Serve jobs for the plugin registered at `webhook_url` by calling
+    `handler` directly instead of POSTing to the webhook. `probe` raises
+    while the backend the handler depends on is down."""
+    _inprocess_handlers[webhook_url] = handler
+    if probe is not None:
+        _inprocess_probes[webhook_url] = probe
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        open_seconds: float,
+        max_open_seconds: float,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.open_for = open_seconds
+        self.opened_at = 0.0
+        self.probing = False
+        self.trial_job: Optional[int] = None
+
+    def retry_in(self) -> Optional[float]:
+        """Seconds until an open breaker is probed, None unless open."""
+        if self.state != OPEN:
+            return None
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+    def allowed(self, free: int) -> int:
+        """How many of `free` slots may be leased: all when closed, one
+        trial when half-open, none when open."""
+        if self.state == CLOSED:
+            return free
+        if self.state == HALF_OPEN and self.trial_job is None:
+            return min(free, 1)
+        return 0
+
+    def probe_due(self) -> bool:
+        return self.state == OPEN and not self.probing and self.retry_in() == 0
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info("Plugin %s recovered, closing its circuit", self.name)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_for = self.open_seconds
+
+    def record_failure(self, error: str):
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN:
+            self._open(min(self.open_for * 2, self.max_open_seconds))
+        elif (
+            self.state == CLOSED
+            and self.failure_threshold > 0
+            and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open(self.open_seconds)
+
+    def probe_succeeded(self):
+        if self.state == OPEN:
+            logger.info("Plugin %s answers its health probe, sending a trial job", self.name)
+            self.state = HALF_OPEN
+
+    def probe_failed(self, error: str):
+        self.last_error = f"health probe: {error}"
+        if self.state == OPEN:
+            self._open(min(self.open_for * 2, self.max_open_seconds))
+
+    def _open(self, seconds: float):
+        self.state = OPEN
+        self.open_for = seconds
+        self.opened_at = time.monotonic()
+        logger.warning(
+            "Plugin %s failed %d times in a row (%s), pausing its jobs for %.0fs",
+            self.name,
+            self.consecutive_failures,
+            self.last_error,
+            seconds,
+        )
+
+    def snapshot(self) -> dict:
+        retry_in = self.retry_in()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "retry_in_seconds": None if retry_in is None else round(retry_in, 1),
+        }
+
+
+class PluginJobDispatcher:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        base_url: str,
+        config: PluginQueueSettings,
+        client: Optional[httpx.AsyncClient] = None,
+        index_queue=None,
+        handlers: Optional[Dict[str, InProcessHandler]] = None,
+        write_queue=None,
+        reuse=None,
+        probes: Optional[Dict[str, HealthProbe]] = None,
+    ):
+        self.session_factory = session_factory
+        self.base_url = base_url.rstrip("/")
+        self.config = config
+        self.index_queue = index_queue
+        self.write_queue = write_queue
+        self.reuse = reuse
+        self.handlers = _inprocess_handlers if handlers is None else handlers
+        self.probes = _inprocess_probes if probes is None else probes
+        self.breakers: Dict[int, CircuitBreaker] = {}
+        self._client = client
+        self._owns_client = client is None
+        self._in_flight: Dict[int, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._runner: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # One thread, so that without a write queue the dispatcher's own
+        # sessions never interleave on a connection.
+        self._db_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="plugin-queue-db"
+        )
+
+    def concurrency_for(self, plugin: Plugin) -> int:
+        return self.config.concurrency_for(plugin.name)
+
+    def in_flight(self, plugin_id: int) -> int:
+        return self._in_flight.get(plugin_id, 0)
+
+    def breaker_for(self, plugin: Plugin) -> CircuitBreaker:
+        breaker = self.breakers.get(plugin.id)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                plugin.name,
+                self.config.breaker_failure_threshold,
+                self.config.breaker_open_seconds,
+                self.config.breaker_max_open_seconds,
+            )
+            self.breakers[plugin.id] = breaker
+        return breaker
+
+    def notify(self):
+        """Wake the dispatcher after new jobs were enqueued. Safe to call
+        from any thread."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient()
+        released = await self._write(crud.release_plugin_job_leases)
+        if released:
+            logger.info("Released %d stale plugin job leases", released)
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._runner is not None:
+            await self._runner
+            self._runner = None
+        self._loop = None
+        # In-flight jobs keep their lease; the next start releases them.
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._db_executor.shutdown(wait=False)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                dispatched = await self.dispatch_once()
+            except Exception as e:
+                logger.error("Error dispatching plugin jobs: %s", e)
+                dispatched = 0
+
+            if dispatched:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.config.poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_once(self) -> int:
+        """Lease as many due jobs as each plugin has free slots for and start
+        them. Returns the number of jobs started."""
+        started = 0
+        for plugin in await self._read(_get_plugins):
+            if not plugin.webhook_url:
+                continue
+            breaker = self.breaker_for(plugin)
+            if breaker.probe_due():
+                self._start_probe(plugin, breaker)
+            free = breaker.allowed(
+                self.concurrency_for(plugin) - self.in_flight(plugin.id)
+            )
+            if free <= 0:
+                continue
+            jobs = await self._write(
+                partial(_lease_jobs, plugin.id, free, self.config.lease_seconds)
+            )
+            for job_id, entity_id in jobs:
+                if breaker.state == HALF_OPEN:
+                    breaker.trial_job = job_id
+                self._start_job(plugin, job_id, entity_id)
+                started += 1
+        return started
+
+    def _start_job(self, plugin: Plugin, job_id: int, entity_id: int):
+        self._in_flight[plugin.id] = self.in_flight(plugin.id) + 1
+        task = asyncio.create_task(self.run_job(plugin, job_id, entity_id))
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._job_done(plugin.id, job_id, t))
+
+    def _job_done(self, plugin_id: int, job_id: int, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._in_flight[plugin_id] = max(0, self.in_flight(plugin_id) - 1)
+        breaker = self.breakers.get(plugin_id)
+        if breaker is not None and breaker.trial_job == job_id:
+            # A trial that never reached the plugin (reused results, deleted
+            # entity) leaves the breaker half-open for another one.
+            breaker.trial_job = None
+        # A slot just freed up.
+        self._wakeup.set()
+
+    def _start_probe(self, plugin: Plugin, breaker: CircuitBreaker):
+        breaker.probing = True
+        task = asyncio.create_task(self.probe(plugin, breaker))
+        self._tasks.add(task)
+        task.add_done_callback(self._probe_done)
+
+    def _probe_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._wakeup.set()
+
+    async def probe(self, plugin: Plugin, breaker: CircuitBreaker):
+        """Check an open plugin's health: the probe registered for an
+        in-process plugin, or a GET of the webhook's `/` route, where any
+        answer below 500 counts as healthy."""
+        try:
+            probe = self.probes.get(plugin.webhook_url)
+            if probe is not None:
+                await asyncio.wait_for(probe(), timeout=self.config.probe_timeout)
+            elif plugin.webhook_url not in self.handlers:
+                response = await self._client.get(
+                    self._absolute(plugin.webhook_url), timeout=self.config.probe_timeout
+                )
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{response.status_code} - {response.text}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            breaker.probe_failed(str(e) or e.__class__.__name__)
+            logger.warning(
+                "Health probe of plugin %d failed, retrying in %.0fs: %s",
+                plugin.id,
+                breaker.open_for,
+                breaker.last_error,
+            )
+        else:
+            breaker.probe_succeeded()
+        finally:
+            breaker.probing = False
+
+    def circuit(self, plugin_id: int) -> Optional[dict]:
+        """Breaker state of a plugin, None until it ran a job."""
+        breaker = self.breakers.get(plugin_id)
+        return None if breaker is None else breaker.snapshot()
+
+    def job_timeout(self) -> float:
+        """Seconds a job may run from its lease: the lease minus a margin
+        for recording the outcome."""
+        lease = self.config.lease_seconds
+        return max(lease - min(LEASE_MARGIN, lease / 10), 0.0)
+
+    async def run_job(self, plugin: Plugin, job_id: int, entity_id: int):
+        deadline = time.monotonic() + self.job_timeout()
+        entity = await self._read(
+            partial(crud.get_entity_by_id, entity_id, include_relationships=True)
+        )
+        if entity is None:
+            await self._write(partial(crud.delete_plugin_job, job_id))
+            return
+
+        phash = None
+        if self.reuse is not None and self.reuse.source_for(plugin) is not None:
+            phash = await self.reuse.phash(entity)
+        if phash is not None and await self._reuse_results(plugin, entity, phash):
+            await self._write(partial(crud.complete_plugin_job, job_id))
+            return
+
+        error = None
+        try:
+            error = await asyncio.wait_for(
+                self._run_plugin(plugin, entity),
+                timeout=max(deadline - time.monotonic(), 0.0),
+            )
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.job_timeout():.0f}s, before its lease expired"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+
+        breaker = self.breaker_for(plugin)
+        if error is None:
+            breaker.record_success()
+            await self._write(partial(crud.complete_plugin_job, job_id))
+            if phash is not None:
+                await self._write(
+                    partial(crud.upsert_entity_phash, entity_id, entity.library_id, phash)
+                )
+            return
+        breaker.record_failure(error)
+        will_retry = await self._write(
+            partial(
+                crud.fail_plugin_job,
+                job_id,
+                error,
+                self.config.max_attempts,
+                self.config.retry_base_delay,
+                self.config.retry_max_delay,
+            )
+        )
+        logger.error(
+            "Error processing entity %d with plugin %d: %s%s",
+            entity_id,
+            plugin.id,
+            error,
+            "" if will_retry else " (giving up)",
+        )
+
+    async def _run_plugin(self, plugin: Plugin, entity: Entity) -> Optional[str]:
+        handler = self.handlers.get(plugin.webhook_url)
+        if handler is None:
+            return await self._call_webhook(plugin, entity)
+        logger.info("Running plugin %d in-process for entity %d", plugin.id, entity.id)
+        await handler(entity, partial(self.write_metadata, entity.id))
+        return None
+
+    async def _reuse_results(self, plugin: Plugin, entity: Entity, phash: int) -> bool:
+        """Copy the plugin's results from a near-duplicate frame; False when
+        there is none and the plugin has to run."""
+        reuse = await self._read(partial(self.reuse.find, entity, plugin, phash))
+        if reuse is None:
+            return False
+        await self.write_metadata(entity.id, reuse.entries)
+        await self._write(
+            partial(crud.upsert_entity_phash, entity.id, entity.library_id, phash)
+        )
+        logger.info(
+            "Reused plugin %d results of entity %d for entity %d (distance %d)",
+            plugin.id,
+            reuse.source_entity_id,
+            entity.id,
+            reuse.distance,
+        )
+        return True
+
+    async def _call_webhook(self, plugin: Plugin, entity: Entity) -> Optional[str]:
+        """POST the entity to an external plugin; return an error string on
+        failure."""
+        webhook_url = self._absolute(plugin.webhook_url)
+        location = f"{self.base_url}/api/entities/{entity.id}"
+
+        logger.info("Triggering plugin %d for entity %d", plugin.id, entity.id)
+        response = await self._client.post(
+            webhook_url,
+            json=entity.model_dump(mode="json"),
+            headers={"Location": location},
+            timeout=self.config.request_timeout,
+        )
+        if response.status_code >= 400:
+            return f"{response.status_code} - {response.text}"
+        return None
+
+    def _absolute(self, url: str) -> str:
+        return self.base_url + url if url.startswith("/") else url
+
+    async def _read(self, fn: Callable[[Session], Any]) -> Any:
+        """Run `fn(db)` in a session of our own, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, self._in_session, fn
+        )
+
+    async def _write(self, fn: Callable[[Session], Any]) -> Any:
+        """Run `fn(db)` through the server's write queue when there is one,
+        otherwise like a read."""
+        if self.write_queue is not None:
+            return await self.write_queue.run(fn)
+        return await self._read(fn)
+
+    def _in_session(self, fn: Callable[[Session], Any]) -> Any:
+        with self.session_factory() as db:
+            return fn(db)
+
+    async def write_metadata(self, entity_id: int, entries: List[EntityMetadataParam]):
+        """Metadata writer handed to in-process plugins; same effect as the
+        PATCH /entities/{id}/metadata route."""
+        index = self.index_queue is not None
+
+        def write(db: Session):
+            crud.update_entity_metadata_entries(entity_id, entries, db)
+            if index:
+                crud.mark_index_pending([entity_id], db)
+
+        await self._write(write)
+        if index:
+            self.index_queue.mark_dirty(entity_id)
+
+
+def _get_plugins(db: Session) -> List[Plugin]:
+    return [Plugin.model_validate(plugin) for plugin in crud.get_plugins(db)]
+
+
+def _lease_jobs(
+    plugin_id: int, limit: int, lease_seconds: int, db: Session
+) -> List[Tuple[int, int]]:
+    """(job id, entity id) of the leased jobs, read before the session the
+    write ran in goes away."""
+    jobs = crud.lease_plugin_jobs(plugin_id, limit, lease_seconds, db)
+    return [(job.id, job.entity_id) for job in jobs]
@@ -0,0 +1,50 @@
+"""Shared plumbing for the built-in plugins.
+
+Each built-in plugin exposes `process_entity(entity, write_metadata)`, which
+does the work and hands its metadata entries to `write_metadata`. The
+webhook route wraps it with `http_metadata_writer` (PATCH back to the
+Location URL); the server's plugin job dispatcher calls it in-process with a
+writer that goes straight through crud, and checks the plugin's backend
+with its `probe_backend()` while the plugin's circuit is open.
+"""
+from typing import Awaitable, Callable, List
+
+import httpx
+from fastapi import HTTPException
+
+from memos.schemas import EntityMetadataParam
+
+MetadataWriter = Callable[[List[EntityMetadataParam]], Awaitable[None]]
+
+
+def http_metadata_writer(location_url: str) -> MetadataWriter:
+    """Return a writer that PATCHes metadata entries to `{location_url}/metadata`."""
+
+    async def write(entries: List[EntityMetadataParam]) -> None:
+        async with httpx.AsyncClient() as client:
+            response = await client.patch(
+                f"{location_url}/metadata",
+                json={
+                    "metadata_entries": [
+                        entry.model_dump(mode="json") for entry in entries
+                    ]
+                },
+                timeout=30,
+            )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail="Failed to patch entity metadata",
+            )
+
+    return write
+
+
+async def probe_url(url: str, timeout: float = 10) -> None:
+    """Health probe for a model backend: GET `url` and raise unless it
+    answers below 500. Any answer shows the server is up, and backends
+    differ in which routes they serve."""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, timeout=timeout)
+    if response.status_code >= 500:
+        raise RuntimeError(f"{url} answered {response.status_code}")
@@ -0,0 +1,196 @@
+"""Adaptive concurrency limit for requests to a model backend.
+
+A fixed semaphore is either too wide for a busy backend (requests queue up
+on it until they time out and are retried) or too narrow for an idle GPU.
+AdaptiveLimiter adjusts the number of requests in flight by AIMD:
+
+- a request that succeeds while the limit was in use raises the limit by
+  1/limit, i.e. by one per round of `limit` such requests;
+- a 5xx, a timeout or a network error multiplies the limit by `backoff`.
+  Only requests started after the previous decrease count, so a burst of
+  failures from one overloaded round shrinks the limit once.
+
+Latency alone is no overload signal: a VLM's latency mostly follows the
+length of its answer. The limit stays within [min_limit, max_limit], and
+limiter_for caps max_limit at the jobs the plugin queue can have in
+flight, so the limit never grows past what callers can use.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+
+SUCCESS = "success"
+OVERLOAD = "overload"
+IGNORE = "ignore"
+
+
+class Slot:
+    """One request's hold on the limiter; the outcome defaults to success."""
+
+    def __init__(self, started: float, saturated: bool):
+        self.started = started
+        self.saturated = saturated
+        self.outcome = SUCCESS
+
+    def overloaded(self):
+        """The backend failed in a way that more load makes worse (5xx, timeout)."""
+        self.outcome = OVERLOAD
+
+    def ignore(self):
+        """Say nothing about the backend's load (e.g. a 4xx)."""
+        self.outcome = IGNORE
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        backoff: float = 0.7,
+        window: int = 200,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._configured_max = self.max_limit
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.in_flight = 0
+        self.successes = 0
+        self.overloads = 0
+        self._latencies = deque(maxlen=window)
+        self._waiters = deque()
+        self._last_decrease = float("-inf")
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    async def acquire(self) -> Slot:
+        while self.in_flight >= self.capacity:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake()
+                raise
+        self.in_flight += 1
+        # Only requests that fill the limit show whether it can grow.
+        return Slot(time.monotonic(), self.in_flight >= self.capacity)
+
+    def release(self, slot: Slot):
+        self.in_flight -= 1
+        latency = time.monotonic() - slot.started
+        if slot.outcome == SUCCESS:
+            self.successes += 1
+            self._latencies.append(latency)
+            if slot.saturated:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif slot.outcome == OVERLOAD:
+            self.overloads += 1
+            self._decrease(slot)
+        self._wake()
+
+    def cap(self, ceiling: int):
+        """Set max_limit to `ceiling`, within min_limit and the max_limit
+        the limiter was created with."""
+        self.max_limit = max(self.min_limit, min(self._configured_max, ceiling))
+        self.limit = min(self.limit, self.max_limit)
+        self._wake()
+
+    def _decrease(self, slot: Slot):
+        if slot.started < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._last_decrease = time.monotonic()
+
+    def _wake(self):
+        free = self.capacity - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for one request. An exception escaping the block
+        counts as overload when it is a timeout or network error."""
+        slot = await self.acquire()
+        try:
+            yield slot
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError):
+            slot.overloaded()
+            raise
+        except BaseException:
+            if slot.outcome == SUCCESS:
+                slot.ignore()
+            raise
+        finally:
+            self.release(slot)
+
+    def stats(self) -> dict:
+        def ms(q):
+            value = self.percentile(q)
+            return None if value is None else round(value * 1000)
+
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "latency_ms": {"p50": ms(0.5), "p90": ms(0.9), "p99": ms(0.99)},
+            "successes": self.successes,
+            "overloads": self.overloads,
+        }
+
+
+# endpoint -> limiter, so plugins calling the same backend share one limit.
+_limiters: Dict[str, AdaptiveLimiter] = {}
+# endpoint -> {plugin name: jobs it can have in flight}
+_in_flight: Dict[str, Dict[str, int]] = {}
+
+
+def limiter_for(
+    endpoint: str,
+    config,
+    plugin_name: Optional[str] = None,
+    max_in_flight: Optional[int] = None,
+) -> AdaptiveLimiter:
+    """The limiter for `endpoint`, created from a VLMSettings on first use.
+    With `adaptive_concurrency` off the limit stays at `concurrency`.
+
+    `max_in_flight` is how many jobs of `plugin_name` the plugin queue runs
+    at once; the limit is capped at the sum over the plugins sharing the
+    endpoint."""
+    limiter = _limiters.get(endpoint)
+    if limiter is None:
+        concurrency = config.concurrency
+        if getattr(config, "adaptive_concurrency", False):
+            limiter = AdaptiveLimiter(
+                concurrency,
+                min_limit=config.min_concurrency,
+                max_limit=config.max_concurrency,
+            )
+        else:
+            limiter = AdaptiveLimiter(concurrency, min_limit=concurrency, max_limit=concurrency)
+        _limiters[endpoint] = limiter
+    if max_in_flight is not None:
+        callers = _in_flight.setdefault(endpoint, {})
+        callers[plugin_name] = max_in_flight
+        limiter.cap(sum(callers.values()))
+    return limiter
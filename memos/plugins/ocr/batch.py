@@ -0,0 +1,162 @@
+"""Batched RapidOCR: detection per frame, recognition over pooled crops.
+
+Recognition dominates OCR time and its model takes a batch of text-line
+crops, but RapidOCR's call handles one image, so a frame with a few lines
+runs tiny batches. Here the crops of every frame in a batch are pooled and
+recognized together in large batches, then mapped back to their frames.
+
+This module only depends on numpy (and cv2, which RapidOCR ships with) so
+the standalone OCR server can import it next to server.py.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Sequence
+
+import numpy as np
+
+DEFAULT_REC_BATCH_SIZE = 32
+# RapidOCR's default Global.text_score.
+MIN_TEXT_SCORE = 0.5
+
+
+def crop_text_line(frame, box):
+    """Perspective-crop one detected text box, rotating tall crops upright."""
+    import cv2
+
+    points = np.asarray(box, dtype=np.float32)
+    width = max(1, int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3]))))
+    height = max(1, int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2]))))
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    crop = cv2.warpPerspective(
+        frame,
+        cv2.getPerspectiveTransform(points, target),
+        (width, height),
+        borderMode=cv2.BORDER_REPLICATE,
+        flags=cv2.INTER_CUBIC,
+    )
+    if height / width >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+class RapidOCRStages:
+    """The detection and recognition stages of a RapidOCR engine.
+
+    Supports both `rapidocr` (2.x, used in-process) and
+    `rapidocr_onnxruntime` (1.x, used by the OCR server image).
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._v2 = type(engine).__module__.split(".")[0] == "rapidocr"
+
+    def detect(self, frame):
+        output = self.engine(frame, use_det=True, use_cls=False, use_rec=False)
+        boxes = output[0] if isinstance(output, tuple) else getattr(output, "boxes", None)
+        return [] if boxes is None else [np.asarray(box, dtype=np.float32) for box in boxes]
+
+    def classify(self, crops):
+        """Turn upside-down crops the right way up, like the angle classifier
+        of RapidOCR's own pipeline does before recognition."""
+        classifier = getattr(self.engine, "text_cls", None)
+        if classifier is None or not getattr(self.engine, "use_cls", True) or not crops:
+            return crops
+        output = classifier(list(crops))
+        return list(output[0] if isinstance(output, tuple) else output.img_list)
+
+    def recognize(self, crops, batch_size):
+        recognizer = self.engine.text_rec
+        if hasattr(recognizer, "rec_batch_num"):
+            recognizer.rec_batch_num = batch_size
+        if self._v2:
+            from rapidocr.ch_ppocr_rec import TextRecInput
+
+            output = recognizer(TextRecInput(img=list(crops)))
+            return list(zip(output.txts, output.scores))
+        results, _ = recognizer(list(crops))
+        return [(text, score) for text, score, *_ in results]
+
+
+def format_result(box, text, score):
+    return {
+        "dt_boxes": [[round(float(x), 1), round(float(y), 1)] for x, y in box],
+        "rec_txt": text,
+        "score": round(float(score), 2),
+    }
+
+
+def ocr_batch(stages, frames: Sequence, rec_batch_size=DEFAULT_REC_BATCH_SIZE) -> List[List[dict]]:
+    """OCR `frames`, returning each frame's results in the `ocr_result` format."""
+    owners, boxes, crops = [], [], []
+    for index, frame in enumerate(frames):
+        for box in stages.detect(frame):
+            owners.append(index)
+            boxes.append(box)
+            crops.append(crop_text_line(frame, box))
+    crops = stages.classify(crops)
+
+    # Similar widths pad less when recognized in the same batch.
+    order = sorted(range(len(crops)), key=lambda i: crops[i].shape[1] / crops[i].shape[0])
+    recognized = [None] * len(crops)
+    for start in range(0, len(order), rec_batch_size):
+        chunk = order[start:start + rec_batch_size]
+        for i, result in zip(chunk, stages.recognize([crops[i] for i in chunk], rec_batch_size)):
+            recognized[i] = result
+
+    results = [[] for _ in frames]
+    for owner, box, (text, score) in zip(owners, boxes, recognized):
+        if score > MIN_TEXT_SCORE:
+            results[owner].append(format_result(box, text, score))
+    return results
+
+
+class FrameBatcher:
+    """Gathers concurrent single-item requests into batches.
+
+    A batch runs once `max_batch` items are waiting, or `window` seconds
+    after the first of them arrived.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list], Awaitable[list]],
+        max_batch=8,
+        window=0.05,
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
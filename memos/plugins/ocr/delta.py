@@ -0,0 +1,208 @@
+"""Incremental OCR for consecutive frames of the same screen.
+
+Consecutive screenshots of one screen usually differ in a small region.
+The new frame is diffed against the last OCR'd frame of its screen on a
+coarse tile grid; only the changed regions are OCR'd, and text lines from
+the rest of the screen are carried over from the previous result.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+Rect = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+def changed_tiles(previous, current, tile, threshold):
+    """Boolean (rows, cols) grid of tiles where any pixel moved by more
+    than `threshold` in any channel."""
+    diff = np.abs(previous.astype(np.int16) - current.astype(np.int16))
+    if diff.ndim == 3:
+        diff = diff.max(axis=2)
+    height, width = diff.shape
+    rows, cols = -(-height // tile), -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=diff.dtype)
+    padded[:height, :width] = diff
+    return padded.reshape(rows, tile, cols, tile).max(axis=(1, 3)) > threshold
+
+
+def tile_regions(mask, tile, shape) -> List[Rect]:
+    """Bounding rectangles, in pixels, of the 8-connected groups of changed tiles."""
+    rows, cols = mask.shape
+    seen = np.zeros_like(mask)
+    regions = []
+    for row, col in zip(*np.nonzero(mask)):
+        if seen[row, col]:
+            continue
+        seen[row, col] = True
+        stack, r0, c0, r1, c1 = [(row, col)], row, col, row, col
+        while stack:
+            r, c = stack.pop()
+            r0, c0, r1, c1 = min(r0, r), min(c0, c), max(r1, r), max(c1, c)
+            for nr in range(max(0, r - 1), min(rows, r + 2)):
+                for nc in range(max(0, c - 1), min(cols, c + 2)):
+                    if mask[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        regions.append(
+            (c0 * tile, r0 * tile, min(shape[1], (c1 + 1) * tile), min(shape[0], (r1 + 1) * tile))
+        )
+    return regions
+
+
+def result_bounds(result) -> Rect:
+    xs = [point[0] for point in result["dt_boxes"]]
+    ys = [point[1] for point in result["dt_boxes"]]
+    return int(min(xs)), int(min(ys)), int(np.ceil(max(xs))), int(np.ceil(max(ys)))
+
+
+def intersects(a: Rect, b: Rect) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def union(a: Rect, b: Rect) -> Rect:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def grow_regions(regions: List[Rect], previous_results, margin, shape) -> List[Rect]:
+    """Widen regions over the previous text lines they cut, pad them by
+    `margin`, and merge the ones that then overlap, until nothing changes."""
+    height, width = shape[:2]
+    line_bounds = [result_bounds(r) for r in previous_results]
+    regions = list(regions)
+    while True:
+        grown = []
+        for region in regions:
+            for bounds in line_bounds:
+                if intersects(region, bounds):
+                    region = union(region, bounds)
+            region = (
+                max(0, region[0] - margin),
+                max(0, region[1] - margin),
+                min(width, region[2] + margin),
+                min(height, region[3] + margin),
+            )
+            for i, other in enumerate(grown):
+                if intersects(region, other):
+                    grown[i] = union(region, other)
+                    break
+            else:
+                grown.append(region)
+        if grown == regions:
+            return regions
+        regions = grown
+        margin = 0
+
+
+class DeltaPlan(NamedTuple):
+    """The regions of a frame to OCR and the previous lines to keep."""
+
+    regions: List[Rect]
+    kept: list
+    area_fraction: float
+
+    def merge(self, region_results: Sequence[list]) -> list:
+        """Combine kept lines with region results shifted back to frame
+        coordinates, in reading order."""
+        merged = list(self.kept)
+        for (x0, y0, _, _), results in zip(self.regions, region_results):
+            for result in results or []:
+                merged.append(
+                    {
+                        **result,
+                        "dt_boxes": [
+                            [round(x + x0, 1), round(y + y0, 1)] for x, y in result["dt_boxes"]
+                        ],
+                    }
+                )
+        merged.sort(key=lambda r: (result_bounds(r)[1], result_bounds(r)[0]))
+        return merged
+
+
+class DeltaOCR:
+    """Per-screen memory of the last OCR'd frame and its result.
+
+    Frames whose changed area exceeds `max_changed_fraction`, whose size
+    differs from the remembered frame, or whose screen has no remembered
+    frame yet are OCR'd in full.
+    """
+
+    def __init__(
+        self,
+        tile=64,
+        threshold=24,
+        max_changed_fraction=0.5,
+        margin=8,
+        max_screens=16,
+    ):
+        self.tile = tile
+        self.threshold = threshold
+        self.max_changed_fraction = max_changed_fraction
+        self.margin = margin
+        self.max_screens = max_screens
+        self._screens = OrderedDict()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.full_frames = 0
+        self.ocr_area = 0.0
+
+    def plan(self, screen, frame) -> Optional[DeltaPlan]:
+        with self._lock:
+            previous = self._screens.get(screen)
+        if previous is None:
+            return None
+        previous_frame, previous_results = previous
+        if previous_frame.shape != frame.shape:
+            return None
+
+        mask = changed_tiles(previous_frame, frame, self.tile, self.threshold)
+        if mask.mean() > self.max_changed_fraction:
+            return None
+        regions = grow_regions(
+            tile_regions(mask, self.tile, frame.shape), previous_results, self.margin, frame.shape
+        )
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        area_fraction = area / (frame.shape[0] * frame.shape[1])
+        if area_fraction > self.max_changed_fraction:
+            return None
+        kept = [
+            r for r in previous_results
+            if not any(intersects(result_bounds(r), region) for region in regions)
+        ]
+        return DeltaPlan(regions, kept, area_fraction)
+
+    def remember(self, screen, frame, results):
+        with self._lock:
+            self._screens[screen] = (frame, results)
+            self._screens.move_to_end(screen)
+            while len(self._screens) > self.max_screens:
+                self._screens.popitem(last=False)
+
+    def ocr(self, screen, frame, ocr_frames: Callable[[list], list]) -> Tuple[list, float]:
+        """OCR `frame` of `screen`, returning the result and the fraction of
+        the frame that was actually OCR'd.
+
+        `ocr_frames` OCRs a list of arrays and returns one result list each.
+        """
+        plan = self.plan(screen, frame) if screen is not None else None
+        if plan is None:
+            results, area_fraction = ocr_frames([frame])[0], 1.0
+        else:
+            crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in plan.regions]
+            results = plan.merge(ocr_frames(crops) if crops else [])
+            area_fraction = plan.area_fraction
+        if results is not None and screen is not None:
+            self.remember(screen, frame, results)
+        with self._lock:
+            self.frames += 1
+            self.full_frames += plan is None
+            self.ocr_area += area_fraction
+        return results, area_fraction
+
+    def summary(self):
+        frames = max(1, self.frames)
+        return (
+            f"{self.frames} frames, {self.full_frames} full, "
+            f"{self.ocr_area / frames:.0%} of the frame area OCR'd on average"
+        )
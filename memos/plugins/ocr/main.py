@@ -3,20 +3,21 @@ import logging
 import os
 from typing import Optional
 import httpx
-import json
 import base64
-from PIL import Image
+import io
+import json
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-import io
 import platform
 import cpuinfo
 
 MAX_THUMBNAIL_SIZE = (1920, 1920)
 
 from fastapi import APIRouter, Request, HTTPException
-from memos.schemas import Entity, MetadataType
+from memos.schemas import Entity, EntityMetadataParam, MetadataType
+from memos.plugins import MetadataWriter, http_metadata_writer, probe_url
+from memos.utils.image_cache import shared_image_cache
 
 METADATA_FIELD_NAME = "ocr_result"
 PLUGIN_NAME = "ocr"
@@ -28,8 +29,17 @@ concurrency = None
 semaphore = None
 use_local = False
 ocr = None
+ocr_pool = None
 thread_pool = None
+batcher = None
+rec_batch_size = 32
+delta_ocr = None
 languages = ["zh-Hans", "en-US"]
+remote = None
+
+# Remote server statuses meaning "busy, come back later".
+RETRY_STATUSES = (429, 503)
+MAX_RETRY_DELAY = 60.0
 
 # Configure logger
 logging.basicConfig(level=logging.INFO)
@@ -43,26 +53,136 @@ def get_metadata_name() -> str:
 
 def image2base64(img_path):
     try:
-        with Image.open(img_path) as img:
-            img = img.convert("RGB")
-            img.thumbnail(MAX_THUMBNAIL_SIZE)
-            buffered = io.BytesIO()
-            img.save(buffered, format="JPEG")
-            encoded_string = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        return encoded_string
+        return shared_image_cache().base64(img_path, MAX_THUMBNAIL_SIZE)
     except Exception as e:
         logger.error(f"Error processing image {img_path}: {str(e)}")
         return None
 
 
-async def fetch(endpoint: str, client, image_base64, headers: Optional[dict] = None):
-    async with semaphore:  # 使用信号量控制并发
-        response = await client.post(
-            f"{endpoint}",
-            json={"image_base64": image_base64},
-            timeout=60,
-            headers=headers,
-        )
+def image2jpeg(img_path):
+    try:
+        return shared_image_cache().encoded(img_path, MAX_THUMBNAIL_SIZE)
+    except Exception as e:
+        logger.error(f"Error processing image {img_path}: {str(e)}")
+        return None
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying a busy server: its Retry-After, or
+    exponential backoff when it sent none."""
+    try:
+        delay = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        delay = 2.0 ** attempt
+    return min(max(delay, 0.0), MAX_RETRY_DELAY)
+
+
+def probe_jpeg() -> bytes:
+    """A tiny well-formed JPEG, to tell a server that does not take raw
+    images from a frame it could not read."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class RemoteOCRClient:
+    """A remote OCR server and how frames are sent to it.
+
+    Frames go out as raw JPEG bytes unless `transport` is "base64". When a
+    raw frame is turned away with 415 or 422, a probe image is sent once:
+    only if the server rejects that too does this client switch to base64
+    JSON, which older servers expect. Once the server has taken a raw
+    image, such a response just fails the frame.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        token=None,
+        concurrency: int = 4,
+        transport: str = "raw",
+        max_retries: int = 3,
+    ):
+        self.endpoint = endpoint
+        self.token = token
+        self.concurrency = concurrency
+        self.transport = transport
+        self.max_retries = max_retries
+        self.raw_accepted = False
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client kept open for the server."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                )
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token.get_secret_value()}"} if self.token else {}
+
+    async def post_frame(self, image):
+        """POST JPEG bytes raw, or a base64 string as JSON, retrying while
+        the server reports backpressure."""
+        for attempt in range(self.max_retries + 1):
+            if isinstance(image, bytes):
+                request = {
+                    "content": image,
+                    "headers": {**self.headers(), "Content-Type": "image/jpeg"},
+                }
+            else:
+                request = {"json": {"image_base64": image}, "headers": self.headers()}
+            response = await self.client.post(self.endpoint, timeout=60, **request)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            delay = retry_delay(response, attempt)
+            logger.info(f"OCR server busy ({response.status_code}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def rejects_raw(self) -> bool:
+        response = await self.post_frame(probe_jpeg())
+        if response.status_code in (415, 422):
+            return True
+        self.raw_accepted = response.status_code == 200
+        return False
+
+    async def predict(self, img_path):
+        if self.transport == "base64":
+            image = image2base64(img_path)
+        else:
+            image = image2jpeg(img_path)
+        if not image:
+            return None
+
+        response = await self.post_frame(image)
+        if response.status_code == 200 and isinstance(image, bytes):
+            self.raw_accepted = True
+        elif (
+            response.status_code in (415, 422)
+            and isinstance(image, bytes)
+            and not self.raw_accepted
+            and await self.rejects_raw()
+        ):
+            logger.warning(
+                f"OCR server at {self.endpoint} does not accept raw images, falling back to base64"
+            )
+            self.transport = "base64"
+            response = await self.post_frame(base64.b64encode(image).decode("utf-8"))
+        if response.status_code in RETRY_STATUSES:
+            # Fail the job so the plugin queue retries it with its own backoff.
+            raise RuntimeError(f"OCR server still busy after {self.max_retries} retries")
         if response.status_code != 200:
             return None
         return response.json()
@@ -110,6 +230,68 @@ def convert_ocr_data(ocr_data):
     return converted_data
 
 
+def load_frame(img_path):
+    """Decode an image into the RGB array RapidOCR expects."""
+    return np.array(shared_image_cache().image(img_path, MAX_THUMBNAIL_SIZE))
+
+
+def extract_ocr_results(ocr_output):
+    """Normalize the output of the installed RapidOCR version to a list of
+    (box, text, score) tuples."""
+    # Handle different RapidOCR return formats
+    if isinstance(ocr_output, tuple) and len(ocr_output) == 2:
+        # Old format: (results, elapsed_time)
+        ocr_results, _ = ocr_output
+        logger.debug("Using old tuple format")
+    elif hasattr(ocr_output, '__dict__') and 'boxes' in ocr_output.__dict__ and 'txts' in ocr_output.__dict__:
+        # New format: RapidOCROutput object with boxes, txts, scores attributes
+        boxes = ocr_output.boxes
+        txts = ocr_output.txts
+        scores = ocr_output.scores if hasattr(ocr_output, 'scores') else []
+
+        # Convert to the expected format: list of (box, text, score) tuples
+        ocr_results = []
+        if boxes is None or txts is None:
+            return ocr_results
+        for box, text, score in zip(boxes, txts, scores):
+            if score > 0.5:  # Filter by confidence
+                ocr_results.append((box, text, score))
+    elif hasattr(ocr_output, 'get') and callable(ocr_output.get):
+        # New format: RapidOCROutput object - try different possible keys
+        for key in ['results', 'boxes', 'texts', 'data', 'content']:
+            try:
+                value = ocr_output.get(key, None)
+                if value is not None:
+                    ocr_results = value
+                    break
+            except Exception:
+                continue
+        else:
+            # If no key worked, try empty list
+            ocr_results = []
+    elif hasattr(ocr_output, '__iter__') and not isinstance(ocr_output, (str, dict, bytes)):
+        # New format: RapidOCROutput object is iterable
+        try:
+            ocr_results = list(ocr_output)
+        except Exception:
+            ocr_results = []
+    elif hasattr(ocr_output, 'results'):
+        # Fallback: try to access results attribute
+        ocr_results = ocr_output.results
+    else:
+        # Last resort: try to convert to list or return empty
+        try:
+            ocr_results = list(ocr_output) if ocr_output else []
+        except Exception:
+            ocr_results = []
+    return ocr_results
+
+
+def run_rapidocr(engine, img_array):
+    """Run a RapidOCR engine on a decoded frame and convert the result."""
+    return convert_ocr_results(extract_ocr_results(engine(img_array)))
+
+
 def predict_local(img_path):
     try:
         # Check if we should force RapidOCR for testing (set environment variable FORCE_RAPIDOCR=1)
@@ -120,66 +302,97 @@ def predict_local(img_path):
             ocr_result = ocrmac.OCR(img_path, language_preference=languages).recognize(px=True)
             return convert_ocr_data(ocr_result)
         else:
-            with Image.open(img_path) as img:
-                img = img.convert("RGB")
-                img.thumbnail(MAX_THUMBNAIL_SIZE)
-                img_array = np.array(img)
-            
-            # Call RapidOCR and handle different return formats
-            ocr_output = ocr(img_array)
-            
-            # Handle different RapidOCR return formats
-            if isinstance(ocr_output, tuple) and len(ocr_output) == 2:
-                # Old format: (results, elapsed_time)
-                ocr_results, _ = ocr_output
-                logger.debug("Using old tuple format")
-            elif hasattr(ocr_output, '__dict__') and 'boxes' in ocr_output.__dict__ and 'txts' in ocr_output.__dict__:
-                # New format: RapidOCROutput object with boxes, txts, scores attributes
-                boxes = ocr_output.boxes
-                txts = ocr_output.txts
-                scores = ocr_output.scores if hasattr(ocr_output, 'scores') else []
-                
-                # Convert to the expected format: list of (box, text, score) tuples
-                ocr_results = []
-                for box, text, score in zip(boxes, txts, scores):
-                    if score > 0.5:  # Filter by confidence
-                        ocr_results.append((box, text, score))
-            elif hasattr(ocr_output, 'get') and callable(ocr_output.get):
-                # New format: RapidOCROutput object - try different possible keys
-                for key in ['results', 'boxes', 'texts', 'data', 'content']:
-                    try:
-                        value = ocr_output.get(key, None)
-                        if value is not None:
-                            ocr_results = value
-                            break
-                    except Exception:
-                        continue
-                else:
-                    # If no key worked, try empty list
-                    ocr_results = []
-            elif hasattr(ocr_output, '__iter__') and not isinstance(ocr_output, (str, dict, bytes)):
-                # New format: RapidOCROutput object is iterable
-                try:
-                    ocr_results = list(ocr_output)
-                except Exception:
-                    ocr_results = []
-            elif hasattr(ocr_output, 'results'):
-                # Fallback: try to access results attribute
-                ocr_results = ocr_output.results
-            else:
-                # Last resort: try to convert to list or return empty
-                try:
-                    ocr_results = list(ocr_output) if ocr_output else []
-                except Exception:
-                    ocr_results = []
-            return convert_ocr_results(ocr_results)
+            return run_rapidocr(ocr, load_frame(img_path))
+    except Exception as e:
+        logger.error(f"Error processing image {img_path}: {str(e)}")
+        return None
+
+
+def ocr_frames(frames):
+    """OCR decoded frames together on the local RapidOCR backend."""
+    from memos.plugins.ocr.batch import RapidOCRStages, ocr_batch
+
+    if ocr_pool is not None:
+        return ocr_pool.predict_batch(frames, rec_batch_size)
+    return ocr_batch(RapidOCRStages(ocr), frames, rec_batch_size)
+
+
+def predict_local_batch(img_paths):
+    """OCR several images with RapidOCR, recognizing their text lines together.
+
+    Images that fail to decode get None, like predict_local.
+    """
+    frames = []
+    for img_path in img_paths:
+        try:
+            frames.append(load_frame(img_path))
+        except Exception as e:
+            logger.error(f"Error processing image {img_path}: {str(e)}")
+            frames.append(None)
+    decoded = [frame for frame in frames if frame is not None]
+    if not decoded:
+        return frames
+    results = iter(ocr_frames(decoded))
+    return [None if frame is None else next(results) for frame in frames]
+
+
+async def async_predict_local_batch(img_paths):
+    loop = asyncio.get_running_loop()
+    if ocr_pool is None:
+        return await loop.run_in_executor(thread_pool, partial(predict_local_batch, img_paths))
+
+    async def decode(img_path):
+        try:
+            return await loop.run_in_executor(thread_pool, partial(load_frame, img_path))
+        except Exception as e:
+            logger.error(f"Error processing image {img_path}: {str(e)}")
+            return None
+
+    frames = await asyncio.gather(*(decode(p) for p in img_paths))
+    decoded = [frame for frame in frames if frame is not None]
+    results = iter(await ocr_pool.async_predict_batch(decoded, rec_batch_size) if decoded else [])
+    return [None if frame is None else next(results) for frame in frames]
+
+
+def predict_local_delta(img_path, screen):
+    """OCR only what changed since the last OCR'd frame of `screen`."""
+    try:
+        results, area_fraction = delta_ocr.ocr(screen, load_frame(img_path), ocr_frames)
     except Exception as e:
         logger.error(f"Error processing image {img_path}: {str(e)}")
         return None
+    logger.info(f"Delta OCR of {img_path}: {area_fraction:.0%} of the frame OCR'd")
+    if delta_ocr.frames % 100 == 0:
+        logger.info(f"Delta OCR: {delta_ocr.summary()}")
+    return results
+
+
+async def predict_entity(entity: Entity):
+    screen_name = entity.get_metadata_by_key("screen_name")
+    if delta_ocr is None or not screen_name:
+        return await predict(entity.filepath)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        thread_pool,
+        partial(predict_local_delta, entity.filepath, (entity.library_id, screen_name.value)),
+    )
+
+
+def uses_rapidocr():
+    return platform.system() != 'Darwin' or os.environ.get('FORCE_RAPIDOCR', '0') == '1'
 
 
 async def async_predict_local(img_path):
     loop = asyncio.get_running_loop()
+    if batcher is not None:
+        return await batcher.submit(img_path)
+    if ocr_pool is not None:
+        try:
+            frame = await loop.run_in_executor(thread_pool, partial(load_frame, img_path))
+            return await ocr_pool.async_predict(frame)
+        except Exception as e:
+            logger.error(f"Error processing image {img_path}: {str(e)}")
+            return None
     results = await loop.run_in_executor(thread_pool, partial(predict_local, img_path))
     return results
 
@@ -188,14 +401,9 @@ async def async_predict_local(img_path):
 async def predict(img_path):
     if use_local:
         return await async_predict_local(img_path)
-    
-    image_base64 = image2base64(img_path)
-    if not image_base64:
-        return None
 
-    async with httpx.AsyncClient() as client:
-        headers = {"Authorization": f"Bearer {token.get_secret_value()}"} if token else {}
-        return await fetch(endpoint, client, image_base64, headers)
+    async with semaphore:  # 使用信号量控制并发
+        return await remote.predict(img_path)
 
 
 @router.get("/")
@@ -203,9 +411,14 @@ async def read_root():
     return {"healthy": True}
 
 
-@router.post("", include_in_schema=False)
-@router.post("/")
-async def ocr(entity: Entity, request: Request):
+async def probe_backend():
+    # The local engine runs in this process; only a remote server can be down.
+    if not use_local:
+        await probe_url(endpoint)
+
+
+async def process_entity(entity: Entity, write_metadata: MetadataWriter):
+    """Run OCR on the entity and hand the result to `write_metadata`."""
     metadata_field_name = get_metadata_name()
     if not entity.file_type_group == "image":
         return {metadata_field_name: "{}"}
@@ -221,13 +434,7 @@ async def ocr(entity: Entity, request: Request):
         logger.info(f"Skipping OCR processing for file: {entity.filepath} due to 'low_info' tag")
         return {metadata_field_name: "{}"}
 
-    location_url = request.headers.get("Location")
-    if not location_url:
-        raise HTTPException(status_code=400, detail="Location header is missing")
-
-    patch_url = f"{location_url}/metadata"
-
-    ocr_result = await predict(entity.filepath)
+    ocr_result = await predict_entity(entity)
     if ocr_result:
         filtered_results = [r for r in ocr_result if r['score'] > 0.5][:10]
         texts = [f"{r['rec_txt']}({r['score']:.2f})" for r in filtered_results]
@@ -237,50 +444,76 @@ async def ocr(entity: Entity, request: Request):
         logger.info(f"No OCR result found for file: {entity.filepath}")
         return {metadata_field_name: "{}"}
 
-    # Call the URL to patch the entity's metadata
-    async with httpx.AsyncClient() as client:
-        response = await client.patch(
-            patch_url,
-            json={
-                "metadata_entries": [
-                    {
-                        "key": metadata_field_name,
-                        "value": json.dumps(
-                            ocr_result,
-                            default=lambda o: o.item() if hasattr(o, "item") else o,
-                        ),
-                        "source": PLUGIN_NAME,
-                        "data_type": MetadataType.JSON_DATA.value,
-                    }
-                ]
-            },
-            timeout=30,
-        )
+    value = json.dumps(
+        ocr_result,
+        default=lambda o: o.item() if hasattr(o, "item") else o,
+    )
+    await write_metadata(
+        [
+            EntityMetadataParam(
+                key=metadata_field_name,
+                value=value,
+                source=PLUGIN_NAME,
+                data_type=MetadataType.JSON_DATA,
+            )
+        ]
+    )
 
-    # Check if the patch request was successful
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Failed to patch entity metadata"
-        )
+    return {metadata_field_name: value}
+
+
+@router.post("", include_in_schema=False)
+@router.post("/")
+async def ocr(entity: Entity, request: Request):
+    location_url = request.headers.get("Location")
+    if not location_url:
+        raise HTTPException(status_code=400, detail="Location header is missing")
+
+    return await process_entity(entity, http_metadata_writer(location_url))
 
-    return {
-        metadata_field_name: json.dumps(
-            ocr_result,
-            default=lambda o: o.item() if hasattr(o, "item") else o,
-        )
-    }
 
+def shutdown_plugin():
+    """Stop the OCR worker processes and threads started by init_plugin."""
+    global ocr_pool, thread_pool
+    if ocr_pool is not None:
+        ocr_pool.close()
+        ocr_pool = None
+    if thread_pool is not None:
+        thread_pool.shutdown(wait=False, cancel_futures=True)
+        thread_pool = None
 
-def init_plugin(config):
-    global endpoint, token, concurrency, semaphore, use_local, ocr, thread_pool, languages
+
+def init_plugin(config, max_in_flight: Optional[int] = None):
+    """`max_in_flight` is how many OCR jobs the plugin queue runs at once;
+    a batch never waits for more frames than that."""
+    global endpoint, token, concurrency, semaphore, use_local, ocr, ocr_pool, thread_pool, languages
+    global batcher, rec_batch_size, delta_ocr, remote
     endpoint = config.endpoint
     token = config.token
     concurrency = config.concurrency
     use_local = config.use_local
     languages = list(getattr(config, "languages", None) or ["zh-Hans", "en-US"])
     semaphore = asyncio.Semaphore(concurrency)
-    
-    if use_local:
+    remote = RemoteOCRClient(
+        endpoint,
+        token,
+        concurrency,
+        transport=getattr(config, "remote_transport", "raw"),
+        max_retries=getattr(config, "remote_max_retries", 3),
+    )
+
+    local_backend = getattr(config, "local_backend", "thread")
+    if use_local and local_backend == "process" and uses_rapidocr():
+        from memos.plugins.ocr.pool import OCRProcessPool, default_workers
+
+        intra_op_threads = getattr(config, "intra_op_threads", 1)
+        workers = getattr(config, "process_workers", 0) or default_workers(
+            concurrency, intra_op_threads
+        )
+        ocr_pool = OCRProcessPool(workers, intra_op_threads)
+        # Frames are still decoded in the server process, off the event loop.
+        thread_pool = ThreadPoolExecutor(max_workers=concurrency)
+    elif use_local:
         from rapidocr import RapidOCR
         config_params = {
             "Global.width_height_ratio": 40,
@@ -292,11 +525,43 @@ def init_plugin(config):
             
         thread_pool = ThreadPoolExecutor(max_workers=concurrency)
 
+    rec_batch_size = getattr(config, "rec_batch_size", 32)
+    batch_size = getattr(config, "batch_size", 1)
+    if max_in_flight is not None:
+        batch_size = min(batch_size, max_in_flight)
+    if use_local and batch_size > 1 and uses_rapidocr():
+        from memos.plugins.ocr.batch import FrameBatcher
+
+        batcher = FrameBatcher(
+            async_predict_local_batch,
+            max_batch=batch_size,
+            window=getattr(config, "batch_window", 0.05),
+        )
+
+    if use_local and getattr(config, "delta", False) and uses_rapidocr():
+        from memos.plugins.ocr.delta import DeltaOCR
+
+        delta_ocr = DeltaOCR(
+            tile=getattr(config, "delta_tile", 64),
+            max_changed_fraction=getattr(config, "delta_max_changed", 0.5),
+        )
+
     logger.info("OCR plugin initialized")
     logger.info(f"Endpoint: {endpoint}")
     logger.info(f"Token: {token}")
     logger.info(f"Concurrency: {concurrency}")
     logger.info(f"Use local: {use_local}")
+    if not use_local:
+        logger.info(f"Remote transport: {remote.transport}")
+    if ocr_pool is not None:
+        logger.info(
+            f"OCR process pool: {ocr_pool.workers} workers x "
+            f"{ocr_pool.intra_op_threads} onnxruntime threads"
+        )
+    if delta_ocr is not None:
+        logger.info(f"Delta OCR: {delta_ocr.tile}px tiles, full OCR above {delta_ocr.max_changed_fraction:.0%} changed")
+    if batcher is not None:
+        logger.info(f"OCR batching: up to {batcher.max_batch} frames per {batcher.window}s window")
     if use_local:
         logger.info(f"OCR library: {'rapidocr_openvino' if platform.system() == 'Windows' and 'Intel' in cpuinfo.get_cpu_info()['brand_raw'] else 'rapidocr_onnxruntime'}")
         if platform.system() == 'Darwin':
@@ -0,0 +1,155 @@
+"""Process-pool backend for local RapidOCR.
+
+A single RapidOCR shared by a thread pool serializes its Python pre- and
+post-processing on the GIL, and every call fans out to onnxruntime's
+default thread count, so `concurrency` threads oversubscribe the cores.
+Here each worker process owns one RapidOCR whose onnxruntime intra-op
+threads are pinned, and decoded frames reach the workers through shared
+memory: only the block name, shape and dtype are pickled.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from memos.plugins.ocr.batch import DEFAULT_REC_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Env vars read by the BLAS/OpenMP runtimes some onnxruntime builds link.
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+_engine = None
+
+
+def build_rapidocr(intra_op_threads):
+    """The RapidOCR engine each worker owns."""
+    from rapidocr import RapidOCR
+
+    return RapidOCR(
+        params={
+            "Global.width_height_ratio": 40,
+            "EngineConfig.onnxruntime.intra_op_num_threads": intra_op_threads,
+            "EngineConfig.onnxruntime.inter_op_num_threads": 1,
+        }
+    )
+
+
+def default_workers(concurrency, intra_op_threads):
+    """Enough workers to fill the cores without oversubscribing them."""
+    cores = os.cpu_count() or 1
+    return max(1, min(concurrency, cores // max(1, intra_op_threads)))
+
+
+def _init_worker(engine_factory, intra_op_threads):
+    global _engine
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(intra_op_threads)
+    _engine = engine_factory(intra_op_threads)
+
+
+def _predict_shared(shm_name, shape, dtype):
+    from memos.plugins.ocr.main import run_rapidocr
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        try:
+            return run_rapidocr(_engine, frame)
+        finally:
+            # The buffer cannot be closed while an array still exports it.
+            del frame
+    finally:
+        shm.close()
+
+
+def _predict_batch_shared(blocks, rec_batch_size):
+    from memos.plugins.ocr.batch import RapidOCRStages, ocr_batch
+
+    shms = [shared_memory.SharedMemory(name=name) for name, _, _ in blocks]
+    try:
+        frames = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, (_, shape, dtype) in zip(shms, blocks)
+        ]
+        try:
+            return ocr_batch(RapidOCRStages(_engine), frames, rec_batch_size)
+        finally:
+            del frames
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+class OCRProcessPool:
+    """RapidOCR workers fed with frames in shared memory."""
+
+    def __init__(self, workers, intra_op_threads=1, engine_factory=build_rapidocr):
+        self.workers = workers
+        self.intra_op_threads = intra_op_threads
+        # spawn, not fork: the server process already runs threads (uvicorn,
+        # the write queue, onnxruntime) that a forked child would inherit
+        # mid-state.
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(engine_factory, intra_op_threads),
+        )
+
+    def _share(self, frame):
+        frame = np.ascontiguousarray(frame)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+        return shm, frame.shape, frame.dtype.str
+
+    def predict(self, frame):
+        """OCR a decoded frame, blocking until a worker returns the result."""
+        shm, shape, dtype = self._share(frame)
+        try:
+            return self._executor.submit(_predict_shared, shm.name, shape, dtype).result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def async_predict(self, frame):
+        shm, shape, dtype = self._share(frame)
+        try:
+            future = self._executor.submit(_predict_shared, shm.name, shape, dtype)
+            return await asyncio.wrap_future(future)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _submit_batch(self, frames, rec_batch_size):
+        shared = [self._share(frame) for frame in frames]
+        blocks = [(shm.name, shape, dtype) for shm, shape, dtype in shared]
+        return self._executor.submit(_predict_batch_shared, blocks, rec_batch_size), shared
+
+    @staticmethod
+    def _release(shared):
+        for shm, _, _ in shared:
+            shm.close()
+            shm.unlink()
+
+    def predict_batch(self, frames, rec_batch_size=DEFAULT_REC_BATCH_SIZE):
+        """OCR several frames in one worker, pooling their text-line crops."""
+        future, shared = self._submit_batch(frames, rec_batch_size)
+        try:
+            return future.result()
+        finally:
+            self._release(shared)
+
+    async def async_predict_batch(self, frames, rec_batch_size=DEFAULT_REC_BATCH_SIZE):
+        future, shared = self._submit_batch(frames, rec_batch_size)
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            self._release(shared)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
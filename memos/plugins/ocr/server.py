@@ -9,6 +9,8 @@ from contextlib import asynccontextmanager
 import base64
 import io
 import asyncio
+import math
+import secrets
 from pydantic import BaseModel, Field
 from typing import List
 from multiprocessing import Pool
@@ -17,6 +19,12 @@ import time
 import uvicorn
 import os
 
+try:
+    from .batch import RapidOCRStages, ocr_batch
+except ImportError:
+    # Run standalone (`uvicorn server:app`) from this directory.
+    from batch import RapidOCRStages, ocr_batch
+
 
 # Configure logger
 logging.basicConfig(
@@ -30,6 +38,8 @@ process_pool = None
 
 # 从环境变量中读取参数
 max_workers = int(os.getenv("MAX_WORKERS", 1))
+# Requests queued on the pool beyond this are turned away with 429.
+max_backlog = int(os.getenv("MAX_BACKLOG", 0)) or 4 * max_workers
 
 
 def str_to_bool(value):
@@ -118,6 +128,15 @@ def predict(image_data):
     return converted_results
 
 
+def predict_batch(images_data, rec_batch_size):
+    global ocr
+    if ocr is None:
+        raise ValueError("OCR engine not initialized")
+
+    frames = [np.array(Image.open(io.BytesIO(data)).convert("RGB")) for data in images_data]
+    return ocr_batch(RapidOCRStages(ocr), frames, rec_batch_size)
+
+
 def convert_to_python_type(item):
     if isinstance(item, np.ndarray):
         return item.tolist()
@@ -131,12 +150,68 @@ def convert_to_python_type(item):
         return item
 
 
-async def async_predict(image_data):
+# Jobs handed to the pool and not finished yet, and a moving average of how
+# long one takes; both only touched on the event loop.
+pending = 0
+job_seconds = 1.0
+
+
+def retry_after():
+    """Seconds until the backlog has room again, for the Retry-After header."""
+    return max(1, math.ceil(job_seconds * pending / max_workers))
+
+
+async def submit(fn, args):
+    """Run `fn(*args)` in the process pool without parking a thread on it.
+
+    The image bytes go to the worker as they are; the caller gets a 429
+    with Retry-After once `max_backlog` jobs are waiting.
+    """
+    global pending
+    if pending >= max_backlog:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="OCR backlog is full",
+            headers={"Retry-After": str(retry_after())},
+        )
     loop = asyncio.get_running_loop()
-    results = await loop.run_in_executor(
-        None, process_pool.apply, predict, (image_data,)
+    future = loop.create_future()
+    started = time.monotonic()
+
+    def settle(result, error):
+        global pending, job_seconds
+        pending -= 1
+        job_seconds = 0.8 * job_seconds + 0.2 * (time.monotonic() - started)
+        if future.done():  # the client went away
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    pending += 1
+    process_pool.apply_async(
+        fn,
+        args,
+        callback=lambda result: loop.call_soon_threadsafe(settle, result, None),
+        error_callback=lambda error: loop.call_soon_threadsafe(settle, None, error),
     )
-    return results
+    return await future
+
+
+async def async_predict(image_data):
+    return await submit(predict, (image_data,))
+
+
+async def async_predict_batch(images_data, rec_batch_size):
+    return await submit(predict_batch, (images_data, rec_batch_size))
+
+
+def decode_base64_image(image_base64):
+    # Remove header part if present
+    if image_base64.startswith("data:image"):
+        image_base64 = image_base64.split(",")[1]
+    return base64.b64decode(image_base64)
 
 
 class OCRResult(BaseModel):
@@ -163,27 +238,72 @@ async def verify_token(api_key: str = Depends(api_key_header)):
         )
     return True
 
-@app.post("/predict", response_model=List[OCRResult])
-async def predict_base64(
-    _auth: bool = Depends(verify_token),
-    image_base64: str = Body(..., embed=True)
-    ):
-    try:
+@app.post(
+    "/predict",
+    response_model=List[OCRResult],
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "image/*": {"schema": {"type": "string", "format": "binary"}},
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"image_base64": {"type": "string"}},
+                        "required": ["image_base64"],
+                    }
+                },
+            },
+            "required": True,
+        }
+    },
+)
+async def predict_image(request: Request, _auth: bool = Depends(verify_token)):
+    """OCR one image sent as the raw request body (any non-JSON content
+    type), or as `{"image_base64": ...}` JSON."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            image_base64 = (await request.json()).get("image_base64")
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
         if not image_base64:
             raise HTTPException(status_code=400, detail="Missing image_base64 field")
+        image_data = decode_base64_image(image_base64)
+    else:
+        image_data = await request.body()
+        if not image_data:
+            raise HTTPException(status_code=400, detail="Empty image body")
+
+    try:
+        ocr_result = await async_predict(image_data)
+        return convert_to_python_type(ocr_result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error during OCR processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 
-        # Remove header part if present
-        if image_base64.startswith("data:image"):
-            image_base64 = image_base64.split(",")[1]
+@app.post("/predict_batch", response_model=List[List[OCRResult]])
+async def predict_batch_base64(
+    _auth: bool = Depends(verify_token),
+    images_base64: List[str] = Body(..., embed=True),
+    rec_batch_size: int = Body(32, embed=True),
+    ):
+    """OCR several images in one call, recognizing their text lines together.
 
-        # Decode the base64 image
-        image_data = base64.b64decode(image_base64)
+    Results are returned in the order of `images_base64`.
+    """
+    try:
+        if not images_base64:
+            raise HTTPException(status_code=400, detail="Missing images_base64 field")
 
-        # 直接传递图像数据给async_predict
-        ocr_result = await async_predict(image_data)
+        images_data = [decode_base64_image(image) for image in images_base64]
+        ocr_results = await async_predict_batch(images_data, rec_batch_size)
 
-        return convert_to_python_type(ocr_result)
+        return convert_to_python_type(ocr_results)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error during OCR processing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,110 @@
+"""Packing of consecutive frames into one structured VLM request.
+
+Consecutive frames of one screen mostly show the same window, and sending
+each on its own repeats the whole prompt and the per-request overhead. The
+plugin queue runs several structured_vlm jobs at once; FrameBatcher holds
+each frame for up to `max_wait` seconds so that frames of the same group
+(library, screen, active app) whose sequence numbers lie within `size` of
+each other go out together, in sequence order. A group is sent as soon as
+it is full, when a frame that does not fit arrives, or when its wait runs
+out.
+
+`run(entities)` makes the request and returns one result per entity; None
+sends that frame back to the caller for a single-frame request. A frame
+left alone in its group gets None straight away.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+
+class _Group:
+    def __init__(self):
+        self.frames = []  # (sequence, entity, future)
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def accepts(self, sequence: int, size: int) -> bool:
+        sequences = [frame[0] for frame in self.frames]
+        if sequence in sequences:
+            return False
+        return max(sequences + [sequence]) - min(sequences + [sequence]) < size
+
+
+class FrameBatcher:
+    def __init__(
+        self,
+        size: int,
+        max_wait: float,
+        run: Callable[[List[Any]], Awaitable[List[Optional[Any]]]],
+    ):
+        self.size = size
+        self.max_wait = max_wait
+        self.run = run
+        self._groups: Dict[Hashable, _Group] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_frames = 0
+        self.single_frames = 0
+        self.fallbacks = 0
+
+    async def submit(self, key: Hashable, sequence: int, entity) -> Optional[Any]:
+        """The entity's result from a batched request, or None when it has
+        to be sent on its own."""
+        loop = asyncio.get_running_loop()
+        group = self._groups.get(key)
+        if group is not None and not group.accepts(sequence, self.size):
+            self._flush(key)
+            group = None
+        if group is None:
+            group = _Group()
+            group.timer = loop.call_later(self.max_wait, self._flush, key, group)
+            self._groups[key] = group
+        future = loop.create_future()
+        group.frames.append((sequence, entity, future))
+        if len(group.frames) >= self.size:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: Hashable, group: Optional[_Group] = None):
+        if group is not None and self._groups.get(key) is not group:
+            return  # the timer of a group that was already sent
+        group = self._groups.pop(key)
+        group.timer.cancel()
+        frames = sorted(group.frames, key=lambda frame: frame[0])
+        if len(frames) == 1:
+            self.single_frames += 1
+            _resolve(frames[0][2], None)
+            return
+        task = asyncio.create_task(self._send(frames))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, frames):
+        self.batches += 1
+        self.batched_frames += len(frames)
+        try:
+            results = await self.run([entity for _, entity, _ in frames])
+        except Exception as e:
+            for _, _, future in frames:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(frames, results):
+            if result is None:
+                self.fallbacks += 1
+            _resolve(future, result)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "batches": self.batches,
+            "batched_frames": self.batched_frames,
+            "single_frames": self.single_frames,
+            "fallbacks": self.fallbacks,
+            "waiting": sum(len(group.frames) for group in self._groups.values()),
+        }
+
+
+def _resolve(future: asyncio.Future, result):
+    # The job may have been cancelled while it waited.
+    if not future.done():
+        future.set_result(result)
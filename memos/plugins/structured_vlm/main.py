@@ -7,20 +7,21 @@ Mirrors the existing `vlm/` plugin shape (FastAPI app, init_plugin, POST handler
 """
 from __future__ import annotations
 import asyncio
-import base64
-import io
 import json
 import logging
 import re
-from typing import Optional
+from typing import Any, List, Optional
 
 import httpx
 from fastapi import APIRouter, HTTPException, Request
-from PIL import Image
 
 from memos.extractors.schema import ExtractedFields
-from memos.plugins.structured_vlm.prompt_v1 import PROMPT_TEXT, PROMPT_VERSION
-from memos.schemas import Entity, MetadataType
+from memos.plugins.limiter import AdaptiveLimiter, limiter_for
+from memos.plugins.structured_vlm.batcher import FrameBatcher
+from memos.plugins.structured_vlm.prompt_v1 import PROMPT_TEXT, PROMPT_VERSION, batch_prompt
+from memos.utils.image_cache import shared_image_cache
+from memos.plugins import MetadataWriter, http_metadata_writer, probe_url
+from memos.schemas import Entity, EntityMetadataParam, MetadataType
 
 logger = logging.getLogger(__name__)
 PLUGIN_NAME = "structured_vlm"
@@ -45,7 +46,12 @@ concurrency: int = 4
 force_jpeg: bool = True
 max_tokens: int = 2048
 disable_thinking: bool = True
-semaphore: Optional[asyncio.Semaphore] = None
+# Fixed at `concurrency` until init_plugin swaps in the configured limiter.
+limiter: AdaptiveLimiter = AdaptiveLimiter(concurrency, min_limit=concurrency, max_limit=concurrency)
+# Packs consecutive frames into one request when batch_size > 1.
+batcher: Optional[FrameBatcher] = None
+# Requests, frames and tokens (as reported by the backend) sent so far.
+usage = {"requests": 0, "frames": 0, "prompt_tokens": 0, "completion_tokens": 0}
 
 
 def metadata_field_name(modelname: str) -> str:
@@ -57,22 +63,16 @@ def metadata_field_name(modelname: str) -> str:
 def _image_to_base64(img_path: str, max_width: int = 1600, quality: int = 85) -> Optional[str]:
     """Open, downscale if needed, return base64 JPEG."""
     try:
-        img = Image.open(img_path)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        if img.width > max_width:
-            ratio = max_width / img.width
-            img = img.resize((max_width, int(img.height * ratio)), Image.LANCZOS)
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality)
-        return base64.b64encode(buf.getvalue()).decode()
+        # Only the width is bounded.
+        return shared_image_cache().base64(img_path, (max_width, 1 << 16), quality=quality)
     except Exception as e:
         logger.warning(f"Failed to load image {img_path}: {e}")
         return None
 
 
-def _parse_json_loose(text: str) -> Optional[dict]:
-    """Try direct parse, then markdown-stripped, then first {..} block."""
+def _parse_json_loose(text: str, block: str = r"\{[\s\S]*\}") -> Optional[Any]:
+    """Try direct parse, then markdown-stripped, then the first `block` match
+    ({..} by default)."""
     if not text:
         return None
     try:
@@ -85,7 +85,7 @@ def _parse_json_loose(text: str) -> Optional[dict]:
             return json.loads(m.group(1))
         except json.JSONDecodeError:
             pass
-    m = re.search(r"\{[\s\S]*\}", text)
+    m = re.search(block, text)
     if m:
         try:
             return json.loads(m.group(0))
@@ -94,6 +94,18 @@ def _parse_json_loose(text: str) -> Optional[dict]:
     return None
 
 
+def _to_extracted(
+    parsed: Any, raw_text: str, modelname: str, log_ctx: str = "",
+) -> Optional[ExtractedFields]:
+    try:
+        return ExtractedFields(extractor=metadata_field_name(modelname), **parsed)
+    except Exception as e:
+        logger.warning(
+            f"VLM fail category={FAIL_SCHEMA} err={e} raw={raw_text[:200]!r} {log_ctx}"
+        )
+        return None
+
+
 def parse_vlm_response_to_extracted(
     raw_text: str, modelname: str, log_ctx: str = "",
 ) -> Optional[ExtractedFields]:
@@ -107,47 +119,31 @@ def parse_vlm_response_to_extracted(
             f"VLM fail category={FAIL_JSON_PARSE} raw={raw_text[:200]!r} {log_ctx}"
         )
         return None
-    try:
-        return ExtractedFields(extractor=metadata_field_name(modelname), **parsed)
-    except Exception as e:
+    return _to_extracted(parsed, raw_text, modelname, log_ctx)
+
+
+def parse_vlm_batch_response(
+    raw_text: str, modelname: str, n: int, log_ctx: str = "",
+) -> List[Optional[ExtractedFields]]:
+    """Split a batched response (a JSON array of n objects) into per-frame
+    results. Frames whose result cannot be recovered get None; an answer
+    that is not an array of n items gives None for every frame."""
+    parsed = _parse_json_loose(raw_text, block=r"\[[\s\S]*\]") if raw_text else None
+    if not isinstance(parsed, list) or len(parsed) != n:
+        category = FAIL_EMPTY if not raw_text or not raw_text.strip() else FAIL_JSON_PARSE
         logger.warning(
-            f"VLM fail category={FAIL_SCHEMA} err={e} raw={raw_text[:200]!r} {log_ctx}"
+            f"VLM fail category={category} batch={n} raw={(raw_text or '')[:200]!r} {log_ctx}"
         )
-        return None
+        return [None] * n
+    return [_to_extracted(item, raw_text, modelname, log_ctx) for item in parsed]
 
 
-async def predict_structured(
-    endpoint: str, modelname: str, img_path: str,
-    token: Optional[object] = None, max_tokens: int = 2048,
-    disable_thinking: bool = True,
-    entity_id: Optional[int] = None,
-    max_retries: int = 3,
-    retry_base_delay: float = 0.5,
-) -> Optional[ExtractedFields]:
-    """Call VLM endpoint, return ExtractedFields or None on failure.
-
-    Retries on transient errors only (5xx and network/timeout). 4xx, image-load,
-    and parse failures are terminal and return None immediately. Every failure
-    path emits one structured warning with `category=...` so log triage can
-    distinguish server-side (http_5xx, network) from data/client-side (image_load,
-    http_4xx, empty, json_parse, schema_validation) issues.
-    """
-    log_ctx = f"entity_id={entity_id} path={img_path}"
-
-    img_b64 = _image_to_base64(img_path)
-    if not img_b64:
-        logger.warning(f"VLM fail category={FAIL_IMAGE_LOAD} {log_ctx}")
-        return None
-
+def _chat_request(
+    modelname: str, content: list, max_tokens: int, disable_thinking: bool,
+) -> dict:
     request_data = {
         "model": modelname,
-        "messages": [{
-            "role": "user",
-            "content": [
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}},
-                {"type": "text", "text": PROMPT_TEXT},
-            ],
-        }],
+        "messages": [{"role": "user", "content": content}],
         "stream": False,
         "max_tokens": max_tokens,
         "temperature": 0.1,
@@ -155,6 +151,22 @@ async def predict_structured(
     }
     if disable_thinking:
         request_data["extra_body"] = {"chat_template_kwargs": {"enable_thinking": False}}
+    return request_data
+
+
+def _image_part(img_b64: str) -> dict:
+    return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}}
+
+
+async def _post_chat(
+    endpoint: str, token: Optional[object], request_data: dict, log_ctx: str,
+    max_retries: int, retry_base_delay: float, frames: int = 1,
+) -> Optional[str]:
+    """POST a chat completion and return the model's text, or None on failure.
+
+    Retries on transient errors only (5xx and network/timeout); 4xx is
+    terminal. Every failure path logs one `category=...` warning.
+    """
     headers = {"Content-Type": "application/json"}
     if token is not None:
         token_str = token.get_secret_value() if hasattr(token, "get_secret_value") else str(token)
@@ -162,11 +174,18 @@ async def predict_structured(
             headers["Authorization"] = f"Bearer {token_str}"
 
     url = f"{endpoint.rstrip('/')}/v1/chat/completions"
-    raw_text: Optional[str] = None
     for attempt in range(max_retries):
         try:
-            async with httpx.AsyncClient() as client:
-                r = await client.post(url, headers=headers, json=request_data, timeout=180.0)
+            # One limiter slot per request; backoff sleeps happen outside it.
+            async with limiter.slot() as slot:
+                async with httpx.AsyncClient() as client:
+                    r = await client.post(
+                        url, headers=headers, json=request_data, timeout=180.0 * frames
+                    )
+                if 500 <= r.status_code < 600:
+                    slot.overloaded()
+                elif r.status_code != 200:
+                    slot.ignore()
         except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
             if attempt < max_retries - 1:
                 delay = retry_base_delay * (2 ** attempt)
@@ -189,7 +208,8 @@ async def predict_structured(
                     f"body={r.text[:200]!r} {log_ctx}"
                 )
                 return None
-            break
+            _record_usage(data.get("usage"), frames)
+            return raw_text
         if 500 <= r.status_code < 600:
             if attempt < max_retries - 1:
                 delay = retry_base_delay * (2 ** attempt)
@@ -211,23 +231,146 @@ async def predict_structured(
         )
         return None
 
+    logger.warning(f"VLM fail category={FAIL_NETWORK} err=exhausted_retries {log_ctx}")
+    return None
+
+
+def _record_usage(reported: Optional[dict], frames: int):
+    usage["requests"] += 1
+    usage["frames"] += frames
+    if isinstance(reported, dict):
+        usage["prompt_tokens"] += reported.get("prompt_tokens") or 0
+        usage["completion_tokens"] += reported.get("completion_tokens") or 0
+
+
+async def predict_structured(
+    endpoint: str, modelname: str, img_path: str,
+    token: Optional[object] = None, max_tokens: int = 2048,
+    disable_thinking: bool = True,
+    entity_id: Optional[int] = None,
+    max_retries: int = 3,
+    retry_base_delay: float = 0.5,
+) -> Optional[ExtractedFields]:
+    """Call VLM endpoint, return ExtractedFields or None on failure.
+
+    Retries on transient errors only (5xx and network/timeout). 4xx, image-load,
+    and parse failures are terminal and return None immediately. Every failure
+    path emits one structured warning with `category=...` so log triage can
+    distinguish server-side (http_5xx, network) from data/client-side (image_load,
+    http_4xx, empty, json_parse, schema_validation) issues.
+    """
+    log_ctx = f"entity_id={entity_id} path={img_path}"
+
+    img_b64 = _image_to_base64(img_path)
+    if not img_b64:
+        logger.warning(f"VLM fail category={FAIL_IMAGE_LOAD} {log_ctx}")
+        return None
+
+    request_data = _chat_request(
+        modelname,
+        [_image_part(img_b64), {"type": "text", "text": PROMPT_TEXT}],
+        max_tokens,
+        disable_thinking,
+    )
+    raw_text = await _post_chat(
+        endpoint, token, request_data, log_ctx, max_retries, retry_base_delay
+    )
     if raw_text is None:
-        logger.warning(f"VLM fail category={FAIL_NETWORK} err=exhausted_retries {log_ctx}")
         return None
 
     return parse_vlm_response_to_extracted(raw_text, modelname, log_ctx=log_ctx)
 
 
+async def predict_structured_batch(
+    endpoint: str, modelname: str, img_paths: List[str],
+    token: Optional[object] = None, max_tokens: int = 2048,
+    disable_thinking: bool = True,
+    entity_ids: Optional[List[int]] = None,
+    max_retries: int = 3,
+    retry_base_delay: float = 0.5,
+) -> Optional[List[Optional[ExtractedFields]]]:
+    """Extract several consecutive frames with one multi-image request.
+
+    Returns one result per frame, None for a frame whose result could not be
+    used (the caller retries it on its own), or None overall when the request
+    itself failed.
+    """
+    entity_ids = entity_ids or [None] * len(img_paths)
+    log_ctx = f"entity_ids={entity_ids}"
+    images = [_image_to_base64(path) for path in img_paths]
+    frames = [i for i, img_b64 in enumerate(images) if img_b64]
+    if len(frames) < 2:
+        return [None] * len(img_paths)
+
+    content = []
+    for n, i in enumerate(frames, start=1):
+        content.append({"type": "text", "text": f"截图 {n}:"})
+        content.append(_image_part(images[i]))
+    content.append({"type": "text", "text": batch_prompt(len(frames))})
+    request_data = _chat_request(
+        modelname, content, max_tokens * len(frames), disable_thinking
+    )
+    raw_text = await _post_chat(
+        endpoint, token, request_data, log_ctx, max_retries, retry_base_delay,
+        frames=len(frames),
+    )
+    if raw_text is None:
+        return None
+
+    results: List[Optional[ExtractedFields]] = [None] * len(img_paths)
+    parsed = parse_vlm_batch_response(raw_text, modelname, len(frames), log_ctx=log_ctx)
+    for i, result in zip(frames, parsed):
+        results[i] = result
+    return results
+
+
 @router.get("/")
 async def read_root():
     return {"healthy": True, "plugin": PLUGIN_NAME, "model": modelname,
-            "prompt_version": PROMPT_VERSION}
+            "prompt_version": PROMPT_VERSION,
+            "concurrency": limiter.stats(),
+            "batching": batcher.stats() if batcher else None,
+            "usage": usage}
 
 
-@router.post("", include_in_schema=False)
-@router.post("/")
-async def handle_entity(entity: Entity, request: Request):
-    """Plugin webhook: process entity, write metadata back."""
+async def probe_backend():
+    await probe_url(endpoint)
+
+
+def batch_frame(entity: Entity) -> Optional[tuple]:
+    """(group key, sequence) of a recorded frame; frames of a group with
+    adjacent sequence numbers may share a request. None for frames without
+    the recorder's screen_name/sequence metadata."""
+    screen = entity.get_metadata_by_key("screen_name")
+    sequence = entity.get_metadata_by_key("sequence")
+    if not screen or not sequence:
+        return None
+    try:
+        sequence = int(sequence.value)
+    except ValueError:
+        return None
+    app = entity.get_metadata_by_key("active_app")
+    return (entity.library_id, screen.value, app.value if app else None), sequence
+
+
+async def _run_batch(entities: List[Entity]) -> List[Optional[ExtractedFields]]:
+    results = await predict_structured_batch(
+        endpoint=endpoint, modelname=modelname,
+        img_paths=[entity.filepath for entity in entities], token=token,
+        max_tokens=max_tokens, disable_thinking=disable_thinking,
+        entity_ids=[entity.id for entity in entities],
+    )
+    if results is None:
+        # The backend failed; sending the frames one by one would not help.
+        raise HTTPException(
+            status_code=502,
+            detail=f"structured VLM failed for entity_ids={[e.id for e in entities]} (see plugin log)",
+        )
+    return results
+
+
+async def process_entity(entity: Entity, write_metadata: MetadataWriter):
+    """Extract structured fields for the entity and hand them to `write_metadata`."""
     if entity.file_type_group != "image":
         return {}
     field = metadata_field_name(modelname)
@@ -236,11 +379,11 @@ async def handle_entity(entity: Entity, request: Request):
         logger.info(f"Skip {entity.filepath}: already has {field}")
         return {field: existing.value}
 
-    location_url = request.headers.get("Location")
-    if not location_url:
-        raise HTTPException(status_code=400, detail="Location header is missing")
-
-    async with semaphore:
+    result = None
+    frame = batch_frame(entity) if batcher is not None else None
+    if frame is not None:
+        result = await batcher.submit(*frame, entity)
+    if result is None:
         result = await predict_structured(
             endpoint=endpoint, modelname=modelname,
             img_path=entity.filepath, token=token,
@@ -257,23 +400,27 @@ async def handle_entity(entity: Entity, request: Request):
         )
 
     value = result.model_dump_json()
-    patch_url = f"{location_url}/metadata"
-    async with httpx.AsyncClient() as client:
-        resp = await client.patch(
-            patch_url,
-            json={"metadata_entries": [{
-                "key": field, "value": value,
-                "source": PLUGIN_NAME, "data_type": MetadataType.JSON_DATA.value,
-            }]},
-            timeout=30,
-        )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail="Failed to patch metadata")
+    await write_metadata([EntityMetadataParam(
+        key=field, value=value,
+        source=PLUGIN_NAME, data_type=MetadataType.JSON_DATA,
+    )])
     return {field: value}
 
 
-def init_plugin(config) -> None:
-    global modelname, endpoint, token, concurrency, force_jpeg, max_tokens, disable_thinking, semaphore
+@router.post("", include_in_schema=False)
+@router.post("/")
+async def handle_entity(entity: Entity, request: Request):
+    """Plugin webhook: process entity, write metadata back."""
+    location_url = request.headers.get("Location")
+    if not location_url:
+        raise HTTPException(status_code=400, detail="Location header is missing")
+    return await process_entity(entity, http_metadata_writer(location_url))
+
+
+def init_plugin(config, max_in_flight: Optional[int] = None) -> None:
+    """`max_in_flight` is how many structured_vlm jobs the plugin queue runs
+    at once."""
+    global modelname, endpoint, token, concurrency, force_jpeg, max_tokens, disable_thinking, limiter, batcher
     modelname = config.modelname
     endpoint = config.endpoint
     token = config.token
@@ -281,7 +428,14 @@ def init_plugin(config) -> None:
     force_jpeg = config.force_jpeg
     max_tokens = config.max_tokens
     disable_thinking = config.disable_thinking
-    semaphore = asyncio.Semaphore(concurrency)
+    # Shared with the vlm plugin when both call the same endpoint.
+    limiter = limiter_for(endpoint, config, PLUGIN_NAME, max_in_flight)
+    batcher = None
+    if config.structured_batch_size > 1:
+        batcher = FrameBatcher(
+            config.structured_batch_size, config.structured_batch_wait, _run_batch
+        )
     logger.info(f"structured_vlm plugin initialized: model={modelname}, "
                 f"prompt={PROMPT_VERSION}, max_tokens={max_tokens}, "
-                f"disable_thinking={disable_thinking}")
+                f"disable_thinking={disable_thinking}, "
+                f"batch_size={config.structured_batch_size}")
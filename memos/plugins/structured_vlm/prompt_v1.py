@@ -10,3 +10,12 @@ PROMPT_VERSION = "v1"
 
 _THIS_DIR = Path(__file__).parent
 PROMPT_TEXT = (_THIS_DIR / "prompt_v1.txt").read_text(encoding="utf-8")
+
+# Appended to PROMPT_TEXT when several frames share one request; `{n}` is
+# the number of frames. The answer is a JSON array of v1 objects, so batched
+# results go to the same metadata field.
+BATCH_PROMPT_TEXT = (_THIS_DIR / "prompt_v1_batch.txt").read_text(encoding="utf-8")
+
+
+def batch_prompt(n: int) -> str:
+    return PROMPT_TEXT.rstrip() + "\n\n" + BATCH_PROMPT_TEXT.replace("{n}", str(n))
@@ -1,15 +1,13 @@
-import base64
 import httpx
-from PIL import Image
-import asyncio
 from typing import Optional
 from fastapi import APIRouter, FastAPI, Request, HTTPException
-from memos.schemas import Entity, MetadataType
+from memos.schemas import Entity, EntityMetadataParam, MetadataType
+from memos.plugins import MetadataWriter, http_metadata_writer, probe_url
+from memos.plugins.limiter import limiter_for
+from memos.utils.image_cache import shared_image_cache
 import logging
 import uvicorn
 import os
-import io
-import numpy as np
 
 
 # Configure logger
@@ -24,7 +22,7 @@ modelname = None
 endpoint = None
 token = None
 concurrency = None
-semaphore = None
+limiter = None
 force_jpeg = None
 prompt = None
 
@@ -37,54 +35,38 @@ def get_metadata_name() -> str:
 
 def image2base64(img_path):
     try:
-        with Image.open(img_path) as img:
-            img.verify()  # Verify the image file
-
-        with Image.open(img_path) as img:
-            # Check image size and skip if it's too small
-            if img.width < 10 or img.height < 10:
-                logger.warning(f"Image is too small: {img.width}x{img.height}. Skipping processing.")
-                return None
-
-            # Convert image to RGB mode (removes alpha channel if present)
-            img = img.convert("RGB")
-            
-            # Convert to numpy array and check shape
-            img_array = np.array(img)
-            logger.info(f"Image shape: {img_array.shape}")
-
-            if img_array.shape[2] != 3:
-                logger.warning(f"Unexpected number of channels: {img_array.shape[2]}. Expected 3. Skipping processing.")
-                return None
-            
-            if force_jpeg:
-                # Save as JPEG in memory
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG")
-                buffer.seek(0)
-                encoded_string = base64.b64encode(buffer.getvalue()).decode("utf-8")
-            else:
-                # Use original format, but ensure it's RGB
-                buffer = io.BytesIO()
-                img.save(buffer, format=img.format or "JPEG")
-                buffer.seek(0)
-                encoded_string = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return encoded_string
+        img = shared_image_cache().image(img_path)
+        # Check image size and skip if it's too small
+        if img.width < 10 or img.height < 10:
+            logger.warning(f"Image is too small: {img.width}x{img.height}. Skipping processing.")
+            return None
+        # The RGB conversion drops the source format, so both force_jpeg
+        # settings have always sent JPEG.
+        return shared_image_cache().base64(img_path, format="JPEG")
     except Exception as e:
         logger.error(f"Error processing image {img_path}: {str(e)}")
         return None
 
 
 async def fetch(endpoint: str, client, request_data, headers: Optional[dict] = None):
-    async with semaphore:
+    """The caption for `request_data`, or None when the request is rejected
+    or the answer is unusable. Backend failures (5xx, timeout, network) raise
+    so the job is retried and the plugin's circuit breaker sees them."""
+    async with limiter.slot() as slot:
+        response = await client.post(
+            f"{endpoint}/v1/chat/completions",
+            json=request_data,
+            timeout=300,
+            headers=headers,
+        )
+        if response.status_code >= 500:
+            slot.overloaded()
+            raise RuntimeError(f"VLM backend answered {response.status_code}")
+        if response.status_code >= 400:
+            slot.ignore()
+            logger.error(f"VLM request rejected: {response.status_code} - {response.text}")
+            return None
         try:
-            response = await client.post(
-                f"{endpoint}/v1/chat/completions",
-                json=request_data,
-                timeout=300,
-                headers=headers,
-            )
-            response.raise_for_status()
             result = response.json()
             choices = result.get("choices", [])
             if (
@@ -163,13 +145,15 @@ async def predict_remote(
 
 @router.get("/")
 async def read_root():
-    return {"healthy": True}
+    return {"healthy": True, "concurrency": limiter.stats() if limiter else None}
 
 
-@router.post("", include_in_schema=False)
-@router.post("/")
-async def vlm(entity: Entity, request: Request):
-    global modelname, endpoint, token
+async def probe_backend():
+    await probe_url(endpoint)
+
+
+async def process_entity(entity: Entity, write_metadata: MetadataWriter):
+    """Caption the entity with the VLM and hand the result to `write_metadata`."""
     metadata_field_name = get_metadata_name()
     if not entity.file_type_group == "image":
         return {metadata_field_name: ""}
@@ -195,12 +179,6 @@ async def vlm(entity: Entity, request: Request):
         )
         return {metadata_field_name: ""}
 
-    location_url = request.headers.get("Location")
-    if not location_url:
-        raise HTTPException(status_code=400, detail="Location header is missing")
-
-    patch_url = f"{location_url}/metadata"
-
     vlm_result = await predict(endpoint, modelname, entity.filepath, token=token)
 
     if not vlm_result:
@@ -209,34 +187,35 @@ async def vlm(entity: Entity, request: Request):
 
     logger.info(f"VLM result: {vlm_result[:100]}...")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.patch(
-            patch_url,
-            json={
-                "metadata_entries": [
-                    {
-                        "key": metadata_field_name,
-                        "value": vlm_result,
-                        "source": PLUGIN_NAME,
-                        "data_type": MetadataType.TEXT_DATA.value,
-                    }
-                ]
-            },
-            timeout=30,
-        )
-
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code, detail="Failed to patch entity metadata"
-        )
+    await write_metadata(
+        [
+            EntityMetadataParam(
+                key=metadata_field_name,
+                value=vlm_result,
+                source=PLUGIN_NAME,
+                data_type=MetadataType.TEXT_DATA,
+            )
+        ]
+    )
 
     return {
         metadata_field_name: vlm_result,
     }
 
 
-def init_plugin(config):
-    global modelname, endpoint, token, concurrency, semaphore, force_jpeg, prompt
+@router.post("", include_in_schema=False)
+@router.post("/")
+async def vlm(entity: Entity, request: Request):
+    location_url = request.headers.get("Location")
+    if not location_url:
+        raise HTTPException(status_code=400, detail="Location header is missing")
+
+    return await process_entity(entity, http_metadata_writer(location_url))
+
+
+def init_plugin(config, max_in_flight: Optional[int] = None):
+    """`max_in_flight` is how many vlm jobs the plugin queue runs at once."""
+    global modelname, endpoint, token, concurrency, limiter, force_jpeg, prompt
 
     modelname = config.modelname
     endpoint = config.endpoint
@@ -244,14 +223,16 @@ def init_plugin(config):
     concurrency = config.concurrency
     force_jpeg = config.force_jpeg
     prompt = config.prompt
-    semaphore = asyncio.Semaphore(concurrency)
+    limiter = limiter_for(endpoint, config, PLUGIN_NAME, max_in_flight)
 
     # Print the parameters
     logger.info("VLM plugin initialized")
     logger.info(f"Model Name: {modelname}")
     logger.info(f"Endpoint: {endpoint}")
     logger.info(f"Token: {token}")
-    logger.info(f"Concurrency: {concurrency}")
+    logger.info(
+        f"Concurrency: {concurrency} (adaptive {limiter.min_limit}-{limiter.max_limit})"
+    )
     logger.info(f"Force JPEG: {force_jpeg}")
     logger.info(f"Prompt: {prompt}")
 
@@ -1,6 +1,6 @@
 import json
 import argparse
-from .utils import get_image_metadata
+from .utils import get_image_metadata, read_images_metadata
 
 
 def read_metadata(image_path):
@@ -19,13 +19,20 @@ def read_metadata(image_path):
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Read metadata from a screenshot")
-    parser.add_argument("image_path", type=str, help="Path to the screenshot image")
+    parser = argparse.ArgumentParser(description="Read metadata from screenshots")
+    parser.add_argument(
+        "image_paths", type=str, nargs="+", help="Paths to the screenshot images"
+    )
     args = parser.parse_args()
 
-    metadata = read_metadata(args.image_path)
-    if metadata is not None:
-        print(json.dumps(metadata, indent=4))
+    if len(args.image_paths) == 1:
+        metadata = read_metadata(args.image_paths[0])
+        if metadata is not None:
+            print(json.dumps(metadata, indent=4))
+        return
+
+    results = read_images_metadata(args.image_paths)
+    print(json.dumps(dict(zip(args.image_paths, results)), indent=4))
 
 
 if __name__ == "__main__":
@@ -5,9 +5,17 @@ import logging
 import platform
 import subprocess
 import argparse
+import queue
+import random
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List
 from PIL import Image
 import imagehash
-from memos.utils import write_image_metadata
+from memos.utils import save_image_with_metadata
 import ctypes
 from mss import mss
 from memos.config import settings
@@ -135,33 +143,48 @@ def get_active_window_info():
         return get_active_window_info_windows()
 
 
-def take_screenshot_macos(
-    base_dir,
-    previous_hashes,
-    threshold,
-    screen_sequences,
-    date,
-    timestamp,
-    app_name,
-    window_title,
-    url,
-):
-    screenshots = []
+def metadata_utc_timestamp(timestamp):
+    """UTC form of a local capture timestamp, as stored in screenshot metadata."""
+    local_dt = datetime.datetime.strptime(timestamp, "%Y%m%d-%H%M%S")
+    utc_offset = -time.timezone  # Get UTC offset in seconds
+    utc_dt = local_dt - datetime.timedelta(seconds=utc_offset)
+    return utc_dt.strftime("%Y%m%d-%H%M%S")
+
+
+def window_metadata(app_name, window_title, url):
+    metadata = {"active_app": app_name, "active_window": window_title}
+    # Browser URLs are only looked up on macOS.
+    if platform.system() == "Darwin":
+        metadata["url"] = url
+    return metadata
+
+
+class FrameSource:
+    """Where the recorder's frames come from.
+
+    screens() names the displays to capture on this tick and grab(screen)
+    returns one of them as an RGB image. grab is called concurrently, one
+    call per screen, from the capture threads.
+    """
+
+    def screens(self) -> List[str]:
+        raise NotImplementedError
+
+    def grab(self, screen: str) -> Image.Image:
+        raise NotImplementedError
+
+
+def get_macos_displays():
+    """Screen names of the connected displays, mapped to screencapture's -D index."""
     result = subprocess.check_output(["system_profiler", "SPDisplaysDataType", "-json"])
     displays_data = json.loads(result)["SPDisplaysDataType"]
     displays_info = next((item["spdisplays_ndrvs"] for item in displays_data if "spdisplays_ndrvs" in item), None)
     if displays_info is None:
         logging.error("Unable to find display information")
-        return
+        return {}
 
+    displays = {}
     screen_names = {}
-
-    # Convert local time to UTC for metadata
-    local_dt = datetime.datetime.strptime(timestamp, "%Y%m%d-%H%M%S")
-    utc_offset = -time.timezone  # Get UTC offset in seconds
-    utc_dt = local_dt - datetime.timedelta(seconds=utc_offset)
-    utc_timestamp = utc_dt.strftime("%Y%m%d-%H%M%S")
-
     for display_index, display_info in enumerate(displays_info):
         base_screen_name = display_info["_name"].replace(" ", "_").lower()
         if base_screen_name in screen_names:
@@ -170,166 +193,361 @@ def take_screenshot_macos(
         else:
             screen_names[base_screen_name] = 1
             screen_name = base_screen_name
+        displays[screen_name] = display_index + 1
+    return displays
 
-        temp_filename = os.path.join(
-            base_dir, date, f"temp_screenshot-{timestamp}-of-{screen_name}.png"
-        )
-        subprocess.run(
-            ["screencapture", "-C", "-x", "-D", str(display_index + 1), temp_filename]
-        )
 
-        with Image.open(temp_filename) as img:
-            img = img.convert("RGB")
-            current_hash = str(imagehash.phash(img))
+class ScreencaptureFrameSource(FrameSource):
+    """macOS: `screencapture` of each display into a temporary PNG."""
 
-            if (
-                screen_name in previous_hashes
-                and imagehash.hex_to_hash(current_hash)
-                - imagehash.hex_to_hash(previous_hashes[screen_name])
-                < threshold
-            ):
-                logging.info(
-                    f"Screenshot for {screen_name} is similar to the previous one. Skipping."
-                )
-                os.remove(temp_filename)
-                yield screen_name, None, "Skipped (similar to previous)"
-                continue
+    # system_profiler is slow; look for plugged/unplugged displays this often.
+    DISPLAY_REFRESH_SECONDS = 60
 
-            previous_hashes[screen_name] = current_hash
-            screen_sequences[screen_name] = screen_sequences.get(screen_name, 0) + 1
+    def __init__(self, temp_dir):
+        self.temp_dir = temp_dir
+        self._displays = {}
+        self._displays_at = 0.0
 
-            metadata = {
-                "timestamp": utc_timestamp,  # Use UTC timestamp in metadata
-                "active_app": app_name,
-                "active_window": window_title,
-                "screen_name": screen_name,
-                "sequence": screen_sequences[screen_name],
-                "url": url,
-            }
+    def screens(self):
+        now = time.monotonic()
+        if not self._displays or now - self._displays_at > self.DISPLAY_REFRESH_SECONDS:
+            self._displays = get_macos_displays()
+            self._displays_at = now
+        return list(self._displays)
 
-            # Save as WebP with metadata included
-            webp_filename = os.path.join(
-                base_dir, date, f"screenshot-{timestamp}-of-{screen_name}.webp"  # Keep local time in filename
+    def grab(self, screen):
+        fd, temp_filename = tempfile.mkstemp(
+            prefix=f"temp_screenshot-{screen}-", suffix=".png", dir=self.temp_dir
+        )
+        os.close(fd)
+        try:
+            subprocess.run(
+                ["screencapture", "-C", "-x", "-D", str(self._displays[screen]), temp_filename]
             )
-            img.save(webp_filename, format="WebP", quality=85)
-            write_image_metadata(webp_filename, metadata)
+            with Image.open(temp_filename) as img:
+                return img.convert("RGB")
+        finally:
+            os.remove(temp_filename)
+
+
+class MssFrameSource(FrameSource):
+    """mss grab of each monitor. mss handles are per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _sct(self):
+        if not hasattr(self._local, "sct"):
+            self._local.sct = mss()
+        return self._local.sct
+
+    def screens(self):
+        # Skip the first monitor (entire screen)
+        return [f"monitor_{i}" for i in range(1, len(self._sct().monitors))]
+
+    def grab(self, screen):
+        sct = self._sct()
+        shot = sct.grab(sct.monitors[int(screen.rsplit("_", 1)[1])])
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+
+class SyntheticFrameSource(FrameSource):
+    """Generated frames, for tests and for exercising the pipeline on
+    machines without a display. Each screen shows a block pattern that
+    changes every `change_every` grabs."""
+
+    def __init__(self, screens=("synthetic_1",), size=(320, 200), change_every=1, grab_delay=0.0):
+        self._screens = list(screens)
+        self.size = size
+        self.change_every = change_every
+        self.grab_delay = grab_delay
+        self._grabs = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def screens(self):
+        return list(self._screens)
+
+    def grab(self, screen):
+        if self.grab_delay:
+            time.sleep(self.grab_delay)
+        with self._lock:
+            variant = self._grabs[screen] // self.change_every
+            self._grabs[screen] += 1
+        rng = random.Random(f"{screen}-{variant}")
+        blocks = Image.new("RGB", (16, 10))
+        blocks.putdata(
+            [tuple(rng.randrange(256) for _ in range(3)) for _ in range(16 * 10)]
+        )
+        return blocks.resize(self.size, Image.NEAREST)
 
-            save_screen_sequences(base_dir, screen_sequences, date)
 
-        os.remove(temp_filename)
-        screenshots.append(webp_filename)
-        yield screen_name, webp_filename, "Saved"
+def default_frame_source(base_dir):
+    if platform.system() == "Darwin":
+        return ScreencaptureFrameSource(base_dir)
+    elif platform.system() == "Windows":
+        return MssFrameSource()
+    raise NotImplementedError(
+        f"Unsupported operating system: {platform.system()}"
+    )
 
 
-def take_screenshot_windows(
-    base_dir,
-    previous_hashes,
-    threshold,
-    screen_sequences,
-    date,
-    timestamp,
-    app_name,
-    window_title,
-):
-    # Convert local time to UTC for metadata
-    local_dt = datetime.datetime.strptime(timestamp, "%Y%m%d-%H%M%S")
-    utc_offset = -time.timezone  # Get UTC offset in seconds
-    utc_dt = local_dt - datetime.timedelta(seconds=utc_offset)
-    utc_timestamp = utc_dt.strftime("%Y%m%d-%H%M%S")
+class StageTimings:
+    """Wall time spent in each capture pipeline stage."""
 
-    with mss() as sct:
-        for i, monitor in enumerate(
-            sct.monitors[1:], 1
-        ):  # Skip the first monitor (entire screen)
-            safe_monitor_name = f"monitor_{i}"
-            logging.info(f"Processing monitor: {safe_monitor_name}")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
 
-            webp_filename = os.path.join(
-                base_dir, date, f"screenshot-{timestamp}-of-{safe_monitor_name}.webp"
-            )
+    @contextmanager
+    def measure(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self._stats.get(stage, (0, 0.0, 0.0))
+            self._stats[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {"count": count, "total": total, "avg": total / count, "max": longest}
+                for stage, (count, total, longest) in self._stats.items()
+            }
 
-            img = sct.grab(monitor)
-            img = Image.frombytes("RGB", img.size, img.bgra, "raw", "BGRX")
-            current_hash = str(imagehash.phash(img))
+    def summary(self):
+        return ", ".join(
+            f"{stage} avg {stats['avg'] * 1000:.1f}ms max {stats['max'] * 1000:.1f}ms"
+            for stage, stats in self.snapshot().items()
+        )
+
+
+class CapturePipeline:
+    """Capture -> encode/write pipeline behind the recorder.
+
+    A tick grabs every screen concurrently and phashes it in the capture
+    threads, then decides per screen (in screen order) whether the frame
+    differs enough from the last one kept. Kept frames go through a bounded
+    queue to the encode workers, which write the WebP with its metadata and
+    update the sequence file and worklog, so one tick's encoding overlaps
+    the next tick's capture. If the workers fall behind, the queue fills
+    and capture waits for them instead of buffering frames without bound.
+    """
+
+    def __init__(
+        self,
+        source,
+        base_dir,
+        threshold,
+        previous_hashes,
+        capture_workers=None,
+        encode_workers=None,
+        queue_size=None,
+    ):
+        self.source = source
+        self.base_dir = base_dir
+        self.threshold = threshold
+        self.previous_hashes = previous_hashes
+        self.timings = StageTimings()
+        self._capture_executor = ThreadPoolExecutor(
+            max_workers=capture_workers or settings.record.capture_workers,
+            thread_name_prefix="record-capture",
+        )
+        self._queue = queue.Queue(maxsize=queue_size or settings.record.queue_size)
+        self._write_lock = threading.Lock()
+        self.frames_captured = 0
+        self.frames_saved = 0
+        self.bytes_written = 0
+        self._sequences_date = None
+        self._screen_sequences = {}
+        self._workers = [
+            threading.Thread(target=self._encode_loop, name=f"record-encode-{i}", daemon=True)
+            for i in range(encode_workers or settings.record.encode_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def tick(self, date, timestamp, window):
+        """Capture all screens and queue the frames worth keeping. Returns a
+        future per queued frame, resolved with its path once written."""
+        os.makedirs(os.path.join(self.base_dir, date), exist_ok=True)
+        worklog_path = os.path.join(self.base_dir, date, "worklog")
+        offset = LocalOffset.from_system()
+        utc_ts = local_ts_to_utc(timestamp, offset)
+        with self._write_lock:
+            if date != self._sequences_date:
+                self._screen_sequences = load_screen_sequences(self.base_dir, date)
+                self._sequences_date = date
+            screen_sequences = self._screen_sequences
+
+        with self.timings.measure("screens"):
+            screens = self.source.screens()
+        grabs = [
+            (screen, self._capture_executor.submit(self._capture, screen))
+            for screen in screens
+        ]
+
+        futures = []
+        for screen, grab in grabs:
+            try:
+                img, current_hash = grab.result()
+            except Exception as e:
+                logging.error(f"Failed to capture {screen}: {e}")
+                continue
+            self.frames_captured += 1
 
             if (
-                safe_monitor_name in previous_hashes
+                screen in self.previous_hashes
                 and imagehash.hex_to_hash(current_hash)
-                - imagehash.hex_to_hash(previous_hashes[safe_monitor_name])
-                < threshold
+                - imagehash.hex_to_hash(self.previous_hashes[screen])
+                < self.threshold
             ):
                 logging.info(
-                    f"Screenshot for {safe_monitor_name} is similar to the previous one. Skipping."
+                    f"Screenshot for {screen} is similar to the previous one. Skipping."
                 )
-                yield safe_monitor_name, None, "Skipped (similar to previous)"
+                with self._write_lock:
+                    worklog_write_entry(worklog_path, utc_ts, screen, False, offset)
                 continue
 
-            previous_hashes[safe_monitor_name] = current_hash
-            screen_sequences[safe_monitor_name] = (
-                screen_sequences.get(safe_monitor_name, 0) + 1
-            )
-
+            self.previous_hashes[screen] = current_hash
+            with self._write_lock:
+                screen_sequences[screen] = screen_sequences.get(screen, 0) + 1
+                sequence = screen_sequences[screen]
             metadata = {
-                "timestamp": utc_timestamp,  # Use UTC timestamp in metadata
-                "active_app": app_name,
-                "active_window": window_title,
-                "screen_name": safe_monitor_name,
-                "sequence": screen_sequences[safe_monitor_name],
+                "timestamp": metadata_utc_timestamp(timestamp),  # Use UTC timestamp in metadata
+                **window,
+                "screen_name": screen,
+                "sequence": sequence,
             }
+            webp_filename = os.path.join(
+                self.base_dir, date, f"screenshot-{timestamp}-of-{screen}.webp"  # Keep local time in filename
+            )
+            future = Future()
+            with self.timings.measure("queue_wait"):
+                self._queue.put(
+                    (img, webp_filename, metadata, date, screen_sequences, worklog_path, utc_ts, offset, future)
+                )
+            futures.append(future)
+        return futures
 
-            img.save(webp_filename, format="WebP", quality=85)
-            write_image_metadata(webp_filename, metadata)
-            save_screen_sequences(base_dir, screen_sequences, date)
-
-            yield safe_monitor_name, webp_filename, "Saved"
-
+    def _capture(self, screen):
+        with self.timings.measure("capture"):
+            img = self.source.grab(screen)
+        with self.timings.measure("hash"):
+            current_hash = str(imagehash.phash(img))
+        return img, current_hash
 
-def take_screenshot(
-    base_dir, previous_hashes, threshold, screen_sequences, date, timestamp
-):
-    app_name, window_title, url = get_active_window_info()
-    os.makedirs(os.path.join(base_dir, date), exist_ok=True)
-    worklog_path = os.path.join(base_dir, date, "worklog")
+    def _encode_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                img, webp_filename, metadata, date, screen_sequences, worklog_path, utc_ts, offset, future = job
+                try:
+                    with self.timings.measure("encode"):
+                        # Save as WebP with metadata included
+                        save_image_with_metadata(
+                            img, webp_filename, metadata, format="WebP", quality=85
+                        )
+                    with self.timings.measure("write"), self._write_lock:
+                        save_screen_sequences(self.base_dir, screen_sequences, date)
+                        worklog_write_entry(
+                            worklog_path, utc_ts, metadata["screen_name"], True, offset
+                        )
+                        self.frames_saved += 1
+                        self.bytes_written += os.path.getsize(webp_filename)
+                except Exception as e:
+                    logging.error(f"Failed to save {webp_filename}: {e}")
+                    future.set_exception(e)
+                else:
+                    future.set_result(webp_filename)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued frame has been written."""
+        self._queue.join()
+
+    def close(self):
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._capture_executor.shutdown(wait=True)
+
+
+class AdaptiveInterval:
+    """Capture interval that stretches while nothing changes on screen.
+
+    Each tick in which every screen stayed within the phash threshold of its
+    last kept frame multiplies the interval by `backoff`, up to
+    `max_interval`. A changed frame, or a switch of active app or window
+    title, snaps it back to `base`.
+    """
+
+    def __init__(self, base, max_interval, backoff=1.5):
+        self.base = base
+        self.max_interval = max(base, max_interval)
+        self.backoff = backoff
+        self.current = base
+
+    def update(self, changed):
+        if changed:
+            self.current = self.base
+        else:
+            self.current = min(self.current * self.backoff, self.max_interval)
+        return self.current
+
+
+class RecorderStats:
+    """Captures, CPU time and disk usage of the recorder, per hour."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.cpu_started = time.process_time()
+
+    def summary(self, pipeline, interval):
+        hours = max(time.monotonic() - self.started, 1e-6) / 3600
+        cpu_seconds = time.process_time() - self.cpu_started
+        return (
+            f"{pipeline.frames_captured / hours:.0f} captures/h, "
+            f"{pipeline.frames_saved / hours:.0f} saved/h, "
+            f"CPU {cpu_seconds / hours:.0f}s/h, "
+            f"disk {pipeline.bytes_written / hours / 1e6:.1f}MB/h, "
+            f"interval {interval:.1f}s"
+        )
 
-    offset = LocalOffset.from_system()
-    utc_ts = local_ts_to_utc(timestamp, offset)
 
-    if platform.system() == "Darwin":
-        screenshot_generator = take_screenshot_macos(
-            base_dir,
-            previous_hashes,
-            threshold,
-            screen_sequences,
-            date,
-            timestamp,
-            app_name,
-            window_title,
-            url,
-        )
-    elif platform.system() == "Windows":
-        screenshot_generator = take_screenshot_windows(
-            base_dir,
-            previous_hashes,
-            threshold,
-            screen_sequences,
-            date,
-            timestamp,
-            app_name,
-            window_title,
-        )
-    else:
-        raise NotImplementedError(
-            f"Unsupported operating system: {platform.system()}"
-        )
+def wait_for_next_tick(interval, sleep_fn, window_changed):
+    """Sleep `interval` seconds in record_interval slices, returning early
+    when window_changed() reports a switch of app or window."""
+    remaining = interval
+    while True:
+        step = min(settings.record_interval, remaining)
+        sleep_fn(step)
+        remaining -= step
+        if remaining <= 0:
+            return
+        # Still ticking, just slowly: keep the heartbeat fresh.
+        touch_heartbeat()
+        if window_changed():
+            return
 
-    screenshots = []
-    for screen_name, screenshot_file, status in screenshot_generator:
-        saved = (status == "Saved")
-        worklog_write_entry(worklog_path, utc_ts, screen_name, saved, offset)
-        if screenshot_file:
-            screenshots.append(screenshot_file)
 
-    return screenshots
+def take_screenshot(base_dir, previous_hashes, threshold, date, timestamp, frame_source=None):
+    app_name, window_title, url = get_active_window_info()
+    pipeline = CapturePipeline(
+        frame_source or default_frame_source(base_dir), base_dir, threshold, previous_hashes
+    )
+    try:
+        futures = pipeline.tick(date, timestamp, window_metadata(app_name, window_title, url))
+    finally:
+        pipeline.close()
+    return [future.result() for future in futures if future.exception() is None]
 
 
 def is_screen_locked():
@@ -364,9 +582,8 @@ def run_screen_recorder_once(threshold, base_dir, previous_hashes):
             logging.info(f"App '{app_name}' is blacklisted, but --once command will ignore blacklist and continue.")
         date = time.strftime("%Y%m%d")
         timestamp = time.strftime("%Y%m%d-%H%M%S")
-        screen_sequences = load_screen_sequences(base_dir, date)
         screenshot_files = take_screenshot(
-            base_dir, previous_hashes, threshold, screen_sequences, date, timestamp
+            base_dir, previous_hashes, threshold, date, timestamp
         )
         for screenshot_file in screenshot_files:
             logging.info(f"Screenshot saved: {screenshot_file}")
@@ -375,38 +592,81 @@ def run_screen_recorder_once(threshold, base_dir, previous_hashes):
         logging.info("Screen is locked. Skipping screenshot.")
 
 
-def run_screen_recorder(threshold, base_dir, previous_hashes, iterations=None, sleep_fn=time.sleep):
+def _log_saved(future):
+    if future.exception() is None:
+        logging.info(f"Screenshot saved: {future.result()}")
+
+
+def run_screen_recorder(
+    threshold,
+    base_dir,
+    previous_hashes,
+    iterations=None,
+    sleep_fn=time.sleep,
+    frame_source=None,
+):
     count = 0
-    while iterations is None or count < iterations:
-        # Heartbeat first, before the lock/blacklist checks, so a stale heartbeat
-        # means the loop stopped ticking — not merely that the screen was locked.
-        touch_heartbeat()
+    pipeline = None
+    interval = AdaptiveInterval(
+        settings.record_interval,
+        settings.record.max_interval,
+        settings.record.interval_backoff,
+    )
+    stats = RecorderStats()
+    last_window = None
+
+    def window_changed():
         try:
-            if not is_screen_locked():
-                app_name, _, _ = get_active_window_info()
-                if is_app_blacklisted(app_name):
-                    logging.info(f"App '{app_name}' is blacklisted. Skipping screenshot.")
+            app_name, window_title, _ = get_active_window_info()
+        except Exception:
+            return True
+        return (app_name, window_title) != last_window
+
+    try:
+        while iterations is None or count < iterations:
+            # Heartbeat first, before the lock/blacklist checks, so a stale heartbeat
+            # means the loop stopped ticking — not merely that the screen was locked.
+            touch_heartbeat()
+            changed = True
+            try:
+                if not is_screen_locked():
+                    app_name, window_title, url = get_active_window_info()
+                    if is_app_blacklisted(app_name):
+                        logging.info(f"App '{app_name}' is blacklisted. Skipping screenshot.")
+                    else:
+                        if pipeline is None:
+                            pipeline = CapturePipeline(
+                                frame_source or default_frame_source(base_dir),
+                                base_dir,
+                                threshold,
+                                previous_hashes,
+                            )
+                        date = time.strftime("%Y%m%d")
+                        timestamp = time.strftime("%Y%m%d-%H%M%S")
+                        with pipeline.timings.measure("tick"):
+                            futures = pipeline.tick(
+                                date,
+                                timestamp,
+                                window_metadata(app_name, window_title, url),
+                            )
+                        for future in futures:
+                            future.add_done_callback(_log_saved)
+                        changed = bool(futures) or (app_name, window_title) != last_window
+                        last_window = (app_name, window_title)
                 else:
-                    date = time.strftime("%Y%m%d")
-                    timestamp = time.strftime("%Y%m%d-%H%M%S")
-                    screen_sequences = load_screen_sequences(base_dir, date)
-                    screenshot_files = take_screenshot(
-                        base_dir,
-                        previous_hashes,
-                        threshold,
-                        screen_sequences,
-                        date,
-                        timestamp,
-                    )
-                    for screenshot_file in screenshot_files:
-                        logging.info(f"Screenshot saved: {screenshot_file}")
-            else:
-                logging.info("Screen is locked. Skipping screenshot.")
-        except Exception as e:
-            logging.error(f"An error occurred: {str(e)}. Skipping this iteration.")
-
-        sleep_fn(settings.record_interval)
-        count += 1
+                    logging.info("Screen is locked. Skipping screenshot.")
+            except Exception as e:
+                logging.error(f"An error occurred: {str(e)}. Skipping this iteration.")
+
+            count += 1
+            next_interval = interval.update(changed)
+            if pipeline is not None and count % settings.record.timings_log_interval == 0:
+                logging.info(f"Capture pipeline timings: {pipeline.timings.summary()}")
+                logging.info(f"Recorder: {stats.summary(pipeline, next_interval)}")
+            wait_for_next_tick(next_interval, sleep_fn, window_changed)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
 
 
 def main():
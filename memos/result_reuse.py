@@ -0,0 +1,115 @@
+"""Reuse of plugin results across near-duplicate frames.
+
+Screenshots of an unchanged screen are often near-identical, and OCR or a
+VLM run on each of them produces the same result again. Every image a
+plugin has processed is indexed by its 64-bit perceptual hash
+(`entity_phashes`). Before a reuse-capable plugin runs, the frame's hash is
+looked up; when a frame within `max_distance` bits has already been
+processed by that plugin, its metadata is copied instead, together with a
+`<source>_reused_from` entry naming the frame it came from.
+
+The hash is split into four 16-bit bands, each indexed per library. Two
+hashes at most 3 bits apart agree on at least one band (pigeonhole), so
+matching any band finds every candidate through an index; the exact
+Hamming distance is then checked in Python.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+import imagehash
+from sqlalchemy.orm import Session
+
+from memos import crud
+from memos.config import ResultReuseSettings
+from memos.schemas import Entity, EntityMetadataParam, MetadataType, Plugin
+from memos.utils.image_cache import shared_image_cache
+
+logger = logging.getLogger(__name__)
+
+REUSED_FROM_SUFFIX = "_reused_from"
+
+
+def compute_phash(image_path) -> Optional[int]:
+    """64-bit perceptual hash of an image file, or None if it cannot be decoded."""
+    try:
+        img = shared_image_cache().image(image_path)
+        return int(str(imagehash.phash(img)), 16)
+    except Exception:
+        return None
+
+
+class Reuse(NamedTuple):
+    source_entity_id: int
+    distance: int
+    entries: List[EntityMetadataParam]
+
+
+class ResultReuse:
+    def __init__(self, config: ResultReuseSettings, cache_size: int = 1024):
+        self.config = config
+        self.cache_size = cache_size
+        # entity id -> phash; a frame is hashed once for all of its plugins.
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def source_for(self, plugin: Plugin) -> Optional[str]:
+        """Metadata source the plugin writes its results under, or None if
+        its results are not reused."""
+        return self.config.plugin_sources.get(plugin.name)
+
+    async def phash(self, entity: Entity) -> Optional[int]:
+        if entity.file_type_group != "image":
+            return None
+        with self._lock:
+            if entity.id in self._hashes:
+                self._hashes.move_to_end(entity.id)
+                return self._hashes[entity.id]
+        phash = await asyncio.to_thread(compute_phash, entity.filepath)
+        if phash is not None:
+            with self._lock:
+                self._hashes[entity.id] = phash
+                while len(self._hashes) > self.cache_size:
+                    self._hashes.popitem(last=False)
+        return phash
+
+    def find(self, entity: Entity, plugin: Plugin, phash: int, db: Session) -> Optional[Reuse]:
+        """The results of the nearest frame the plugin already processed,
+        rewritten for `entity`."""
+        source = self.source_for(plugin)
+        if source is None:
+            return None
+        candidates = crud.find_processed_near_duplicates(
+            entity.library_id, plugin.id, phash, self.config.max_distance, entity.id, db
+        )
+        for source_entity_id, distance in candidates:
+            entries = [
+                EntityMetadataParam(
+                    key=entry.key,
+                    value=entry.value,
+                    source=source,
+                    data_type=entry.data_type,
+                )
+                for entry in crud.get_entity_metadata_by_source(source_entity_id, source, db)
+                if not entry.key.endswith(REUSED_FROM_SUFFIX)
+            ]
+            # A frame the plugin skipped (e.g. low-info) has nothing to copy.
+            if not entries:
+                continue
+            entries.append(
+                EntityMetadataParam(
+                    key=f"{source}{REUSED_FROM_SUFFIX}",
+                    value=json.dumps({"entity_id": source_entity_id, "distance": distance}),
+                    source=source,
+                    data_type=MetadataType.JSON_DATA,
+                )
+            )
+            self.hits += 1
+            return Reuse(source_entity_id, distance, entries)
+        self.misses += 1
+        return None
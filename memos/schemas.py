@@ -95,6 +95,23 @@ class UpdateEntityMetadataParam(BaseModel):
     metadata_entries: List[EntityMetadataParam]
 
 
+class RemoveMissingEntitiesParam(BaseModel):
+    path_prefix: str
+    # Every file a scan found under path_prefix; the rest are deleted.
+    present_filepaths: List[str]
+    # False: only entities directly in the path_prefix directory.
+    recursive: bool = True
+
+
+class RemoveMissingEntitiesResponse(BaseModel):
+    deleted_filepaths: List[str]
+
+
+class DirectoryDigestsResponse(BaseModel):
+    # Directory -> digest of its entity filepaths (memos.utils.directory_digest)
+    digests: Dict[str, str]
+
+
 class NewPluginParam(BaseModel):
     name: str
     description: str | None
@@ -121,6 +138,7 @@ class Folder(BaseModel):
     path: str
     last_modified_at: datetime
     type: FolderType
+    created_at: datetime | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -346,6 +364,29 @@ class ProcessingBacklog(BaseModel):
     oldest_age_seconds: int | None
 
 
+class ProcessingQueue(BaseModel):
+    depth: int
+    in_flight: int
+    oldest_age_seconds: int | None
+
+
+class IndexQueueStatus(BaseModel):
+    pending: int
+    oldest_pending_age_seconds: float | None
+    last_flush_lag_seconds: float | None
+    flushed_total: int
+
+
+class WriteQueueStatus(BaseModel):
+    pending: int
+    writes_total: int
+    batches_total: int
+    lock_wait_seconds_total: float
+    lock_wait_seconds_max: float
+    queue_wait_seconds_total: float
+    queue_wait_seconds_max: float
+
+
 class ProcessingWatchState(BaseModel):
     is_alive: bool
     is_on_battery: bool
@@ -353,10 +394,21 @@ class ProcessingWatchState(BaseModel):
     idle_window: Tuple[str, str]
 
 
+class PluginCircuitState(BaseModel):
+    plugin_id: int
+    name: str
+    state: str  # closed | open | half_open
+    consecutive_failures: int
+    last_error: str | None
+    retry_in_seconds: float | None
+
+
 class ProcessingStatusResponse(BaseModel):
     library_id: int
     computed_at: datetime
     window_hours: int
     coverage_window: ProcessingCoverageWindow
     backlog: ProcessingBacklog
+    queue: ProcessingQueue
     watch: ProcessingWatchState
+    plugins: List[PluginCircuitState] = []
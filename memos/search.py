@@ -1,14 +1,17 @@
 from abc import ABC, abstractmethod
 from sqlalchemy import text, bindparam
 from sqlalchemy.orm import Session
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import time
 import logging
 import logfire
 from sqlite_vec import serialize_float32
 from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime
 from .embedding import get_embeddings
+from .result_reuse import REUSED_FROM_SUFFIX
+from .utils.low_info import FRAME_INFO_KEY
 import json
 import jieba
 import os
@@ -122,6 +125,40 @@ def _assemble_stats(rows) -> dict:
     }
 
 
+@dataclass
+class IndexBatch:
+    """Index rows computed for a batch of entities, ready to be written.
+
+    `vec_ids` and `fts_ids` are entities whose existing rows are deleted
+    first, for tables without upserts.
+    """
+
+    vec_ids: List[int] = field(default_factory=list)
+    vec_rows: List[dict] = field(default_factory=list)
+    fts_ids: List[int] = field(default_factory=list)
+    fts_rows: List[dict] = field(default_factory=list)
+
+
+def _vec_row(entity, embedding, created_at_timestamp: int) -> dict:
+    return {
+        "id": entity.id,
+        "embedding": embedding,
+        "app_name": next(
+            (
+                entry.value
+                for entry in entity.metadata_entries
+                if entry.key == "active_app"
+            ),
+            "unknown",
+        ),
+        "file_type_group": entity.file_type_group or "unknown",
+        "created_at_timestamp": created_at_timestamp,
+        "file_created_at_timestamp": int(entity.file_created_at.timestamp()),
+        "file_created_at_date": entity.file_created_at.strftime("%Y-%m-%d"),
+        "library_id": entity.library_id,
+    }
+
+
 class SearchProvider(ABC):
     @abstractmethod
     def full_text_search(
@@ -155,9 +192,77 @@ class SearchProvider(ABC):
         pass
 
     @abstractmethod
+    def prepare_index_batch(
+        self, entity_ids: List[int], db: Session, force: bool = False
+    ) -> IndexBatch:
+        """Read the entities and compute their FTS rows and embeddings.
+
+        Entities whose vector row is newer than their last scan are skipped
+        unless `force` is set. Nothing is written, so this can run outside
+        the database's single writer.
+        """
+        pass
+
+    @abstractmethod
+    def write_index_batch(self, batch: IndexBatch, db: Session):
+        """Replace the index rows of a prepared batch and commit."""
+        pass
+
     def batch_update_entity_indices(self, entity_ids: List[int], db: Session):
         """Batch update both FTS and vector indexes for multiple entities"""
-        pass
+        try:
+            self.write_index_batch(self.prepare_index_batch(entity_ids, db), db)
+        except Exception as e:
+            logger.error(f"Error batch updating indexes: {e}")
+            db.rollback()
+            raise
+
+    def _entities_needing_index(
+        self, entity_ids: List[int], vec_timestamps: Dict[int, int], db: Session, force: bool
+    ):
+        """The entities, and those of them whose last_scan_at is more recent
+        than their vector index timestamp."""
+        from sqlalchemy.orm import selectinload
+        from .models import EntityModel
+
+        entities = (
+            db.query(EntityModel)
+            .filter(EntityModel.id.in_(entity_ids))
+            .options(
+                selectinload(EntityModel.metadata_entries),
+                selectinload(EntityModel.tags),
+            )
+            .all()
+        )
+        missing_ids = set(entity_ids) - {entity.id for entity in entities}
+        if missing_ids:
+            raise ValueError(f"Entities not found: {missing_ids}")
+
+        needs_index = [
+            entity
+            for entity in entities
+            if force
+            or int(entity.last_scan_at.timestamp()) > vec_timestamps.get(entity.id, 0)
+        ]
+        logfire.info(
+            f"Entities needing full indexing: {len(needs_index)}/{len(entity_ids)}"
+        )
+        return entities, needs_index
+
+    def _drop_deleted(self, batch: IndexBatch, db: Session) -> IndexBatch:
+        """Leave out entities deleted since the batch was prepared."""
+        from .crud import get_existing_entity_ids
+
+        ids = {row["id"] for row in batch.vec_rows + batch.fts_rows}
+        existing = set(get_existing_entity_ids(list(ids), db))
+        if existing == ids:
+            return batch
+        return IndexBatch(
+            vec_ids=[i for i in batch.vec_ids if i in existing],
+            vec_rows=[row for row in batch.vec_rows if row["id"] in existing],
+            fts_ids=[i for i in batch.fts_ids if i in existing],
+            fts_rows=[row for row in batch.fts_rows if row["id"] in existing],
+        )
 
     @abstractmethod
     def get_search_stats(
@@ -186,11 +291,21 @@ class SearchProvider(ABC):
         unbounded by limit. Used to populate SearchResult.found honestly."""
         pass
 
-    def prepare_vec_data(self, entity) -> str:
+    def searchable_entries(self, entity):
+        """Metadata entries that describe the frame's content, leaving out
+        the frame score blob and result reuse bookkeeping."""
+        return [
+            entry
+            for entry in entity.metadata_entries
+            if entry.key != FRAME_INFO_KEY and not entry.key.endswith(REUSED_FROM_SUFFIX)
+        ]
+
+    def prepare_vec_data(self, entity, skip_keys=()) -> str:
         """Prepare metadata for vector embedding.
 
         Args:
             entity: The entity object containing metadata entries
+            skip_keys: Further metadata keys to leave out
 
         Returns:
             str: Processed metadata string for vector embedding
@@ -198,8 +313,8 @@ class SearchProvider(ABC):
         vec_metadata = "\n".join(
             [
                 f"{entry.key}: {entry.value}"
-                for entry in entity.metadata_entries
-                if entry.key not in ["ocr_result", "sequence"]
+                for entry in self.searchable_entries(entity)
+                if entry.key not in ["ocr_result", "sequence", *skip_keys]
             ]
         )
         ocr_result = next(
@@ -215,6 +330,48 @@ class SearchProvider(ABC):
         )
         return vec_metadata
 
+    def reused_embedding_sources(self, entities, db: Session) -> Dict[int, int]:
+        """Map entity id -> id of an entity whose embedding it can share.
+
+        An entity whose plugin results were copied from a near-duplicate
+        frame (see memos.result_reuse) embeds the same text as that frame
+        apart from the capture timestamp, so the frame's embedding is
+        reused instead of computing a new one.
+        """
+        from sqlalchemy.orm import selectinload
+        from .models import EntityModel
+
+        candidates = {}
+        for entity in entities:
+            for entry in entity.metadata_entries:
+                if entry.key.endswith(REUSED_FROM_SUFFIX):
+                    try:
+                        source_id = json.loads(entry.value)["entity_id"]
+                    except (ValueError, TypeError, KeyError):
+                        continue
+                    candidates.setdefault(entity.id, []).append(source_id)
+        if not candidates:
+            return {}
+
+        source_ids = {source_id for ids in candidates.values() for source_id in ids}
+        sources = {
+            source.id: self.prepare_vec_data(source, skip_keys=("timestamp",))
+            for source in db.query(EntityModel)
+            .filter(EntityModel.id.in_(source_ids))
+            .options(selectinload(EntityModel.metadata_entries))
+            .all()
+        }
+        shared = {}
+        for entity in entities:
+            if entity.id not in candidates:
+                continue
+            vec_data = self.prepare_vec_data(entity, skip_keys=("timestamp",))
+            for source_id in candidates[entity.id]:
+                if sources.get(source_id) == vec_data:
+                    shared[entity.id] = source_id
+                    break
+        return shared
+
     def process_ocr_result(self, value, max_length=4096):
         """Process OCR result data.
 
@@ -273,7 +430,7 @@ class PostgreSQLSearchProvider(SearchProvider):
         # Tokenize metadata
         metadata_entries = [
             f"{entry.key}: {self.process_ocr_result(entry.value) if entry.key == 'ocr_result' else entry.value}"
-            for entry in entity.metadata_entries
+            for entry in self.searchable_entries(entity)
         ]
         metadata = "\n".join(metadata_entries)
         tokenized_metadata = self.tokenize_text(metadata)
@@ -380,161 +537,132 @@ class PostgreSQLSearchProvider(SearchProvider):
             db.rollback()
             raise
 
-    def batch_update_entity_indices(self, entity_ids: List[int], db: Session):
-        """Batch update both FTS and vector indexes for multiple entities"""
-        try:
-            from sqlalchemy.orm import selectinload
-            from .models import EntityModel
-
-            entities = (
-                db.query(EntityModel)
-                .filter(EntityModel.id.in_(entity_ids))
-                .options(
-                    selectinload(EntityModel.metadata_entries),
-                    selectinload(EntityModel.tags),
-                )
-                .all()
-            )
-            found_ids = {entity.id for entity in entities}
-
-            missing_ids = set(entity_ids) - found_ids
-            if missing_ids:
-                raise ValueError(f"Entities not found: {missing_ids}")
-
-            # Check existing vector indices and their timestamps
-            existing_vec_indices = db.execute(
-                text(
-                    """
-                    SELECT rowid, created_at_timestamp
-                    FROM entities_vec_v2
-                    WHERE rowid = ANY(:entity_ids)
-                    """
-                ),
-                {"entity_ids": entity_ids},
-            ).fetchall()
-
-            # Create lookup of vector index timestamps
-            vec_timestamps = {row[0]: row[1] for row in existing_vec_indices}
-
-            # Separate entities that need indexing
-            needs_index = []
-            for entity in entities:
-                entity_last_scan = int(entity.last_scan_at.timestamp())
-                vec_timestamp = vec_timestamps.get(entity.id, 0)
-
-                # Entity needs full indexing if last_scan_at is
-                # more recent than the vector index timestamp
-                if entity_last_scan > vec_timestamp:
-                    needs_index.append(entity)
-
-            logfire.info(
-                f"Entities needing full indexing: {len(needs_index)}/{len(entity_ids)}"
-            )
+    def prepare_index_batch(
+        self, entity_ids: List[int], db: Session, force: bool = False
+    ) -> IndexBatch:
+        # Check existing vector indices and their timestamps
+        vec_timestamps = db.execute(
+            text(
+                """
+                SELECT rowid, created_at_timestamp
+                FROM entities_vec_v2
+                WHERE rowid = ANY(:entity_ids)
+                """
+            ),
+            {"entity_ids": entity_ids},
+        ).fetchall()
+        _, needs_index = self._entities_needing_index(
+            entity_ids, dict(vec_timestamps), db, force
+        )
 
-            # Update vector index only for entities that need it
-            if needs_index:
+        batch = IndexBatch()
+        if needs_index:
+            # Frames with copied plugin results share their source's embedding
+            shared = self.reused_embedding_sources(needs_index, db)
+            source_embeddings = {}
+            if shared:
+                rows = db.execute(
+                    text(
+                        """
+                        SELECT rowid, embedding::text
+                        FROM entities_vec_v2
+                        WHERE rowid = ANY(:ids)
+                        """
+                    ),
+                    {"ids": list(set(shared.values()))},
+                ).fetchall()
+                source_embeddings = {row[0]: row[1] for row in rows}
+            to_embed = [
+                entity
+                for entity in needs_index
+                if shared.get(entity.id) not in source_embeddings
+            ]
+            embeddings_by_id = {
+                entity.id: source_embeddings[shared[entity.id]]
+                for entity in needs_index
+                if shared.get(entity.id) in source_embeddings
+            }
+            if to_embed:
                 vec_metadata_list = [
-                    self.prepare_vec_data(entity) for entity in needs_index
+                    self.prepare_vec_data(entity) for entity in to_embed
                 ]
                 with logfire.span("get embedding in batch indexing"):
                     embeddings = get_embeddings(vec_metadata_list)
                     logfire.info(f"vec_metadata_list: {vec_metadata_list}")
-
-                # Prepare batch insert data for vector index
-                created_at_timestamp = int(datetime.now().timestamp())
-                insert_values = []
-                for entity, embedding in zip(needs_index, embeddings):
+                for entity, embedding in zip(to_embed, embeddings):
                     if embedding:
-                        app_name = next(
-                            (
-                                entry.value
-                                for entry in entity.metadata_entries
-                                if entry.key == "active_app"
-                            ),
-                            "unknown",
-                        )
-                        file_type_group = entity.file_type_group or "unknown"
-                        file_created_at_timestamp = int(
-                            entity.file_created_at.timestamp()
-                        )
-                        file_created_at_date = entity.file_created_at.strftime(
-                            "%Y-%m-%d"
-                        )
-
-                        insert_values.append(
-                            {
-                                "id": entity.id,
-                                "embedding": str(
-                                    embedding
-                                ),  # Convert to string for PostgreSQL vector type
-                                "app_name": app_name,
-                                "file_type_group": file_type_group,
-                                "created_at_timestamp": created_at_timestamp,
-                                "file_created_at_timestamp": file_created_at_timestamp,
-                                "file_created_at_date": file_created_at_date,
-                                "library_id": entity.library_id,
-                            }
-                        )
-
-                # Batch insert/update vector index
-                if insert_values:
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO entities_vec_v2 (
-                                rowid, embedding, app_name, file_type_group,
-                                created_at_timestamp, file_created_at_timestamp,
-                                file_created_at_date, library_id
-                            )
-                            VALUES (
-                                :id, vector(:embedding), :app_name, :file_type_group,
-                                :created_at_timestamp, :file_created_at_timestamp,
-                                :file_created_at_date, :library_id
-                            )
-                            ON CONFLICT (rowid) DO UPDATE SET
-                                embedding = vector(:embedding),
-                                app_name = :app_name,
-                                file_type_group = :file_type_group,
-                                created_at_timestamp = :created_at_timestamp,
-                                file_created_at_timestamp = :file_created_at_timestamp,
-                                file_created_at_date = :file_created_at_date,
-                                library_id = :library_id
-                            """
-                        ),
-                        insert_values,
-                    )
+                        # Convert to string for PostgreSQL vector type
+                        embeddings_by_id[entity.id] = str(embedding)
+            logfire.info(
+                f"Embeddings shared with duplicate frames: {len(needs_index) - len(to_embed)}"
+            )
 
-            # Update FTS index
+            created_at_timestamp = int(datetime.now().timestamp())
             for entity in needs_index:
-                processed_filepath, tokenized_tags, tokenized_metadata = (
-                    self.prepare_fts_data(entity)
-                )
-
-                db.execute(
-                    text(
-                        """
-                        INSERT INTO entities_fts (id, filepath, tags, metadata)
-                        VALUES (:id, :filepath, :tags, :metadata)
-                        ON CONFLICT (id) DO UPDATE SET
-                            filepath = :filepath,
-                            tags = :tags,
-                            metadata = :metadata
-                        """
-                    ),
-                    {
-                        "id": entity.id,
-                        "filepath": processed_filepath,
-                        "tags": tokenized_tags,
-                        "metadata": tokenized_metadata,
-                    },
-                )
+                embedding = embeddings_by_id.get(entity.id)
+                if embedding:
+                    batch.vec_rows.append(
+                        _vec_row(entity, embedding, created_at_timestamp)
+                    )
 
-            db.commit()
+        # Update FTS index
+        for entity in needs_index:
+            processed_filepath, tokenized_tags, tokenized_metadata = (
+                self.prepare_fts_data(entity)
+            )
+            batch.fts_rows.append(
+                {
+                    "id": entity.id,
+                    "filepath": processed_filepath,
+                    "tags": tokenized_tags,
+                    "metadata": tokenized_metadata,
+                }
+            )
+        return batch
 
-        except Exception as e:
-            logger.error(f"Error batch updating indexes: {e}")
-            db.rollback()
-            raise
+    def write_index_batch(self, batch: IndexBatch, db: Session):
+        batch = self._drop_deleted(batch, db)
+        if batch.vec_rows:
+            db.execute(
+                text(
+                    """
+                    INSERT INTO entities_vec_v2 (
+                        rowid, embedding, app_name, file_type_group,
+                        created_at_timestamp, file_created_at_timestamp,
+                        file_created_at_date, library_id
+                    )
+                    VALUES (
+                        :id, vector(:embedding), :app_name, :file_type_group,
+                        :created_at_timestamp, :file_created_at_timestamp,
+                        :file_created_at_date, :library_id
+                    )
+                    ON CONFLICT (rowid) DO UPDATE SET
+                        embedding = vector(:embedding),
+                        app_name = :app_name,
+                        file_type_group = :file_type_group,
+                        created_at_timestamp = :created_at_timestamp,
+                        file_created_at_timestamp = :file_created_at_timestamp,
+                        file_created_at_date = :file_created_at_date,
+                        library_id = :library_id
+                    """
+                ),
+                batch.vec_rows,
+            )
+        if batch.fts_rows:
+            db.execute(
+                text(
+                    """
+                    INSERT INTO entities_fts (id, filepath, tags, metadata)
+                    VALUES (:id, :filepath, :tags, :metadata)
+                    ON CONFLICT (id) DO UPDATE SET
+                        filepath = :filepath,
+                        tags = :tags,
+                        metadata = :metadata
+                    """
+                ),
+                batch.fts_rows,
+            )
+        db.commit()
 
     def _build_fts_filters(
         self,
@@ -844,7 +972,7 @@ class SqliteSearchProvider(SearchProvider):
         fts_metadata = "\n".join(
             [
                 f"{entry.key}: {self.process_ocr_result(entry.value) if entry.key == 'ocr_result' else entry.value}"
-                for entry in entity.metadata_entries
+                for entry in self.searchable_entries(entity)
             ]
         )
         return tags, fts_metadata
@@ -938,156 +1066,125 @@ class SqliteSearchProvider(SearchProvider):
             db.rollback()
             raise
 
-    def batch_update_entity_indices(self, entity_ids: List[int], db: Session):
-        """Batch update both FTS and vector indexes for multiple entities"""
-        try:
-            from sqlalchemy.orm import selectinload
-            from .models import EntityModel
-
-            entities = (
-                db.query(EntityModel)
-                .filter(EntityModel.id.in_(entity_ids))
-                .options(
-                    selectinload(EntityModel.metadata_entries),
-                    selectinload(EntityModel.tags),
-                )
-                .all()
-            )
-            found_ids = {entity.id for entity in entities}
-
-            missing_ids = set(entity_ids) - found_ids
-            if missing_ids:
-                raise ValueError(f"Entities not found: {missing_ids}")
-
-            # Check existing vector indices and their timestamps
-            existing_vec_indices = db.execute(
-                text(
-                    """
-                    SELECT rowid, created_at_timestamp
-                    FROM entities_vec_v2
-                    WHERE rowid IN :entity_ids
+    def prepare_index_batch(
+        self, entity_ids: List[int], db: Session, force: bool = False
+    ) -> IndexBatch:
+        # Check existing vector indices and their timestamps
+        vec_timestamps = db.execute(
+            text(
                 """
-                ).bindparams(bindparam("entity_ids", expanding=True)),
-                {"entity_ids": tuple(entity_ids)},
-            ).fetchall()
-
-            # Create lookup of vector index timestamps
-            vec_timestamps = {row[0]: row[1] for row in existing_vec_indices}
-
-            # Separate entities that need indexing
-            needs_index = []
-
-            for entity in entities:
-                entity_last_scan = int(entity.last_scan_at.timestamp())
-                vec_timestamp = vec_timestamps.get(entity.id, 0)
-
-                # Entity needs full indexing if last_scan_at is
-                # more recent than the vector index timestamp
-                if entity_last_scan > vec_timestamp:
-                    needs_index.append(entity)
-
-            logfire.info(
-                f"Entities needing full indexing: {len(needs_index)}/{len(entity_ids)}"
-            )
+                SELECT rowid, created_at_timestamp
+                FROM entities_vec_v2
+                WHERE rowid IN :entity_ids
+                """
+            ).bindparams(bindparam("entity_ids", expanding=True)),
+            {"entity_ids": tuple(entity_ids)},
+        ).fetchall()
+        entities, needs_index = self._entities_needing_index(
+            entity_ids, dict(vec_timestamps), db, force
+        )
 
-            # Handle entities needing full indexing
-            if needs_index:
+        batch = IndexBatch(vec_ids=[entity.id for entity in needs_index])
+        if needs_index:
+            # Frames with copied plugin results share their source's embedding
+            shared = self.reused_embedding_sources(needs_index, db)
+            source_embeddings = {}
+            if shared:
+                rows = db.execute(
+                    text(
+                        "SELECT rowid, embedding FROM entities_vec_v2 WHERE rowid IN :ids"
+                    ).bindparams(bindparam("ids", expanding=True)),
+                    {"ids": tuple(set(shared.values()))},
+                ).fetchall()
+                source_embeddings = {row[0]: row[1] for row in rows}
+            to_embed = [
+                entity
+                for entity in needs_index
+                if shared.get(entity.id) not in source_embeddings
+            ]
+            embeddings_by_id = {
+                entity.id: source_embeddings[shared[entity.id]]
+                for entity in needs_index
+                if shared.get(entity.id) in source_embeddings
+            }
+            if to_embed:
                 vec_metadata_list = [
-                    self.prepare_vec_data(entity) for entity in needs_index
+                    self.prepare_vec_data(entity) for entity in to_embed
                 ]
                 with logfire.span("get embedding in batch indexing"):
                     embeddings = get_embeddings(vec_metadata_list)
                     logfire.info(f"vec_metadata_list: {vec_metadata_list}")
+                for entity, embedding in zip(to_embed, embeddings):
+                    embeddings_by_id[entity.id] = serialize_float32(embedding)
+            logfire.info(
+                f"Embeddings shared with duplicate frames: {len(needs_index) - len(to_embed)}"
+            )
 
-                # Delete all existing vector indices in one query
-                if needs_index:
-                    db.execute(
-                        text(
-                            "DELETE FROM entities_vec_v2 WHERE rowid IN :ids"
-                        ).bindparams(bindparam("ids", expanding=True)),
-                        {"ids": tuple(entity.id for entity in needs_index)},
-                    )
+            created_at_timestamp = int(datetime.now().timestamp())
+            batch.vec_rows = [
+                _vec_row(entity, embeddings_by_id[entity.id], created_at_timestamp)
+                for entity in needs_index
+            ]
 
-                    # Prepare batch insert data
-                    created_at_timestamp = int(datetime.now().timestamp())
-                    insert_values = []
-                    for entity, embedding in zip(needs_index, embeddings):
-                        app_name = next(
-                            (
-                                entry.value
-                                for entry in entity.metadata_entries
-                                if entry.key == "active_app"
-                            ),
-                            "unknown",
-                        )
-                        file_type_group = entity.file_type_group or "unknown"
-
-                        insert_values.append(
-                            {
-                                "id": entity.id,
-                                "embedding": serialize_float32(embedding),
-                                "app_name": app_name,
-                                "file_type_group": file_type_group,
-                                "created_at_timestamp": created_at_timestamp,
-                                "file_created_at_timestamp": int(
-                                    entity.file_created_at.timestamp()
-                                ),
-                                "file_created_at_date": entity.file_created_at.strftime(
-                                    "%Y-%m-%d"
-                                ),
-                                "library_id": entity.library_id,
-                            }
-                        )
+        # Update FTS index for all entities
+        batch.fts_ids = [entity.id for entity in entities]
+        for entity in entities:
+            tags, fts_metadata = self.prepare_fts_data(entity)
+            batch.fts_rows.append(
+                {
+                    "id": entity.id,
+                    "filepath": entity.filepath,
+                    "tags": tags,
+                    "metadata": fts_metadata,
+                }
+            )
+        return batch
 
-                    # Execute batch insert
-                    db.execute(
-                        text(
-                            """
-                            INSERT INTO entities_vec_v2 (
-                                rowid, embedding, app_name, file_type_group,
-                                created_at_timestamp, file_created_at_timestamp,
-                                file_created_at_date, library_id
-                            )
-                            VALUES (
-                                :id, :embedding, :app_name, :file_type_group,
-                                :created_at_timestamp, :file_created_at_timestamp,
-                                :file_created_at_date, :library_id
-                            )
-                        """
-                        ),
-                        insert_values,
+    def write_index_batch(self, batch: IndexBatch, db: Session):
+        batch = self._drop_deleted(batch, db)
+        if batch.vec_ids:
+            db.execute(
+                text("DELETE FROM entities_vec_v2 WHERE rowid IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                {"ids": tuple(batch.vec_ids)},
+            )
+        if batch.vec_rows:
+            db.execute(
+                text(
+                    """
+                    INSERT INTO entities_vec_v2 (
+                        rowid, embedding, app_name, file_type_group,
+                        created_at_timestamp, file_created_at_timestamp,
+                        file_created_at_date, library_id
                     )
-
-            # Update FTS index for all entities
+                    VALUES (
+                        :id, :embedding, :app_name, :file_type_group,
+                        :created_at_timestamp, :file_created_at_timestamp,
+                        :file_created_at_date, :library_id
+                    )
+                """
+                ),
+                batch.vec_rows,
+            )
+        if batch.fts_ids:
             db.execute(
                 text("DELETE FROM entities_fts WHERE id IN :ids").bindparams(
                     bindparam("ids", expanding=True)
                 ),
-                {"ids": tuple(entity.id for entity in entities)},
+                {"ids": tuple(batch.fts_ids)},
             )
-            for entity in entities:
-                tags, fts_metadata = self.prepare_fts_data(entity)
-                db.execute(
-                    text(
-                        """
-                        INSERT OR REPLACE INTO entities_fts(id, filepath, tags, metadata)
-                        VALUES(:id, :filepath, :tags, :metadata)
+        if batch.fts_rows:
+            db.execute(
+                text(
                     """
-                    ),
-                    {
-                        "id": entity.id,
-                        "filepath": entity.filepath,
-                        "tags": tags,
-                        "metadata": fts_metadata,
-                    },
-                )
-
-            db.commit()
-
-        except Exception as e:
-            logger.error(f"Error batch updating indexes: {e}")
-            db.rollback()
-            raise
+                    INSERT OR REPLACE INTO entities_fts(id, filepath, tags, metadata)
+                    VALUES(:id, :filepath, :tags, :metadata)
+                """
+                ),
+                batch.fts_rows,
+            )
+        db.commit()
 
     def _build_fts_filters(
         self,
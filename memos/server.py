@@ -4,6 +4,7 @@ import uvicorn
 import mimetypes
 import time
 import threading
+import asyncio
 import concurrent.futures
 import psutil
 from datetime import datetime, timedelta, timezone
@@ -24,13 +25,21 @@ import cv2
 from PIL import Image
 import logging
 from urllib.parse import quote
+from contextlib import asynccontextmanager
+from functools import partial
 
 from .config import settings, load_config, save_config, apply_config_updates, restart_processes
 from memos.plugins.vlm import main as vlm_main
 from memos.plugins.ocr import main as ocr_main
 from . import crud
 from .search import create_search_provider
+from .plugin_queue import PluginJobDispatcher, register_inprocess_handler
+from .index_queue import IndexQueue
+from .write_queue import WriteQueue
+from .result_reuse import ResultReuse
 from .read_metadata import read_metadata
+from .utils.low_info import LOW_INFO_TAG
+from .utils.image_cache import shared_image_cache
 from .schemas import (
     Library,
     LibraryKind,
@@ -46,6 +55,9 @@ from .schemas import (
     NewLibraryPluginParam,
     UpdateEntityTagsParam,
     UpdateEntityMetadataParam,
+    RemoveMissingEntitiesParam,
+    RemoveMissingEntitiesResponse,
+    DirectoryDigestsResponse,
     MetadataType,
     MetadataIndexItem,
     EntitySearchResult,
@@ -61,13 +73,23 @@ from .schemas import (
     DateBucket,
     ProcessingBacklog,
     ProcessingCoverageWindow,
+    ProcessingQueue,
+    PluginCircuitState,
+    IndexQueueStatus,
+    WriteQueueStatus,
     ProcessingStatusResponse,
     ProcessingWatchState,
 )
 from memos.utils import watch_state
 from .models import LibraryModel
 from .logging_config import LOGGING_CONFIG
-from .databases.initializers import create_db_initializer
+from .databases.initializers import (
+    connection_setup_stats,
+    create_db_initializer,
+    create_read_engine,
+    create_write_engine,
+    prewarm_engine,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -79,7 +101,52 @@ logging.basicConfig(level=logging.INFO)
 # the browser will not render them correctly in some windows machines.
 mimetypes.add_type("application/javascript", ".js")
 
-app = FastAPI()
+def prewarm_database_pools():
+    """Set up pooled SQLite connections before the first request instead of
+    inside it; each one loads the tokenizer and vector extensions."""
+    seconds = prewarm_engine(engine, settings.sqlite.prewarm_connections)
+    if read_engine is not engine:
+        seconds += prewarm_engine(read_engine, settings.sqlite.read_pool_size)
+    seconds += prewarm_engine(write_engine, 1)
+    count = connection_setup_stats["count"]
+    logging.info(
+        "Pre-warmed database pools in %.0f ms (%d connections, avg setup %.1f ms, max %.1f ms)",
+        seconds * 1000,
+        count,
+        connection_setup_stats["total_seconds"] / max(count, 1) * 1000,
+        connection_setup_stats["max_seconds"] * 1000,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.is_sqlite:
+        await asyncio.to_thread(prewarm_database_pools)
+    # Plugin webhooks run from the durable job queue on this server's loop.
+    dispatcher = PluginJobDispatcher(
+        SessionLocal,
+        settings.server_endpoint,
+        settings.plugin_queue,
+        index_queue=app.state.index_queue,
+        write_queue=app.state.write_queue,
+        reuse=ResultReuse(settings.result_reuse) if settings.result_reuse.enabled else None,
+    )
+    await dispatcher.start()
+    app.state.plugin_dispatcher = dispatcher
+    app.state.index_queue.start()
+    try:
+        yield
+    finally:
+        app.state.plugin_dispatcher = None
+        await dispatcher.stop()
+        # The final index flush writes through the write queue.
+        app.state.index_queue.stop()
+        app.state.write_queue.stop()
+        # OCR worker processes and their shared memory go with the server.
+        await asyncio.to_thread(ocr_main.shutdown_plugin)
+
+
+app = FastAPI(lifespan=lifespan)
 
 logfire.configure(send_to_logfire="if-token-present")
 logfire.instrument_fastapi(app, excluded_urls=["/files"])
@@ -93,7 +160,22 @@ app.state.search_provider = search_provider
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Search and entity listing read through their own read-only pool; the hot
+# entity writes go through a single writer that group-commits them.
+read_engine = create_read_engine(settings, engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+write_engine = create_write_engine(settings, engine)
+app.state.write_queue = WriteQueue(write_engine, settings.sqlite.write_batch_size)
+
+# Entity writes mark entities dirty; the queue indexes them in batches.
+app.state.index_queue = IndexQueue(
+    search_provider, SessionLocal, settings.index_queue, write_queue=app.state.write_queue
+)
+
 logfire.instrument_sqlalchemy(engine=engine)
+if read_engine is not engine:
+    logfire.instrument_sqlalchemy(engine=read_engine)
+logfire.instrument_sqlalchemy(engine=write_engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -118,13 +200,38 @@ app.mount(
 # Mount API router with prefix
 app.mount("/api", api_router)
 
+# Bounded executors for the blocking work of async handlers. Index
+# preparation (entity reads and embeddings) and thumbnail rendering each get
+# their own small pool instead of running on the event loop (which stalls
+# every request) or on the shared anyio threadpool (which a saturated ingest
+# would fill, queueing /search behind it). Search fans its phases out onto a third pool, shared across requests.
+_INDEX_WORKERS = 4
+_FILE_WORKERS = 4
+_SEARCH_WORKERS = 8
+_index_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_INDEX_WORKERS, thread_name_prefix="index-prepare"
+)
+_file_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_FILE_WORKERS, thread_name_prefix="file-render"
+)
+_search_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=_SEARCH_WORKERS, thread_name_prefix="search"
+)
+
+
+async def run_blocking(executor: concurrent.futures.Executor, fn, *args, **kwargs):
+    """Run the sync `fn` on `executor` without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
 @api_router.get("/health")
 async def health():
     return {"status": "ok"}
 
 
 @api_router.get("/processes", tags=["system"])
-async def get_processes():
+def get_processes():
     """获取当前所有服务进程的状态"""
     services = ["serve", "watch", "record"]
     processes = []
@@ -197,8 +304,34 @@ def get_db():
     finally:
         db.close()
 
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_write_queue() -> WriteQueue:
+    return app.state.write_queue
+
+
+def notify_plugin_dispatcher():
+    """Wake the plugin dispatcher once newly queued jobs are committed."""
+    dispatcher = getattr(app.state, "plugin_dispatcher", None)
+    if dispatcher is not None:
+        dispatcher.notify()
+
 @api_router.post("/libraries", response_model=Library, tags=["library"])
-def new_library(library_param: NewLibraryParam, db: Session = Depends(get_db)):
+async def new_library(
+    library_param: NewLibraryParam,
+    write_queue: WriteQueue = Depends(get_write_queue),
+):
+    return await write_queue.run(partial(_create_library, library_param))
+
+
+def _create_library(library_param: NewLibraryParam, db: Session) -> Library:
     # Check if a library with the same name (case insensitive) already exists
     existing_library = crud.get_library_by_name(library_param.name, db)
     if existing_library:
@@ -216,8 +349,7 @@ def new_library(library_param: NewLibraryParam, db: Session = Depends(get_db)):
             unique_folders.append(folder)
     library_param.folders = unique_folders
 
-    library = crud.create_library(library_param, db)
-    return library
+    return crud.create_library(library_param, db)
 
 @api_router.get("/libraries", response_model=List[Library], tags=["library"])
 def list_libraries(db: Session = Depends(get_db)):
@@ -240,16 +372,66 @@ def get_library_by_id(library_id: int, db: Session = Depends(get_db)):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["library"],
 )
-def delete_library(library_id: int, db: Session = Depends(get_db)):
+async def delete_library(
+    library_id: int, write_queue: WriteQueue = Depends(get_write_queue)
+):
     """Delete a library and everything under it: its entities (with their FTS/
     vector index rows and metadata), folders, and plugin bindings. Destructive
     and irreversible."""
     try:
-        crud.remove_library(library_id, db)
+        await write_queue.run(partial(crud.remove_library, library_id))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+def _plugin_queue_status(library_id: int, db: Session) -> ProcessingQueue:
+    depth, in_flight, oldest_dt = crud.get_plugin_queue_stats(library_id, db)
+    oldest_age_seconds = None
+    if oldest_dt is not None:
+        if oldest_dt.tzinfo is None:
+            oldest_dt = oldest_dt.replace(tzinfo=timezone.utc)
+        oldest_age_seconds = max(
+            0, int((datetime.now(timezone.utc) - oldest_dt).total_seconds())
+        )
+    return ProcessingQueue(
+        depth=depth, in_flight=in_flight, oldest_age_seconds=oldest_age_seconds
+    )
+
+
+def _plugin_circuits(library) -> List[PluginCircuitState]:
+    dispatcher = getattr(app.state, "plugin_dispatcher", None)
+    circuits = []
+    for plugin in library.plugins:
+        circuit = dispatcher.circuit(plugin.id) if dispatcher is not None else None
+        circuits.append(
+            PluginCircuitState(
+                plugin_id=plugin.id,
+                name=plugin.name,
+                **(circuit or {
+                    "state": "closed",
+                    "consecutive_failures": 0,
+                    "last_error": None,
+                    "retry_in_seconds": None,
+                }),
+            )
+        )
+    return circuits
+
+
+@api_router.get(
+    "/libraries/{library_id}/plugin-jobs",
+    response_model=ProcessingQueue,
+    tags=["library"],
+)
+def get_plugin_queue_status(library_id: int, db: Session = Depends(get_db)):
+    library = crud.get_library_by_id(library_id, db)
+    if library is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Library not found"
+        )
+    return _plugin_queue_status(library_id, db)
+
+
 @api_router.get(
     "/libraries/{library_id}/processing-status",
     response_model=ProcessingStatusResponse,
@@ -320,6 +502,7 @@ def get_processing_status(
     # request rather than serving it from the cached (up to _PROCESSING_STATUS_TTL
     # stale) payload, so a dead or restarted watcher shows up immediately. Only the
     # expensive DB counts — and the computed_at that honestly dates them — are cached.
+    # The plugin job queue stats are cheap too (the table only holds pending work).
     idle_window = (
         settings.watch.idle_process_interval[0],
         settings.watch.idle_process_interval[1],
@@ -330,6 +513,8 @@ def get_processing_status(
         window_hours=window_hours,
         coverage_window=coverage_window,
         backlog=backlog,
+        queue=_plugin_queue_status(library_id, db),
+        plugins=_plugin_circuits(library),
         watch=ProcessingWatchState(
             is_alive=watch_state.is_alive(),
             is_on_battery=watch_state.is_on_battery(),
@@ -340,11 +525,15 @@ def get_processing_status(
 
 
 @api_router.patch("/libraries/{library_id}", response_model=Library, tags=["library"])
-def update_library(
+async def update_library(
     library_id: int,
     update: UpdateLibraryParam,
-    db: Session = Depends(get_db),
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
+    return await write_queue.run(partial(_update_library, library_id, update))
+
+
+def _update_library(library_id: int, update: UpdateLibraryParam, db: Session) -> Library:
     library = db.query(LibraryModel).filter(LibraryModel.id == library_id).first()
     if library is None:
         raise HTTPException(
@@ -354,15 +543,19 @@ def update_library(
         library.kind = update.kind
         db.commit()
         db.refresh(library)
-    return library
+    return Library.model_validate(library)
 
 
 @api_router.post("/libraries/{library_id}/folders", response_model=Library, tags=["library"])
-def new_folders(
+async def new_folders(
     library_id: int,
     folders: NewFoldersParam,
-    db: Session = Depends(get_db),
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
+    return await write_queue.run(partial(_add_folders, library_id, folders))
+
+
+def _add_folders(library_id: int, folders: NewFoldersParam, db: Session) -> Library:
     library = crud.get_library_by_id(library_id, db)
     if library is None:
         raise HTTPException(
@@ -379,72 +572,82 @@ def new_folders(
     return crud.add_folders(library_id=library.id, folders=folders, db=db)
 
 
-async def trigger_webhooks(
+def trigger_webhooks(
     library: Library,
     entity: Entity,
-    request: Request,
     plugins: List[int] = None,
     db: Session = Depends(get_db),
 ):
-    """Trigger webhooks for plugins that haven't processed the entity yet"""
-    async with httpx.AsyncClient() as client:
-        tasks = []
-        pending_plugins = crud.get_pending_plugins(entity.id, library.id, db)
-
-        for plugin in library.plugins:
-            # Skip if specific plugins are requested and this one isn't in the list
-            if plugins is not None and plugin.id not in plugins:
-                continue
-
-            # Skip if entity has already been processed by this plugin
-            if plugin.id not in pending_plugins:
-                continue
-
-            if plugin.webhook_url:
-                logging.info("Triggering plugin %d for entity %d", plugin.id, entity.id)
-                location = str(request.url_for("get_entity_by_id", entity_id=entity.id))
-                webhook_url = plugin.webhook_url
-                if webhook_url.startswith("/"):
-                    webhook_url = str(request.base_url)[:-1] + webhook_url
-                task = client.post(
-                    webhook_url,
-                    json=entity.model_dump(mode="json"),
-                    headers={"Location": location},
-                    timeout=300.0,
-                )
-                tasks.append((plugin.id, task))
-
-        for plugin_id, task in tasks:
-            try:
-                response = await task
-                if response.status_code < 400:
-                    # Record successful plugin processing
-                    crud.record_plugin_processed(entity.id, plugin_id, db)
-                else:
-                    logging.error(
-                        "Error processing entity with plugin %d: %d - %s",
-                        plugin_id,
-                        response.status_code,
-                        response.text,
-                    )
-            except Exception as e:
-                logging.error(
-                    "Error processing entity with plugin %d: %s",
-                    plugin_id,
-                    str(e),
-                )
+    """Queue plugin jobs for plugins that haven't processed the entity yet.
+
+    The webhooks themselves are called by the PluginJobDispatcher, so entity
+    writes return as soon as the jobs are persisted.
+    """
+    pending_plugins = crud.get_pending_plugins(entity.id, library.id, db)
+    plugin_ids = [
+        plugin.id
+        for plugin in library.plugins
+        if plugin.webhook_url
+        and plugin.id in pending_plugins
+        # Skip if specific plugins are requested and this one isn't in the list
+        and (plugins is None or plugin.id in plugins)
+    ]
+    if not plugin_ids:
+        return
+
+    if any(tag.name == LOW_INFO_TAG for tag in entity.tags or []):
+        skip = set(settings.low_info.skip_plugins)
+        skipped = [p.id for p in library.plugins if p.id in plugin_ids and p.name in skip]
+        for plugin_id in skipped:
+            # Nothing to extract: count the plugin as done for this frame.
+            crud.record_plugin_processed(entity.id, plugin_id, db)
+        if skipped:
+            logging.info(
+                "Skipped %d plugin jobs for low-info entity %d", len(skipped), entity.id
+            )
+        plugin_ids = [plugin_id for plugin_id in plugin_ids if plugin_id not in skipped]
+        if not plugin_ids:
+            return
+
+    created = crud.enqueue_plugin_jobs(entity.id, plugin_ids, db)
+    logging.info("Queued %d plugin jobs for entity %d", created, entity.id)
 
 @api_router.post("/libraries/{library_id}/entities", response_model=Entity, tags=["entity"])
 async def new_entity(
     new_entity: NewEntityParam,
     library_id: int,
     request: Request,
-    db: Session = Depends(get_db),
     plugins: Annotated[List[int] | None, Query()] = None,
     trigger_webhooks_flag: bool = True,
     update_index: bool = False,
-    search_provider=Depends(lambda: app.state.search_provider),
+    write_queue: WriteQueue = Depends(get_write_queue),
+    index_queue=Depends(lambda: app.state.index_queue),
 ):
+    entity = await write_queue.run(
+        partial(
+            _create_entity,
+            new_entity,
+            library_id,
+            plugins,
+            trigger_webhooks_flag,
+            update_index,
+        )
+    )
+    if trigger_webhooks_flag:
+        notify_plugin_dispatcher()
+    if update_index:
+        index_queue.mark_dirty(entity.id)
+    return entity
+
+
+def _create_entity(
+    new_entity: NewEntityParam,
+    library_id: int,
+    plugins: List[int] | None,
+    trigger_webhooks_flag: bool,
+    update_index: bool,
+    db: Session,
+) -> Entity:
     library = crud.get_library_by_id(library_id, db)
     if library is None:
         raise HTTPException(
@@ -456,11 +659,10 @@ async def new_entity(
 
     if trigger_webhooks_flag:
         with logfire.span("trigger webhooks {entity_id=}", entity_id=entity.id):
-            await trigger_webhooks(library, entity, request, plugins, db)
+            trigger_webhooks(library, entity, plugins, db)
 
     if update_index:
-        with logfire.span("update entity index {entity_id=}", entity_id=entity.id):
-            search_provider.update_entity_index(entity.id, db)
+        crud.mark_index_pending([entity.id], db)
 
     return entity
 
@@ -477,7 +679,10 @@ def list_entities_in_folder(
     path_prefix: str | None = None,
     unprocessed_only: bool = False,
     order_by: str = Query("last_scan_at:desc", pattern="^[a-zA-Z_]+:(asc|desc)$"),
-    db: Session = Depends(get_db),
+    after_id: int | None = Query(None, description="Keyset cursor: id of the last entity of the previous page"),
+    after_ts: datetime | None = Query(None, description="Keyset cursor: order_by timestamp of that entity"),
+    count: bool = Query(True, description="Compute X-Total-Count"),
+    db: Session = Depends(get_read_db),
 ):
     library = crud.get_library_by_id(library_id, db)
     if library is None:
@@ -501,11 +706,14 @@ def list_entities_in_folder(
             path_prefix,
             unprocessed_only,
             order_by,
+            after_id=after_id,
+            after_ts=after_ts,
+            with_count=count,
         )
-        return JSONResponse(
-            content=jsonable_encoder(entities),
-            headers={"X-Total-Count": str(total_count)},
-        )
+        headers = {}
+        if total_count is not None:
+            headers["X-Total-Count"] = str(total_count)
+        return JSONResponse(content=jsonable_encoder(entities), headers=headers)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -515,7 +723,7 @@ def list_entities_in_folder(
     tags=["entity"],
 )
 def get_entity_by_filepath(
-    library_id: int, filepath: str, db: Session = Depends(get_db)
+    library_id: int, filepath: str, db: Session = Depends(get_read_db)
 ):
     entity = crud.get_entity_by_filepath(filepath, db, library_id=library_id)
     if entity is None:
@@ -531,13 +739,13 @@ def get_entity_by_filepath(
     tags=["entity"],
 )
 def get_entities_by_filepaths(
-    library_id: int, filepaths: List[str], db: Session = Depends(get_db)
+    library_id: int, filepaths: List[str], db: Session = Depends(get_read_db)
 ):
     entities = crud.get_entities_by_filepaths(filepaths, db)
     return [entity for entity in entities if entity.library_id == library_id]
 
 @api_router.get("/entities/{entity_id}", response_model=Entity, tags=["entity"])
-def get_entity_by_id(entity_id: int, db: Session = Depends(get_db)):
+def get_entity_by_id(entity_id: int, db: Session = Depends(get_read_db)):
     entity = crud.get_entity_by_id(entity_id, db, include_relationships=True)
     if entity is None:
         return JSONResponse(
@@ -552,7 +760,7 @@ def get_entity_by_id(entity_id: int, db: Session = Depends(get_db)):
     tags=["entity"],
 )
 def get_entity_by_id_in_library(
-    library_id: int, entity_id: int, db: Session = Depends(get_db)
+    library_id: int, entity_id: int, db: Session = Depends(get_read_db)
 ):
     entity = crud.get_entity_by_id(entity_id, db, include_relationships=True)
     if entity is None or entity.library_id != library_id:
@@ -567,13 +775,40 @@ async def update_entity(
     entity_id: int,
     request: Request,
     updated_entity: UpdateEntityParam = None,
-    db: Session = Depends(get_db),
     trigger_webhooks_flag: bool = False,
     plugins: Annotated[List[int] | None, Query()] = None,
     update_index: bool = False,
     force: bool = False,
-    search_provider=Depends(lambda: app.state.search_provider),
+    write_queue: WriteQueue = Depends(get_write_queue),
+    index_queue=Depends(lambda: app.state.index_queue),
 ):
+    entity = await write_queue.run(
+        partial(
+            _update_entity,
+            entity_id,
+            updated_entity,
+            trigger_webhooks_flag,
+            plugins,
+            force,
+            update_index,
+        )
+    )
+    if trigger_webhooks_flag:
+        notify_plugin_dispatcher()
+    if update_index:
+        index_queue.mark_dirty(entity.id)
+    return entity
+
+
+def _update_entity(
+    entity_id: int,
+    updated_entity: UpdateEntityParam | None,
+    trigger_webhooks_flag: bool,
+    plugins: List[int] | None,
+    force: bool,
+    update_index: bool,
+    db: Session,
+) -> Entity:
     with logfire.span("fetch entity {entity_id=}", entity_id=entity_id):
         entity = crud.get_entity_by_id(entity_id, db)
         if entity is None:
@@ -591,10 +826,10 @@ async def update_entity(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Library not found"
             )
-        await trigger_webhooks(library, entity, request, plugins, db)
+        trigger_webhooks(library, entity, plugins, db)
 
     if update_index:
-        search_provider.update_entity_index(entity.id, db)
+        crud.mark_index_pending([entity.id], db)
 
     return entity
 
@@ -603,11 +838,13 @@ async def update_entity(
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["entity"],
 )
-def update_entity_last_scan_at(entity_id: int, db: Session = Depends(get_db)):
+async def update_entity_last_scan_at(
+    entity_id: int, write_queue: WriteQueue = Depends(get_write_queue)
+):
     """
     Update the last_scan_at timestamp for an entity and trigger update for fts and vec.
     """
-    succeeded = crud.touch_entity(entity_id, db)
+    succeeded = await write_queue.run(partial(crud.touch_entity, entity_id))
     if not succeeded:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -619,22 +856,29 @@ def update_entity_last_scan_at(entity_id: int, db: Session = Depends(get_db)):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["entity"],
 )
-def update_index(
+async def update_index(
     entity_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     search_provider=Depends(lambda: app.state.search_provider),
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
     """
     Update the FTS and vector indexes for an entity.
     """
-    entity = crud.get_entity_by_id(entity_id, db)
-    if entity is None:
+
+    def prepare():
+        if crud.get_entity_by_id(entity_id, db) is None:
+            return None
+        return search_provider.prepare_index_batch([entity_id], db, force=True)
+
+    batch = await run_blocking(_index_executor, prepare)
+    if batch is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Entity not found",
         )
+    await write_queue.run(partial(search_provider.write_index_batch, batch))
 
-    search_provider.update_entity_index(entity.id, db)
 
 @api_router.post(
     "/entities/batch-index",
@@ -643,34 +887,86 @@ def update_index(
 )
 async def batch_update_index(
     request: BatchIndexRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     search_provider=Depends(lambda: app.state.search_provider),
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
     """
     Batch update the FTS and vector indexes for multiple entities.
     """
+    # Embeddings are computed off the writer; only the inserts queue for it.
     try:
-        search_provider.batch_update_entity_indices(request.entity_ids, db)
+        batch = await run_blocking(
+            _index_executor,
+            search_provider.prepare_index_batch,
+            request.entity_ids,
+            db,
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await write_queue.run(partial(search_provider.write_index_batch, batch))
+
+
+@api_router.get("/index-queue", response_model=IndexQueueStatus, tags=["entity"])
+def get_index_queue_status(index_queue=Depends(lambda: app.state.index_queue)):
+    """
+    Report how far the write-behind search index lags behind entity writes.
+    """
+    return IndexQueueStatus(
+        pending=index_queue.pending_count(),
+        oldest_pending_age_seconds=index_queue.oldest_pending_age_seconds(),
+        last_flush_lag_seconds=index_queue.last_flush_lag_seconds,
+        flushed_total=index_queue.flushed_total,
+    )
+
+
+@api_router.post("/index-queue/flush", response_model=IndexQueueStatus, tags=["entity"])
+def flush_index_queue(index_queue=Depends(lambda: app.state.index_queue)):
+    """
+    Index every pending entity now, without waiting for the debounce.
+    """
+    index_queue.flush()
+    return get_index_queue_status(index_queue)
+
+
+@api_router.get("/write-queue", response_model=WriteQueueStatus, tags=["entity"])
+def get_write_queue_status(write_queue: WriteQueue = Depends(get_write_queue)):
+    """
+    Report single-writer throughput and how long writes waited for the lock.
+    """
+    return WriteQueueStatus(
+        pending=write_queue.pending_count(),
+        writes_total=write_queue.writes_total,
+        batches_total=write_queue.batches_total,
+        lock_wait_seconds_total=write_queue.lock_wait_seconds_total,
+        lock_wait_seconds_max=write_queue.lock_wait_seconds_max,
+        queue_wait_seconds_total=write_queue.queue_wait_seconds_total,
+        queue_wait_seconds_max=write_queue.queue_wait_seconds_max,
+    )
+
 
 @api_router.put("/entities/{entity_id}/tags", response_model=Entity, tags=["entity"])
-def replace_entity_tags(
-    entity_id: int, update_tags: UpdateEntityTagsParam, db: Session = Depends(get_db)
+async def replace_entity_tags(
+    entity_id: int,
+    update_tags: UpdateEntityTagsParam,
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
-    entity = crud.get_entity_by_id(entity_id, db)
-    if entity is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Entity not found",
-        )
-
-    return crud.update_entity_tags(entity_id, update_tags.tags, db)
+    return await write_queue.run(
+        partial(_write_entity_tags, crud.update_entity_tags, entity_id, update_tags.tags)
+    )
 
 @api_router.patch("/entities/{entity_id}/tags", response_model=Entity, tags=["entity"])
-def patch_entity_tags(
-    entity_id: int, update_tags: UpdateEntityTagsParam, db: Session = Depends(get_db)
+async def patch_entity_tags(
+    entity_id: int,
+    update_tags: UpdateEntityTagsParam,
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
+    return await write_queue.run(
+        partial(_write_entity_tags, crud.add_new_tags, entity_id, update_tags.tags)
+    )
+
+
+def _write_entity_tags(write, entity_id: int, tags: List[str], db: Session) -> Entity:
     entity = crud.get_entity_by_id(entity_id, db)
     if entity is None:
         raise HTTPException(
@@ -678,15 +974,25 @@ def patch_entity_tags(
             detail="Entity not found",
         )
 
-    return crud.add_new_tags(entity_id, update_tags.tags, db)
+    return write(entity_id, tags, db)
 
 @api_router.patch("/entities/{entity_id}/metadata", response_model=Entity, tags=["entity"])
-def patch_entity_metadata(
+async def patch_entity_metadata(
     entity_id: int,
     update_metadata: UpdateEntityMetadataParam,
-    db: Session = Depends(get_db),
-    search_provider=Depends(lambda: app.state.search_provider),
+    write_queue: WriteQueue = Depends(get_write_queue),
+    index_queue=Depends(lambda: app.state.index_queue),
 ):
+    entity = await write_queue.run(
+        partial(_patch_entity_metadata, entity_id, update_metadata)
+    )
+    index_queue.mark_dirty(entity.id)
+    return entity
+
+
+def _patch_entity_metadata(
+    entity_id: int, update_metadata: UpdateEntityMetadataParam, db: Session
+) -> Entity:
     with logfire.span("fetch entity {entity_id=}", entity_id=entity_id):
         entity = crud.get_entity_by_id(entity_id, db)
         if entity is None:
@@ -699,7 +1005,7 @@ def patch_entity_metadata(
     entity = crud.update_entity_metadata_entries(
         entity_id, update_metadata.metadata_entries, db
     )
-    search_provider.update_entity_index(entity.id, db)
+    crud.mark_index_pending([entity_id], db)
     return entity
 
 @api_router.delete(
@@ -707,7 +1013,13 @@ def patch_entity_metadata(
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["entity"],
 )
-def remove_entity(library_id: int, entity_id: int, db: Session = Depends(get_db)):
+async def remove_entity(
+    library_id: int, entity_id: int, write_queue: WriteQueue = Depends(get_write_queue)
+):
+    await write_queue.run(partial(_remove_entity, library_id, entity_id))
+
+
+def _remove_entity(library_id: int, entity_id: int, db: Session):
     entity = crud.get_entity_by_id(entity_id, db)
     if entity is None or entity.library_id != library_id:
         raise HTTPException(
@@ -717,8 +1029,62 @@ def remove_entity(library_id: int, entity_id: int, db: Session = Depends(get_db)
 
     crud.remove_entity(entity_id, db)
 
+
+@api_router.post(
+    "/libraries/{library_id}/folders/{folder_id}/entities/remove-missing",
+    response_model=RemoveMissingEntitiesResponse,
+    tags=["entity"],
+)
+async def remove_missing_entities(
+    library_id: int,
+    folder_id: int,
+    param: RemoveMissingEntitiesParam,
+    write_queue: WriteQueue = Depends(get_write_queue),
+):
+    """
+    Delete the folder's entities under path_prefix that are not in
+    present_filepaths, in one transaction.
+    """
+    deleted = await write_queue.run(
+        partial(
+            crud.remove_missing_entities,
+            library_id,
+            folder_id,
+            param.path_prefix,
+            set(param.present_filepaths),
+            recursive=param.recursive,
+        )
+    )
+    return RemoveMissingEntitiesResponse(deleted_filepaths=deleted)
+
+
+@api_router.get(
+    "/libraries/{library_id}/folders/{folder_id}/entities/directory-digests",
+    response_model=DirectoryDigestsResponse,
+    tags=["entity"],
+)
+def get_directory_digests(
+    library_id: int,
+    folder_id: int,
+    path_prefix: str,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Digest of the entity filepaths in each directory under path_prefix, so a
+    scan only sends the file lists of directories that changed.
+    """
+    return DirectoryDigestsResponse(
+        digests=crud.get_directory_digests(library_id, folder_id, path_prefix, db)
+    )
+
 @api_router.post("/plugins", response_model=Plugin, tags=["plugin"])
-def new_plugin(new_plugin: NewPluginParam, db: Session = Depends(get_db)):
+async def new_plugin(
+    new_plugin: NewPluginParam, write_queue: WriteQueue = Depends(get_write_queue)
+):
+    return await write_queue.run(partial(_create_plugin, new_plugin))
+
+
+def _create_plugin(new_plugin: NewPluginParam, db: Session) -> Plugin:
     existing_plugin = crud.get_plugin_by_name(new_plugin.name, db)
     if existing_plugin:
         raise HTTPException(
@@ -738,9 +1104,15 @@ def list_plugins(db: Session = Depends(get_db)):
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["plugin"],
 )
-def add_library_plugin(
-    library_id: int, new_plugin: NewLibraryPluginParam, db: Session = Depends(get_db)
+async def add_library_plugin(
+    library_id: int,
+    new_plugin: NewLibraryPluginParam,
+    write_queue: WriteQueue = Depends(get_write_queue),
 ):
+    await write_queue.run(partial(_add_library_plugin, library_id, new_plugin))
+
+
+def _add_library_plugin(library_id: int, new_plugin: NewLibraryPluginParam, db: Session):
     library = crud.get_library_by_id(library_id, db)
     if library is None:
         raise HTTPException(
@@ -771,9 +1143,13 @@ def add_library_plugin(
     status_code=status.HTTP_204_NO_CONTENT,
     tags=["plugin"],
 )
-def delete_library_plugin(
-    library_id: int, plugin_id: int, db: Session = Depends(get_db)
+async def delete_library_plugin(
+    library_id: int, plugin_id: int, write_queue: WriteQueue = Depends(get_write_queue)
 ):
+    await write_queue.run(partial(_delete_library_plugin, library_id, plugin_id))
+
+
+def _delete_library_plugin(library_id: int, plugin_id: int, db: Session):
     library = crud.get_library_by_id(library_id, db)
     if library is None:
         raise HTTPException(
@@ -831,11 +1207,16 @@ def generate_thumbnail(image_path: Path, size: tuple = (400, 400)) -> Path:
         if thumb_path.exists():
             return thumb_path
 
-        # Generate the thumbnail
-        img = Image.open(image_path)
-
-        # Use LANCZOS resampling for better quality
-        img.thumbnail(size, Image.LANCZOS)
+        # Reuse a frame the plugins already decoded, but don't fill the
+        # shared cache with old frames browsed in the UI
+        cached = shared_image_cache().cached(image_path)
+        if cached is not None:
+            img = cached.copy()
+            img.thumbnail(size, Image.LANCZOS)
+        else:
+            with Image.open(image_path) as img:
+                img.draft(img.mode, size)
+                img.thumbnail(size, Image.LANCZOS)
 
         # Save the thumbnail with optimized settings
         thumb_path.parent.mkdir(parents=True, exist_ok=True)
@@ -892,7 +1273,10 @@ def schedule_thumbnail_cleanup(interval_hours=24):
 
 @api_router.get("/files/video/{file_path:path}", tags=["files"])
 async def get_video_frame(file_path: str):
+    return await run_blocking(_file_executor, _video_frame_response, file_path)
 
+
+def _video_frame_response(file_path: str):
     full_path = Path("/") / file_path.strip("/")
 
     if not full_path.is_file():
@@ -944,49 +1328,25 @@ async def get_file(file_path: str):
 async def get_thumbnail(file_path: str, width: int = 200, height: int = 200):
     """Dedicated endpoint for thumbnails to make it easier for clients"""
     full_path = Path("/") / file_path.strip("/")
-
-    # Check if the file exists and is a file
-    if not full_path.is_file():
-        return JSONResponse(
-            content={"detail": "File not found"}, status_code=status.HTTP_404_NOT_FOUND
-        )
-
-    # Only generate thumbnails for images
-    if not is_image(full_path):
-        return JSONResponse(
-            content={"detail": "Thumbnails only supported for images"},
-            status_code=status.HTTP_400_BAD_REQUEST,
-        )
-
-    # Generate the thumbnail
-    thumb_path = generate_thumbnail(full_path, (width, height))
-    if thumb_path:
-        filename = f"thumb_{full_path.name}"
-        # Use RFC 6266/5987 for UTF-8 filename support
-        disposition = (
-            f"inline; filename=thumb.png; filename*=UTF-8''{quote(filename)}"
-        )
-        return FileResponse(
-            thumb_path,
-            headers={"Content-Disposition": disposition},
-        )
-    else:
-        # Fallback to original file if thumbnail generation fails
-        return FileResponse(full_path)
+    return await run_blocking(_file_executor, _thumbnail_response, full_path, width, height)
 
 @api_router.get("/entities/{entity_id}/thumbnail", tags=["files", "entity"])
 async def get_entity_thumbnail(
-    entity_id: int, width: int = 200, height: int = 200, db: Session = Depends(get_db)
+    entity_id: int, width: int = 200, height: int = 200, db: Session = Depends(get_read_db)
 ):
     """Get thumbnail for an entity by entity ID"""
-    entity = crud.get_entity_by_id(entity_id, db)
+    entity = await run_blocking(_file_executor, crud.get_entity_by_id, entity_id, db)
     if entity is None:
         return JSONResponse(
             content={"detail": "Entity not found"}, status_code=status.HTTP_404_NOT_FOUND
         )
 
-    full_path = Path(entity.filepath)
+    return await run_blocking(
+        _file_executor, _thumbnail_response, Path(entity.filepath), width, height
+    )
+
 
+def _thumbnail_response(full_path: Path, width: int, height: int):
     # Check if the file exists and is a file
     if not full_path.is_file():
         return JSONResponse(
@@ -1080,7 +1440,7 @@ def _timed_in_worker(fn):
     thread-safe; this helper hides the open/time/close boilerplate so
     the search_entities_v2 closures stay one-liners.
     """
-    worker_db = SessionLocal()
+    worker_db = ReadSessionLocal()
     t0 = time.perf_counter()
     try:
         return fn(worker_db), round((time.perf_counter() - t0) * 1000)
@@ -1089,7 +1449,7 @@ def _timed_in_worker(fn):
 
 
 @api_router.get("/search", response_model=SearchResult, tags=["search"])
-async def search_entities_v2(
+def search_entities_v2(
     q: str,
     library_ids: str = Query(None, description="Comma-separated list of library IDs"),
     limit: Annotated[int, Query(ge=1, le=200)] = 48,
@@ -1098,7 +1458,7 @@ async def search_entities_v2(
     app_names: str = Query(None, description="Comma-separated list of app names"),
     facet: bool = Query(None, description="Include facet in the search results"),
     date: str = Query(None, description="Date bucket filter, YYYY-MM or YYYY-MM-DD"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     search_provider=Depends(lambda: app.state.search_provider),
 ):
     library_ids = [int(id) for id in library_ids.split(",")] if library_ids else None
@@ -1201,18 +1561,18 @@ async def search_entities_v2(
             # count_full_text_matches call entirely. Both caps now share the
             # same value so 'found' has consistent semantics either way.
             parallel_t0 = time.perf_counter()
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as ex:
-                f_search = ex.submit(_run_hybrid_search)
-                f_stats = ex.submit(_run_stats) if use_facet else None
-                f_count = None if use_facet else ex.submit(_run_count)
-                entity_ids, hybrid_ms, hybrid_sub_ms = f_search.result()
-                if f_stats is not None:
-                    stats, stats_ms = f_stats.result()
-                    total_matches = int(stats.get("total") or 0)
-                    count_ms = None
-                else:
-                    stats, stats_ms = {}, 0
-                    total_matches, count_ms = f_count.result()
+            ex = _search_executor
+            f_search = ex.submit(_run_hybrid_search)
+            f_stats = ex.submit(_run_stats) if use_facet else None
+            f_count = None if use_facet else ex.submit(_run_count)
+            entity_ids, hybrid_ms, hybrid_sub_ms = f_search.result()
+            if f_stats is not None:
+                stats, stats_ms = f_stats.result()
+                total_matches = int(stats.get("total") or 0)
+                count_ms = None
+            else:
+                stats, stats_ms = {}, 0
+                total_matches, count_ms = f_count.result()
             phase_ms["hybrid_search"] = hybrid_ms
             for name, ms in hybrid_sub_ms.items():
                 phase_ms[f"hybrid.{name}"] = ms
@@ -1364,7 +1724,7 @@ def get_entity_context(
     entity_id: int,
     prev: Annotated[int | None, Query(ge=0, le=100)] = None,
     next: Annotated[int | None, Query(ge=0, le=100)] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     Get the context (previous and next entities) for a given entity.
@@ -1476,8 +1836,13 @@ def run_server():
 
     # Only add VLM plugin router if enabled
     if settings.vlm.enabled:
-        vlm_main.init_plugin(settings.vlm)
+        vlm_main.init_plugin(
+            settings.vlm, max_in_flight=settings.plugin_queue.concurrency_for("vlm")
+        )
         api_router.include_router(vlm_main.router, prefix="/plugins/vlm")
+        register_inprocess_handler(
+            "/api/plugins/vlm", vlm_main.process_entity, vlm_main.probe_backend
+        )
         logging.info("VLM plugin initialized and router added")
     else:
         logging.info("VLM plugin disabled")
@@ -1486,14 +1851,26 @@ def run_server():
     # Enable/disable is per-library via the plugin binding (default_plugins config
     # controls which builtins get bound on init).
     from memos.plugins.structured_vlm import main as structured_vlm_main
-    structured_vlm_main.init_plugin(settings.vlm)
+    structured_vlm_main.init_plugin(
+        settings.vlm, max_in_flight=settings.plugin_queue.concurrency_for("structured_vlm")
+    )
     api_router.include_router(structured_vlm_main.router, prefix="/plugins/structured_vlm")
+    register_inprocess_handler(
+        "/api/plugins/structured_vlm",
+        structured_vlm_main.process_entity,
+        structured_vlm_main.probe_backend,
+    )
     logging.info("structured_vlm plugin initialized and router added")
 
     # Only add OCR plugin router if enabled
     if settings.ocr.enabled:
-        ocr_main.init_plugin(settings.ocr)
+        ocr_main.init_plugin(
+            settings.ocr, max_in_flight=settings.plugin_queue.concurrency_for("ocr")
+        )
         api_router.include_router(ocr_main.router, prefix="/plugins/ocr")
+        register_inprocess_handler(
+            "/api/plugins/ocr", ocr_main.process_entity, ocr_main.probe_backend
+        )
         logging.info("OCR plugin initialized and router added")
     else:
         logging.info("OCR plugin disabled")
@@ -11,7 +11,8 @@ from sqlalchemy.pool import StaticPool
 from pathlib import Path
 
 
-from memos.server import app, api_router, get_db
+from memos.server import app, api_router, get_db, get_read_db
+from memos.write_queue import WriteQueue
 from memos.schemas import (
     NewPluginParam,
     NewLibraryParam,
@@ -64,6 +65,8 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 api_router.dependency_overrides[get_db] = override_get_db
+api_router.dependency_overrides[get_read_db] = override_get_db
+app.state.write_queue = WriteQueue(test_engine)
 
 
 def _fake_embeddings(texts):
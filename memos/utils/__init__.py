@@ -3,8 +3,25 @@ import piexif
 from PIL.PngImagePlugin import PngInfo
 import json
 
+from .image_metadata import (
+    MetadataFormatError,
+    read_image_metadata,
+    read_images_metadata,
+    rewrite_image_metadata,
+    save_image_with_metadata,
+)
+
 
 def write_image_metadata(image_path, metadata):
+    # WebP, PNG and JPEG only have their metadata chunk replaced; anything
+    # else, and files too unusual to rewrite in place, is re-encoded through
+    # PIL.
+    try:
+        if rewrite_image_metadata(image_path, metadata):
+            return
+    except MetadataFormatError:
+        pass
+
     img = Image.open(image_path)
     image_path_str = str(image_path)
 
@@ -24,26 +41,4 @@ def write_image_metadata(image_path, metadata):
 
 
 def get_image_metadata(image_path):
-    img = Image.open(image_path)
-    image_path_str = str(image_path)
-
-    if image_path_str.lower().endswith((".jpg", ".jpeg", ".tiff", ".webp")):
-        try:
-            exif_dict = piexif.load(image_path_str)
-            existing_description = exif_dict["0th"].get(
-                piexif.ImageIFD.ImageDescription, b"{}"
-            )
-            return json.loads(existing_description.decode("utf-8"))
-        except Exception as e:
-            print(f"Error decoding EXIF metadata for {image_path_str}: {e}")
-            return None
-    elif image_path_str.lower().endswith(".png"):
-        existing_description = img.info.get("Description", "{}")
-        try:
-            return json.loads(existing_description)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding PNG metadata for {image_path_str}: {e}")
-            return None
-    else:
-        print(f"Unsupported file format: {image_path_str}")
-        return None
+    return read_image_metadata(image_path)
@@ -0,0 +1,38 @@
+"""Per-directory digests of file path sets.
+
+`memos scan` and the server each hash the file paths they know about, one
+digest per directory, so that a scan can tell which directories lost files
+without sending every path under a library folder. Only directories whose
+digests differ need their full path lists compared.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Dict, Iterable
+
+
+class DirectoryDigests:
+    """Accumulates a digest per parent directory. Paths must be added in
+    sorted order, so both sides hash each directory's paths identically."""
+
+    def __init__(self):
+        self._hashes: Dict[str, "hashlib._Hash"] = {}
+
+    def add(self, filepath: str):
+        directory = os.path.dirname(filepath)
+        digest = self._hashes.get(directory)
+        if digest is None:
+            digest = self._hashes[directory] = hashlib.sha1()
+        digest.update(filepath.encode("utf-8", "surrogateescape"))
+        digest.update(b"\n")
+
+    def result(self) -> Dict[str, str]:
+        return {directory: digest.hexdigest() for directory, digest in self._hashes.items()}
+
+
+def directory_digests(filepaths: Iterable[str]) -> Dict[str, str]:
+    digests = DirectoryDigests()
+    for filepath in sorted(filepaths):
+        digests.add(filepath)
+    return digests.result()
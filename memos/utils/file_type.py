@@ -0,0 +1,124 @@
+"""Tiered file type detection for scan, sync and watch.
+
+Running the magika model on every file is by far the most expensive part of
+preparing an entity, yet nearly every file we index is a screenshot the
+recorder wrote itself. Detection therefore goes through three tiers, cheapest
+first, and only falls back to magika when the cheaper ones cannot tell:
+
+1. Files under the recorder's screenshots directory with one of the
+   extensions it writes are trusted by extension, without any I/O.
+2. Anything else has its first bytes compared against known signatures.
+3. Files no signature matches go to magika, which is loaded on first use.
+
+Labels and groups match what magika reports for the same formats, so
+entities do not change type depending on the tier that detected them.
+Results are cached by (path, size, mtime).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from memos.config import settings
+
+# Extensions the recorder writes, as (label, group).
+TRUSTED_EXTENSIONS = {
+    ".png": ("png", "image"),
+    ".jpg": ("jpeg", "image"),
+    ".jpeg": ("jpeg", "image"),
+    ".webp": ("webp", "image"),
+}
+
+# (offset, signature, label, group)
+MAGIC_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "png", "image"),
+    (0, b"\xff\xd8\xff", "jpeg", "image"),
+    (8, b"WEBP", "webp", "image"),
+    (0, b"GIF87a", "gif", "image"),
+    (0, b"GIF89a", "gif", "image"),
+    (0, b"BM", "bmp", "image"),
+    (0, b"II*\x00", "tiff", "image"),
+    (0, b"MM\x00*", "tiff", "image"),
+    (0, b"%PDF-", "pdf", "document"),
+]
+# "BM" alone is too common a prefix, so a bmp must also carry one of the
+# known DIB header sizes right after its 14-byte file header.
+BMP_DIB_HEADER_SIZES = {12, 40, 52, 56, 108, 124}
+SNIFF_BYTES = 18
+
+_magika = None
+_magika_lock = threading.Lock()
+
+
+def _get_magika():
+    global _magika
+    with _magika_lock:
+        if _magika is None:
+            from magika import Magika
+
+            _magika = Magika()
+    return _magika
+
+
+@lru_cache(maxsize=4)
+def _resolve_dir(path: str) -> Path:
+    return Path(path).expanduser().resolve()
+
+
+def _trusted_type(path: Path) -> Optional[Tuple[str, str]]:
+    file_type = TRUSTED_EXTENSIONS.get(path.suffix.lower())
+    if file_type and path.is_relative_to(
+        _resolve_dir(str(Path(settings.base_dir) / settings.screenshots_dir))
+    ):
+        return file_type
+    return None
+
+
+def _sniff_type(path: Path) -> Optional[Tuple[str, str]]:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    for offset, signature, label, group in MAGIC_SIGNATURES:
+        if head[offset : offset + len(signature)] == signature:
+            # "RIFF....WEBP": the size field sits between the two markers.
+            if label == "webp" and not head.startswith(b"RIFF"):
+                continue
+            if label == "bmp" and (
+                int.from_bytes(head[14:18], "little") not in BMP_DIB_HEADER_SIZES
+            ):
+                continue
+            return label, group
+    return None
+
+
+def _magika_type(path: Path) -> Tuple[str, str]:
+    result = _get_magika().identify_path(path)
+    return result.output.ct_label, result.output.group
+
+
+@lru_cache(maxsize=65536)
+def _detect_cached(path: str, size: int, mtime_ns: int) -> Tuple[str, str]:
+    return _detect(Path(path))
+
+
+def _detect(path: Path) -> Tuple[str, str]:
+    return _trusted_type(path) or _sniff_type(path) or _magika_type(path)
+
+
+def detect_file_type(
+    file_path, file_stat: Optional[os.stat_result] = None
+) -> Tuple[str, str]:
+    """Return (file_type, file_type_group) for a file.
+
+    Pass the file's stat result when it is already at hand to save a stat
+    call for the cache key.
+    """
+    path = Path(file_path)
+    if file_stat is None:
+        file_stat = path.stat()
+    return _detect_cached(str(path), file_stat.st_size, file_stat.st_mtime_ns)
@@ -0,0 +1,175 @@
+"""In-process cache of decoded, downscaled and encoded frames.
+
+A new screenshot is read by OCR, the VLM plugins, result reuse hashing and
+the thumbnail endpoints, each of which used to decode (and often resize and
+re-encode) the file on its own. Here a file is decoded once; every
+(mode, size) rendition and (format, quality) encoding derived from it is
+cached too. Entries are keyed by path, mtime and size, so a rewritten file
+is a miss, and evicted least-recently-used once their estimated memory
+exceeds the byte budget.
+
+Cached images are shared between callers: treat them as read-only and
+copy before drawing on or resizing them in place.
+"""
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image
+
+Size = Tuple[int, int]
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return len(value)
+
+
+class ImageCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # One lock per key being built, so concurrent callers wait for the
+        # first decode instead of repeating it.
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def _get_or_build(self, key, build):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry[0]
+                self.misses += 1
+            try:
+                value = build()
+                self._store(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def _store(self, key, value):
+        size = _nbytes(value)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    @staticmethod
+    def file_key(path) -> tuple:
+        stat = os.stat(path)
+        return os.fspath(path), stat.st_mtime_ns, stat.st_size
+
+    def image(self, path, max_size: Optional[Size] = None, mode: Optional[str] = "RGB"):
+        """The decoded image converted to `mode` (None keeps the file's own)
+        and, with `max_size`, downscaled to fit it keeping the aspect ratio."""
+        return self._image(self.file_key(path), path, max_size, mode)
+
+    def _image(self, file_key, path, max_size, mode):
+        if max_size is not None:
+            full = self._image(file_key, path, None, mode)
+            if full.width <= max_size[0] and full.height <= max_size[1]:
+                return full
+
+            def build():
+                small = full.copy()
+                small.thumbnail(max_size, Image.LANCZOS)
+                return small
+
+            return self._get_or_build((file_key, mode, tuple(max_size)), build)
+
+        if mode is not None:
+            native = self._image(file_key, path, None, None)
+            if native.mode == mode:
+                return native
+            return self._get_or_build((file_key, mode, None), lambda: native.convert(mode))
+
+        def decode():
+            with Image.open(path) as img:
+                img.load()
+                return img
+
+        return self._get_or_build((file_key, None, None), decode)
+
+    def cached(self, path, mode: Optional[str] = None):
+        """The decoded image if it is already cached, else None. Never
+        decodes, stores or reorders entries, so callers reading arbitrary
+        old files (the thumbnail endpoints) don't evict the frames the
+        plugins are about to process."""
+        key = (self.file_key(path), mode, None)
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def encoded(
+        self,
+        path,
+        max_size: Optional[Size] = None,
+        format: str = "JPEG",
+        quality: int = 75,
+        mode: Optional[str] = "RGB",
+    ) -> bytes:
+        """The image (see `image`) encoded as `format`."""
+        file_key = self.file_key(path)
+
+        def encode():
+            buffer = io.BytesIO()
+            self._image(file_key, path, max_size, mode).save(buffer, format=format, quality=quality)
+            return buffer.getvalue()
+
+        key = (file_key, mode, max_size and tuple(max_size), format, quality)
+        return self._get_or_build(key, encode)
+
+    def base64(self, path, max_size: Optional[Size] = None, format: str = "JPEG", quality: int = 75) -> str:
+        return base64.b64encode(self.encoded(path, max_size, format, quality)).decode("utf-8")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_shared: Optional[ImageCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_image_cache() -> ImageCache:
+    """The process-wide cache, sized by `image_cache_mb` in the settings."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from memos.config import settings
+
+            _shared = ImageCache(settings.image_cache_mb * 1024 * 1024)
+        return _shared
@@ -0,0 +1,371 @@
+"""Read and write screenshot metadata straight in the image container.
+
+The recorder stores its metadata as JSON in the EXIF ImageDescription tag
+(WebP, JPEG, TIFF) or in a PNG "Description" text chunk. Going through PIL
+and piexif parses the container twice and reads far more of the file than
+needed; here the file is walked chunk by chunk, seeking past everything but
+the one chunk that holds the description.
+
+Writing works the same way: new screenshots get their metadata during the
+one and only encode (save_image_with_metadata), and existing files have just
+the metadata chunk spliced out and back in (rewrite_image_metadata), so the
+pixels are never decoded or re-encoded.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, List, Optional
+
+import piexif
+from PIL.PngImagePlugin import PngInfo
+
+EXIF_EXTENSIONS = (".jpg", ".jpeg", ".tiff", ".webp")
+PNG_EXTENSIONS = (".png",)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+EXIF_PREFIX = b"Exif\x00\x00"
+IMAGE_DESCRIPTION_TAG = 0x010E
+PNG_DESCRIPTION_KEY = b"Description"
+
+
+class MetadataFormatError(ValueError):
+    pass
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise MetadataFormatError("unexpected end of file")
+    return data
+
+
+def _tiff_image_description(tiff: bytes) -> Optional[bytes]:
+    """ImageDescription from IFD0 of a TIFF structure (the EXIF payload)."""
+    if tiff.startswith(EXIF_PREFIX):
+        tiff = tiff[len(EXIF_PREFIX) :]
+    if tiff[:4] == b"II*\x00":
+        endian = "<"
+    elif tiff[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        raise MetadataFormatError("EXIF payload is not a TIFF structure")
+
+    (ifd_offset,) = struct.unpack_from(endian + "I", tiff, 4)
+    (entry_count,) = struct.unpack_from(endian + "H", tiff, ifd_offset)
+    for i in range(entry_count):
+        tag, _, count, value = struct.unpack_from(
+            endian + "HHI4s", tiff, ifd_offset + 2 + i * 12
+        )
+        if tag != IMAGE_DESCRIPTION_TAG:
+            continue
+        if count <= 4:
+            data = value[:count]
+        else:
+            (offset,) = struct.unpack(endian + "I", value)
+            data = tiff[offset : offset + count]
+            if len(data) != count:
+                raise MetadataFormatError("ImageDescription runs past the EXIF data")
+        return data.rstrip(b"\x00")
+    return None
+
+
+def _webp_exif(f: BinaryIO) -> Optional[bytes]:
+    header = _read_exact(f, 12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+        raise MetadataFormatError("not a WebP file")
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        fourcc, size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+        if fourcc == b"EXIF":
+            return _read_exact(f, size)
+        # Chunks are padded to an even size.
+        f.seek(size + (size & 1), 1)
+
+
+def _jpeg_exif(f: BinaryIO) -> Optional[bytes]:
+    if _read_exact(f, 2) != b"\xff\xd8":
+        raise MetadataFormatError("not a JPEG file")
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        # Start of scan: image data follows, no more metadata segments.
+        if marker[1] == 0xDA:
+            return None
+        (size,) = struct.unpack(">H", _read_exact(f, 2))
+        if marker[1] == 0xE1:
+            segment = _read_exact(f, size - 2)
+            if segment.startswith(EXIF_PREFIX):
+                return segment
+        else:
+            f.seek(size - 2, 1)
+
+
+def _png_description(f: BinaryIO) -> Optional[bytes]:
+    if _read_exact(f, 8) != PNG_SIGNATURE:
+        raise MetadataFormatError("not a PNG file")
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return None
+        size, chunk_type = struct.unpack(">I4s", chunk_header)
+        # Like PIL's open(), only text chunks ahead of the image data count.
+        if chunk_type in (b"IDAT", b"IEND"):
+            return None
+        if chunk_type not in (b"tEXt", b"zTXt", b"iTXt"):
+            f.seek(size + 4, 1)  # data + CRC
+            continue
+        data = _read_exact(f, size)
+        f.seek(4, 1)
+        keyword, _, rest = data.partition(b"\x00")
+        if keyword != PNG_DESCRIPTION_KEY:
+            continue
+        if chunk_type == b"tEXt":
+            return rest
+        if chunk_type == b"zTXt":
+            return zlib.decompress(rest[1:])
+        # iTXt: compression flag, method, language tag, translated keyword, text
+        compressed, text = rest[0], rest[2:].split(b"\x00", 2)[2]
+        return zlib.decompress(text) if compressed else text
+
+
+def read_image_description(image_path) -> Optional[bytes]:
+    """Raw metadata description stored in the image, or None if it has none."""
+    image_path_str = str(image_path)
+    lower = image_path_str.lower()
+    with open(image_path_str, "rb") as f:
+        if lower.endswith(PNG_EXTENSIONS):
+            return _png_description(f)
+        if lower.endswith(".webp"):
+            exif = _webp_exif(f)
+        elif lower.endswith(".tiff"):
+            exif = f.read()
+        else:
+            exif = _jpeg_exif(f)
+    return _tiff_image_description(exif) if exif else None
+
+
+def read_image_metadata(image_path) -> Optional[dict]:
+    """Decoded metadata, {} for images without any, None when it cannot be
+    read (unsupported format, malformed container or JSON)."""
+    image_path_str = str(image_path)
+    lower = image_path_str.lower()
+    if lower.endswith(EXIF_EXTENSIONS):
+        kind = "EXIF"
+    elif lower.endswith(PNG_EXTENSIONS):
+        kind = "PNG"
+    else:
+        print(f"Unsupported file format: {image_path_str}")
+        return None
+
+    try:
+        description = read_image_description(image_path_str)
+        if description is None:
+            return {}
+        return json.loads(description.decode("utf-8"))
+    except (OSError, ValueError, struct.error, zlib.error, IndexError) as e:
+        print(f"Error decoding {kind} metadata for {image_path_str}: {e}")
+        return None
+
+
+def read_images_metadata(
+    image_paths: Iterable, max_workers: int = 8
+) -> List[Optional[dict]]:
+    """read_image_metadata for many paths, in order. The reads are small and
+    I/O-bound, so they are spread over a thread pool."""
+    image_paths = list(image_paths)
+    if max_workers <= 1 or len(image_paths) <= 1:
+        return [read_image_metadata(path) for path in image_paths]
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(image_paths)),
+        thread_name_prefix="image-metadata",
+    ) as executor:
+        return list(executor.map(read_image_metadata, image_paths))
+
+
+def _exif_bytes(metadata: dict) -> bytes:
+    """EXIF block (with the Exif\\0\\0 prefix) holding only the description."""
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    exif_dict["0th"][piexif.ImageIFD.ImageDescription] = json.dumps(metadata).encode(
+        "utf-8"
+    )
+    return piexif.dump(exif_dict)
+
+
+def save_image_with_metadata(img, image_path, metadata: dict, **save_kwargs):
+    """img.save(image_path, **save_kwargs) with the metadata embedded in the
+    same encode."""
+    lower = str(image_path).lower()
+    fmt = str(save_kwargs.get("format", "")).lower()
+    if lower.endswith(PNG_EXTENSIONS) or fmt == "png":
+        pnginfo = PngInfo()
+        pnginfo.add_text("Description", json.dumps(metadata))
+        save_kwargs["pnginfo"] = pnginfo
+    else:
+        save_kwargs["exif"] = _exif_bytes(metadata)
+    img.save(image_path, **save_kwargs)
+
+
+def _chunk(fourcc: bytes, data: bytes) -> bytes:
+    return fourcc + struct.pack("<I", len(data)) + data + b"\x00" * (len(data) & 1)
+
+
+def _webp_canvas(fourcc: bytes, data: bytes):
+    """(width, height, has_alpha) from a VP8/VP8L bitstream header."""
+    if fourcc == b"VP8 ":
+        if data[3:6] != b"\x9d\x01\x2a":
+            raise MetadataFormatError("bad VP8 frame header")
+        width, height = struct.unpack_from("<HH", data, 6)
+        return width & 0x3FFF, height & 0x3FFF, False
+    if data[:1] != b"\x2f":
+        raise MetadataFormatError("bad VP8L signature")
+    (bits,) = struct.unpack_from("<I", data, 1)
+    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+
+
+def _rewrite_webp(content: bytes, exif: bytes) -> bytes:
+    if content[:4] != b"RIFF" or content[8:12] != b"WEBP":
+        raise MetadataFormatError("not a WebP file")
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(content):
+        fourcc = content[pos : pos + 4]
+        (size,) = struct.unpack_from("<I", content, pos + 4)
+        chunks.append((fourcc, content[pos + 8 : pos + 8 + size]))
+        pos += 8 + size + (size & 1)
+
+    chunks = [(fourcc, data) for fourcc, data in chunks if fourcc != b"EXIF"]
+    if chunks and chunks[0][0] == b"VP8X":
+        flags = chunks[0][1][0] | 0x08
+        chunks[0] = (b"VP8X", bytes([flags]) + chunks[0][1][1:])
+    else:
+        # Simple format (a lone VP8/VP8L chunk) cannot carry EXIF; switch to
+        # the extended format, whose VP8X header repeats the canvas size.
+        fourcc, data = chunks[0]
+        width, height, has_alpha = _webp_canvas(fourcc, data)
+        flags = 0x08 | (0x10 if has_alpha else 0)
+        vp8x = (
+            bytes([flags, 0, 0, 0])
+            + (width - 1).to_bytes(3, "little")
+            + (height - 1).to_bytes(3, "little")
+        )
+        chunks.insert(0, (b"VP8X", vp8x))
+
+    # EXIF goes after the image data, ahead of any XMP chunk.
+    xmp = [i for i, (fourcc, _) in enumerate(chunks) if fourcc == b"XMP "]
+    chunks.insert(xmp[0] if xmp else len(chunks), (b"EXIF", exif))
+
+    body = b"WEBP" + b"".join(_chunk(fourcc, data) for fourcc, data in chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def _rewrite_png(content: bytes, description: str) -> bytes:
+    if not content.startswith(PNG_SIGNATURE):
+        raise MetadataFormatError("not a PNG file")
+    try:
+        text_chunk = _png_chunk(
+            b"tEXt", PNG_DESCRIPTION_KEY + b"\x00" + description.encode("latin-1")
+        )
+    except UnicodeEncodeError:
+        text_chunk = _png_chunk(
+            b"iTXt",
+            PNG_DESCRIPTION_KEY + b"\x00\x00\x00\x00\x00" + description.encode("utf-8"),
+        )
+
+    out = [PNG_SIGNATURE]
+    pos = len(PNG_SIGNATURE)
+    inserted = False
+    while pos + 8 <= len(content):
+        size, chunk_type = struct.unpack_from(">I4s", content, pos)
+        end = pos + 12 + size
+        if chunk_type in (b"tEXt", b"zTXt", b"iTXt") and content[
+            pos + 8 : pos + 8 + size
+        ].startswith(PNG_DESCRIPTION_KEY + b"\x00"):
+            pos = end
+            continue
+        if chunk_type == b"IDAT" and not inserted:
+            out.append(text_chunk)
+            inserted = True
+        out.append(content[pos:end])
+        pos = end
+    if not inserted:
+        raise MetadataFormatError("PNG has no image data")
+    return b"".join(out)
+
+
+def _rewrite_jpeg(content: bytes, exif: bytes) -> bytes:
+    if not content.startswith(b"\xff\xd8"):
+        raise MetadataFormatError("not a JPEG file")
+    if len(exif) + 2 > 0xFFFF:
+        raise MetadataFormatError("metadata too large for a JPEG APP1 segment")
+    segments = []
+    pos = 2
+    while True:
+        if pos + 4 > len(content):
+            raise MetadataFormatError("JPEG ends before its image data")
+        if content[pos] != 0xFF:
+            raise MetadataFormatError("bad JPEG marker")
+        marker = content[pos + 1]
+        if marker == 0xDA:
+            break
+        (size,) = struct.unpack_from(">H", content, pos + 2)
+        if size < 2 or pos + 2 + size > len(content):
+            raise MetadataFormatError("JPEG segment runs past the end of file")
+        segment = content[pos : pos + 2 + size]
+        if not (marker == 0xE1 and segment[4:].startswith(EXIF_PREFIX)):
+            segments.append((marker, segment))
+        pos += 2 + size
+
+    app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    # A JFIF APP0 segment has to stay first.
+    index = 1 if segments and segments[0][0] == 0xE0 else 0
+    segments.insert(index, (0xE1, app1))
+    return b"\xff\xd8" + b"".join(segment for _, segment in segments) + content[pos:]
+
+
+def rewrite_image_metadata(image_path, metadata: dict) -> bool:
+    """Replace the metadata of a WebP, PNG or JPEG file without touching its
+    pixels. The file is replaced atomically. Returns False for formats that
+    cannot be rewritten this way."""
+    image_path_str = str(image_path)
+    lower = image_path_str.lower()
+    with open(image_path_str, "rb") as f:
+        content = f.read()
+    if lower.endswith(".webp"):
+        content = _rewrite_webp(content, _exif_bytes(metadata)[len(EXIF_PREFIX) :])
+    elif lower.endswith(PNG_EXTENSIONS):
+        content = _rewrite_png(content, json.dumps(metadata))
+    elif lower.endswith((".jpg", ".jpeg")):
+        content = _rewrite_jpeg(content, _exif_bytes(metadata))
+    else:
+        return False
+
+    directory, name = os.path.split(os.path.abspath(image_path_str))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        # mkstemp creates the file 0600; keep the screenshot's own mode.
+        shutil.copymode(image_path_str, tmp_path)
+        os.replace(tmp_path, image_path_str)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
@@ -0,0 +1,88 @@
+"""Cheap detection of screenshots with little to read or describe.
+
+Locked screens, blank desktops, loading spinners and video playback cost as
+much OCR and VLM time as a page of text. A frame is scored on a small
+grayscale copy by:
+
+- edge density: the share of pixels with a sharp step to a neighbour,
+  which text and UI chrome produce and smooth video or wallpaper does not;
+- entropy of the gray-level histogram;
+- dominant-color ratio: the share of the most common (quantized) color.
+
+A frame is low-info when it has almost no sharp edges (blank screens,
+spinners), or when it has few sharp edges over smooth, varied imagery
+(video, wallpaper, lock screens) -- the histogram entropy tells that imagery
+apart from sparse text on a plain background, which has few edges too. The
+dominant-color ratio is recorded but does not decide on its own: a terminal
+or editor with a line or two of text is almost all background as well.
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+ANALYSIS_SIZE = (256, 256)
+# Gray-level step that counts as an edge. Small, dim text (light gray on a
+# dark terminal) keeps little more than this once scaled down.
+EDGE_STEP = 32
+
+LOW_INFO_TAG = "low_info"
+FRAME_INFO_KEY = "frame_info"
+
+
+class FrameInfo(NamedTuple):
+    edge_density: float
+    entropy: float
+    dominant_ratio: float
+
+    def is_low_info(self, thresholds) -> bool:
+        """`thresholds` is a LowInfoSettings."""
+        return (
+            self.edge_density < thresholds.min_edge_density
+            or (
+                self.edge_density < thresholds.media_edge_density
+                and self.entropy > thresholds.media_entropy
+            )
+        )
+
+    def as_metadata(self, low_info: bool) -> dict:
+        return {
+            "edge_density": round(self.edge_density, 4),
+            "entropy": round(self.entropy, 3),
+            "dominant_ratio": round(self.dominant_ratio, 4),
+            "low_info": low_info,
+        }
+
+
+def frame_info(img: Image.Image) -> FrameInfo:
+    """Score a freshly opened image (a JPEG is decoded at reduced scale)."""
+    img.draft("RGB", ANALYSIS_SIZE)
+    small = img.convert("RGB")
+    small.thumbnail(ANALYSIS_SIZE)
+    rgb = np.asarray(small)
+    gray = np.asarray(small.convert("L"), dtype=np.int16)
+
+    steps = np.zeros(gray.shape, dtype=bool)
+    steps[:, 1:] |= np.abs(np.diff(gray, axis=1)) > EDGE_STEP
+    steps[1:, :] |= np.abs(np.diff(gray, axis=0)) > EDGE_STEP
+    edge_density = float(steps.mean())
+
+    histogram = np.bincount(gray.ravel(), minlength=256) / gray.size
+    nonzero = histogram[histogram > 0]
+    entropy = max(0.0, float(-(nonzero * np.log2(nonzero)).sum()))
+
+    # 4 bits per channel: JPEG noise and anti-aliasing fall into one bucket.
+    quantized = rgb >> 4
+    codes = (quantized[..., 0].astype(np.int32) << 8) | (quantized[..., 1] << 4) | quantized[..., 2]
+    dominant_ratio = float(np.bincount(codes.ravel()).max() / codes.size)
+
+    return FrameInfo(edge_density, entropy, dominant_ratio)
+
+
+def read_frame_info(image_path) -> Optional[FrameInfo]:
+    """FrameInfo of an image file, or None if it cannot be decoded."""
+    try:
+        with Image.open(image_path) as img:
+            return frame_info(img)
+    except Exception:
+        return None
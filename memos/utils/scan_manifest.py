@@ -0,0 +1,205 @@
+"""Per-directory manifests that let `memos scan` skip unchanged directories.
+
+A scan used to walk the whole folder, resolve every path and re-read every
+file's stat, file type and EXIF, even in daily screenshot directories that
+have not changed in months. The manifest remembers, for each directory under
+a library folder, its mtime, its subdirectories and the (size, mtime) of each
+candidate file. On the next scan a directory whose mtime is unchanged is not
+listed at all (its files come from the manifest), and in listed directories
+only new or changed files are handed on to be prepared.
+
+Adding, removing or renaming an entry bumps its directory's mtime. Rewriting
+a file in place does not, so such edits inside otherwise untouched
+directories are only picked up by a full scan.
+
+A manifest also records the identity of the server-side folder it was built
+against (its creation time). A library or folder recreated with the same ids,
+e.g. after the database was reset, does not match and starts from scratch.
+It also keeps the server's digest of each directory's entity paths (see
+memos.utils.directory_digest) as of the last scan; a directory whose digest
+has changed since, e.g. because entities were deleted on the server, has all
+its files checked again.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from memos.config import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# A directory modified this close to the moment it was listed may still have
+# been changing within the filesystem's mtime granularity; list it again.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def manifest_path(library_id: int, folder_id: int) -> Path:
+    return (
+        settings.resolved_base_dir
+        / "scan_manifests"
+        / f"library-{library_id}-folder-{folder_id}.json"
+    )
+
+
+@dataclass
+class ScanPlan:
+    # Every candidate file under the scanned root, changed or not.
+    candidate_files: List[str] = field(default_factory=list)
+    # The subset that is new or changed since the last scan.
+    changed_files: List[str] = field(default_factory=list)
+    dirs_listed: int = 0
+    dirs_skipped: int = 0
+
+
+class ScanManifest:
+    def __init__(
+        self,
+        path: Path,
+        dirs: Dict[str, dict] | None = None,
+        identity: Optional[str] = None,
+        server_digests: Dict[str, str] | None = None,
+    ):
+        self.path = path
+        self.dirs: Dict[str, dict] = dirs or {}
+        self.identity = identity
+        self.server_digests: Dict[str, str] = server_digests or {}
+
+    @classmethod
+    def load(cls, path: Path, identity: Optional[str] = None) -> "ScanManifest":
+        """The manifest at `path`, or an empty one when it was written for a
+        different server-side folder than `identity`."""
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return cls(path, identity=identity)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable scan manifest %s: %s", path, e)
+            return cls(path, identity=identity)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path, identity=identity)
+        if data.get("identity") != identity:
+            logger.info("Ignoring scan manifest %s of a different folder", path)
+            return cls(path, identity=identity)
+        return cls(path, data.get("dirs", {}), identity, data.get("server_digests", {}))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION,
+                    "identity": self.identity,
+                    "dirs": self.dirs,
+                    "server_digests": {
+                        dirpath: digest
+                        for dirpath, digest in self.server_digests.items()
+                        if dirpath in self.dirs
+                    },
+                },
+                separators=(",", ":"),
+            )
+        )
+        os.replace(tmp_path, self.path)
+
+    def walk(
+        self, root: Path, include: Callable[[str], bool], full: bool = False
+    ) -> ScanPlan:
+        """Collect candidate files under `root` and record the tree.
+
+        Directories unchanged since the last walk are not listed; with `full`
+        every directory is listed and every file is reported as changed. Like
+        os.walk, symlinked directories are not followed.
+        """
+        root = root.resolve()
+        plan = ScanPlan()
+        seen: Dict[str, dict] = {}
+        stack = [str(root)]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                dir_mtime_ns = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+
+            old = self.dirs.get(dirpath)
+            if (
+                not full
+                and old is not None
+                and old["mtime_ns"] == dir_mtime_ns
+                and dir_mtime_ns < old["listed_at_ns"] - RACY_WINDOW_NS
+            ):
+                plan.dirs_skipped += 1
+                seen[dirpath] = old
+                plan.candidate_files.extend(
+                    os.path.join(dirpath, name) for name in old["files"]
+                )
+                stack.extend(os.path.join(dirpath, name) for name in old["subdirs"])
+                continue
+
+            plan.dirs_listed += 1
+            entry = self._list_dir(dirpath, dir_mtime_ns, include)
+            if entry is None:
+                continue
+            seen[dirpath] = entry
+            old_files = {} if full or old is None else old["files"]
+            for name, stat in entry["files"].items():
+                filepath = os.path.join(dirpath, name)
+                plan.candidate_files.append(filepath)
+                if old_files.get(name) != stat:
+                    plan.changed_files.append(filepath)
+            stack.extend(os.path.join(dirpath, name) for name in entry["subdirs"])
+
+        # Directories under root that were not reached no longer exist.
+        prefix = str(root) + os.sep
+        self.dirs = {
+            dirpath: entry
+            for dirpath, entry in self.dirs.items()
+            if dirpath != str(root) and not dirpath.startswith(prefix)
+        }
+        self.dirs.update(seen)
+        return plan
+
+    def _list_dir(
+        self, dirpath: str, dir_mtime_ns: int, include: Callable[[str], bool]
+    ) -> dict | None:
+        listed_at_ns = time.time_ns()
+        subdirs, files = [], {}
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                subdirs.append(entry.name)
+                        elif include(entry.name):
+                            stat = entry.stat()
+                            files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning("Could not list %s: %s", dirpath, e)
+            return None
+        return {
+            "mtime_ns": dir_mtime_ns,
+            "listed_at_ns": listed_at_ns,
+            "subdirs": subdirs,
+            "files": files,
+        }
+
+    def forget(self, filepath: str):
+        """Make the next walk list `filepath`'s directory and treat the file
+        as changed, e.g. after it failed to be indexed."""
+        dirpath, name = os.path.split(filepath)
+        entry = self.dirs.get(dirpath)
+        if entry is not None:
+            entry["mtime_ns"] = None
+            entry["files"].pop(name, None)
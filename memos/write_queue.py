@@ -0,0 +1,151 @@
+"""Single-writer queue for entity writes.
+
+SQLite allows one writer at a time; with every request holding its own pooled
+connection, concurrent plugin PATCHes, scan PUTs and entity creates spin on
+the database lock inside the busy timeout. WriteQueue instead owns the only
+writer connection and runs queued write callables on one thread. Writes that
+arrive while a transaction is open are group-committed: up to `batch_size`
+callables share one BEGIN IMMEDIATE ... COMMIT, each inside its own savepoint
+so a failing write is rolled back without taking its batch down with it.
+
+Each callable gets a Session; crud functions that commit only release their
+savepoint, and the result is handed back once the whole batch has committed.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, engine: Engine, batch_size: int = 32):
+        self.engine = engine
+        self.batch_size = max(1, batch_size)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.writes_total = 0
+        self.batches_total = 0
+        # Time spent waiting for the database write lock (BEGIN IMMEDIATE),
+        # and time writes spent queued behind other writes.
+        self.lock_wait_seconds_total = 0.0
+        self.lock_wait_seconds_max = 0.0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+
+    def submit(self, fn: WriteFn) -> concurrent.futures.Future:
+        """Queue `fn(db)` and return a future resolved after its batch has
+        committed. The writer thread is started on first use."""
+        self._ensure_started()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._queue.put((fn, future, time.monotonic()))
+        return future
+
+    async def run(self, fn: WriteFn) -> Any:
+        """Run `fn(db)` on the writer thread and return its result.
+
+        `fn` must commit its own changes, as the crud functions do: the
+        session runs inside a savepoint, and whatever `fn` leaves
+        uncommitted is rolled back with it when the session closes. An
+        exception raised by `fn` rolls back its savepoint and is raised
+        here; the rest of the batch still commits."""
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def pending_count(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="write-queue", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self):
+        """Drain queued writes and stop the writer thread."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _next_batch(self) -> Tuple[List[tuple], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        with self.engine.connect() as conn:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._commit_batch(conn, batch)
+                if stopping:
+                    return
+
+    def _commit_batch(self, conn, batch: List[tuple]):
+        started = time.monotonic()
+        for _, _, queued_at in batch:
+            wait = started - queued_at
+            self.queue_wait_seconds_total += wait
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, wait)
+
+        results = []
+        try:
+            t0 = time.perf_counter()
+            transaction = conn.begin()
+            lock_wait = time.perf_counter() - t0
+            self.lock_wait_seconds_total += lock_wait
+            self.lock_wait_seconds_max = max(self.lock_wait_seconds_max, lock_wait)
+
+            for fn, _, _ in batch:
+                with Session(
+                    bind=conn,
+                    join_transaction_mode="create_savepoint",
+                    autoflush=False,
+                ) as db:
+                    try:
+                        results.append((fn(db), None))
+                    except Exception as e:
+                        results.append((None, e))
+            transaction.commit()
+        except Exception as e:
+            logger.error("Group commit of %d writes failed: %s", len(batch), e)
+            if conn.in_transaction():
+                conn.rollback()
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.writes_total += len(batch)
+        self.batches_total += 1
+        for (_, future, _), (result, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,82 @@
+"""Shared fixtures: an in-memory database and a seeded record library."""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from memos.models import (
+    Base,
+    EntityModel,
+    FolderModel,
+    LibraryModel,
+    LibraryPluginModel,
+    PluginModel,
+)
+from memos.schemas import FolderType, LibraryKind
+
+
+@pytest.fixture
+def engine():
+    eng = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def seeded(Session):
+    """One record library with two bound plugins and three entities."""
+    with Session() as db:
+        lib = LibraryModel(name="shots", kind=LibraryKind.RECORD)
+        db.add(lib)
+        db.flush()
+        folder = FolderModel(
+            library_id=lib.id,
+            path="/tmp",
+            type=FolderType.DEFAULT,
+            last_modified_at=datetime.now(timezone.utc),
+        )
+        db.add(folder)
+        db.flush()
+        plugin_ids = []
+        for name in ("ocr", "vlm"):
+            p = PluginModel(name=name, webhook_url=f"/api/plugins/{name}")
+            db.add(p)
+            db.flush()
+            db.add(LibraryPluginModel(library_id=lib.id, plugin_id=p.id))
+            plugin_ids.append(p.id)
+        entity_ids = []
+        for i in range(3):
+            now = datetime.now(timezone.utc)
+            ent = EntityModel(
+                filepath=f"/tmp/e{i}.png",
+                filename=f"e{i}.png",
+                size=1,
+                file_created_at=now,
+                file_last_modified_at=now,
+                file_type="png",
+                file_type_group="image",
+                library_id=lib.id,
+                folder_id=folder.id,
+            )
+            db.add(ent)
+            db.flush()
+            entity_ids.append(ent.id)
+        db.commit()
+        return {
+            "library_id": lib.id,
+            "folder_id": folder.id,
+            "plugin_ids": plugin_ids,
+            "entity_ids": entity_ids,
+        }
@@ -0,0 +1,94 @@
+"""Connection setup cost: shared jieba dictionary, pool sizing, pre-warming."""
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from memos.config import SQLiteSettings
+from memos.databases import initializers
+from memos.databases.initializers import (
+    create_db_initializer,
+    load_sqlite_extensions,
+    prewarm_engine,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.loaded = []
+        self.executed = []
+
+    def enable_load_extension(self, enabled):
+        pass
+
+    def load_extension(self, path, *args, **kwargs):
+        self.loaded.append(str(path))
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+
+class FakeSettings:
+    is_sqlite = True
+    sqlite = SQLiteSettings()
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+
+
+def test_jieba_dictionary_loaded_once_per_process(monkeypatch):
+    monkeypatch.setattr(initializers, "_jieba_dict_loaded", False)
+    first, second = FakeConnection(), FakeConnection()
+
+    load_sqlite_extensions(first)
+    load_sqlite_extensions(second)
+
+    # Each connection still registers the tokenizer and sqlite-vec...
+    assert len(first.loaded) == len(second.loaded) == 2
+    # ...but only the first one reloads the dictionary files.
+    assert sum("jieba_dict" in sql for sql in first.executed) == 1
+    assert not any("jieba_dict" in sql for sql in second.executed)
+
+
+def test_sqlite_pool_keeps_connections(tmp_path):
+    engine, _ = create_db_initializer(FakeSettings(f"sqlite:///{tmp_path / 'db.sqlite'}"))
+    assert engine.pool.size() == 30
+    assert engine.pool._max_overflow == 0
+    assert engine.pool._recycle == -1
+    engine.dispose()
+
+
+@pytest.fixture
+def counted_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'db.sqlite'}", pool_size=4, max_overflow=0
+    )
+    connects = []
+
+    @event.listens_for(engine, "connect")
+    def setup(dbapi_conn, connection_record):
+        # Stands in for loading the tokenizer and vector extensions.
+        connects.append(dbapi_conn)
+
+    yield engine, connects
+    engine.dispose()
+
+
+def run_query(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def test_first_query_pays_setup_without_prewarm(counted_engine):
+    engine, connects = counted_engine
+    run_query(engine)
+    assert len(connects) == 1
+
+
+def test_prewarmed_pool_serves_first_queries_without_setup(counted_engine):
+    engine, connects = counted_engine
+    prewarm_engine(engine, 4)
+    assert len(connects) == 4
+
+    for _ in range(8):
+        run_query(engine)
+    # Nothing was closed and reopened.
+    assert len(connects) == 4
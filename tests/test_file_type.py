@@ -0,0 +1,99 @@
+"""Tiered file type detection: extension, magic bytes, then magika."""
+import io
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+from memos.config import settings
+from memos.utils import file_type
+from memos.utils.file_type import detect_file_type
+
+def image_bytes(fmt):
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 32), (10, 200, 30)).save(buf, fmt)
+    return buf.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    file_type._detect_cached.cache_clear()
+    yield
+    file_type._detect_cached.cache_clear()
+
+
+def test_recorder_output_is_trusted_by_extension(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "base_dir", str(tmp_path))
+    screenshot = tmp_path / settings.screenshots_dir / "20241101" / "a.webp"
+    screenshot.parent.mkdir(parents=True)
+    screenshot.write_bytes(b"not even an image")
+
+    monkeypatch.setattr(file_type, "_sniff_type", pytest.fail)
+    assert detect_file_type(screenshot) == ("webp", "image")
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "JPEG", "WEBP", "GIF", "BMP", "TIFF"])
+def test_magic_bytes_agree_with_magika(tmp_path, fmt):
+    path = tmp_path / "no-extension"
+    path.write_bytes(image_bytes(fmt))
+
+    sniffed = file_type._sniff_type(path)
+    assert sniffed is not None
+    assert sniffed == file_type._magika_type(path)
+
+
+def test_ambiguous_files_fall_back_to_magika(tmp_path):
+    path = tmp_path / "notes.png"
+    path.write_text("plain text that merely ends in .png\n" * 20)
+    assert detect_file_type(path) == file_type._magika_type(path)
+    assert detect_file_type(path)[1] != "image"
+
+
+@pytest.mark.parametrize(
+    "content", ["BMW,Munich,1916\nAudi,Ingolstadt,1909\n", "BM is not a bitmap\n"]
+)
+def test_text_starting_with_bm_is_not_a_bitmap(tmp_path, content):
+    path = tmp_path / "cars.csv"
+    path.write_text(content * 20)
+    assert file_type._sniff_type(path) is None
+
+
+def test_results_are_cached_by_path_size_and_mtime(tmp_path, monkeypatch):
+    path = tmp_path / "a.png"
+    path.write_bytes(image_bytes("PNG"))
+    calls = []
+    sniff = file_type._sniff_type
+    monkeypatch.setattr(
+        file_type, "_sniff_type", lambda p: calls.append(p) or sniff(p)
+    )
+
+    assert detect_file_type(path) == ("png", "image")
+    assert detect_file_type(path, path.stat()) == ("png", "image")
+    assert len(calls) == 1
+
+    path.write_bytes(image_bytes("JPEG"))
+    assert detect_file_type(path) == ("jpeg", "image")
+    assert len(calls) == 2
+
+
+def test_magika_is_not_loaded_at_import():
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, memos.cmds.library; print('magika' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip().endswith("False")
+
+
+def test_folder_of_images_never_reaches_magika(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_type, "_magika_type", pytest.fail)
+    for i, fmt in enumerate(["PNG", "JPEG", "WEBP", "GIF"] * 5):
+        path = tmp_path / f"{i}.{fmt.lower()}"
+        path.write_bytes(image_bytes(fmt))
+        assert detect_file_type(path)[1] == "image"
@@ -0,0 +1,192 @@
+"""Keyset pagination of folder entity listings."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from memos import crud
+from memos.models import Base, EntityModel, FolderModel, LibraryModel
+from memos.schemas import FolderType
+from memos.server import api_router, app, get_read_db
+
+
+def seed(Session, count, same_ts_every=1):
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session() as db:
+        lib = LibraryModel(name="lib")
+        db.add(lib)
+        db.flush()
+        folder = FolderModel(
+            library_id=lib.id,
+            path="/data",
+            type=FolderType.DEFAULT,
+            last_modified_at=base,
+        )
+        db.add(folder)
+        db.flush()
+        rows = [
+            {
+                "filepath": f"/data/{i}.png",
+                "filename": f"{i}.png",
+                "size": 1,
+                # Groups of same_ts_every entities share a timestamp.
+                "file_created_at": base + timedelta(seconds=i // same_ts_every),
+                "file_last_modified_at": base,
+                "file_type": "png",
+                "file_type_group": "image",
+                "library_id": lib.id,
+                "folder_id": folder.id,
+            }
+            for i in range(count)
+        ]
+        db.execute(insert(EntityModel), rows)
+        db.commit()
+        return lib.id, folder.id
+
+
+@pytest.fixture
+def Session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def keyset_pass(db, library_id, folder_id, limit, order_by="id:asc", on_page=None):
+    seen = []
+    after_id = after_ts = None
+    while True:
+        entities, total = crud.get_entities_of_folder(
+            library_id,
+            folder_id,
+            db,
+            limit=limit,
+            order_by=order_by,
+            after_id=after_id,
+            after_ts=after_ts,
+            with_count=False,
+        )
+        assert total is None
+        if not entities:
+            return seen
+        seen.extend(e.id for e in entities)
+        if on_page:
+            on_page(entities)
+        after_id = entities[-1].id
+        after_ts = getattr(entities[-1], order_by.split(":")[0])
+
+
+def test_keyset_by_id_visits_every_entity_once(Session):
+    library_id, folder_id = seed(Session, 25)
+    with Session() as db:
+        seen = keyset_pass(db, library_id, folder_id, limit=7)
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == 25
+
+
+def test_keyset_by_timestamp_handles_ties(Session):
+    library_id, folder_id = seed(Session, 25, same_ts_every=4)
+    with Session() as db:
+        seen = keyset_pass(
+            db, library_id, folder_id, limit=3, order_by="file_created_at:desc"
+        )
+    assert len(seen) == len(set(seen)) == 25
+
+
+def delete_entities(db, entity_ids):
+    db.query(EntityModel).filter(EntityModel.id.in_(entity_ids)).delete()
+    db.commit()
+
+
+def test_keyset_pass_does_not_skip_rows_deleted_behind_it(Session):
+    library_id, folder_id = seed(Session, 20)
+    with Session() as db:
+        # Delete every page as soon as it has been read, like check_deleted_files.
+        seen = keyset_pass(
+            db,
+            library_id,
+            folder_id,
+            limit=5,
+            on_page=lambda page: delete_entities(db, [e.id for e in page]),
+        )
+    assert len(seen) == 20
+
+
+def test_keyset_rejects_unsupported_order(Session):
+    library_id, folder_id = seed(Session, 3)
+    with Session() as db:
+        with pytest.raises(ValueError):
+            crud.get_entities_of_folder(
+                library_id, folder_id, db, order_by="filename:asc", after_id=1
+            )
+        with pytest.raises(ValueError):
+            crud.get_entities_of_folder(
+                library_id, folder_id, db, order_by="file_created_at:asc", after_id=1
+            )
+
+
+def test_route_count_free_mode(Session, monkeypatch):
+    library_id, folder_id = seed(Session, 5)
+
+    def override():
+        with Session() as db:
+            yield db
+
+    monkeypatch.setitem(api_router.dependency_overrides, get_read_db, override)
+    client = TestClient(app)
+    url = f"/api/libraries/{library_id}/folders/{folder_id}/entities"
+
+    response = client.get(url, params={"limit": 2, "order_by": "id:asc"})
+    assert response.headers["X-Total-Count"] == "5"
+    first_page = response.json()
+
+    response = client.get(
+        url,
+        params={
+            "limit": 2,
+            "order_by": "id:asc",
+            "after_id": first_page[-1]["id"],
+            "count": False,
+        },
+    )
+    assert "X-Total-Count" not in response.headers
+    assert [e["id"] for e in response.json()] == [3, 4]
+
+
+def test_full_folder_pass_only_counts_with_offset_paging(Session):
+    library_id, folder_id = seed(Session, 50)
+    limit = 10
+    counts = []
+
+    with Session() as db:
+        event.listen(
+            db.get_bind(),
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: counts.append(statement)
+            if "count(" in statement.lower()
+            else None,
+        )
+        offset, offset_seen = 0, 0
+        while True:
+            entities, _ = crud.get_entities_of_folder(
+                library_id, folder_id, db, limit=limit, offset=offset, order_by="id:asc"
+            )
+            if not entities:
+                break
+            offset_seen += len(entities)
+            offset += limit
+        offset_counts = len(counts)
+
+        keyset_seen = len(keyset_pass(db, library_id, folder_id, limit=limit))
+
+    assert offset_seen == keyset_seen == 50
+    # Offset paging re-counts the folder for every page; keyset never does.
+    assert offset_counts == 50 // limit + 1
+    assert len(counts) == offset_counts
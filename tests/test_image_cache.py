@@ -0,0 +1,154 @@
+"""Shared cache of decoded, downscaled and encoded frames."""
+import base64
+import io
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from memos.utils import image_cache as image_cache_module
+from memos.utils.image_cache import ImageCache
+
+
+@pytest.fixture
+def opens(monkeypatch):
+    """Count the files the cache decodes."""
+    calls = []
+    real_open = Image.open
+
+    def counting_open(path, *args, **kwargs):
+        if isinstance(path, (str, os.PathLike)):
+            calls.append(os.fspath(path))
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(image_cache_module.Image, "open", counting_open)
+    return calls
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    cache = ImageCache(64 * 1024 * 1024)
+    monkeypatch.setattr(image_cache_module, "_shared", cache)
+    return cache
+
+
+def frame(path, size=(2400, 1500), color=(30, 90, 200), mode="RGB"):
+    Image.new(mode, size, color).save(path)
+    return path
+
+
+def test_renditions_share_one_decode(tmp_path, opens):
+    path = frame(tmp_path / "shot.webp")
+    cache = ImageCache(64 * 1024 * 1024)
+
+    full = cache.image(path)
+    small = cache.image(path, (1920, 1920))
+    encoded = cache.base64(path, (1920, 1920))
+    assert cache.image(path, (1920, 1920)) is small
+    assert cache.base64(path, (1920, 1920)) == encoded
+
+    assert opens == [os.fspath(path)]
+    assert full.size == (2400, 1500) and small.size == (1920, 1200)
+    with Image.open(io.BytesIO(base64.b64decode(encoded))) as img:
+        assert img.format == "JPEG" and img.size == (1920, 1200)
+    # Smaller than the box: the full image itself.
+    assert cache.image(path, (4000, 4000)) is full
+
+
+def test_rewritten_file_is_decoded_again(tmp_path, opens):
+    path = frame(tmp_path / "shot.png")
+    cache = ImageCache(64 * 1024 * 1024)
+    assert cache.image(path).getpixel((0, 0)) == (30, 90, 200)
+
+    frame(path, color=(200, 10, 10))
+    os.utime(path, ns=(0, 10**18))
+    assert cache.image(path).getpixel((0, 0)) == (200, 10, 10)
+    assert len(opens) == 2
+
+
+def test_native_mode_is_kept_on_request(tmp_path):
+    path = frame(tmp_path / "icon.png", size=(64, 64), color=(0, 0, 0, 0), mode="RGBA")
+    cache = ImageCache(1024 * 1024)
+    assert cache.image(path, mode=None).mode == "RGBA"
+    assert cache.image(path).mode == "RGB"
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    # A 100x100 RGB image is estimated at 30000 bytes.
+    paths = [frame(tmp_path / f"{i}.png", size=(100, 100)) for i in range(3)]
+    cache = ImageCache(70_000)
+    first = cache.image(paths[0])
+    cache.image(paths[1])
+    assert cache.image(paths[0]) is first  # now most recently used
+    cache.image(paths[2])
+
+    assert len(cache) == 2 and cache.nbytes == 60_000
+    assert cache.image(paths[0]) is first
+    misses = cache.misses
+    cache.image(paths[1])
+    assert cache.misses == misses + 1
+
+    # An entry bigger than the whole budget is returned but not kept.
+    assert ImageCache(1000).image(paths[0]).size == (100, 100)
+
+
+def test_concurrent_readers_wait_for_one_decode(tmp_path, opens):
+    path = frame(tmp_path / "shot.png")
+    cache = ImageCache(64 * 1024 * 1024)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(cache.image(path, (800, 800)))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(opens) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_plugins_and_thumbnails_decode_a_frame_once(tmp_path, opens, shared):
+    from memos.plugins.ocr import main as ocr_main
+    from memos.plugins.structured_vlm.main import _image_to_base64
+    from memos.plugins.vlm.main import image2base64
+    from memos.result_reuse import compute_phash
+    from memos.server import generate_thumbnail
+
+    path = frame(tmp_path / "shot.webp")
+    assert ocr_main.load_frame(path).shape == (1200, 1920, 3)
+    assert ocr_main.image2base64(path)
+    assert image2base64(path)
+    with Image.open(io.BytesIO(base64.b64decode(_image_to_base64(str(path))))) as img:
+        assert img.size == (1600, 1000)
+    assert compute_phash(path) is not None
+    thumb = generate_thumbnail(path, (123, 77))
+    try:
+        assert opens == [os.fspath(path)]
+        with Image.open(thumb) as img:
+            assert img.size == (123, 77)
+    finally:
+        thumb.unlink()
+
+
+def test_thumbnails_of_old_frames_leave_the_shared_cache_alone(tmp_path, shared):
+    from memos.server import generate_thumbnail
+
+    fresh = frame(tmp_path / "fresh.webp")
+    shared.image(fresh)
+    entries = list(shared._entries)
+
+    old = frame(tmp_path / "old.png", color=(200, 10, 10))
+    thumb = generate_thumbnail(old, (120, 120))
+    try:
+        assert list(shared._entries) == entries and shared.cached(old) is None
+        with Image.open(thumb) as img:
+            assert img.size == (120, 75)
+            assert img.getpixel((60, 37)) == (200, 10, 10)
+    finally:
+        thumb.unlink()
@@ -0,0 +1,204 @@
+"""Header-only screenshot metadata reader."""
+import json
+import os
+import stat
+
+import piexif
+import pytest
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from memos import utils
+from memos.utils import get_image_metadata, write_image_metadata
+from memos.utils.image_metadata import (
+    MetadataFormatError,
+    read_images_metadata,
+    rewrite_image_metadata,
+    save_image_with_metadata,
+)
+
+METADATA = {
+    "timestamp": "20241101-120000",
+    "active_app": "Safari",
+    "active_window": "Safari - 日本語のタイトル",
+    "screen_name": "1",
+    "sequence": 42,
+    "url": None,
+}
+
+
+def legacy_get_image_metadata(image_path):
+    """The PIL + piexif reader this module replaces."""
+    img = Image.open(image_path)
+    if str(image_path).lower().endswith((".jpg", ".jpeg", ".tiff", ".webp")):
+        exif_dict = piexif.load(str(image_path))
+        description = exif_dict["0th"].get(piexif.ImageIFD.ImageDescription, b"{}")
+        return json.loads(description.decode("utf-8"))
+    return json.loads(img.info.get("Description", "{}"))
+
+
+def screenshot(path, size=(64, 48), metadata=METADATA):
+    Image.new("RGB", size, (10, 200, 30)).save(path)
+    if metadata is not None:
+        write_image_metadata(path, metadata)
+    return path
+
+
+@pytest.mark.parametrize("ext", ["webp", "png", "jpg", "jpeg", "tiff"])
+def test_matches_legacy_reader(tmp_path, ext):
+    path = screenshot(tmp_path / f"a.{ext}")
+    assert get_image_metadata(path) == legacy_get_image_metadata(path) == METADATA
+
+
+@pytest.mark.parametrize("ext", ["webp", "png", "jpg"])
+def test_images_without_metadata(tmp_path, ext):
+    # piexif raised for a WebP without an EXIF chunk (so the old reader gave
+    # None); both are falsy to callers, but no metadata is simply {}.
+    path = screenshot(tmp_path / f"a.{ext}", metadata=None)
+    assert get_image_metadata(path) == {}
+
+
+@pytest.mark.parametrize("zip", [False, True])
+def test_png_international_text_chunks(tmp_path, zip):
+    path = tmp_path / "a.png"
+    info = PngInfo()
+    info.add_itxt("Description", json.dumps(METADATA, ensure_ascii=False), zip=zip)
+    Image.new("RGB", (8, 8)).save(path, pnginfo=info)
+    assert get_image_metadata(path) == METADATA
+
+
+def test_unreadable_metadata_is_none(tmp_path):
+    # Pre-EXIF recorder builds stored raw JSON in the WebP EXIF chunk;
+    # process_webp relies on a falsy result to convert those files.
+    old_format = tmp_path / "old.webp"
+    Image.new("RGB", (8, 8)).save(old_format, exif=json.dumps(METADATA).encode())
+    truncated = tmp_path / "truncated.png"
+    truncated.write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00")
+
+    assert get_image_metadata(old_format) is None
+    assert get_image_metadata(truncated) == {}
+    assert get_image_metadata(tmp_path / "missing.webp") is None
+    assert get_image_metadata(tmp_path / "a.gif") is None
+
+
+def test_batch_keeps_order(tmp_path):
+    paths = [
+        screenshot(tmp_path / f"{i}.webp", metadata={**METADATA, "sequence": i})
+        for i in range(10)
+    ]
+    results = read_images_metadata(paths + [tmp_path / "missing.webp"])
+    assert [r["sequence"] for r in results[:-1]] == list(range(10))
+    assert results[-1] is None
+
+
+def test_full_frame_metadata_is_read_without_pil(tmp_path, monkeypatch):
+    # Real screenshots are large; the reader has to find the metadata
+    # without handing the frame to PIL.
+    source = tmp_path / "source.webp"
+    Image.effect_noise((1920, 1080), 64).convert("RGB").save(source, quality=85)
+    write_image_metadata(source, METADATA)
+    paths = [source, tmp_path / "copy.webp"]
+    paths[1].write_bytes(source.read_bytes())
+    legacy = [legacy_get_image_metadata(p) for p in paths]
+
+    monkeypatch.setattr(Image, "open", pytest.fail)
+    assert [get_image_metadata(p) for p in paths] == legacy
+    assert read_images_metadata(paths) == legacy
+
+
+def pixels(path):
+    with Image.open(path) as img:
+        return img.convert("RGBA").tobytes()
+
+
+def noisy(size=(96, 64), mode="RGB"):
+    return Image.effect_noise(size, 64).convert(mode)
+
+
+@pytest.mark.parametrize(
+    "name, save_kwargs",
+    [
+        ("lossy.webp", {"quality": 85}),
+        ("lossless-alpha.webp", {"lossless": True}),
+        ("a.png", {}),
+        ("a.jpg", {"quality": 90}),
+    ],
+)
+def test_rewrite_keeps_pixels_and_replaces_metadata(tmp_path, name, save_kwargs):
+    path = tmp_path / name
+    mode = "RGBA" if "alpha" in name else "RGB"
+    noisy(mode=mode).save(path, **save_kwargs)
+    before = pixels(path)
+
+    assert rewrite_image_metadata(path, METADATA)
+    assert rewrite_image_metadata(path, {**METADATA, "sequence": 43})
+
+    assert pixels(path) == before
+    assert get_image_metadata(path)["sequence"] == 43
+    assert legacy_get_image_metadata(path)["sequence"] == 43
+    content = path.read_bytes()
+    assert content.count(b"EXIF") + content.count(b"Exif\x00\x00") <= 1
+    assert content.count(b"Description") <= 1
+
+
+def test_rewrite_keeps_jfif_header_first(tmp_path):
+    path = tmp_path / "a.jpg"
+    noisy().save(path, quality=90, jfif=True)
+    assert path.read_bytes()[2:4] == b"\xff\xe0"
+
+    rewrite_image_metadata(path, METADATA)
+
+    content = path.read_bytes()
+    assert content[2:4] == b"\xff\xe0"
+    assert get_image_metadata(path) == METADATA
+
+
+def test_one_shot_save_encodes_once(tmp_path):
+    img = noisy()
+    reference, path = tmp_path / "reference.webp", tmp_path / "a.webp"
+    img.save(reference, format="WebP", quality=85)
+
+    save_image_with_metadata(img, path, METADATA, format="WebP", quality=85)
+
+    assert get_image_metadata(path) == METADATA
+    assert pixels(path) == pixels(reference)
+
+
+@pytest.mark.parametrize("name", ["a.webp", "a.png", "a.jpg"])
+def test_rewrite_keeps_file_mode_without_reencoding(tmp_path, monkeypatch, name):
+    path = tmp_path / name
+    noisy().save(path)
+    os.chmod(path, 0o644)
+
+    monkeypatch.setattr(Image, "open", pytest.fail)
+    assert rewrite_image_metadata(path, METADATA)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert get_image_metadata(path) == METADATA
+
+
+@pytest.mark.parametrize("cut", [3, 20, -1])
+def test_truncated_jpeg_is_a_format_error(tmp_path, cut):
+    path = tmp_path / "a.jpg"
+    noisy().save(path, quality=90)
+    content = path.read_bytes()
+    # Everything up to the start of scan, cut short somewhere inside it.
+    head = content[: content.index(b"\xff\xda")]
+    path.write_bytes(head[:cut])
+
+    with pytest.raises(MetadataFormatError):
+        rewrite_image_metadata(path, METADATA)
+    assert path.read_bytes() == head[:cut]
+
+
+def test_write_falls_back_to_pil_when_rewrite_fails(tmp_path, monkeypatch):
+    path = tmp_path / "a.jpg"
+    noisy().save(path, quality=90)
+
+    def reject(image_path, metadata):
+        raise MetadataFormatError("unusual file")
+
+    monkeypatch.setattr(utils, "rewrite_image_metadata", reject)
+    write_image_metadata(path, METADATA)
+
+    assert get_image_metadata(path) == METADATA
@@ -0,0 +1,225 @@
+"""Tests for the write-behind search index queue."""
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from memos import crud
+from memos.config import IndexQueueSettings
+from memos.index_queue import IndexQueue
+from memos.models import Base, EntityModel, FolderModel, LibraryModel
+from memos.schemas import FolderType
+from memos.server import app
+from memos.write_queue import WriteQueue
+
+
+class FakeProvider:
+    """Batches fail with `fail_batch`; entity 2 fails on its own as well."""
+
+    def __init__(self, fail_batch=False):
+        self.batches = []
+        self.singles = []
+        self.fail_batch = fail_batch
+        self.batch_failed = False
+        self.forced = set()
+        self.write_threads = set()
+
+    def prepare_index_batch(self, entity_ids, db, force=False):
+        self.forced.add(force)
+        if self.batch_failed:  # the one-at-a-time fallback
+            if entity_ids == [2]:
+                raise ValueError("bad entity")
+            return self.singles, entity_ids
+        if self.fail_batch:
+            self.batch_failed = True
+            raise ValueError("embedding service down")
+        return self.batches, [list(entity_ids)]
+
+    def write_index_batch(self, batch, db):
+        written, rows = batch
+        written.extend(rows)
+        self.write_threads.add(threading.current_thread().name)
+
+
+@pytest.fixture
+def Session():
+    eng = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(eng)
+    Session = sessionmaker(bind=eng)
+    with Session() as db:
+        lib = LibraryModel(name="lib")
+        db.add(lib)
+        db.flush()
+        folder = FolderModel(
+            library_id=lib.id,
+            path="/tmp",
+            type=FolderType.DEFAULT,
+            last_modified_at=datetime.now(timezone.utc),
+        )
+        db.add(folder)
+        db.flush()
+        for i in range(1, 4):
+            now = datetime.now(timezone.utc)
+            db.add(
+                EntityModel(
+                    id=i,
+                    filepath=f"/tmp/{i}.png",
+                    filename=f"{i}.png",
+                    size=1,
+                    file_created_at=now,
+                    file_last_modified_at=now,
+                    file_type="png",
+                    file_type_group="image",
+                    library_id=lib.id,
+                    folder_id=folder.id,
+                )
+            )
+        db.commit()
+    yield Session
+    eng.dispose()
+
+
+def make_queue(Session, provider, **config):
+    return IndexQueue(provider, Session, IndexQueueSettings(**config))
+
+
+def test_repeated_marks_coalesce_into_one_index_pass(Session):
+    provider = FakeProvider()
+    queue = make_queue(Session, provider)
+    for entity_id in (1, 2, 1, 3, 1):
+        queue.mark_dirty(entity_id)
+
+    assert queue.pending_count() == 3
+    assert queue.flush() == 3
+    assert provider.batches == [[1, 2, 3]]
+    # Being marked is the reason to index: no freshness check skips it.
+    assert provider.forced == {True}
+    assert queue.pending_count() == 0
+    assert queue.flushed_total == 3
+    assert queue.last_flush_lag_seconds is not None
+
+
+def test_debounce_and_max_delay(Session):
+    queue = make_queue(Session, FakeProvider(), debounce_seconds=60, max_delay_seconds=120)
+    queue.mark_dirty(1)
+    with queue._cond:
+        assert queue._take_ready() == []
+        assert 0 < queue._next_due_in() <= 60
+
+    # Dirty for longer than max_delay: ready even though it keeps being touched.
+    first = time.monotonic() - 121
+    queue._pending[1] = (first, time.monotonic())
+    with queue._cond:
+        assert queue._take_ready() == [(1, first)]
+
+
+def test_flush_batches_and_skips_deleted_entities(Session):
+    provider = FakeProvider()
+    queue = make_queue(Session, provider, batch_size=2)
+    for entity_id in (1, 2, 3, 99):
+        queue.mark_dirty(entity_id)
+
+    assert queue.flush() == 4
+    assert provider.batches == [[1, 2], [3]]
+
+
+def test_failed_batch_falls_back_to_single_entity_indexing(Session):
+    provider = FakeProvider(fail_batch=True)
+    queue = make_queue(Session, provider)
+    for entity_id in (1, 2, 3):
+        queue.mark_dirty(entity_id)
+
+    queue.flush()
+    assert provider.singles == [1, 3]
+
+
+def test_pending_marks_survive_a_restart(Session):
+    with Session() as db:
+        crud.mark_index_pending([1, 2, 3], db)
+
+    # The previous process acknowledged the writes but never flushed; a new
+    # queue picks them up from index_pending on start.
+    provider = FakeProvider(fail_batch=True)
+    queue = make_queue(Session, provider, debounce_seconds=60)
+    assert queue.recover() == 3
+    queue.flush()
+    assert provider.singles == [1, 3]
+    with Session() as db:
+        assert crud.get_index_pending_ids(db) == [2]
+
+    # An entity written again while the pass ran keeps its mark.
+    class RewritingProvider(FakeProvider):
+        def prepare_index_batch(self, entity_ids, db, force=False):
+            with Session() as other:
+                crud.mark_index_pending([3], other)
+            return super().prepare_index_batch(entity_ids, db, force)
+
+    queue = make_queue(Session, RewritingProvider())
+    queue.mark_dirty(3)
+    queue.flush()
+    with Session() as db:
+        assert sorted(crud.get_index_pending_ids(db)) == [2, 3]
+
+
+def test_index_rows_are_written_through_the_write_queue(Session):
+    write_queue = WriteQueue(Session.kw["bind"])
+    provider = FakeProvider()
+    queue = IndexQueue(
+        provider, Session, IndexQueueSettings(), write_queue=write_queue
+    )
+    try:
+        with Session() as db:
+            crud.mark_index_pending([1, 2], db)
+        queue.mark_dirty(1)
+        queue.mark_dirty(2)
+        assert queue.flush() == 2
+    finally:
+        write_queue.stop()
+
+    assert provider.batches == [[1, 2]]
+    assert provider.write_threads == {"write-queue"}
+    assert write_queue.writes_total == 1
+    with Session() as db:
+        assert crud.get_index_pending_ids(db) == []
+
+
+def test_background_worker_indexes_after_debounce(Session):
+    provider = FakeProvider()
+    queue = make_queue(Session, provider, debounce_seconds=0.05)
+    queue.start()
+    try:
+        queue.mark_dirty(1)
+        queue.mark_dirty(1)
+        deadline = time.monotonic() + 5
+        while not provider.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+    assert provider.batches == [[1]]
+
+
+def test_index_queue_routes(Session, monkeypatch):
+    provider = FakeProvider()
+    queue = make_queue(Session, provider, debounce_seconds=60)
+    monkeypatch.setattr(app.state, "index_queue", queue)
+    queue.mark_dirty(1)
+    queue.mark_dirty(2)
+
+    client = TestClient(app)
+    status = client.get("/api/index-queue").json()
+    assert status["pending"] == 2
+    assert status["oldest_pending_age_seconds"] >= 0
+
+    status = client.post("/api/index-queue/flush").json()
+    assert status["pending"] == 0
+    assert status["flushed_total"] == 2
+    assert provider.batches == [[1, 2]]
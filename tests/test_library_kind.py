@@ -14,7 +14,8 @@ from memos.models import (
     LibraryModel,
 )
 from memos.schemas import FolderType, LibraryKind
-from memos.server import api_router, app, get_db
+from memos.server import api_router, app, get_db, get_read_db, get_write_queue
+from memos.write_queue import WriteQueue
 
 
 @pytest.fixture
@@ -45,10 +46,16 @@ def client(engine):
     # /api routes live on a child FastAPI app, so the override has to be
     # registered on that one to take effect.
     api_router.dependency_overrides[get_db] = override_get_db
+    api_router.dependency_overrides[get_read_db] = override_get_db
+    write_queue = WriteQueue(engine)
+    api_router.dependency_overrides[get_write_queue] = lambda: write_queue
     try:
         yield TestClient(app)
     finally:
+        write_queue.stop()
         api_router.dependency_overrides.pop(get_db, None)
+        api_router.dependency_overrides.pop(get_read_db, None)
+        api_router.dependency_overrides.pop(get_write_queue, None)
 
 
 def _seed_library(engine, kind: LibraryKind, name: str | None = None) -> int:
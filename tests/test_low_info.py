@@ -0,0 +1,218 @@
+"""Low-information frame prefilter: scoring, tagging and plugin skips."""
+import json
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from memos import crud
+from memos.cmds.library import prepare_entity
+from memos.config import settings
+from memos.models import EntityPluginStatusModel, PluginJobModel
+from memos.utils.low_info import FRAME_INFO_KEY, LOW_INFO_TAG, read_frame_info
+
+SIZE = (1920, 1080)
+
+
+def font(size):
+    return ImageFont.load_default(size)
+
+
+def text_screen(bg="white", fg="black", size=14, lines=40, step=24):
+    img = Image.new("RGB", SIZE, bg)
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        draw.text(
+            (60, 40 + i * step),
+            f"{i:03d} def handler(request): return render(request, 'index.html')",
+            fill=fg,
+            font=font(size),
+        )
+    return img
+
+
+def sparse_terminal(lines):
+    return text_screen(bg=(30, 30, 30), fg=(200, 200, 200), size=13, lines=lines)
+
+
+def empty_editor():
+    img = Image.new("RGB", SIZE, (30, 30, 30))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, SIZE[0], 34), fill=(45, 45, 45))
+    draw.text((20, 8), "main.py", fill=(220, 220, 220), font=font(14))
+    draw.text((20, 50), "1", fill=(110, 110, 110), font=font(13))
+    draw.text((60, 50), "import os", fill=(200, 200, 200), font=font(13))
+    draw.text((20, 74), "2", fill=(110, 110, 110), font=font(13))
+    draw.rectangle((0, SIZE[1] - 24, SIZE[0], SIZE[1]), fill=(0, 122, 204))
+    draw.text((10, SIZE[1] - 20), "Ln 2, Col 1  UTF-8  Python", fill="white", font=font(12))
+    return img
+
+
+def dialog():
+    img = Image.new("RGB", SIZE, (236, 236, 236))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((660, 380, 1260, 700), fill="white", outline=(180, 180, 180))
+    draw.text((700, 420), "Save changes to document before closing?", fill="black", font=font(18))
+    draw.text((700, 460), "Your changes will be lost if you don't save them.", fill="black", font=font(14))
+    draw.rectangle((1000, 620, 1100, 660), fill=(0, 120, 255))
+    draw.text((1020, 630), "Save", fill="white", font=font(14))
+    return img
+
+
+def spreadsheet():
+    img = Image.new("RGB", SIZE, "white")
+    draw = ImageDraw.Draw(img)
+    for x in range(0, SIZE[0], 120):
+        draw.line((x, 0, x, SIZE[1]), fill=(200, 200, 200))
+    for y in range(0, SIZE[1], 24):
+        draw.line((0, y, SIZE[0], y), fill=(200, 200, 200))
+    for row in range(0, SIZE[1] // 24, 2):
+        for col in range(0, SIZE[0] // 120, 2):
+            draw.text((col * 120 + 5, row * 24 + 5), f"{row * col * 3.7:.2f}", fill="black", font=font(12))
+    return img
+
+
+def wallpaper(seed=2):
+    rng = np.random.default_rng(seed)
+    coarse = Image.fromarray(rng.integers(0, 255, (54, 96, 3), dtype=np.uint8))
+    return coarse.resize(SIZE, Image.BICUBIC).filter(ImageFilter.GaussianBlur(30))
+
+
+def lock_screen():
+    img = wallpaper()
+    ImageDraw.Draw(img).text((900, 300), "10:42", fill="white", font=font(64))
+    return img
+
+
+def desktop():
+    img = wallpaper()
+    draw = ImageDraw.Draw(img)
+    for i in range(4):
+        draw.rectangle((40, 40 + i * 110, 104, 104 + i * 110), fill=(200, 200, 220))
+    return img
+
+
+def spinner():
+    img = Image.new("RGB", SIZE, "white")
+    ImageDraw.Draw(img).arc((930, 510, 990, 570), 0, 270, fill=(120, 120, 120), width=6)
+    return img
+
+
+def video_frame(seed):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:SIZE[1], 0:SIZE[0]]
+    planes = [
+        x / SIZE[0] * 200 + 40 * np.sin(y / 90),
+        y / SIZE[1] * 180 + 30 * np.cos(x / 120),
+        100 + 80 * np.sin((x + y) / 200),
+    ]
+    img = Image.fromarray(np.clip(np.stack(planes, -1), 0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        cx, cy, r = rng.integers(200, 1700), rng.integers(150, 900), rng.integers(60, 200)
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=tuple(int(v) for v in rng.integers(0, 255, 3)))
+    return img.filter(ImageFilter.GaussianBlur(6))
+
+
+LOW_INFO_FRAMES = {
+    "blank": lambda: Image.new("RGB", SIZE, (20, 30, 60)),
+    "black": lambda: Image.new("RGB", SIZE, "black"),
+    "lock_screen": lock_screen,
+    "desktop": desktop,
+    "spinner": spinner,
+    "video": lambda: video_frame(3),
+    "video_2": lambda: video_frame(7),
+}
+INFORMATIVE_FRAMES = {
+    "document": text_screen,
+    "terminal": lambda: text_screen(bg=(30, 30, 30), fg=(200, 200, 200), size=13),
+    "small_code": lambda: text_screen(size=11, lines=60, step=17),
+    "terminal_1_line": lambda: sparse_terminal(1),
+    "terminal_3_lines": lambda: sparse_terminal(3),
+    "empty_editor": empty_editor,
+    "dialog": dialog,
+    "spreadsheet": spreadsheet,
+}
+
+
+@pytest.fixture(scope="module")
+def frames(tmp_path_factory):
+    root = tmp_path_factory.mktemp("frames")
+    paths = {}
+    for name, make in {**LOW_INFO_FRAMES, **INFORMATIVE_FRAMES}.items():
+        paths[name] = root / f"{name}.webp"
+        make().save(paths[name], quality=85)
+    return paths
+
+
+def test_precision_and_recall_on_fixture_frames(frames):
+    predicted = {
+        name for name, path in frames.items()
+        if read_frame_info(path).is_low_info(settings.low_info)
+    }
+    true_positives = len(predicted & set(LOW_INFO_FRAMES))
+    precision = true_positives / max(1, len(predicted))
+    recall = true_positives / len(LOW_INFO_FRAMES)
+    print(f"\nlow-info prefilter: precision {precision:.2f}, recall {recall:.2f}")
+    assert precision == 1.0 and recall == 1.0
+
+
+def test_prepare_entity_tags_and_scores_frames(frames):
+    low = prepare_entity(str(frames["lock_screen"]), folder_id=1)
+    informative = prepare_entity(str(frames["document"]), folder_id=1)
+
+    assert LOW_INFO_TAG in low["tags"]
+    assert LOW_INFO_TAG not in informative.get("tags", [])
+    for entity, expected in ((low, True), (informative, False)):
+        [entry] = [e for e in entity["metadata_entries"] if e["key"] == FRAME_INFO_KEY]
+        assert entry["data_type"] == "json"
+        assert json.loads(entry["value"])["low_info"] is expected
+
+
+def test_frame_scores_are_left_out_of_the_search_indexes():
+    from types import SimpleNamespace
+
+    from memos.search import PostgreSQLSearchProvider, SqliteSearchProvider
+
+    entity = SimpleNamespace(
+        filepath="/screenshots/20250101/frame.webp",
+        tag_names=[LOW_INFO_TAG],
+        metadata_entries=[
+            SimpleNamespace(key="active_app", value="Terminal"),
+            SimpleNamespace(key=FRAME_INFO_KEY, value='{"edge_density": 0.0123}'),
+            SimpleNamespace(key="ocr_reused_from", value='{"entity_id": 7}'),
+        ],
+    )
+    for provider in (PostgreSQLSearchProvider, SqliteSearchProvider):
+        metadata = provider().prepare_fts_data(entity)[-1]
+        assert "Terminal" in metadata
+        assert "edge_density" not in metadata and "reused_from" not in metadata
+
+
+def test_prefilter_can_be_disabled(frames, monkeypatch):
+    monkeypatch.setattr(settings.low_info, "enabled", False)
+    entity = prepare_entity(str(frames["spinner"]), folder_id=1)
+    assert "metadata_entries" not in entity and "tags" not in entity
+
+
+def test_low_info_entities_skip_configured_plugins(Session, seeded, monkeypatch):
+    from memos.server import trigger_webhooks
+
+    ocr_id, vlm_id = seeded["plugin_ids"]
+    monkeypatch.setattr(settings.low_info, "skip_plugins", ["ocr"])
+    with Session() as db:
+        library = crud.get_library_by_id(seeded["library_id"], db)
+        low, normal, _ = seeded["entity_ids"]
+        crud.add_new_tags(low, [LOW_INFO_TAG], db)
+        for entity_id in (low, normal):
+            trigger_webhooks(library, crud.get_entity_by_id(entity_id, db), None, db)
+
+        jobs = {(j.entity_id, j.plugin_id) for j in db.query(PluginJobModel)}
+        done = {(s.entity_id, s.plugin_id) for s in db.query(EntityPluginStatusModel)}
+
+    assert jobs == {(low, vlm_id), (normal, ocr_id), (normal, vlm_id)}
+    # The skipped plugin counts as done, so the frame is not reported pending.
+    assert done == {(low, ocr_id)}
+    avoided = 2 * 2 - len(jobs)
+    print(f"\nplugin calls avoided: {avoided} of 4")
+    assert avoided == 1
@@ -0,0 +1,142 @@
+"""Batched OCR: per-frame detection, pooled recognition, request batching."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from memos.plugins.ocr import main as ocr_main
+from memos.plugins.ocr.batch import FrameBatcher, crop_text_line, ocr_batch
+
+
+def box(x0, y0, x1, y1):
+    return np.float32([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+
+
+class LineStages:
+    """One 20px-high text line per row band whose pixels are the line's id."""
+
+    def __init__(self):
+        self.rec_batches = []
+        self.classified = []
+
+    def detect(self, frame):
+        return [box(0, y, 40, y + 20) for y in range(0, frame.shape[0], 20) if frame[y, 0, 0]]
+
+    def classify(self, crops):
+        # Line 8 is "upside down" and reads as line 80 once turned.
+        self.classified.append(len(crops))
+        return [crop * 10 if crop.mean() == 8 else crop for crop in crops]
+
+    def recognize(self, crops, batch_size):
+        assert len(crops) <= batch_size
+        self.rec_batches.append(len(crops))
+        return [(f"line-{int(crop.mean())}", 0.9 if crop.mean() != 99 else 0.2) for crop in crops]
+
+
+def frame_with_lines(*values):
+    frame = np.zeros((20 * len(values), 40, 3), dtype=np.uint8)
+    for i, value in enumerate(values):
+        frame[20 * i:20 * i + 20] = value
+    return frame
+
+
+def test_crops_are_pooled_across_frames_and_mapped_back():
+    stages = LineStages()
+    frames = [frame_with_lines(1, 2, 3), frame_with_lines(), frame_with_lines(4, 99, 5, 6)]
+
+    results = ocr_batch(stages, frames, rec_batch_size=4)
+
+    assert [[r["rec_txt"] for r in frame] for frame in results] == [
+        ["line-1", "line-2", "line-3"],
+        [],
+        ["line-4", "line-5", "line-6"],  # the low-score line is dropped
+    ]
+    assert results[2][1]["dt_boxes"] == [[0.0, 40.0], [40.0, 40.0], [40.0, 60.0], [0.0, 60.0]]
+    assert results[0][0]["score"] == 0.9
+    assert stages.rec_batches == [4, 3]
+
+
+def test_angle_classification_runs_on_pooled_crops():
+    stages = LineStages()
+    results = ocr_batch(stages, [frame_with_lines(1, 8), frame_with_lines(8)])
+
+    assert stages.classified == [3]
+    assert [[r["rec_txt"] for r in frame] for frame in results] == [
+        ["line-1", "line-80"],
+        ["line-80"],
+    ]
+
+
+def test_crop_rotates_tall_text_upright():
+    frame = np.arange(60 * 80 * 3, dtype=np.uint32).reshape(60, 80, 3).astype(np.uint8)
+    assert crop_text_line(frame, box(10, 5, 50, 25)).shape == (20, 40, 3)
+    assert crop_text_line(frame, box(10, 0, 20, 50)).shape == (10, 50, 3)
+
+
+def test_batcher_gathers_concurrent_requests():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(list(items))
+        return [item * 10 for item in items]
+
+    async def run():
+        batcher = FrameBatcher(run_batch, max_batch=4, window=0.05)
+        first = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        second = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [0, 10, 20]
+    assert second == [i * 10 for i in range(10)]
+    assert [len(c) for c in calls] == [3, 4, 4, 2]
+
+
+def test_batcher_fails_every_request_of_a_failed_batch():
+    async def run_batch(items):
+        raise RuntimeError("model crashed")
+
+    async def run():
+        batcher = FrameBatcher(run_batch, max_batch=8, window=0.01)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+
+def test_undecodable_images_get_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_main, "ocr_pool", None)
+    monkeypatch.setattr(ocr_main, "ocr", None)
+    stages = LineStages()
+    monkeypatch.setattr("memos.plugins.ocr.batch.RapidOCRStages", lambda engine: stages)
+
+    from PIL import Image
+
+    good = tmp_path / "good.png"
+    Image.fromarray(frame_with_lines(7)).save(good)
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(b"not an image")
+
+    results = ocr_main.predict_local_batch([bad, good, tmp_path / "missing.png"])
+    assert results[0] is None and results[2] is None
+    assert [r["rec_txt"] for r in results[1]] == ["line-7"]
+
+
+def test_batches_match_the_engine_pipeline(tmp_path):
+    rapidocr = pytest.importorskip("rapidocr")
+    from memos.plugins.ocr.batch import RapidOCRStages
+    from tests.test_ocr_process_pool import screenshot_set
+
+    frames = [ocr_main.load_frame(p) for p in screenshot_set(tmp_path, 4)]
+    engine = rapidocr.RapidOCR(params={"Global.width_height_ratio": 40})
+    stages = RapidOCRStages(engine)
+
+    texts = {}
+    for batch_size in (1, 4):
+        results = []
+        for start in range(0, len(frames), batch_size):
+            results += ocr_batch(stages, frames[start:start + batch_size])
+        texts[batch_size] = [[r["rec_txt"] for r in frame] for frame in results]
+
+    # Detection, angle classification and recognition as in one engine call.
+    pipeline = [[r["rec_txt"] for r in ocr_main.run_rapidocr(engine, f)] for f in frames]
+    assert texts[1] == texts[4] == pipeline
@@ -0,0 +1,130 @@
+"""Delta OCR: only changed tiles are OCR'd, the rest is carried over."""
+import numpy as np
+import pytest
+
+from memos.plugins.ocr.batch import ocr_batch
+from memos.plugins.ocr.delta import DeltaOCR, changed_tiles, tile_regions
+
+SIZE = (360, 480)
+
+
+class BarStages:
+    """Reads solid bars on a black background; a bar's text is its value."""
+
+    def detect(self, frame):
+        rows = np.nonzero(frame.max(axis=(1, 2)))[0]
+        boxes = []
+        for band in np.split(rows, np.nonzero(np.diff(rows) > 1)[0] + 1):
+            if not len(band):
+                continue
+            y0, y1 = band[0], band[-1] + 1
+            cols = np.nonzero(frame[y0:y1].max(axis=(0, 2)))[0]
+            x0, x1 = cols[0], cols[-1] + 1
+            boxes.append(np.float32([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]))
+        return boxes
+
+    def classify(self, crops):
+        return crops
+
+    def recognize(self, crops, batch_size):
+        return [(f"v{int(crop.max())}", 0.9) for crop in crops]
+
+
+def ocr_frames(frames):
+    return ocr_batch(BarStages(), frames)
+
+
+def render(lines):
+    """lines: {value: (x, y, width)}, 16px high bars."""
+    frame = np.zeros((*SIZE, 3), dtype=np.uint8)
+    for value, (x, y, width) in lines.items():
+        frame[y:y + 16, x:x + width] = value
+    return frame
+
+
+LINES = {10 + 20 * i: (20 + 7 * i, 20 + 40 * i, 150 + 30 * i) for i in range(8)}
+
+
+def fixture_sequence():
+    frames = [LINES]
+    frames.append({**LINES, 50: (27 + 7 * 2, 100, 210)})  # one line edited
+    frames.append({**frames[-1], 250: (300, 330, 120)})  # a line appears
+    frames.append(frames[-1])  # nothing changes
+    frames.append({k: v for k, v in frames[-1].items() if k != 30})  # a line disappears
+    frames.append({v + 1: (x + 3, y + 2, w) for v, (x, y, w) in frames[-1].items()})  # scroll
+    return [render(lines) for lines in frames]
+
+
+def texts_and_boxes(results):
+    return sorted((r["rec_txt"], tuple(map(tuple, r["dt_boxes"]))) for r in results)
+
+
+def test_delta_matches_full_ocr_on_a_fixture_sequence():
+    delta = DeltaOCR(tile=32)
+    fractions = []
+    for frame in fixture_sequence():
+        results, fraction = delta.ocr("screen-1", frame, ocr_frames)
+        assert texts_and_boxes(results) == texts_and_boxes(ocr_frames([frame])[0])
+        fractions.append(fraction)
+
+    assert fractions[0] == 1.0  # nothing to diff against yet
+    assert 0 < fractions[1] < 0.25 and 0 < fractions[2] < 0.25
+    assert fractions[3] == 0  # unchanged: everything carried over
+    assert 0 < fractions[4] < 0.25
+    assert fractions[5] == 1.0  # a scroll changes too much: full OCR
+    assert delta.full_frames == 2 and delta.frames == 6
+    assert "6 frames, 2 full" in delta.summary()
+
+
+def test_screens_and_frame_sizes_are_kept_apart():
+    delta = DeltaOCR(tile=32)
+    frame = render(LINES)
+    delta.ocr("left", frame, ocr_frames)
+
+    assert delta.ocr("left", frame, ocr_frames)[1] == 0
+    assert delta.ocr("right", frame, ocr_frames)[1] == 1.0
+    small = frame[:200]
+    assert delta.ocr("left", small, ocr_frames)[1] == 1.0
+
+
+def test_changed_tiles_group_into_regions():
+    previous = np.zeros((100, 130, 3), dtype=np.uint8)
+    current = previous.copy()
+    current[5, 5] = 200  # tile (0, 0)
+    current[40, 40] = 200  # tile (1, 1): diagonal neighbour, same region
+    current[90, 125] = 10  # below the threshold
+    current[90, 110] = 200  # tile (2, 3), the clipped bottom-right tile
+
+    mask = changed_tiles(previous, current, tile=32, threshold=24)
+    assert mask.shape == (4, 5)
+    assert sorted(tile_regions(mask, 32, previous.shape)) == [(0, 0, 64, 64), (96, 64, 128, 96)]
+
+
+def test_real_ocr_matches_on_rendered_text():
+    rapidocr = pytest.importorskip("rapidocr")
+    from PIL import Image, ImageDraw
+
+    from memos.plugins.ocr.batch import RapidOCRStages
+
+    stages = RapidOCRStages(rapidocr.RapidOCR(params={"Global.width_height_ratio": 40}))
+
+    def screen(edited):
+        img = Image.new("RGB", (1280, 800), "white")
+        draw = ImageDraw.Draw(img)
+        for line in range(16):
+            text = f"line {line}: the quick brown fox"
+            if line == 7 and edited:
+                text = "line 7: jumps over the lazy dog"
+            draw.text((40, 30 + line * 44), text, fill="black")
+        return np.array(img)
+
+    def real_ocr(frames):
+        return ocr_batch(stages, frames)
+
+    delta = DeltaOCR()
+    delta.ocr("screen", screen(False), real_ocr)
+    results, fraction = delta.ocr("screen", screen(True), real_ocr)
+    full = real_ocr([screen(True)])[0]
+    print(f"\ndelta OCR'd {fraction:.0%} of the frame")
+    assert fraction < 0.5
+    assert sorted(r["rec_txt"] for r in results) == sorted(r["rec_txt"] for r in full)
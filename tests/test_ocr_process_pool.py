@@ -0,0 +1,127 @@
+"""Process-pool OCR backend: one engine per worker, frames in shared memory."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from memos.plugins.ocr import main as ocr_main
+from memos.plugins.ocr.pool import OCRProcessPool
+
+BOX = [[0.0, 0.0], [10.0, 0.0], [10.0, 5.0], [0.0, 5.0]]
+
+
+class FrameEchoEngine:
+    """Stands in for RapidOCR: reports what frame it saw and where it ran."""
+
+    def __init__(self, intra_op_threads):
+        self.pid = os.getpid()
+        self.threads = os.environ["OMP_NUM_THREADS"]
+
+    def __call__(self, frame):
+        text = f"{frame.shape}:{int(frame.sum())}:{self.pid}:{id(self)}:{self.threads}"
+        return [[BOX, text, 0.9]], 0.0
+
+
+def frame(seed, size=(48, 64)):
+    return np.random.default_rng(seed).integers(0, 255, (*size, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def pool():
+    pool = OCRProcessPool(2, intra_op_threads=3, engine_factory=FrameEchoEngine)
+    yield pool
+    pool.close()
+
+
+def test_frames_reach_the_workers_intact(pool):
+    frames = [frame(i) for i in range(6)]
+    for f in frames:
+        [result] = pool.predict(f)
+        shape, total, *_ = result["rec_txt"].split(":")
+        assert shape == str(f.shape) and int(total) == int(f.sum())
+        assert result["dt_boxes"] == BOX and result["score"] == 0.9
+
+
+def test_each_worker_builds_one_engine_with_pinned_threads(pool):
+    async def run():
+        return await asyncio.gather(*(pool.async_predict(frame(i)) for i in range(12)))
+
+    texts = [result[0]["rec_txt"] for result in asyncio.run(run())]
+    engines = {tuple(t.split(":")[2:4]) for t in texts}
+    pids = {pid for pid, _ in engines}
+    assert pids and os.getpid() not in {int(p) for p in pids}
+    assert len(pids) <= 2 and len(engines) == len(pids)
+    assert {t.split(":")[4] for t in texts} == {"3"}
+
+
+def test_shared_memory_is_released(pool, monkeypatch):
+    names = []
+    share = pool._share
+
+    def tracking_share(f):
+        shm, shape, dtype = share(f)
+        names.append(shm.name)
+        return shm, shape, dtype
+
+    monkeypatch.setattr(pool, "_share", tracking_share)
+    pool.predict(frame(0))
+    asyncio.run(pool.async_predict(frame(1)))
+
+    from multiprocessing import shared_memory
+
+    assert len(names) == 2
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def screenshot_set(tmp_path, count):
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (1280, 800), "white")
+        draw = ImageDraw.Draw(img)
+        for line in range(20):
+            draw.text((40, 30 + line * 36), f"frame {i} line {line}: the quick brown fox", fill="black")
+        path = tmp_path / f"{i}.png"
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def test_shutdown_closes_the_pool_and_threads(monkeypatch):
+    pool = OCRProcessPool(1, engine_factory=FrameEchoEngine)
+    threads = ThreadPoolExecutor(1)
+    monkeypatch.setattr(ocr_main, "ocr_pool", pool)
+    monkeypatch.setattr(ocr_main, "thread_pool", threads)
+    pool.predict(frame(0))
+
+    ocr_main.shutdown_plugin()
+
+    assert ocr_main.ocr_pool is None and ocr_main.thread_pool is None
+    with pytest.raises(RuntimeError):
+        pool.predict(frame(1))
+    with pytest.raises(RuntimeError):
+        threads.submit(print)
+
+
+def test_process_pool_matches_thread_pool_output(tmp_path):
+    rapidocr = pytest.importorskip("rapidocr")
+    frames = [ocr_main.load_frame(p) for p in screenshot_set(tmp_path, 4)]
+
+    engine = rapidocr.RapidOCR(params={"Global.width_height_ratio": 40})
+    with ThreadPoolExecutor(4) as threads:
+        shared = list(threads.map(lambda f: ocr_main.run_rapidocr(engine, f), frames))
+
+    pool = OCRProcessPool(2)
+    try:
+        with ThreadPoolExecutor(4) as threads:
+            pooled = list(threads.map(pool.predict, frames))
+    finally:
+        pool.close()
+
+    assert [[r["rec_txt"] for r in f] for f in pooled] == [
+        [r["rec_txt"] for r in f] for f in shared
+    ]
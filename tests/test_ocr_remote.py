@@ -0,0 +1,199 @@
+"""Remote OCR: raw image transport, backpressure and the fallback to base64."""
+import asyncio
+import base64
+import io
+import threading
+from multiprocessing.pool import ThreadPool
+
+import httpx
+import pytest
+import respx
+from PIL import Image
+
+from memos.plugins.ocr import main as ocr_main
+from memos.plugins.ocr import server as ocr_server
+from memos.utils import image_cache
+
+ENDPOINT = "http://ocr.test/predict"
+RESULT = [{"dt_boxes": [[0, 0], [4, 0], [4, 2], [0, 2]], "rec_txt": "hi", "score": 0.9}]
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path):
+    """The OCR plugin set up for a remote server, and a frame to send."""
+    monkeypatch.setattr(image_cache, "_shared", image_cache.ImageCache(16 * 1024 * 1024))
+    monkeypatch.setattr(ocr_main, "use_local", False)
+    monkeypatch.setattr(
+        ocr_main, "remote", ocr_main.RemoteOCRClient(ENDPOINT, concurrency=2, max_retries=2)
+    )
+    delays = []
+
+    async def no_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(ocr_main.asyncio, "sleep", no_sleep)
+    path = tmp_path / "shot.png"
+    Image.new("RGB", (320, 200), "white").save(path)
+    return path, delays
+
+
+def predict(path):
+    async def run():
+        ocr_main.semaphore = asyncio.Semaphore(2)
+        try:
+            return await ocr_main.predict(path)
+        finally:
+            await ocr_main.remote.aclose()
+
+    return asyncio.run(run())
+
+
+@respx.mock
+def test_frames_are_sent_as_raw_jpeg(remote):
+    path, _ = remote
+    route = respx.post(ENDPOINT).mock(return_value=httpx.Response(200, json=RESULT))
+
+    assert predict(path) == RESULT
+    request = route.calls[0].request
+    assert request.headers["Content-Type"] == "image/jpeg"
+    with Image.open(io.BytesIO(request.content)) as img:
+        assert img.format == "JPEG" and img.size == (320, 200)
+
+
+@respx.mock
+def test_busy_server_is_retried_after_its_retry_after(remote):
+    path, delays = remote
+    route = respx.post(ENDPOINT).mock(
+        side_effect=[
+            httpx.Response(429, headers={"Retry-After": "3"}),
+            httpx.Response(503),
+            httpx.Response(200, json=RESULT),
+        ]
+    )
+
+    assert predict(path) == RESULT
+    assert route.call_count == 3
+    assert delays == [3.0, 2.0]  # the second answer had no Retry-After
+
+    route.side_effect = None
+    route.return_value = httpx.Response(429, headers={"Retry-After": "1"})
+    with pytest.raises(RuntimeError, match="busy"):
+        predict(path)
+
+
+@respx.mock
+def test_old_servers_get_base64_json(remote):
+    path, _ = remote
+    route = respx.post(ENDPOINT).mock(
+        side_effect=[
+            httpx.Response(422),
+            httpx.Response(422),  # the probe image is rejected too
+            httpx.Response(200, json=RESULT),
+            httpx.Response(200, json=RESULT),
+        ]
+    )
+
+    assert predict(path) == RESULT
+    assert ocr_main.remote.transport == "base64"
+    image = base64.b64decode(route.calls[2].request.content.split(b'"')[3])
+    assert image == route.calls[0].request.content
+
+    assert predict(path) == RESULT
+    assert route.calls[3].request.headers["Content-Type"] == "application/json"
+
+
+@respx.mock
+def test_a_rejected_frame_keeps_the_raw_transport(remote):
+    path, _ = remote
+    route = respx.post(ENDPOINT).mock(
+        side_effect=[
+            httpx.Response(422),
+            httpx.Response(200, json=[]),  # the probe image is taken
+            httpx.Response(415),
+            httpx.Response(200, json=RESULT),
+        ]
+    )
+
+    assert predict(path) is None
+    assert ocr_main.remote.transport == "raw" and ocr_main.remote.raw_accepted
+    # The server is known to take raw images: no second probe.
+    assert predict(path) is None
+    assert predict(path) == RESULT
+    assert route.call_count == 4
+    assert all(call.request.headers["Content-Type"] == "image/jpeg" for call in route.calls)
+
+
+class FakeEngine:
+    def __init__(self, release=None):
+        self.release = release
+
+    def __call__(self, img_array):
+        if self.release is not None:
+            self.release.wait(5)
+        return [[[[0, 0], [4, 0], [4, 2], [0, 2]], f"{img_array.shape[1]}px", 0.9]], 0.01
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The OCR server with thread workers sharing a fake engine."""
+    pool = ThreadPool(1)
+    monkeypatch.setattr(ocr_server, "process_pool", pool)
+    monkeypatch.setattr(ocr_server, "ocr", FakeEngine(), raising=False)
+    monkeypatch.setattr(ocr_server, "API_TOKEN", "secret")
+    monkeypatch.setattr(ocr_server, "max_workers", 1)
+    monkeypatch.setattr(ocr_server, "max_backlog", 1)
+    monkeypatch.setattr(ocr_server, "pending", 0)
+    yield
+    pool.terminate()
+
+
+def png_bytes(width):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, 40), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def post(client, headers=None, **kwargs):
+    headers = {"Authorization": "Bearer secret", **(headers or {})}
+    return client.post("/predict", headers=headers, **kwargs)
+
+
+def test_server_takes_raw_and_base64_images(server):
+    async def run():
+        transport = httpx.ASGITransport(app=ocr_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ocr") as client:
+            raw = await post(client, content=png_bytes(64), headers={"Content-Type": "image/png"})
+            encoded = await post(
+                client, json={"image_base64": base64.b64encode(png_bytes(32)).decode()}
+            )
+            empty = await post(client, content=b"", headers={"Content-Type": "image/png"})
+            return raw, encoded, empty
+
+    raw, encoded, empty = asyncio.run(run())
+    assert raw.status_code == 200 and raw.json()[0]["rec_txt"] == "64px"
+    assert encoded.status_code == 200 and encoded.json()[0]["rec_txt"] == "32px"
+    assert empty.status_code == 400
+
+
+def test_server_turns_requests_away_once_the_backlog_is_full(server, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(ocr_server, "ocr", FakeEngine(release))
+    monkeypatch.setattr(ocr_server, "job_seconds", 2.5)
+
+    async def run():
+        transport = httpx.ASGITransport(app=ocr_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://ocr") as client:
+            first = asyncio.create_task(
+                post(client, content=png_bytes(64), headers={"Content-Type": "image/png"})
+            )
+            while ocr_server.pending == 0:
+                await asyncio.sleep(0.01)
+            busy = await post(client, content=png_bytes(64), headers={"Content-Type": "image/png"})
+            release.set()
+            return await first, busy
+
+    first, busy = asyncio.run(run())
+    assert first.status_code == 200
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == "3"
+    assert ocr_server.pending == 0
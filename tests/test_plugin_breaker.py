@@ -0,0 +1,213 @@
+"""Per-plugin circuit breaker, driven by faults injected into a stub plugin."""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from memos import crud
+from memos import server as server_module
+from memos.config import PluginQueueSettings
+from memos.models import PluginJobModel
+from memos.plugin_queue import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, PluginJobDispatcher
+from memos.server import api_router, app, get_db
+
+
+class StubPlugin(httpx.AsyncBaseTransport):
+    """An external plugin at /api/plugins/vlm. `mode` is "up", "error"
+    (answers 500) or "refuse" (connection refused)."""
+
+    def __init__(self):
+        self.mode = "up"
+        self.posts = 0
+        self.gets = 0
+        self.app = FastAPI()
+        self.app.post("/api/plugins/vlm")(self.run)
+        self.app.get("/api/plugins/vlm")(self.health)
+        self._asgi = httpx.ASGITransport(app=self.app)
+
+    async def run(self):
+        self.posts += 1
+        if self.mode == "error":
+            return JSONResponse({"detail": "model crashed"}, status_code=500)
+        return {}
+
+    async def health(self):
+        self.gets += 1
+        if self.mode == "error":
+            return JSONResponse({"healthy": False}, status_code=500)
+        return {"healthy": True}
+
+    async def handle_async_request(self, request):
+        if self.mode == "refuse":
+            raise httpx.ConnectError("connection refused", request=request)
+        return await self._asgi.handle_async_request(request)
+
+
+async def run_round(dispatcher):
+    started = await dispatcher.dispatch_once()
+    await asyncio.gather(*dispatcher._tasks)
+    return started
+
+
+def processing_status(Session, library_id):
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api_router.dependency_overrides[get_db] = override_get_db
+    server_module._processing_status_cache.clear()
+    try:
+        response = TestClient(app).get(f"/api/libraries/{library_id}/processing-status")
+        assert response.status_code == 200
+        return {p["name"]: p for p in response.json()["plugins"]}
+    finally:
+        api_router.dependency_overrides.pop(get_db, None)
+        server_module._processing_status_cache.clear()
+
+
+async def test_open_circuit_defers_jobs_until_the_plugin_recovers(
+    Session, seeded, monkeypatch
+):
+    vlm_id = seeded["plugin_ids"][1]
+    with Session() as db:
+        for entity_id in seeded["entity_ids"]:
+            crud.enqueue_plugin_jobs(entity_id, [vlm_id], db)
+
+    stub = StubPlugin()
+    stub.mode = "error"
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(
+            concurrency=1,
+            max_attempts=10,
+            retry_base_delay=0,
+            breaker_failure_threshold=2,
+            breaker_open_seconds=30,
+            breaker_max_open_seconds=600,
+        ),
+        handlers={},
+        probes={},
+    )
+    dispatcher._client = httpx.AsyncClient(transport=stub)
+    monkeypatch.setattr(app.state, "plugin_dispatcher", dispatcher, raising=False)
+    breaker = dispatcher.breakers
+    try:
+        assert await run_round(dispatcher) == 1
+        assert breaker[vlm_id].state == CLOSED
+        assert await run_round(dispatcher) == 1
+        assert breaker[vlm_id].state == OPEN
+
+        # Open: nothing is leased and the plugin is left alone.
+        assert await run_round(dispatcher) == 0
+        assert (stub.posts, stub.gets) == (2, 0)
+        with Session() as db:
+            jobs = db.query(PluginJobModel).all()
+            assert len(jobs) == 3 and max(job.attempts for job in jobs) == 1
+        status = processing_status(Session, seeded["library_id"])
+        assert status["vlm"]["state"] == "open"
+        assert status["vlm"]["consecutive_failures"] == 2
+        assert "500" in status["vlm"]["last_error"]
+        assert 25 < status["vlm"]["retry_in_seconds"] <= 30
+        assert status["ocr"]["state"] == "closed"
+
+        # A probe of a plugin that still refuses connections keeps it open,
+        # for twice as long.
+        stub.mode = "refuse"
+        breaker[vlm_id].opened_at -= 30
+        assert await run_round(dispatcher) == 0
+        assert breaker[vlm_id].state == OPEN
+        assert breaker[vlm_id].open_for == 60
+        assert breaker[vlm_id].last_error.startswith("health probe")
+
+        # Once the health route answers, one trial job closes the circuit.
+        stub.mode = "up"
+        breaker[vlm_id].opened_at -= 60
+        assert await run_round(dispatcher) == 0
+        assert stub.gets == 1
+        assert breaker[vlm_id].state == HALF_OPEN
+        assert await dispatcher.dispatch_once() == 1
+        assert await dispatcher.dispatch_once() == 0  # one trial at a time
+        await asyncio.gather(*dispatcher._tasks)
+        assert breaker[vlm_id].state == CLOSED
+
+        while await run_round(dispatcher):
+            pass
+    finally:
+        await dispatcher._client.aclose()
+
+    assert stub.posts == 5
+    with Session() as db:
+        assert db.query(PluginJobModel).count() == 0
+    assert processing_status(Session, seeded["library_id"])["vlm"] == {
+        "plugin_id": vlm_id,
+        "name": "vlm",
+        "state": "closed",
+        "consecutive_failures": 0,
+        "last_error": "health probe: connection refused",
+        "retry_in_seconds": None,
+    }
+
+
+async def test_inprocess_plugins_are_probed_through_their_backend(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(seeded["entity_ids"][0], [ocr_id], db)
+    backend_up = False
+
+    async def handler(entity, write_metadata):
+        if not backend_up:
+            raise RuntimeError("OCR server unreachable")
+        return {}
+
+    async def probe():
+        if not backend_up:
+            raise RuntimeError("OCR server unreachable")
+
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(
+            retry_base_delay=0, breaker_failure_threshold=1, breaker_open_seconds=0
+        ),
+        handlers={"/api/plugins/ocr": handler},
+        probes={"/api/plugins/ocr": probe},
+    )
+    assert await run_round(dispatcher) == 1
+    assert dispatcher.breakers[ocr_id].state == OPEN
+
+    assert await run_round(dispatcher) == 0  # the probe fails
+    assert dispatcher.breakers[ocr_id].state == OPEN
+
+    backend_up = True
+    assert await run_round(dispatcher) == 0
+    assert await run_round(dispatcher) == 1
+    assert dispatcher.circuit(ocr_id)["state"] == CLOSED
+
+
+def test_failed_trial_reopens_for_longer():
+    breaker = CircuitBreaker("vlm", 3, open_seconds=10, max_open_seconds=25)
+    for _ in range(3):
+        breaker.record_failure("503")
+    assert breaker.state == OPEN and breaker.allowed(4) == 0
+    assert not breaker.probe_due()
+
+    breaker.opened_at = time.monotonic() - 10
+    assert breaker.probe_due()
+    breaker.probe_succeeded()
+    assert breaker.state == HALF_OPEN and breaker.allowed(4) == 1
+
+    breaker.record_failure("503")
+    assert breaker.state == OPEN and breaker.open_for == 20
+    breaker.probe_failed("timeout")
+    assert breaker.open_for == 25
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allowed(4) == 4
+    assert breaker.open_for == 10 and breaker.consecutive_failures == 0
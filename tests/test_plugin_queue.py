@@ -0,0 +1,301 @@
+"""Tests for the durable plugin job queue (crud helpers + dispatcher)."""
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import respx
+from fastapi.testclient import TestClient
+
+from memos import crud
+from memos.config import PluginQueueSettings
+from memos.models import EntityPluginStatusModel, PluginJobModel
+from memos.plugin_queue import PluginJobDispatcher
+from memos.server import api_router, app, get_db
+
+
+def test_enqueue_is_idempotent(Session, seeded):
+    entity_id = seeded["entity_ids"][0]
+    with Session() as db:
+        assert crud.enqueue_plugin_jobs(entity_id, seeded["plugin_ids"], db) == 2
+        assert crud.enqueue_plugin_jobs(entity_id, seeded["plugin_ids"], db) == 0
+        assert db.query(PluginJobModel).count() == 2
+
+
+def test_lease_complete_records_plugin_status(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        for entity_id in seeded["entity_ids"]:
+            crud.enqueue_plugin_jobs(entity_id, [ocr_id], db)
+
+        jobs = crud.lease_plugin_jobs(ocr_id, 2, 60, db)
+        assert len(jobs) == 2
+        assert all(job.attempts == 1 for job in jobs)
+        # Leased jobs are not handed out twice.
+        assert len(crud.lease_plugin_jobs(ocr_id, 10, 60, db)) == 1
+
+        crud.complete_plugin_job(jobs[0].id, db)
+        assert db.query(PluginJobModel).count() == 2
+        assert (
+            db.query(EntityPluginStatusModel)
+            .filter_by(entity_id=jobs[0].entity_id, plugin_id=ocr_id)
+            .count()
+            == 1
+        )
+
+
+def test_expired_lease_is_dispatched_again(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(seeded["entity_ids"][0], [ocr_id], db)
+        (job,) = crud.lease_plugin_jobs(ocr_id, 1, 60, db)
+        job.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()
+
+        (again,) = crud.lease_plugin_jobs(ocr_id, 1, 60, db)
+        assert again.id == job.id
+        assert again.attempts == 2
+
+
+def test_fail_backs_off_then_gives_up(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(seeded["entity_ids"][0], [ocr_id], db)
+        (job,) = crud.lease_plugin_jobs(ocr_id, 1, 60, db)
+
+        assert crud.fail_plugin_job(job.id, "boom", 2, 30, 3600, db) is True
+        db.refresh(job)
+        assert job.lease_expires_at is None
+        assert job.last_error == "boom"
+        assert job.next_attempt_at > datetime.now(timezone.utc) + timedelta(seconds=20)
+        # Still backing off.
+        assert crud.lease_plugin_jobs(ocr_id, 1, 60, db) == []
+
+        job.next_attempt_at = datetime.now(timezone.utc)
+        db.commit()
+        (job,) = crud.lease_plugin_jobs(ocr_id, 1, 60, db)
+        assert crud.fail_plugin_job(job.id, "boom", 2, 30, 3600, db) is False
+        assert db.query(PluginJobModel).count() == 0
+
+
+def test_per_plugin_concurrency_falls_back_to_the_default():
+    settings = PluginQueueSettings(concurrency=4, plugin_concurrency={"vlm": 1, "ocr": 0})
+    assert settings.concurrency_for("vlm") == 1
+    assert settings.concurrency_for("ocr") == 1
+    assert settings.concurrency_for("structured_vlm") == 4
+
+
+def test_queue_stats_and_unprocessed_listing(Session, seeded):
+    entity_id = seeded["entity_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(entity_id, seeded["plugin_ids"], db)
+        crud.lease_plugin_jobs(seeded["plugin_ids"][0], 1, 60, db)
+
+        depth, in_flight, oldest = crud.get_plugin_queue_stats(seeded["library_id"], db)
+        assert (depth, in_flight) == (2, 1)
+        assert oldest is not None
+
+        entities, _ = crud.get_entities_of_folder(
+            seeded["library_id"], seeded["folder_id"], db, unprocessed_only=True
+        )
+        assert entity_id not in [e.id for e in entities]
+        assert len(entities) == 2
+
+
+@respx.mock
+async def test_dispatcher_runs_jobs_with_bounded_concurrency(Session, seeded):
+    ocr_id, vlm_id = seeded["plugin_ids"]
+    with Session() as db:
+        for entity_id in seeded["entity_ids"]:
+            crud.enqueue_plugin_jobs(entity_id, [ocr_id, vlm_id], db)
+
+    ocr_route = respx.post("http://testserver/api/plugins/ocr").mock(
+        return_value=httpx.Response(200, json={})
+    )
+    respx.post("http://testserver/api/plugins/vlm").mock(
+        return_value=httpx.Response(500, text="model unavailable")
+    )
+
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(concurrency=2, plugin_concurrency={"vlm": 1}),
+    )
+    dispatcher._client = httpx.AsyncClient()
+    try:
+        assert await dispatcher.dispatch_once() == 3
+        assert dispatcher.in_flight(ocr_id) == 2
+        assert dispatcher.in_flight(vlm_id) == 1
+        await asyncio.gather(*dispatcher._tasks)
+        while await dispatcher.dispatch_once():
+            assert dispatcher.in_flight(vlm_id) <= 1
+            await asyncio.gather(*dispatcher._tasks)
+    finally:
+        await dispatcher._client.aclose()
+
+    assert ocr_route.call_count == 3
+    request = ocr_route.calls[0].request
+    assert request.headers["Location"].startswith("http://testserver/api/entities/")
+
+    with Session() as db:
+        remaining = db.query(PluginJobModel).all()
+        # OCR jobs are done; the failed VLM jobs wait out their backoff.
+        assert [job.plugin_id for job in remaining] == [vlm_id, vlm_id, vlm_id]
+        assert all(job.attempts == 1 for job in remaining)
+        assert all("500" in job.last_error for job in remaining)
+        assert (
+            db.query(EntityPluginStatusModel).filter_by(plugin_id=ocr_id).count() == 3
+        )
+
+
+@respx.mock
+async def test_dispatcher_runs_builtin_plugins_in_process(Session, seeded):
+    from memos.schemas import EntityMetadataParam, MetadataType
+
+    ocr_id = seeded["plugin_ids"][0]
+    entity_id = seeded["entity_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(entity_id, [ocr_id], db)
+
+    seen = []
+
+    async def fake_ocr(entity, write_metadata):
+        seen.append(entity.id)
+        await write_metadata(
+            [
+                EntityMetadataParam(
+                    key="ocr_result",
+                    value="[]",
+                    source="ocr",
+                    data_type=MetadataType.JSON_DATA,
+                )
+            ]
+        )
+        return {}
+
+    webhook = respx.post(url__regex=r".*/api/plugins/.*")
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(),
+        handlers={"/api/plugins/ocr": fake_ocr},
+    )
+    assert await dispatcher.dispatch_once() == 1
+    await asyncio.gather(*dispatcher._tasks)
+
+    assert seen == [entity_id]
+    assert webhook.call_count == 0
+    with Session() as db:
+        assert db.query(PluginJobModel).count() == 0
+        entity = crud.get_entity_by_id(entity_id, db, include_relationships=True)
+        assert entity.get_metadata_by_key("ocr_result").value == "[]"
+        assert [s.plugin_id for s in entity.plugin_status] == [ocr_id]
+
+
+async def test_job_outliving_its_lease_is_failed_not_run_twice(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(seeded["entity_ids"][0], [ocr_id], db)
+
+    runs = []
+
+    async def hung_ocr(entity, write_metadata):
+        runs.append(entity.id)
+        await asyncio.sleep(3600)
+
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(lease_seconds=1, retry_base_delay=0),
+        handlers={"/api/plugins/ocr": hung_ocr},
+    )
+    assert dispatcher.job_timeout() == pytest.approx(0.9)
+    assert await dispatcher.dispatch_once() == 1
+    await asyncio.gather(*dispatcher._tasks)
+
+    assert runs == [seeded["entity_ids"][0]]
+    assert dispatcher.in_flight(ocr_id) == 0
+    with Session() as db:
+        [job] = db.query(PluginJobModel).all()
+        assert job.attempts == 1 and job.lease_expires_at is None
+        assert "timed out" in job.last_error
+
+
+async def test_dispatcher_keeps_database_work_off_the_event_loop(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    with Session() as db:
+        crud.enqueue_plugin_jobs(seeded["entity_ids"][0], [ocr_id], db)
+
+    loop_thread = threading.get_ident()
+    session_threads = set()
+
+    def session_factory():
+        session_threads.add(threading.get_ident())
+        return Session()
+
+    async def fake_ocr(entity, write_metadata):
+        await write_metadata([])
+
+    dispatcher = PluginJobDispatcher(
+        session_factory,
+        "http://testserver",
+        PluginQueueSettings(),
+        handlers={"/api/plugins/ocr": fake_ocr},
+    )
+    await dispatcher.start()
+    try:
+        assert session_threads and loop_thread not in session_threads
+        dispatcher.notify()
+
+        def pending(db):
+            return db.query(PluginJobModel).count()
+
+        # Polled on the dispatcher's own database thread: the sessions share
+        # one connection.
+        for _ in range(200):
+            if await dispatcher._read(pending) == 0:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await dispatcher.stop()
+    with Session() as db:
+        assert db.query(PluginJobModel).count() == 0
+    assert loop_thread not in session_threads
+
+
+def test_trigger_webhooks_only_enqueues(Session, seeded):
+    from memos.server import trigger_webhooks
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api_router.dependency_overrides[get_db] = override_get_db
+    try:
+        with Session() as db, respx.mock(assert_all_called=False) as mock:
+            webhook = mock.post(url__regex=r".*/api/plugins/.*")
+            library = crud.get_library_by_id(seeded["library_id"], db)
+            entity = crud.get_entity_by_id(seeded["entity_ids"][0], db)
+            trigger_webhooks(library, entity, None, db)
+            # Only the requested plugins are queued.
+            entity = crud.get_entity_by_id(seeded["entity_ids"][1], db)
+            trigger_webhooks(library, entity, [seeded["plugin_ids"][0]], db)
+        assert webhook.call_count == 0
+
+        client = TestClient(app)
+        response = client.get(f"/api/libraries/{seeded['library_id']}/plugin-jobs")
+        assert response.status_code == 200
+        assert response.json()["depth"] == 3
+
+        status = client.get(
+            f"/api/libraries/{seeded['library_id']}/processing-status"
+        ).json()
+        assert status["queue"]["depth"] == 3
+        assert status["queue"]["in_flight"] == 0
+        assert status["queue"]["oldest_age_seconds"] is not None
+    finally:
+        api_router.dependency_overrides.pop(get_db, None)
@@ -203,3 +203,36 @@ async def test_predict_logs_json_parse_failure_category(img_path, caplog):
         )
     assert result is None
     assert any(f"category={FAIL_JSON_PARSE}" in r.message for r in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_process_entity_writes_through_given_writer(img_path, good_envelope):
+    """In-process dispatch: the result goes to the writer, not over HTTP."""
+    from datetime import datetime, timezone
+
+    from memos.config import VLMSettings
+    from memos.plugins.structured_vlm import main as structured_vlm_main
+    from memos.schemas import Entity
+
+    structured_vlm_main.init_plugin(
+        VLMSettings(endpoint="https://fake-vlm.test", modelname="qwen3.6-35b")
+    )
+    now = datetime.now(timezone.utc)
+    entity = Entity(
+        id=7, filepath=img_path, filename="sample.webp", size=1,
+        file_created_at=now, file_last_modified_at=now, file_type="webp",
+        file_type_group="image", last_scan_at=None, folder_id=1, library_id=1,
+    )
+    written = []
+
+    async def writer(entries):
+        written.extend(entries)
+
+    with respx.mock(base_url="https://fake-vlm.test") as mock:
+        mock.post("/v1/chat/completions").mock(return_value=Response(200, json=good_envelope))
+        result = await structured_vlm_main.process_entity(entity, writer)
+
+    field = metadata_field_name("qwen3.6-35b")
+    assert [e.key for e in written] == [field]
+    assert written[0].source == "structured_vlm"
+    assert result == {field: written[0].value}
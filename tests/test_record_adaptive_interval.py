@@ -0,0 +1,90 @@
+"""Adaptive capture interval: back off on a static screen, snap back on change."""
+import pytest
+
+import memos.record as record
+from memos.config import settings
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "record_interval", 4)
+    monkeypatch.setattr(settings.record, "max_interval", 20)
+    monkeypatch.setattr(settings.record, "interval_backoff", 2)
+    monkeypatch.setattr(record, "touch_heartbeat", lambda: None)
+    monkeypatch.setattr(record, "is_screen_locked", lambda: False)
+    window = {"current": ("Editor", "notes.txt - Editor", None)}
+    monkeypatch.setattr(record, "get_active_window_info", lambda: window["current"])
+    sleeps = []
+
+    def run(source, iterations, sleep_fn=None):
+        record.run_screen_recorder(
+            4,
+            str(tmp_path),
+            {},
+            iterations=iterations,
+            sleep_fn=sleep_fn or sleeps.append,
+            frame_source=source,
+        )
+        return sleeps
+
+    run.window = window
+    return run
+
+
+def test_interval_backs_off_up_to_the_cap_and_snaps_back():
+    interval = record.AdaptiveInterval(base=4, max_interval=20, backoff=2)
+    assert [interval.update(False) for _ in range(4)] == [8, 16, 20, 20]
+    assert interval.update(True) == 4
+    assert record.AdaptiveInterval(base=4, max_interval=1).update(False) == 4
+
+
+def test_static_screen_sleeps_longer_in_record_interval_slices(recorder):
+    # change_every larger than the run: only the first frame is new.
+    source = record.SyntheticFrameSource(screens=["main"], change_every=100)
+    sleeps = recorder(source, iterations=3)
+    # base 4s after the first (changed) tick, then 8s and 16s in 4s slices.
+    assert sleeps == [4] + [4] * 2 + [4] * 4
+
+
+def test_changing_screen_keeps_the_base_interval(recorder):
+    source = record.SyntheticFrameSource(screens=["main"], change_every=1)
+    assert recorder(source, iterations=3) == [4, 4, 4]
+
+
+def test_window_switch_ends_a_long_wait_early(recorder):
+    source = record.SyntheticFrameSource(screens=["main"], change_every=100)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            recorder.window["current"] = ("Browser", "docs", None)
+
+    recorder(source, iterations=3, sleep_fn=sleep)
+    # tick 1: 4s. tick 2 (static): 8s, cut short after the first slice by the
+    # switch. tick 3 sees the new window and waits the base interval again.
+    assert sleeps == [4, 4, 4]
+
+
+def test_stats_report_captures_disk_and_cpu(tmp_path):
+    pipeline = record.CapturePipeline(
+        record.SyntheticFrameSource(screens=["a", "b"], change_every=2),
+        str(tmp_path),
+        4,
+        {},
+    )
+    window = {"active_app": "", "active_window": ""}
+    try:
+        for i in range(4):
+            pipeline.tick("20241101", f"20241101-1200{i:02d}", window)
+        pipeline.flush()
+    finally:
+        pipeline.close()
+
+    assert pipeline.frames_captured == 8
+    assert pipeline.frames_saved == 4
+    files = list((tmp_path / "20241101").glob("*.webp"))
+    assert pipeline.bytes_written == sum(f.stat().st_size for f in files)
+    summary = record.RecorderStats().summary(pipeline, 8)
+    for part in ("captures/h", "saved/h", "CPU", "MB/h", "interval 8.0s"):
+        assert part in summary
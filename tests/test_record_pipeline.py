@@ -0,0 +1,116 @@
+"""The pipelined recorder, driven by a synthetic frame source."""
+import json
+import time
+
+import memos.record as record
+from memos.utils import get_image_metadata
+from memos.worklog import read_worklog
+
+DATE = "20241101"
+
+WINDOW = {"active_app": "Editor", "active_window": "notes.txt - Editor"}
+
+
+def record_ticks(tmp_path, source, iterations):
+    pipeline = record.CapturePipeline(source, str(tmp_path), 4, {})
+    try:
+        for i in range(iterations):
+            pipeline.tick(DATE, f"{DATE}-1200{i:02d}", WINDOW)
+    finally:
+        pipeline.close()
+    return sorted((tmp_path / DATE).glob("*.webp"))
+
+
+def test_frames_are_written_with_metadata_sequences_and_worklog(tmp_path):
+    source = record.SyntheticFrameSource(screens=["left", "right"])
+    files = record_ticks(tmp_path, source, iterations=3)
+
+    assert len(files) == 6
+    metadata = [get_image_metadata(f) for f in files]
+    assert sorted((m["screen_name"], m["sequence"]) for m in metadata) == [
+        ("left", 1), ("left", 2), ("left", 3), ("right", 1), ("right", 2), ("right", 3)
+    ]
+    assert all(m["active_app"] == "Editor" for m in metadata)
+    sequences = json.loads((tmp_path / DATE / ".screen_sequences").read_text())
+    assert sequences == {"left": 3, "right": 3}
+    entries = list(read_worklog(tmp_path / DATE / "worklog"))
+    assert len(entries) == 6 and all(e.saved for e in entries)
+
+
+def test_similar_frames_are_skipped(tmp_path):
+    source = record.SyntheticFrameSource(screens=["main"], change_every=2)
+    files = record_ticks(tmp_path, source, iterations=4)
+
+    assert len(files) == 2
+    entries = list(read_worklog(tmp_path / DATE / "worklog"))
+    assert sorted(e.saved for e in entries) == [False, False, True, True]
+
+
+def test_recorder_loop_uses_the_given_frame_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(record, "touch_heartbeat", lambda: None)
+    monkeypatch.setattr(record, "is_screen_locked", lambda: False)
+    monkeypatch.setattr(
+        record, "get_active_window_info", lambda: ("Editor", "notes.txt - Editor", None)
+    )
+    record.run_screen_recorder(
+        4,
+        str(tmp_path),
+        {},
+        iterations=1,
+        sleep_fn=lambda _interval: None,
+        frame_source=record.SyntheticFrameSource(screens=["left", "right"]),
+    )
+    files = list(tmp_path.glob("*/screenshot-*.webp"))
+    assert sorted(get_image_metadata(f)["screen_name"] for f in files) == ["left", "right"]
+
+
+def test_screens_are_captured_concurrently(tmp_path):
+    delay = 0.1
+    source = record.SyntheticFrameSource(
+        screens=[f"monitor_{i}" for i in range(4)], grab_delay=delay
+    )
+    pipeline = record.CapturePipeline(source, str(tmp_path), 4, {}, capture_workers=4)
+    try:
+        t0 = time.perf_counter()
+        futures = pipeline.tick(DATE, f"{DATE}-120000", {"active_app": "", "active_window": ""})
+        elapsed = time.perf_counter() - t0
+        assert all(f.result(5) for f in futures)
+    finally:
+        pipeline.close()
+    assert elapsed < 2 * delay
+
+
+def test_encoding_overlaps_capture_until_the_queue_is_full(tmp_path, monkeypatch):
+    encode_delay = 0.1
+    save = record.save_image_with_metadata
+
+    def slow_save(*args, **kwargs):
+        time.sleep(encode_delay)
+        save(*args, **kwargs)
+
+    monkeypatch.setattr(record, "save_image_with_metadata", slow_save)
+    window = {"active_app": "", "active_window": ""}
+
+    def tick_seconds(screens, queue_size):
+        source = record.SyntheticFrameSource(screens=[f"s{i}" for i in range(screens)])
+        pipeline = record.CapturePipeline(
+            source, str(tmp_path), 4, {}, encode_workers=1, queue_size=queue_size
+        )
+        try:
+            t0 = time.perf_counter()
+            pipeline.tick(DATE, f"{DATE}-120000", window)
+            elapsed = time.perf_counter() - t0
+            pipeline.flush()
+            return elapsed, pipeline.timings.snapshot()
+        finally:
+            pipeline.close()
+
+    # The tick hands frames off and returns while they are still encoding...
+    elapsed, timings = tick_seconds(screens=2, queue_size=8)
+    assert elapsed < encode_delay
+    assert {"screens", "capture", "hash", "queue_wait", "encode", "write"} <= set(timings)
+    assert timings["encode"]["count"] == 2
+
+    # ...but a full queue makes capture wait for the encoder.
+    elapsed, _ = tick_seconds(screens=4, queue_size=1)
+    assert elapsed >= 2 * encode_delay
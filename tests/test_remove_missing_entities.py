@@ -0,0 +1,263 @@
+"""Bulk deletion of entities a scan no longer finds."""
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from memos import crud
+from memos.cmds.library import check_deleted_files
+from memos.models import (
+    Base,
+    EntityMetadataModel,
+    EntityModel,
+    EntityPluginStatusModel,
+    EntityTagModel,
+    FolderModel,
+    LibraryModel,
+    PluginJobModel,
+    PluginModel,
+    TagModel,
+)
+from memos.schemas import FolderType, MetadataSource, MetadataType
+from memos.server import api_router, app, get_read_db
+from memos.utils.directory_digest import directory_digests
+from memos.write_queue import WriteQueue
+
+NOW = datetime(2024, 11, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Plain stand-ins for the fts5/vec0 virtual tables.
+        conn.execute(text("CREATE TABLE entities_fts (id, filepath, tags, metadata)"))
+        conn.execute(text("CREATE TABLE entities_vec_v2 (embedding BLOB)"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+def seed(Session, filepaths):
+    with Session() as db:
+        lib = LibraryModel(name="lib")
+        plugin = PluginModel(name="ocr", description="", webhook_url="http://x")
+        tag = TagModel(name="t")
+        db.add_all([lib, plugin, tag])
+        db.flush()
+        folder = FolderModel(
+            library_id=lib.id,
+            path="/data",
+            type=FolderType.DEFAULT,
+            last_modified_at=NOW,
+        )
+        db.add(folder)
+        db.flush()
+        for filepath in filepaths:
+            entity = EntityModel(
+                filepath=filepath,
+                filename=filepath.rsplit("/", 1)[-1],
+                size=1,
+                file_created_at=NOW,
+                file_last_modified_at=NOW,
+                file_type="png",
+                file_type_group="image",
+                library_id=lib.id,
+                folder_id=folder.id,
+            )
+            db.add(entity)
+            db.flush()
+            db.add_all(
+                [
+                    EntityMetadataModel(
+                        entity_id=entity.id,
+                        key="k",
+                        value="v",
+                        source_type=MetadataSource.SYSTEM_GENERATED,
+                        data_type=MetadataType.TEXT_DATA,
+                    ),
+                    EntityTagModel(
+                        entity_id=entity.id,
+                        tag_id=tag.id,
+                        source=MetadataSource.USER_GENERATED,
+                    ),
+                    EntityPluginStatusModel(entity_id=entity.id, plugin_id=plugin.id),
+                    PluginJobModel(
+                        entity_id=entity.id, plugin_id=plugin.id, next_attempt_at=NOW
+                    ),
+                ]
+            )
+            db.execute(
+                text("INSERT INTO entities_fts (id, filepath) VALUES (:id, :fp)"),
+                {"id": entity.id, "fp": filepath},
+            )
+            db.execute(
+                text("INSERT INTO entities_vec_v2 (rowid, embedding) VALUES (:id, x'00')"),
+                {"id": entity.id},
+            )
+        db.commit()
+        return lib.id, folder.id
+
+
+def remaining(db):
+    return {
+        "entities": sorted(fp for (fp,) in db.query(EntityModel.filepath)),
+        "fts": db.execute(text("SELECT count(*) FROM entities_fts")).scalar(),
+        "vec": db.execute(text("SELECT count(*) FROM entities_vec_v2")).scalar(),
+        "metadata": db.query(EntityMetadataModel).count(),
+        "tags": db.query(EntityTagModel).count(),
+        "status": db.query(EntityPluginStatusModel).count(),
+        "jobs": db.query(PluginJobModel).count(),
+    }
+
+
+FILES = [
+    "/data/20241101/a.png",
+    "/data/20241101/b.png",
+    "/data/20241101/c.png",
+    "/data/20241101-copy/a.png",
+]
+
+
+def test_removes_only_missing_entities_under_prefix(Session):
+    library_id, folder_id = seed(Session, FILES)
+    with Session() as db:
+        deleted = crud.remove_missing_entities(
+            library_id, folder_id, "/data/20241101", {"/data/20241101/a.png"}, db
+        )
+        assert sorted(deleted) == ["/data/20241101/b.png", "/data/20241101/c.png"]
+        assert remaining(db) == {
+            # The -copy sibling matches the LIKE prefix but is not under it.
+            "entities": ["/data/20241101-copy/a.png", "/data/20241101/a.png"],
+            "fts": 2,
+            "vec": 2,
+            "metadata": 2,
+            "tags": 2,
+            "status": 2,
+            "jobs": 2,
+        }
+
+
+def test_remove_library_uses_bulk_delete(Session):
+    library_id, _ = seed(Session, FILES)
+    with Session() as db:
+        crud.remove_library(library_id, db)
+        assert remaining(db) == {
+            "entities": [],
+            "fts": 0,
+            "vec": 0,
+            "metadata": 0,
+            "tags": 0,
+            "status": 0,
+            "jobs": 0,
+        }
+        assert db.query(FolderModel).count() == 0
+        assert db.query(LibraryModel).count() == 0
+
+
+def test_route_deletes_in_one_queued_write(engine, Session, monkeypatch):
+    library_id, folder_id = seed(Session, FILES)
+    write_queue = WriteQueue(engine)
+    monkeypatch.setattr(app.state, "write_queue", write_queue)
+    try:
+        response = TestClient(app).post(
+            f"/api/libraries/{library_id}/folders/{folder_id}/entities/remove-missing",
+            json={
+                "path_prefix": "/data/20241101",
+                "present_filepaths": ["/data/20241101/c.png"],
+            },
+        )
+    finally:
+        write_queue.stop()
+
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted_filepaths"]) == [
+        "/data/20241101/a.png",
+        "/data/20241101/b.png",
+    ]
+    assert write_queue.batches_total == 1
+    with Session() as db:
+        assert remaining(db)["entities"] == [
+            "/data/20241101-copy/a.png",
+            "/data/20241101/c.png",
+        ]
+
+
+def test_directory_digests_match_the_scanned_files(Session):
+    library_id, folder_id = seed(Session, FILES)
+    with Session() as db:
+        digests = crud.get_directory_digests(library_id, folder_id, "/data", db)
+        assert digests == directory_digests(FILES)
+        assert crud.get_directory_digests(
+            library_id, folder_id, "/data/20241101", db
+        ) == directory_digests(FILES[:3])
+
+
+def test_non_recursive_removal_leaves_subdirectories_alone(Session):
+    library_id, folder_id = seed(Session, FILES + ["/data/20241101/sub/d.png"])
+    with Session() as db:
+        deleted = crud.remove_missing_entities(
+            library_id, folder_id, "/data/20241101", set(), db, recursive=False
+        )
+        assert sorted(deleted) == FILES[:3]
+        assert remaining(db)["entities"] == [
+            "/data/20241101-copy/a.png",
+            "/data/20241101/sub/d.png",
+        ]
+
+
+async def test_scan_only_sends_file_lists_of_changed_directories(
+    engine, Session, monkeypatch
+):
+    library_id, folder_id = seed(Session, FILES + ["/data/20241102/a.png"])
+    write_queue = WriteQueue(engine)
+    monkeypatch.setattr(app.state, "write_queue", write_queue)
+
+    def override():
+        with Session() as db:
+            yield db
+
+    monkeypatch.setitem(api_router.dependency_overrides, get_read_db, override)
+    bodies = []
+
+    async def record(request):
+        if request.url.path.endswith("/remove-missing"):
+            bodies.append(json.loads(request.content))
+
+    scanned = set(FILES + ["/data/20241102/a.png"]) - {"/data/20241101/b.png"}
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), event_hooks={"request": [record]}
+        ) as client:
+            deleted = await check_deleted_files(
+                client, library_id, {"id": folder_id}, Path("/data"), scanned
+            )
+    finally:
+        write_queue.stop()
+
+    assert deleted == 1
+    assert bodies == [
+        {
+            "path_prefix": "/data/20241101",
+            "present_filepaths": ["/data/20241101/a.png", "/data/20241101/c.png"],
+            "recursive": False,
+        }
+    ]
+    with Session() as db:
+        assert "/data/20241101/b.png" not in remaining(db)["entities"]
+        assert len(remaining(db)["entities"]) == 4
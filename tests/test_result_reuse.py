@@ -0,0 +1,198 @@
+"""Reuse of plugin results for near-duplicate frames."""
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from PIL import Image, ImageDraw
+from sqlalchemy import text
+
+from memos import crud
+from memos.config import PluginQueueSettings, ResultReuseSettings
+from memos.models import EntityModel, EntityPhashModel
+from memos.plugin_queue import PluginJobDispatcher
+from memos.result_reuse import ResultReuse, compute_phash
+from memos.schemas import EntityMetadataParam, MetadataType
+from memos.search import SqliteSearchProvider
+
+
+def screen(path, layout, marker=None):
+    img = Image.new("RGB", (640, 400), "white" if layout == "a" else (30, 30, 30))
+    draw = ImageDraw.Draw(img)
+    panel, text_x = ((380, 80, 600, 360), 30) if layout == "a" else ((40, 80, 260, 360), 300)
+    draw.rectangle(panel, fill=(200, 60, 60) if layout == "a" else (220, 220, 220))
+    for i in range(12):
+        draw.text((text_x, 60 + i * 26), f"{layout} line {i}", fill="gray")
+    if marker:
+        draw.point(marker, fill="black")  # a cursor blink: same frame to the eye
+    img.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def frames(tmp_path, Session, seeded):
+    """e0 and e1 show the same screen, e2 a different one."""
+    paths = [
+        screen(tmp_path / "e0.png", "a"),
+        screen(tmp_path / "e1.png", "a", marker=(620, 390)),
+        screen(tmp_path / "e2.png", "b"),
+    ]
+    with Session() as db:
+        for entity_id, path in zip(seeded["entity_ids"], paths):
+            db.get(EntityModel, entity_id).filepath = path
+        db.commit()
+    return paths
+
+
+def fake_plugin(seen):
+    async def fake_ocr(entity, write_metadata):
+        seen.append(entity.id)
+        await write_metadata(
+            [
+                EntityMetadataParam(
+                    key="ocr_result",
+                    value=json.dumps([{"rec_txt": f"text of {entity.id}"}]),
+                    source="ocr",
+                    data_type=MetadataType.JSON_DATA,
+                )
+            ]
+        )
+        return {}
+
+    return fake_ocr
+
+
+def test_band_lookup_respects_the_distance_cutoff(Session, seeded):
+    ocr_id = seeded["plugin_ids"][0]
+    e0, e1, e2 = seeded["entity_ids"]
+    base = 0xF123_4567_89AB_CDEF  # above 2**63: stored signed
+    with Session() as db:
+        crud.upsert_entity_phash(e0, seeded["library_id"], base ^ 0b1, db)
+        crud.upsert_entity_phash(e1, seeded["library_id"], base ^ 0b1111, db)
+        for entity_id in (e0, e1):
+            crud.record_plugin_processed(entity_id, ocr_id, db)
+
+        assert db.get(EntityPhashModel, e0).phash < 0
+        assert crud.find_processed_near_duplicates(
+            seeded["library_id"], ocr_id, base, 3, e2, db
+        ) == [(e0, 1)]
+        assert crud.find_processed_near_duplicates(
+            seeded["library_id"], ocr_id, base, 0, e2, db
+        ) == []
+        # Three flipped bits spread over three bands still share the fourth.
+        spread = base ^ 0b1 ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+        assert crud.find_processed_near_duplicates(
+            seeded["library_id"], ocr_id, spread, 3, e2, db
+        ) == [(e0, 3)]
+        # Only frames the plugin itself processed are candidates.
+        vlm_id = seeded["plugin_ids"][1]
+        assert crud.find_processed_near_duplicates(
+            seeded["library_id"], vlm_id, base, 3, e2, db
+        ) == []
+
+
+def test_near_duplicate_gets_a_copy_instead_of_a_plugin_run(Session, seeded, frames):
+    ocr_id = seeded["plugin_ids"][0]
+    e0, e1, e2 = seeded["entity_ids"]
+    assert bin(compute_phash(frames[0]) ^ compute_phash(frames[1])).count("1") <= 2
+    assert bin(compute_phash(frames[0]) ^ compute_phash(frames[2])).count("1") > 3
+
+    seen = []
+    reuse = ResultReuse(ResultReuseSettings(plugin_sources={"ocr": "ocr"}))
+    dispatcher = PluginJobDispatcher(
+        Session,
+        "http://testserver",
+        PluginQueueSettings(),
+        handlers={"/api/plugins/ocr": fake_plugin(seen)},
+        reuse=reuse,
+    )
+
+    async def run(entity_id):
+        with Session() as db:
+            crud.enqueue_plugin_jobs(entity_id, [ocr_id], db)
+        assert await dispatcher.dispatch_once() == 1
+        await asyncio.gather(*dispatcher._tasks)
+
+    async def run_all():
+        for entity_id in (e0, e1, e2):
+            await run(entity_id)
+
+    asyncio.run(run_all())
+
+    assert seen == [e0, e2]
+    assert (reuse.hits, reuse.misses) == (1, 2)
+    with Session() as db:
+        copy = crud.get_entity_by_id(e1, db, include_relationships=True)
+        assert copy.get_metadata_by_key("ocr_result").value == json.dumps(
+            [{"rec_txt": f"text of {e0}"}]
+        )
+        audit = json.loads(copy.get_metadata_by_key("ocr_reused_from").value)
+        assert audit["entity_id"] == e0 and audit["distance"] <= 2
+        assert [s.plugin_id for s in copy.plugin_status] == [ocr_id]
+        assert db.query(EntityPhashModel).count() == 3
+
+
+def test_copied_frames_share_the_source_embedding(Session, seeded, monkeypatch):
+    e0, e1, e2 = seeded["entity_ids"]
+    with Session() as db:
+        for entity_id, (timestamp, text_value) in zip(
+            seeded["entity_ids"], [("0900", "same"), ("0904", "same"), ("0908", "other")]
+        ):
+            db.get(EntityModel, entity_id).last_scan_at = datetime.now()
+            crud.update_entity_metadata_entries(
+                entity_id,
+                [
+                    EntityMetadataParam(
+                        key="timestamp", value=timestamp, source="scan",
+                        data_type=MetadataType.TEXT_DATA,
+                    ),
+                    EntityMetadataParam(
+                        key="ocr_result", value=text_value, source="ocr",
+                        data_type=MetadataType.TEXT_DATA,
+                    ),
+                ],
+                db,
+            )
+        for entity_id in (e1, e2):
+            crud.update_entity_metadata_entries(
+                entity_id,
+                [
+                    EntityMetadataParam(
+                        key="ocr_reused_from",
+                        value=json.dumps({"entity_id": e0, "distance": 1}),
+                        source="ocr",
+                        data_type=MetadataType.JSON_DATA,
+                    )
+                ],
+                db,
+            )
+        db.execute(
+            text(
+                "CREATE TABLE entities_vec_v2 (rowid INTEGER PRIMARY KEY, embedding BLOB, "
+                "app_name, file_type_group, created_at_timestamp, "
+                "file_created_at_timestamp, file_created_at_date, library_id)"
+            )
+        )
+        db.execute(text("CREATE TABLE entities_fts (id, filepath, tags, metadata)"))
+        db.execute(
+            text("INSERT INTO entities_vec_v2 (rowid, embedding) VALUES (:id, x'0102')"),
+            {"id": e0},
+        )
+        db.commit()
+
+    embedded = []
+
+    def fake_embeddings(texts):
+        embedded.extend(texts)
+        return [[0.5] * 4 for _ in texts]
+
+    monkeypatch.setattr("memos.search.get_embeddings", fake_embeddings)
+    with Session() as db:
+        SqliteSearchProvider().batch_update_entity_indices([e1, e2], db)
+        rows = dict(db.execute(text("SELECT rowid, embedding FROM entities_vec_v2")).fetchall())
+
+    # e1 differs from e0 only in its timestamp; e2's text is its own.
+    assert rows[e1] == b"\x01\x02"
+    assert rows[e2] != b"\x01\x02"
+    assert len(embedded) == 1 and "other" in embedded[0]
+    assert "reused_from" not in embedded[0]
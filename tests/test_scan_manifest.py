@@ -0,0 +1,182 @@
+"""Incremental scans driven by per-directory manifests."""
+import os
+import time
+
+import pytest
+
+from memos.cmds.library import is_candidate_file
+from memos.utils.scan_manifest import ScanManifest
+
+# Old enough that directory mtimes are outside the racy window.
+AN_HOUR_AGO = time.time() - 3600
+
+
+def touch(path, content=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def age(root):
+    """Backdate every directory so the manifest trusts its mtime."""
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (AN_HOUR_AGO, AN_HOUR_AGO))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / "screenshots"
+    for day in ("20241101", "20241102"):
+        for i in range(3):
+            touch(root / day / f"screenshot-{i}.webp")
+        touch(root / day / ".tmp-screenshot.webp")
+        touch(root / day / "notes.txt")
+    age(root)
+    return root.resolve()
+
+
+def walk(manifest, root, **kwargs):
+    return manifest.walk(root, is_candidate_file, **kwargs)
+
+
+def test_first_scan_reports_every_candidate(archive, tmp_path):
+    plan = walk(ScanManifest(tmp_path / "m.json"), archive)
+    assert len(plan.candidate_files) == 6
+    assert sorted(plan.changed_files) == sorted(plan.candidate_files)
+    assert all(p.endswith(".webp") and "/.tmp" not in p for p in plan.candidate_files)
+
+
+def test_unchanged_directories_are_skipped(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, archive)
+    manifest.save()
+
+    manifest = ScanManifest.load(tmp_path / "m.json")
+    plan = walk(manifest, archive)
+    assert len(plan.candidate_files) == 6
+    assert plan.changed_files == []
+    assert (plan.dirs_listed, plan.dirs_skipped) == (0, 3)
+
+
+def test_recently_modified_directories_are_listed_again(tmp_path):
+    root = tmp_path / "screenshots"
+    touch(root / "20241101" / "screenshot-0.webp")
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, root)
+
+    # Modified within the racy window: a file added in the same mtime tick
+    # would not have changed the mtime, so the manifest cannot be trusted.
+    plan = walk(manifest, root)
+    assert (plan.dirs_listed, plan.dirs_skipped) == (2, 0)
+
+
+def test_only_new_and_changed_files_are_reported(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, archive)
+
+    touch(archive / "20241102" / "screenshot-9.webp")
+    touch(archive / "20241102" / "screenshot-0.webp", b"rewritten")
+    touch(archive / "20241103" / "screenshot-0.webp")
+
+    plan = walk(manifest, archive)
+    assert sorted(plan.changed_files) == sorted(
+        [
+            str(archive / "20241102" / "screenshot-0.webp"),
+            str(archive / "20241102" / "screenshot-9.webp"),
+            str(archive / "20241103" / "screenshot-0.webp"),
+        ]
+    )
+    assert len(plan.candidate_files) == 8
+
+
+def test_removed_directories_leave_the_manifest(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, archive)
+
+    for f in (archive / "20241101").iterdir():
+        f.unlink()
+    (archive / "20241101").rmdir()
+
+    plan = walk(manifest, archive)
+    assert len(plan.candidate_files) == 3
+    assert str(archive / "20241101") not in manifest.dirs
+
+
+def test_full_scan_and_forget_recheck_files(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, archive)
+    age(archive)
+
+    assert len(walk(manifest, archive, full=True).changed_files) == 6
+
+    failed = str(archive / "20241101" / "screenshot-1.webp")
+    manifest.forget(failed)
+    age(archive)
+    assert walk(manifest, archive).changed_files == [failed]
+
+
+def test_subpath_scan_keeps_the_rest_of_the_manifest(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json")
+    walk(manifest, archive)
+
+    plan = walk(manifest, archive / "20241102")
+    assert len(plan.candidate_files) == 3
+    assert str(archive / "20241101") in manifest.dirs
+
+
+def test_unreadable_manifest_starts_over(tmp_path):
+    path = tmp_path / "m.json"
+    path.write_text("{not json")
+    assert ScanManifest.load(path).dirs == {}
+
+
+def test_manifest_of_another_folder_starts_over(archive, tmp_path):
+    manifest = ScanManifest(tmp_path / "m.json", identity="2024-11-01T00:00:00")
+    walk(manifest, archive)
+    manifest.server_digests = {str(archive / "20241101"): "a", "/gone": "b"}
+    manifest.save()
+
+    same = ScanManifest.load(tmp_path / "m.json", "2024-11-01T00:00:00")
+    assert len(same.dirs) == 3
+    assert same.server_digests == {str(archive / "20241101"): "a"}
+    # A library or folder recreated under the same ids.
+    assert ScanManifest.load(tmp_path / "m.json", "2025-01-01T00:00:00").dirs == {}
+
+
+async def test_scan_rechecks_what_changed_on_the_server(archive, tmp_path, monkeypatch):
+    from memos.cmds import library as library_cmds
+
+    day1, day2 = str(archive / "20241101"), str(archive / "20241102")
+    digests = {day1: "a", day2: "b"}
+    sent = []
+
+    async def process_file_batches(client, library, folder, files, *args):
+        sent.append(sorted(files))
+        return 0, 0
+
+    async def fetch_directory_digests(*args):
+        return dict(digests)
+
+    async def check_deleted_files(client, library_id, folder, path, scanned, manifest):
+        manifest.server_digests = dict(digests)
+        return 0
+
+    monkeypatch.setattr(library_cmds, "manifest_path", lambda *ids: tmp_path / "m.json")
+    monkeypatch.setattr(library_cmds, "process_file_batches", process_file_batches)
+    monkeypatch.setattr(library_cmds, "fetch_directory_digests", fetch_directory_digests)
+    monkeypatch.setattr(library_cmds, "check_deleted_files", check_deleted_files)
+    library = {"id": 1, "plugins": []}
+    folder = {"id": 1, "created_at": "2024-11-01T00:00:00"}
+
+    async def scan(folder=folder, plugins=None):
+        await library_cmds.loop_files(library, folder, archive, False, plugins, 1)
+        return sent[-1]
+
+    assert len(await scan()) == 6
+    assert await scan() == []
+    # The day's entities were deleted on the server.
+    del digests[day2]
+    assert await scan() == [f"{day2}/screenshot-{i}.webp" for i in range(3)]
+    assert await scan() == []
+    # Plugin runs and recreated folders reach every file.
+    assert len(await scan(plugins=[5])) == 6
+    assert len(await scan(folder={"id": 1, "created_at": "2025-01-01T00:00:00"})) == 6
@@ -0,0 +1,101 @@
+"""The scan pipeline: parallel prepare, bounded hand-offs, failure handling."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from memos.cmds import library
+
+PREPARE_DELAY = 0.05
+
+
+class Ingest:
+    """Stands in for the server: no existing entities, every add succeeds."""
+
+    def __init__(self, upsert_delay=0.0):
+        self.upsert_delay = upsert_delay
+        self.prepared = 0
+        self.added = []
+        self.max_outstanding = 0
+
+    async def handler(self, request):
+        if request.url.path.endswith("/entities/by-filepaths"):
+            return httpx.Response(200, json=[])
+        await asyncio.sleep(self.upsert_delay)
+        self.added.append(request.url.path)
+        return httpx.Response(200, json={})
+
+    def prepare(self, file_path, folder_id):
+        self.prepared += 1
+        self.max_outstanding = max(
+            self.max_outstanding, self.prepared - len(self.added)
+        )
+        if "thumb" in file_path:
+            return None
+        if "broken" in file_path:
+            raise OSError("vanished")
+        return {"filepath": file_path, "folder_id": folder_id}
+
+
+def run_scan(ingest, files, **kwargs):
+    async def scan():
+        transport = httpx.MockTransport(ingest.handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await library.process_file_batches(
+                client,
+                {"id": 1, "plugins": []},
+                {"id": 1},
+                files,
+                False,
+                None,
+                asyncio.Semaphore(4),
+                **kwargs,
+            )
+
+    return asyncio.run(scan())
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    ingest = Ingest()
+    monkeypatch.setattr(library, "prepare_entity", ingest.prepare)
+    return ingest
+
+
+def test_prepare_runs_in_parallel(ingest, monkeypatch):
+    def slow_prepare(file_path, folder_id):
+        time.sleep(PREPARE_DELAY)
+        return ingest.prepare(file_path, folder_id)
+
+    monkeypatch.setattr(library, "prepare_entity", slow_prepare)
+    files = [f"/data/{i}.png" for i in range(16)]
+
+    t0 = time.perf_counter()
+    added, updated = run_scan(ingest, files, prepare_workers=8)
+    elapsed = time.perf_counter() - t0
+
+    assert (added, updated) == (16, 0)
+    # Serially this takes 16 * PREPARE_DELAY.
+    assert elapsed < 8 * PREPARE_DELAY
+
+
+def test_slow_upserts_hold_back_preparation(ingest):
+    ingest.upsert_delay = 0.002
+    files = [f"/data/{i}.png" for i in range(600)]
+
+    added, _ = run_scan(ingest, files, prepare_workers=2)
+
+    assert added == 600
+    # Bounded queues: the folder is never prepared far ahead of the server.
+    assert ingest.max_outstanding <= 250
+
+
+def test_failed_and_thumbnail_files(ingest):
+    files = ["/data/a.png", "/data/broken.png", "/data/thumb.png"]
+    failed = set()
+
+    added, _ = run_scan(ingest, files, failed_files=failed)
+
+    assert added == 1
+    assert failed == {"/data/broken.png"}
@@ -0,0 +1,95 @@
+"""Search latency must not degrade while entity ingest is saturated."""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+
+from memos import crud, server
+from memos.schemas import Entity, Library
+from memos.server import api_router, app, get_read_db
+from memos.write_queue import WriteQueue
+
+INGEST_DELAY = 0.5
+
+
+def fake_get_db():
+    yield None
+
+
+@pytest.fixture
+def slow_ingest(monkeypatch):
+    now = datetime.now(timezone.utc)
+
+    def create_entity(library_id, new_entity, db):
+        # Stands in for a write stuck behind the database lock.
+        time.sleep(INGEST_DELAY)
+        fields = new_entity.model_dump(exclude={"tags", "metadata_entries"})
+        return Entity(id=1, last_scan_at=None, library_id=library_id, **fields)
+
+    monkeypatch.setattr(
+        crud, "get_library_by_id", lambda library_id, db: Library(id=library_id, name="lib")
+    )
+    monkeypatch.setattr(crud, "create_entity", create_entity)
+    monkeypatch.setattr(crud, "list_entities", lambda **kwargs: [])
+    monkeypatch.setattr(crud, "count_entities", lambda **kwargs: 0)
+    monkeypatch.setitem(api_router.dependency_overrides, get_read_db, fake_get_db)
+    write_queue = WriteQueue(create_engine("sqlite://"))
+    monkeypatch.setattr(app.state, "write_queue", write_queue)
+    server._collection_size_cache.clear()
+    yield now
+    write_queue.stop()
+    server._collection_size_cache.clear()
+
+
+async def test_search_latency_stays_flat_while_ingest_is_saturated(slow_ingest):
+    now = slow_ingest.isoformat()
+    entity = {
+        "filename": "a.png",
+        "filepath": "/tmp/a.png",
+        "size": 1,
+        "file_created_at": now,
+        "file_last_modified_at": now,
+        "file_type": "png",
+        "file_type_group": "image",
+        "folder_id": 1,
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def timed_search():
+            t0 = time.perf_counter()
+            response = await client.get("/api/search", params={"q": ""})
+            assert response.status_code == 200
+            return time.perf_counter() - t0
+
+        idle = await timed_search()
+
+        # The single writer works through these one INGEST_DELAY at a time.
+        ingest = [
+            asyncio.create_task(
+                client.post(
+                    "/api/libraries/1/entities",
+                    params={"trigger_webhooks_flag": False},
+                    json=entity,
+                )
+            )
+            for _ in range(4)
+        ]
+        await asyncio.sleep(0.1)
+
+        t0 = time.perf_counter()
+        busy = [await timed_search() for _ in range(5)]
+        searches_done = time.perf_counter() - t0
+
+        responses = await asyncio.gather(*ingest)
+        ingest_done = time.perf_counter() - t0
+
+    assert all(r.status_code == 200 for r in responses)
+    # Searches finished while the ingest backlog was still draining...
+    assert ingest_done >= INGEST_DELAY
+    assert searches_done < INGEST_DELAY
+    # ...and none of them waited for a write.
+    assert max(busy) < max(idle * 10, INGEST_DELAY / 2)
@@ -0,0 +1,176 @@
+"""Multi-frame structured VLM requests, measured against a mock VLM that
+bills tokens and time like a single-GPU backend."""
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+import respx
+from httpx import Response
+
+from memos.config import VLMSettings
+from memos.plugins.limiter import AdaptiveLimiter
+from memos.plugins.structured_vlm import main as structured_vlm_main
+from memos.plugins.structured_vlm.main import metadata_field_name, parse_vlm_batch_response
+from memos.schemas import Entity, EntityMetadata, MetadataType
+
+FIXTURES = Path(__file__).parent / "fixtures"
+ENDPOINT = "https://fake-vlm.test"
+MODEL = "qwen3.6-35b"
+ANSWER = json.loads((FIXTURES / "vlm_responses" / "iterm_cc_task.json").read_text())
+
+
+class MockVLM:
+    """Bills IMAGE_TOKENS per image plus one token per prompt character, and
+    takes OVERHEAD seconds per request plus PER_IMAGE per image, one request
+    at a time. With `garble` set, multi-image answers have a frame missing."""
+
+    IMAGE_TOKENS = 640
+    OVERHEAD = 0.04
+    PER_IMAGE = 0.002
+
+    def __init__(self, garble=False):
+        self.garble = garble
+        self.batches = []  # images per request
+        self._busy = asyncio.Lock()
+
+    async def __call__(self, request):
+        content = json.loads(request.content)["messages"][0]["content"]
+        images = sum(part["type"] == "image_url" for part in content)
+        text = "".join(part["text"] for part in content if part["type"] == "text")
+        self.batches.append(images)
+        async with self._busy:
+            await asyncio.sleep(self.OVERHEAD + self.PER_IMAGE * images)
+        if images == 1:
+            answer = json.dumps(ANSWER)
+        else:
+            answer = json.dumps([ANSWER] * (images - 1 if self.garble else images))
+        return Response(200, json={
+            "choices": [{"message": {"content": answer}}],
+            "usage": {
+                "prompt_tokens": images * self.IMAGE_TOKENS + len(text),
+                "completion_tokens": len(answer) // 4,
+            },
+        })
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    """Set up the structured_vlm plugin with a given batch size."""
+    for name in ("batcher", "limiter", "usage"):
+        monkeypatch.setattr(structured_vlm_main, name, getattr(structured_vlm_main, name))
+
+    def setup(batch_size):
+        structured_vlm_main.init_plugin(VLMSettings(
+            endpoint=ENDPOINT, modelname=MODEL,
+            structured_batch_size=batch_size, structured_batch_wait=0.5,
+        ))
+        structured_vlm_main.limiter = AdaptiveLimiter(8, min_limit=8, max_limit=8)
+        structured_vlm_main.usage = dict.fromkeys(structured_vlm_main.usage, 0)
+
+    return setup
+
+
+def frame(entity_id, sequence, screen="display_1", app="iTerm2"):
+    now = datetime.now(timezone.utc)
+    metadata = {"screen_name": screen, "sequence": str(sequence), "active_app": app}
+    return Entity(
+        id=entity_id, filepath=str(FIXTURES / "screenshots" / "sample_iterm_cc.webp"),
+        filename=f"{entity_id}.webp", size=1, file_created_at=now,
+        file_last_modified_at=now, file_type="webp", file_type_group="image",
+        last_scan_at=None, folder_id=1, library_id=1,
+        metadata_entries=[
+            EntityMetadata(
+                id=i, entity_id=entity_id, key=key, value=value,
+                source="recorder", data_type=MetadataType.TEXT_DATA,
+            )
+            for i, (key, value) in enumerate(metadata.items())
+        ],
+    )
+
+
+async def process(frames, vlm):
+    """Run the frames through the plugin concurrently, as the plugin queue
+    would; returns the written values by entity id and the elapsed time."""
+    written = {}
+
+    async def run(entity):
+        async def writer(entries):
+            written[entity.id] = entries[0].value
+
+        await structured_vlm_main.process_entity(entity, writer)
+
+    with respx.mock(base_url=ENDPOINT) as mock:
+        mock.post("/v1/chat/completions").mock(side_effect=vlm)
+        started = time.perf_counter()
+        await asyncio.gather(*(run(entity) for entity in frames))
+        return written, time.perf_counter() - started
+
+
+async def test_batches_cut_prompt_tokens_and_time(plugin):
+    frames = [frame(i, 100 + i) for i in range(8)]
+
+    plugin(1)
+    single = MockVLM()
+    single_written, single_seconds = await process(frames, single)
+    single_usage = dict(structured_vlm_main.usage)
+
+    plugin(4)
+    batched = MockVLM()
+    batched_written, batched_seconds = await process(frames, batched)
+    batched_usage = dict(structured_vlm_main.usage)
+
+    assert single.batches == [1] * 8 and batched.batches == [4, 4]
+    assert batched_written == single_written and len(batched_written) == 8
+    field = metadata_field_name(MODEL)
+    assert json.loads(batched_written[0])["extractor"] == field
+    assert single_usage["frames"] == batched_usage["frames"] == 8
+
+    # The prompt is sent once per batch instead of once per frame, so the
+    # text share of the prompt tokens drops to about a quarter.
+    image_tokens = 8 * MockVLM.IMAGE_TOKENS
+    single_text = single_usage["prompt_tokens"] - image_tokens
+    batched_text = batched_usage["prompt_tokens"] - image_tokens
+    assert batched_text < 0.4 * single_text
+    assert batched_usage["prompt_tokens"] < 0.75 * single_usage["prompt_tokens"]
+    assert batched_seconds < 0.6 * single_seconds
+    assert structured_vlm_main.batcher.stats()["batched_frames"] == 8
+
+
+async def test_unusable_batch_answer_falls_back_to_single_frames(plugin):
+    plugin(4)
+    vlm = MockVLM(garble=True)
+    written, _ = await process([frame(i, i) for i in range(4)], vlm)
+
+    assert vlm.batches == [4, 1, 1, 1, 1]
+    assert len(written) == 4
+    assert structured_vlm_main.batcher.stats()["fallbacks"] == 4
+
+
+async def test_only_adjacent_frames_of_one_screen_and_app_share_a_request(plugin):
+    plugin(4)
+    vlm = MockVLM()
+    frames = [
+        frame(1, 10), frame(2, 11),
+        frame(3, 10, screen="display_2"), frame(4, 11, screen="display_2"),
+        frame(5, 12, app="Safari"),
+        frame(6, 40),
+    ]
+    written, _ = await process(frames, vlm)
+
+    assert len(written) == 6
+    # Screen 1 sends 10-11 when 40 arrives, screen 2 sends 10-11 when its
+    # wait runs out; the Safari frame and frame 40 are on their own.
+    assert sorted(vlm.batches) == [1, 1, 2, 2]
+    assert structured_vlm_main.batcher.stats()["single_frames"] == 2
+
+
+def test_batch_answer_is_split_per_frame():
+    answer = "```json\n" + json.dumps([ANSWER, {"primary": {"app": 1}}]) + "\n```"
+    first, second = parse_vlm_batch_response(answer, MODEL, 2)
+    assert first.primary.app == ANSWER["primary"]["app"]
+    assert second is None
+
+    assert parse_vlm_batch_response(json.dumps(ANSWER), MODEL, 2) == [None, None]
@@ -0,0 +1,169 @@
+"""Adaptive VLM concurrency against a fake VLM server with set service times."""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from memos.plugins import limiter as limiter_module
+from memos.plugins.limiter import AdaptiveLimiter, limiter_for
+from memos.plugins.vlm import main as vlm_main
+
+
+class FakeVLM:
+    """Serves `capacity` requests at `service_time` each; more in flight slow
+    every request down proportionally, and above `reject_above` it answers 503."""
+
+    def __init__(self, service_time, capacity, reject_above=None):
+        self.service_time = service_time
+        self.capacity = capacity
+        self.reject_above = reject_above
+        self.in_flight = 0
+        self.peak = 0
+        self.rejected = 0
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self.complete)
+
+    async def complete(self):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.reject_above is not None and self.in_flight > self.reject_above:
+                self.rejected += 1
+                return JSONResponse({"error": "overloaded"}, status_code=503)
+            await asyncio.sleep(self.service_time * max(1, self.in_flight / self.capacity))
+            return {"choices": [{"message": {"content": "a screenshot"}}]}
+        finally:
+            self.in_flight -= 1
+
+
+def drive(server, limiter, requests, callers, monkeypatch):
+    """Send `requests` captions from `callers` concurrent tasks via the vlm plugin."""
+    monkeypatch.setattr(vlm_main, "limiter", limiter)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport) as client:
+            remaining = iter(range(requests))
+            results = []
+
+            async def caller():
+                for _ in remaining:
+                    try:
+                        results.append(await vlm_main.fetch("http://vlm", client, {}))
+                    except RuntimeError:  # the backend answered 5xx
+                        results.append(None)
+
+            await asyncio.gather(*(caller() for _ in range(callers)))
+            return results
+
+    return asyncio.run(run())
+
+
+def test_limit_grows_on_an_idle_backend(monkeypatch):
+    server = FakeVLM(service_time=0.02, capacity=6)
+    limiter = AdaptiveLimiter(1, max_limit=16)
+
+    results = drive(server, limiter, 300, 24, monkeypatch)
+
+    assert results.count("a screenshot") == 300
+    assert limiter.limit > 4
+    assert server.peak <= 16
+    stats = limiter.stats()
+    assert stats["successes"] == 300 and stats["in_flight"] == 0
+    assert stats["latency_ms"]["p50"] >= 20
+
+
+def test_limit_backs_off_an_overloaded_backend(monkeypatch):
+    server = FakeVLM(service_time=0.02, capacity=2, reject_above=3)
+    limiter = AdaptiveLimiter(16, max_limit=16)
+
+    results = drive(server, limiter, 200, 24, monkeypatch)
+
+    assert limiter.capacity <= 4
+    assert limiter.overloads == server.rejected
+    # Once the limit has settled, the backend is no longer flooded.
+    assert server.rejected < 40
+    assert results.count("a screenshot") == 200 - server.rejected
+
+
+def test_failures_from_one_round_shrink_the_limit_once():
+    async def run():
+        limiter = AdaptiveLimiter(8, max_limit=8)
+        slots = [await limiter.acquire() for _ in range(8)]
+        for slot in slots:
+            slot.overloaded()
+            limiter.release(slot)
+        return limiter
+
+    assert asyncio.run(run()).limit == pytest.approx(8 * 0.7)
+
+
+def test_waiters_are_held_at_the_limit():
+    async def run():
+        limiter = AdaptiveLimiter(2, min_limit=2, max_limit=2)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(request()) for _ in range(6)]
+        await asyncio.sleep(0)
+        assert limiter.stats()["waiting"] == 4
+        tasks[-1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return limiter, peak
+
+    limiter, peak = asyncio.run(run())
+    assert peak == 2 and limiter.in_flight == 0 and limiter.limit == 2
+    assert limiter.successes == 5
+
+
+def test_long_answers_do_not_shrink_the_limit():
+    async def run():
+        limiter = AdaptiveLimiter(4, max_limit=4)
+
+        async def request(seconds):
+            async with limiter.slot():
+                await asyncio.sleep(seconds)
+
+        # Short and long answers, as a VLM gives for sparse and busy frames.
+        await asyncio.gather(*(request(0.002 if i % 4 else 0.05) for i in range(40)))
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == 4 and limiter.overloads == 0 and limiter.successes == 40
+
+
+def test_limit_never_exceeds_the_jobs_in_flight(monkeypatch):
+    monkeypatch.setattr(limiter_module, "_limiters", {})
+    monkeypatch.setattr(limiter_module, "_in_flight", {})
+    config = SimpleNamespace(
+        concurrency=8, adaptive_concurrency=True, min_concurrency=1, max_concurrency=16,
+    )
+
+    limiter = limiter_for("http://gpu-box:8000", config, "structured_vlm", 4)
+    assert (limiter.limit, limiter.max_limit) == (4, 4)
+    assert limiter_for("http://gpu-box:8000", config, "vlm", 2) is limiter
+    assert limiter.max_limit == 6
+    limiter_for("http://gpu-box:8000", config, "vlm", 20)
+    assert limiter.max_limit == 16
+
+
+def test_plugins_on_one_endpoint_share_a_limiter(monkeypatch):
+    monkeypatch.setattr(limiter_module, "_limiters", {})
+    adaptive = SimpleNamespace(
+        concurrency=8, adaptive_concurrency=True, min_concurrency=2, max_concurrency=12,
+    )
+    fixed = SimpleNamespace(concurrency=3, adaptive_concurrency=False)
+
+    shared = limiter_for("http://gpu-box:8000", adaptive)
+    assert limiter_for("http://gpu-box:8000", fixed) is shared
+    assert (shared.limit, shared.min_limit, shared.max_limit) == (8, 2, 12)
+    other = limiter_for("http://other:8000", fixed)
+    assert (other.limit, other.min_limit, other.max_limit) == (3, 3, 3)
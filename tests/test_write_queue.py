@@ -0,0 +1,143 @@
+"""Tests for the single-writer queue and the SQLite pool tuning."""
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from memos.config import SQLiteSettings
+from memos.databases.initializers import apply_sqlite_pragmas, use_begin_immediate
+from memos.write_queue import WriteQueue
+
+
+class FakeSettings:
+    sqlite = SQLiteSettings()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    use_begin_immediate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (v INTEGER)"))
+    yield engine
+    engine.dispose()
+
+
+def insert(value):
+    def write(db):
+        db.execute(text("INSERT INTO t (v) VALUES (:v)"), {"v": value})
+        db.commit()
+        return value
+
+    return write
+
+
+def values(engine):
+    with engine.connect() as conn:
+        return sorted(v for (v,) in conn.execute(text("SELECT v FROM t")))
+
+
+def test_writes_queued_behind_a_batch_are_group_committed(engine):
+    queue = WriteQueue(engine)
+    release = threading.Event()
+
+    def blocking(db):
+        release.wait(5)
+        return insert(0)(db)
+
+    try:
+        futures = [queue.submit(blocking)]
+        time.sleep(0.05)
+        futures += [queue.submit(insert(i)) for i in (1, 2, 3)]
+        release.set()
+        assert [f.result(5) for f in futures] == [0, 1, 2, 3]
+    finally:
+        queue.stop()
+
+    assert values(engine) == [0, 1, 2, 3]
+    assert queue.writes_total == 4
+    assert queue.batches_total == 2
+    assert queue.queue_wait_seconds_max > 0
+
+
+def test_failed_write_is_rolled_back_alone(engine):
+    queue = WriteQueue(engine)
+    release = threading.Event()
+
+    def blocking(db):
+        release.wait(5)
+        return insert(1)(db)
+
+    def failing(db):
+        db.execute(text("INSERT INTO t (v) VALUES (99)"))
+        raise ValueError("bad write")
+
+    try:
+        first = queue.submit(blocking)
+        time.sleep(0.05)
+        bad = queue.submit(failing)
+        good = queue.submit(insert(2))
+        release.set()
+        assert first.result(5) == 1
+        assert good.result(5) == 2
+        with pytest.raises(ValueError):
+            bad.result(5)
+    finally:
+        queue.stop()
+
+    assert values(engine) == [1, 2]
+
+
+def test_writes_left_uncommitted_are_rolled_back(engine):
+    queue = WriteQueue(engine)
+
+    def uncommitted(db):
+        db.execute(text("INSERT INTO t (v) VALUES (7)"))
+        return 7
+
+    try:
+        assert queue.submit(uncommitted).result(5) == 7
+        assert queue.submit(insert(8)).result(5) == 8
+    finally:
+        queue.stop()
+
+    assert values(engine) == [8]
+
+
+def test_lock_wait_is_measured(engine, tmp_path):
+    # Another process-style connection holds the write lock for a while.
+    other = sqlite3.connect(
+        tmp_path / "db.sqlite", isolation_level=None, check_same_thread=False
+    )
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.2, other.commit).start()
+
+    queue = WriteQueue(engine)
+    try:
+        queue.submit(insert(1)).result(5)
+    finally:
+        queue.stop()
+        other.close()
+
+    assert queue.lock_wait_seconds_max >= 0.15
+    assert queue.lock_wait_seconds_total >= queue.lock_wait_seconds_max
+
+
+def test_reader_pragmas_reject_writes(tmp_path):
+    path = tmp_path / "db.sqlite"
+    writer = sqlite3.connect(path)
+    apply_sqlite_pragmas(writer, FakeSettings())
+    assert writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert writer.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    writer.execute("CREATE TABLE t (v INTEGER)")
+    writer.commit()
+
+    reader = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    apply_sqlite_pragmas(reader, FakeSettings(), read_only=True)
+    assert reader.execute("SELECT count(*) FROM t").fetchone()[0] == 0
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("INSERT INTO t (v) VALUES (1)")
+    reader.close()
+    writer.close()
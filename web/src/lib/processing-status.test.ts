@@ -12,6 +12,7 @@ function fixture(overrides: Partial<ProcessingStatus> = {}): ProcessingStatus {
     window_hours: 24,
     coverage_window: { total: 100, fully_processed: 100, pct: 1.0 },
     backlog: { total_unprocessed: 0, oldest_age_seconds: null },
+    queue: { depth: 0, in_flight: 0, oldest_age_seconds: null },
     watch: {
       is_alive: true,
       is_on_battery: false,
@@ -24,6 +25,7 @@ function fixture(overrides: Partial<ProcessingStatus> = {}): ProcessingStatus {
     ...overrides,
     coverage_window: { ...base.coverage_window, ...(overrides.coverage_window ?? {}) },
     backlog: { ...base.backlog, ...(overrides.backlog ?? {}) },
+    queue: { ...base.queue, ...(overrides.queue ?? {}) },
     watch: { ...base.watch, ...(overrides.watch ?? {}) },
   };
 }
@@ -11,6 +11,11 @@ export interface ProcessingStatus {
     total_unprocessed: number;
     oldest_age_seconds: number | null;
   };
+  queue: {
+    depth: number;
+    in_flight: number;
+    oldest_age_seconds: number | null;
+  };
   watch: {
     is_alive: boolean;
     is_on_battery: boolean;
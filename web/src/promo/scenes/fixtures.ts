@@ -9,6 +9,7 @@ export function makeStatus(overrides: Partial<ProcessingStatus>): ProcessingStat
     window_hours: 24,
     coverage_window: { total: 10294, fully_processed: 10294, pct: 1.0 },
     backlog: { total_unprocessed: 0, oldest_age_seconds: null },
+    queue: { depth: 0, in_flight: 0, oldest_age_seconds: null },
     watch: {
       is_alive: true,
       is_on_battery: false,
@@ -21,6 +22,7 @@ export function makeStatus(overrides: Partial<ProcessingStatus>): ProcessingStat
     ...overrides,
     coverage_window: { ...base.coverage_window, ...(overrides.coverage_window ?? {}) },
     backlog: { ...base.backlog, ...(overrides.backlog ?? {}) },
+    queue: { ...base.queue, ...(overrides.queue ?? {}) },
     watch: { ...base.watch, ...(overrides.watch ?? {}) },
   };
 }